@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Rebuild the curriculum tables so their foreign keys carry the ON DELETE CASCADE / SET NULL
+rules declared in models.py. SQLite cannot ALTER a constraint, so each table is recreated
+and its rows copied across.
+
+Hard deletes cascade in crud.py with set-based DELETEs either way; this brings the schema
+of databases created before those rules in line with new ones. Tables without the
+deactivated_by column that soft delete and restore record their cascades in get it first.
+"""
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateTable
+from database import engine
+import models
+
+# Parents before children
+TABLES = [
+    models.SchoolLevel.__table__,
+    models.Section.__table__,
+    models.FormGrade.__table__,
+    models.Term.__table__,
+    models.Subject.__table__,
+    models.Topic.__table__,
+    models.Subtopic.__table__,
+    models.LessonPlan.__table__,
+    models.TimetableSlot.__table__,
+]
+
+def rebuild_table(conn, table):
+    existing = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    copied = [col for col in table.columns if col.name in existing]
+    columns = ", ".join(col.name for col in copied)
+    # NULLs in columns that are now NOT NULL (e.g. display_order) take the column's default
+    values = ", ".join(
+        f"COALESCE({col.name}, {col.server_default.arg})"
+        if not col.nullable and col.server_default is not None else col.name
+        for col in copied
+    )
+    temp_name = f"{table.name}__rebuild"
+
+    create_sql = str(CreateTable(table).compile(conn)).replace(
+        f"CREATE TABLE {table.name} ", f"CREATE TABLE {temp_name} ", 1
+    )
+    conn.exec_driver_sql(create_sql)
+    conn.exec_driver_sql(f"INSERT INTO {temp_name} ({columns}) SELECT {values} FROM {table.name}")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {temp_name} RENAME TO {table.name}")
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+def add_deactivated_by(conn, table) -> bool:
+    existing = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    if "deactivated_by" in existing or "deactivated_by" not in table.columns:
+        return False
+    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN deactivated_by VARCHAR(64)")
+    return True
+
+def add_cascade_deletes():
+    """Recreate curriculum tables with cascading foreign keys"""
+    print("🏗️ Adding cascading foreign keys to curriculum tables...")
+    tables = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        # Must be off while tables are dropped and renamed
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.commit()
+        try:
+            with conn.begin():
+                for table in TABLES:
+                    if table.name not in tables:
+                        print(f"⏭️ {table.name} - Not found, skipping")
+                        continue
+                    if add_deactivated_by(conn, table):
+                        print(f"✅ Added column: {table.name}.deactivated_by")
+                    rebuild_table(conn, table)
+                    print(f"✅ {table.name} - Rebuilt")
+            orphans = conn.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+            if orphans:
+                print(f"⚠️ {len(orphans)} rows reference missing parents (left untouched)")
+        except Exception as e:
+            print(f"❌ Error adding cascading foreign keys: {str(e)}")
+            raise
+    print("🎉 Cascading foreign keys added successfully!")
+
+if __name__ == "__main__":
+    add_cascade_deletes()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+from database import engine
+from models import SchoolLevel, Section, FormGrade, Term, Subject, Topic, Subtopic
+from add_cascade_deletes import rebuild_table
+
+def make_display_order_not_null(conn, table) -> bool:
+    """Backfill NULL display_order with 0 and rebuild the table as NOT NULL DEFAULT 0 if needed.
+
+    Keyset pages order and compare on the bare column, so a NULL would fall out of the
+    (display_order, id) order; SQLite cannot ALTER a column, hence the rebuild.
+    """
+    conn.exec_driver_sql(f"UPDATE {table.name} SET display_order = 0 WHERE display_order IS NULL")
+    column = next(col for col in inspect(conn).get_columns(table.name) if col["name"] == "display_order")
+    if not column["nullable"]:
+        return False
+    rebuild_table(conn, table)
+    return True
+
+def add_pagination_indexes():
+    """Add the (parent, display_order, id) indexes used by keyset pagination to an existing database"""
+    print("🏗️ Adding pagination indexes to existing database...")
+    tables = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        # Must be off while tables are dropped and renamed
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.commit()
+        with conn.begin():
+            for model in [SchoolLevel, Section, FormGrade, Term, Subject, Topic, Subtopic]:
+                if model.__tablename__ not in tables:
+                    print(f"⏭️ {model.__tablename__} - Not found, skipping")
+                    continue
+                if make_display_order_not_null(conn, model.__table__):
+                    print(f"✅ {model.__tablename__}.display_order - NOT NULL DEFAULT 0")
+    for model in [SchoolLevel, Section, FormGrade, Term, Subject, Topic, Subtopic]:
+        for index in model.__table__.indexes:
+            if not index.name.endswith("_order"):
+                continue
+            try:
+                index.create(bind=engine, checkfirst=True)
+                print(f"✅ {index.name}")
+            except Exception as e:
+                print(f"❌ Error creating {index.name}: {e}")
+    print("🎉 Pagination indexes added successfully!")
+
+if __name__ == "__main__":
+    add_pagination_indexes()
@@ -5,7 +5,8 @@ import sys
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import engine
+from sqlalchemy import text
+from database import engine, SessionLocal
 from models import Base
 
 def add_timetable_tables():
@@ -19,12 +20,37 @@ def add_timetable_tables():
         from sqlalchemy import inspect
         inspector = inspect(engine)
         tables = inspector.get_table_names()
-        timetable_tables = ['timetables', 'timetable_slots']
+        timetable_tables = ['timetables', 'timetable_slots', 'timetable_occupancy', 'coverage_subjects', 'coverage_subtopics']
         for table in timetable_tables:
             if table in tables:
                 print(f"✅ {table} - Created successfully")
             else:
                 print(f"❌ {table} - Failed to create")
+        # Columns and indexes added to the timetable tables after they were first created
+        columns = [column['name'] for column in inspector.get_columns('timetables')]
+        if 'class_name' not in columns:
+            with engine.begin() as connection:
+                connection.execute(text("ALTER TABLE timetables ADD COLUMN class_name VARCHAR(100)"))
+            print("✅ Added column: timetables.class_name")
+        columns = [column['name'] for column in inspector.get_columns('timetable_occupancy')]
+        if 'term_id' not in columns:
+            with engine.begin() as connection:
+                connection.execute(text("ALTER TABLE timetable_occupancy ADD COLUMN term_id INTEGER"))
+                # Replaced by the *_term_cell indexes, which include the term
+                connection.execute(text("DROP INDEX IF EXISTS ix_timetable_occupancy_user_cell"))
+                connection.execute(text("DROP INDEX IF EXISTS ix_timetable_occupancy_class_cell"))
+            print("✅ Added column: timetable_occupancy.term_id")
+        for table in ['timetables', 'timetable_slots', 'timetable_occupancy']:
+            for index in Base.metadata.tables[table].indexes:
+                index.create(bind=engine, checkfirst=True)
+                print(f"✅ {index.name}")
+        # Index the slots of timetables saved before the occupancy table (or its term_id) existed
+        from services import timetable_clashes
+        db = SessionLocal()
+        try:
+            print(f"✅ Indexed {timetable_clashes.rebuild(db)} timetables for clash detection")
+        finally:
+            db.close()
         print("🎉 Timetable tables added successfully!")
     except Exception as e:
         print(f"❌ Error adding timetable tables: {str(e)}")
@@ -38,19 +38,7 @@ async def generate_scheme_of_work(
         # --- Ensure selected topics/subtopics are passed by title, not just ID ---
         db = next(get_db())
         timetable_data = context.get("timetable_data", {})
-        # Replace selected_topics with their titles
-        if "selected_topics" in timetable_data:
-            topic_ids = timetable_data["selected_topics"]
-            if topic_ids and isinstance(topic_ids[0], int):
-                topics = db.query(models.Topic).filter(models.Topic.id.in_(topic_ids)).all()
-                timetable_data["selected_topics"] = [{"id": t.id, "title": t.title} for t in topics]
-        # Replace selected_subtopics with their titles
-        if "selected_subtopics" in timetable_data:
-            subtopic_ids = timetable_data["selected_subtopics"]
-            if subtopic_ids and isinstance(subtopic_ids[0], int):
-                subtopics = db.query(models.Subtopic).filter(models.Subtopic.id.in_(subtopic_ids)).all()
-                timetable_data["selected_subtopics"] = [{"id": st.id, "title": st.title} for st in subtopics]
-        context["timetable_data"] = timetable_data
+        context["timetable_data"] = crud.resolve_selected_content(db, timetable_data)
         ai_service = GroqAIService()
         result = ai_service.generate_scheme_of_work(context, config)
         return {"success": True, "data": result}
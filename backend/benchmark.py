@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the API.
+
+Each dataset size is seeded once with seed_fast.py (cached under --data-dir) and then
+benchmarked in its own process: the app runs in-process behind httpx's ASGI transport, on a
+scratch copy of the seeded database, with the Groq client replaced by a stub that sleeps for
+--llm-latency and returns a canned scheme. Results (latency percentiles, throughput, error
+counts per flow) are written as JSON so two commits can be compared:
+
+    python benchmark.py run --sizes small,medium --output base.json
+    python benchmark.py run --sizes small,medium --output head.json
+    python benchmark.py compare base.json head.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = os.path.join(BACKEND_DIR, "benchmark_data")
+
+# seed_fast.generate_synthetic sizes
+SIZES = {
+    "small": dict(schools=1, levels=2, forms=2, terms=1, subjects=6, topics=6, subtopics=4,
+                  users=10, schemes_per_user=2, slots_per_timetable=30),
+    "medium": dict(schools=2, levels=2, forms=4, terms=3, subjects=10, topics=8, subtopics=6,
+                   users=100, schemes_per_user=3, slots_per_timetable=40),
+    "large": dict(schools=5, levels=2, forms=4, terms=3, subjects=14, topics=10, subtopics=8,
+                  users=500, schemes_per_user=4, slots_per_timetable=40),
+}
+
+# Reported latency percentiles
+PERCENTILES = (50, 90, 95, 99)
+
+
+# ============= LLM STUB =============
+
+def stub_scheme_json(weeks: int = 12, lessons_per_week: int = 4) -> str:
+    """A well-formed scheme response like the one the prompt asks Groq for"""
+    return json.dumps({
+        "scheme_header": {"subject": "Biology", "form_grade": "Form 2", "term": "Term 1", "total_weeks": weeks},
+        "weeks": [
+            {
+                "week_number": week,
+                "theme": f"Week {week} theme",
+                "lessons": [
+                    {
+                        "lesson_number": lesson,
+                        "topic_subtopic": f"Topic {week}.{lesson}",
+                        "specific_objectives": ["Describe the concept", "Apply it to a local example"],
+                        "teaching_learning_activities": ["Q/A session", "Group work"],
+                        "materials_resources": ["Textbook", "Charts"],
+                        "references": "KLB Biology Book 2",
+                        "remarks": "",
+                    }
+                    for lesson in range(1, lessons_per_week + 1)
+                ],
+            }
+            for week in range(1, weeks + 1)
+        ],
+    })
+
+
+class StubStream:
+    """A streamed completion as groq 0.4 yields it: text deltas, then usage under x_groq (a dict)"""
+    chunk_chars = 512
+
+    def __init__(self, content: str, usage: Dict[str, int], latency: float):
+        self.content = content
+        self.usage = usage
+        self.latency = latency
+
+    def __iter__(self):
+        time.sleep(self.latency)
+        for start in range(0, len(self.content), self.chunk_chars):
+            delta = SimpleNamespace(role="assistant", content=self.content[start:start + self.chunk_chars])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], x_groq=None)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason="stop")],
+                              x_groq={"usage": self.usage})
+
+    def close(self):
+        pass
+
+
+class StubGroq:
+    """Stands in for groq.Groq: sleeps for the configured latency and returns a canned scheme,
+    streamed when asked to as the model router does"""
+    latency = 0.0
+    content = stub_scheme_json()
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(self.content) // 4,
+                 "total_tokens": prompt_tokens + len(self.content) // 4}
+        if stream:
+            return StubStream(self.content, usage, self.latency)
+        time.sleep(self.latency)
+        message = SimpleNamespace(role="assistant", content=self.content)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                               usage=SimpleNamespace(**usage))
+
+
+# ============= DATASETS =============
+
+def ensure_dataset(size: str, seed: int, data_dir: str) -> str:
+    """Path of the seeded database for a size, generating it on first use"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench-{size}-seed{seed}.db")
+    if not os.path.exists(path):
+        import seed_fast
+        print(f"🌱 Seeding {size} dataset (seed {seed}) into {path}")
+        partial = f"{path}.partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        seed_fast.generate_synthetic(seed_fast.make_engine(partial, fast_writes=True), seed=seed, **SIZES[size])
+        os.replace(partial, path)
+    return path
+
+
+def load_targets(engine) -> Dict[str, Any]:
+    """Ids the flows pick from: users with their schemes, timetables (with slots), subjects, schools"""
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        users = dict(conn.execute(text("SELECT id, google_id FROM users")).all())
+        schemes = [(users[user_id], scheme_id) for scheme_id, user_id in conn.execute(
+            text("SELECT id, user_id FROM schemes_of_work ORDER BY id")).all()]
+        timetables = [(users[user_id], timetable_id, scheme_id) for timetable_id, user_id, scheme_id in conn.execute(
+            text("SELECT id, user_id, scheme_id FROM timetables ORDER BY id")).all()]
+        slots: Dict[str, List[Dict[str, Any]]] = {}
+        for row in conn.execute(text(
+            "SELECT timetable_id, day_of_week, time_slot, period_number, topic_id, subtopic_id, lesson_title "
+            "FROM timetable_slots ORDER BY timetable_id, day_of_week, period_number"
+        )).mappings():
+            slot = dict(row)
+            slots.setdefault(slot.pop("timetable_id"), []).append(slot)
+        subjects = [row[0] for row in conn.execute(text("SELECT id FROM subjects ORDER BY id")).all()]
+        schools = [row[0] for row in conn.execute(text("SELECT id FROM schools ORDER BY id")).all()]
+    return {"users": sorted(users.values()), "schemes": schemes, "timetables": timetables,
+            "slots": slots, "subjects": subjects, "schools": schools}
+
+
+# ============= FLOWS =============
+
+# A flow turns (targets, rng) into one request: (method, path, params, json body)
+Request = Tuple[str, str, Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+def _scheme(t, rng) -> Tuple[str, int]:
+    return rng.choice(t["schemes"])
+
+
+def _timetable_payload(t, timetable_id: str, scheme_id: int) -> Dict[str, Any]:
+    slots = t["slots"].get(timetable_id, [])
+    return {
+        "scheme_id": scheme_id,
+        "name": "Benchmark timetable",
+        "selected_topics": sorted({slot["topic_id"] for slot in slots if slot["topic_id"]}),
+        "selected_subtopics": sorted({slot["subtopic_id"] for slot in slots if slot["subtopic_id"]}),
+        "slots": slots,
+    }
+
+
+def _flow_scheme_list(t, rng) -> Request:
+    return "GET", "/api/schemes", {"user_google_id": rng.choice(t["users"])}, None
+
+
+def _flow_scheme_detail(t, rng) -> Request:
+    google_id, scheme_id = _scheme(t, rng)
+    return "GET", f"/api/schemes/{scheme_id}", {"user_google_id": google_id}, None
+
+
+def _flow_content_tree(t, rng) -> Request:
+    return "GET", f"/api/v1/subjects/{rng.choice(t['subjects'])}/content-tree", {}, None
+
+
+def _flow_hierarchy(t, rng) -> Request:
+    return "GET", f"/api/v1/admin/hierarchy/{rng.choice(t['schools'])}", {}, None
+
+
+def _flow_timetable_get(t, rng) -> Request:
+    google_id, _, scheme_id = rng.choice(t["timetables"])
+    return "GET", f"/api/timetables/by-scheme/{scheme_id}", {"user_google_id": google_id}, None
+
+
+def _flow_timetable_create(t, rng) -> Request:
+    google_id, timetable_id, scheme_id = rng.choice(t["timetables"])
+    return "POST", "/api/timetables", {"user_google_id": google_id}, _timetable_payload(t, timetable_id, scheme_id)
+
+
+def _flow_timetable_update(t, rng) -> Request:
+    google_id, timetable_id, scheme_id = rng.choice(t["timetables"])
+    return "PUT", f"/api/timetables/{timetable_id}", {"user_google_id": google_id}, _timetable_payload(t, timetable_id, scheme_id)
+
+
+def _flow_statistics(t, rng) -> Request:
+    return "GET", "/api/v1/admin/statistics/", {"school_id": rng.choice(t["schools"])}, None
+
+
+def _flow_dashboard_stats(t, rng) -> Request:
+    return "GET", "/api/dashboard/stats", {"user_google_id": rng.choice(t["users"])}, None
+
+
+def _flow_pdf(t, rng) -> Request:
+    google_id, scheme_id = _scheme(t, rng)
+    return "GET", f"/api/schemes/{scheme_id}/pdf", {"user_google_id": google_id}, None
+
+
+def _flow_generate(t, rng) -> Request:
+    google_id, timetable_id, scheme_id = rng.choice(t["timetables"])
+    timetable = _timetable_payload(t, timetable_id, scheme_id)
+    timetable_data = {key: timetable[key] for key in ("selected_topics", "selected_subtopics", "slots")}
+    context = {"school_name": "Benchmark High School", "timetable_data": timetable_data}
+    return "POST", "/api/schemes/generate", {"user_google_id": google_id}, {"scheme_id": scheme_id, "context": context}
+
+
+FLOWS: Dict[str, Callable[[Dict[str, Any], random.Random], Request]] = {
+    "scheme_list": _flow_scheme_list,
+    "scheme_detail": _flow_scheme_detail,
+    "content_tree": _flow_content_tree,
+    "hierarchy": _flow_hierarchy,
+    "timetable_get": _flow_timetable_get,
+    "timetable_create": _flow_timetable_create,
+    "timetable_update": _flow_timetable_update,
+    "statistics": _flow_statistics,
+    "dashboard_stats": _flow_dashboard_stats,
+    "pdf": _flow_pdf,
+    "generate": _flow_generate,
+}
+
+
+# ============= MEASUREMENT =============
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies: List[float], errors: int, wall_time: float, concurrency: int) -> Dict[str, Any]:
+    values = sorted(latency * 1000.0 for latency in latencies)
+    latency_ms = {"min": values[0] if values else 0.0, "mean": sum(values) / len(values) if values else 0.0}
+    latency_ms.update({f"p{pct}": percentile(values, pct) for pct in PERCENTILES})
+    latency_ms["max"] = values[-1] if values else 0.0
+    return {
+        "requests": len(values),
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": len(values) / wall_time if wall_time > 0 else 0.0,
+        "latency_ms": {key: round(value, 3) for key, value in latency_ms.items()},
+    }
+
+
+def _is_error(response) -> bool:
+    if response.status_code >= 400:
+        return True
+    if response.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = response.json()
+        except ValueError:
+            return True
+        if not isinstance(body, dict):
+            return False
+        if body.get("success") is False:
+            return True
+        # A generation that fell back to the curriculum template did not get a usable LLM answer
+        metadata = (body.get("data") or {}).get("metadata") if isinstance(body.get("data"), dict) else None
+        return isinstance(metadata, dict) and str(metadata.get("generation_source", "")).endswith("_template")
+    return False
+
+
+async def run_flow(client, build: Callable, targets: Dict[str, Any], requests: int, warmup: int,
+                   concurrency: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    planned = [build(targets, rng) for _ in range(warmup + requests)]
+    for method, path, params, body in planned[:warmup]:
+        await client.request(method, path, params=params, json=body)
+
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(planned[warmup:])
+
+    async def worker():
+        nonlocal errors
+        for method, path, params, body in pending:
+            start = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body)
+            latencies.append(time.perf_counter() - start)
+            if _is_error(response):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+async def _benchmark_app(flows: List[str], requests: int, warmup: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    import httpx
+    from main import app
+    from database import engine
+
+    targets = load_targets(engine)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for index, name in enumerate(flows):
+            results[name] = await run_flow(client, FLOWS[name], targets, requests, warmup, concurrency, seed + index)
+            stats = results[name]
+            print(f"   {name:<18} p50 {stats['latency_ms']['p50']:>9.2f} ms   p95 {stats['latency_ms']['p95']:>9.2f} ms"
+                  f"   {stats['throughput_rps']:>8.1f} req/s   errors {stats['errors']}", file=sys.stderr)
+    return results
+
+
+def run_dataset(args) -> Dict[str, Any]:
+    """Benchmark one seeded database (child process; DATABASE_URL is already set)"""
+    logging.disable(getattr(logging, args.log_level.upper()))
+    if args.groq_base_url:
+        # Real groq client against fake_groq_server.py (or another compatible endpoint)
+        os.environ["GROQ_BASE_URL"] = args.groq_base_url
+    else:
+        import services.ai_service as ai_service
+        StubGroq.latency = args.llm_latency
+        ai_service.Groq = StubGroq
+        os.environ.setdefault("GROQ_API_KEY", "gsk_benchmark_stub")
+    return asyncio.run(_benchmark_app(args.flows, args.requests, args.warmup, args.concurrency, args.seed))
+
+
+# ============= REPORTS =============
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "groq_base_url": args.groq_base_url,
+            "log_level": args.log_level,
+        },
+        "datasets": {},
+    }
+    for size in args.sizes:
+        db_path = ensure_dataset(size, args.seed, args.data_dir)
+        with tempfile.TemporaryDirectory(prefix="eduscheme-bench-") as scratch:
+            # Write flows change the data, so every run starts from a fresh copy
+            work_db = os.path.join(scratch, "bench.db")
+            shutil.copyfile(db_path, work_db)
+            output = os.path.join(scratch, "result.json")
+            print(f"🏁 Benchmarking {size} dataset", file=sys.stderr)
+            command = [
+                sys.executable, os.path.abspath(__file__), "run-dataset", "--output", output,
+                "--flows", ",".join(args.flows), "--requests", str(args.requests), "--warmup", str(args.warmup),
+                "--concurrency", str(args.concurrency), "--seed", str(args.seed),
+                "--llm-latency", str(args.llm_latency), "--log-level", args.log_level,
+            ]
+            if args.groq_base_url:
+                command += ["--groq-base-url", args.groq_base_url]
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{work_db}"}
+            subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True)
+            with open(output) as f:
+                flows = json.load(f)
+        results["datasets"][size] = {"config": SIZES[size], "flows": flows}
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+
+def compare(args) -> int:
+    """Print p50/p95 changes between two result files; non-zero exit when p95 regressed past the threshold"""
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    print(f"base {base['meta'].get('commit')}  →  head {head['meta'].get('commit')}")
+    regressions = 0
+    for size, dataset in head["datasets"].items():
+        base_flows = base["datasets"].get(size, {}).get("flows", {})
+        for name, stats in dataset["flows"].items():
+            if name not in base_flows:
+                continue
+            line = [f"{size:<7} {name:<18}"]
+            for key in ("p50", "p95"):
+                before, after = base_flows[name]["latency_ms"][key], stats["latency_ms"][key]
+                change = (after - before) / before if before else 0.0
+                line.append(f"{key} {before:>9.2f} → {after:>9.2f} ms ({change:+.0%})")
+                if key == "p95" and change > args.threshold:
+                    regressions += 1
+                    line.append("⚠️ regression")
+            print("  ".join(line))
+    if regressions:
+        print(f"❌ {regressions} flow(s) regressed by more than {args.threshold:.0%} at p95")
+        return 1
+    print("✅ No p95 regressions")
+    return 0
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="EDUScheme API benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(command):
+        command.add_argument("--flows", type=_csv, default=list(FLOWS), help=f"Comma separated subset of: {', '.join(FLOWS)}")
+        command.add_argument("--requests", type=int, default=200, help="Measured requests per flow")
+        command.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per flow")
+        command.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once")
+        command.add_argument("--seed", type=int, default=1, help="Dataset and request-mix seed")
+        command.add_argument("--llm-latency", type=float, default=0.2, help="Seconds the stub LLM takes per call")
+        command.add_argument("--groq-base-url", default=None,
+                             help="Send generation to this server (e.g. fake_groq_server.py) instead of the in-process stub")
+        command.add_argument("--log-level", default="info",
+                             help="Suppress app log records at or below this level (default: info)")
+
+    run_command = commands.add_parser("run", help="Seed (if needed) and benchmark one or more dataset sizes")
+    run_command.add_argument("--sizes", type=_csv, default=["small"], help=f"Comma separated subset of: {', '.join(SIZES)}")
+    run_command.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where seeded databases are cached")
+    run_command.add_argument("--output", default="benchmark_results.json")
+    add_run_options(run_command)
+
+    dataset_command = commands.add_parser("run-dataset", help=argparse.SUPPRESS)
+    dataset_command.add_argument("--output", required=True)
+    add_run_options(dataset_command)
+
+    compare_command = commands.add_parser("compare", help="Compare two result files")
+    compare_command.add_argument("base")
+    compare_command.add_argument("head")
+    compare_command.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 slowdown (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+    if args.command != "compare":
+        unknown = [name for name in args.flows if name not in FLOWS]
+        if unknown:
+            parser.error(f"Unknown flows: {', '.join(unknown)}")
+    if args.command == "run":
+        unknown = [size for size in args.sizes if size not in SIZES]
+        if unknown:
+            parser.error(f"Unknown sizes: {', '.join(unknown)}")
+        run(args)
+    elif args.command == "run-dataset":
+        with open(args.output, "w") as f:
+            json.dump(run_dataset(args), f)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
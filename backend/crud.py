@@ -1,9 +1,147 @@
 # backend/crud.py
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, func
-from typing import List, Optional, Dict, Any, Union
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, or_, case, desc, func, select, text
+from typing import List, Optional, Dict, Any, Union, Tuple
+import base64
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import models, schemas
 from models import User, SchemeOfWork, LessonPlan
+from services import metrics
+
+# ============= KEYSET PAGINATION =============
+# List endpoints page by (display_order, id) instead of OFFSET, so page N costs the same
+# as page 1. Cursors are opaque to clients.
+
+COUNT_CACHE_TTL = 30  # seconds
+# Distinct filters (e.g. search strings) kept; the least recently used are evicted first
+COUNT_CACHE_MAX = 1024
+_count_cache: "OrderedDict[Tuple[str, str], Tuple[float, int]]" = OrderedDict()
+
+def encode_cursor(display_order: Optional[int], id: int) -> str:
+    raw = json.dumps([display_order or 0, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        display_order, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(display_order), int(id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def next_cursor(items: List[Any], limit: Optional[int]) -> Optional[str]:
+    """Cursor for the page after `items`, or None when this was the last page"""
+    if not limit or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, "display_order", 0), last.id)
+
+def invalidate_counts(model):
+    """Drop cached totals for a table after a write"""
+    table = model.__tablename__
+    for key in [k for k in _count_cache if k[0] == table]:
+        _count_cache.pop(key, None)
+
+# ============= CASCADING SOFT DELETE =============
+# Deactivating a row deactivates everything below it with one UPDATE per table
+# (UPDATE child SET is_active = 0 WHERE parent_id IN (SELECT ...)), never loading the subtree.
+
+HIERARCHY_CHILDREN = {
+    models.School: [(models.SchoolLevel, models.SchoolLevel.school_id)],
+    models.SchoolLevel: [
+        (models.Section, models.Section.school_level_id),
+        (models.FormGrade, models.FormGrade.school_level_id),
+    ],
+    models.FormGrade: [(models.Term, models.Term.form_grade_id)],
+    models.Term: [(models.Subject, models.Subject.term_id)],
+    models.Subject: [(models.Topic, models.Topic.subject_id)],
+    models.Topic: [(models.Subtopic, models.Subtopic.topic_id)],
+}
+
+def cascade_key(model, id: int) -> str:
+    """deactivated_by value of the rows a soft delete of this row switches off"""
+    return f"{model.__tablename__}:{id}"
+
+def _set_active_subtree(db: Session, model, ids, is_active: bool, keys: List[str]) -> int:
+    """Switch the descendants of the rows selected by `ids` off or back on.
+
+    Deactivating switches off every active descendant, however deep, and records keys[0] in
+    their deactivated_by. Restoring switches back on exactly the descendants whose
+    deactivated_by is in keys, so rows switched off on their own (or by another soft delete)
+    stay off. Deeper tables are updated first so the selecting subqueries still see the old state.
+    """
+    affected = 0
+    now = datetime.utcnow()
+    for child, parent_fk in HIERARCHY_CHILDREN.get(model, []):
+        below = select(child.id).where(parent_fk.in_(ids))
+        if is_active:
+            changed = [child.is_active == False, child.deactivated_by.in_(keys)]
+            values = {"is_active": True, "deactivated_by": None, "updated_at": now}
+        else:
+            changed = [child.is_active == True]
+            values = {"is_active": False, "deactivated_by": keys[0], "updated_at": now}
+        affected += _set_active_subtree(db, child, below, is_active, keys)
+        affected += db.query(child).filter(child.id.in_(below), *changed).update(values, synchronize_session=False)
+        invalidate_counts(child)
+    return affected
+
+# Child model -> (parent model, foreign key column), derived from HIERARCHY_CHILDREN
+PARENTS = {
+    child: (parent, parent_fk)
+    for parent, children in HIERARCHY_CHILDREN.items()
+    for child, parent_fk in children
+}
+
+# Levels HierarchyCRUD.duplicate_structure can copy
+DUPLICATABLE_LEVELS = {
+    "form_grade": models.FormGrade,
+    "term": models.Term,
+    "subject": models.Subject,
+    "topic": models.Topic,
+}
+
+# Nullable references to curriculum content that must not dangle after a hard delete
+CONTENT_REFERENCES = {
+    models.Topic: [models.LessonPlan.topic_id, models.TimetableSlot.topic_id],
+    models.Subtopic: [models.LessonPlan.subtopic_id, models.TimetableSlot.subtopic_id],
+}
+
+def _delete_subtree(db: Session, model, ids) -> int:
+    """DELETE the rows selected by `ids` and all their descendants, deepest table first.
+
+    Mirrors the ON DELETE CASCADE / SET NULL rules declared on the models, so it also works on
+    SQLite, where foreign keys are not enforced, and on databases created before those rules.
+    """
+    affected = 0
+    for child, parent_fk in HIERARCHY_CHILDREN.get(model, []):
+        affected += _delete_subtree(db, child, select(child.id).where(parent_fk.in_(ids)))
+    for reference in CONTENT_REFERENCES.get(model, []):
+        db.query(reference.class_).filter(reference.in_(ids)).update(
+            {reference.key: None}, synchronize_session=False
+        )
+    affected += db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+    invalidate_counts(model)
+    return affected
+
+# ============= BATCH LOOKUPS =============
+
+MAX_BATCH_IDS = 200
+IN_CHUNK = 500  # ids per IN (...) list, below SQLite's bound-parameter limit
+
+def parse_ids(ids: str) -> List[int]:
+    """Parse a comma-separated id list ("3,1,2") as sent to the :batch endpoints, at most MAX_BATCH_IDS distinct"""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    if not parsed:
+        raise ValueError("At least one id is required")
+    if len(set(parsed)) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} ids can be fetched at once")
+    return parsed
 
 class BaseCRUD:
     def __init__(self, model):
@@ -12,19 +150,91 @@ class BaseCRUD:
     def get(self, db: Session, id: int):
         return db.query(self.model).filter(self.model.id == id).first()
 
-    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100, is_active: Optional[bool] = None):
-        """Get multiple records with optional active filter"""
+    def get_many(self, db: Session, ids: List[int]) -> List[Any]:
+        """Fetch rows by id with IN queries of up to IN_CHUNK ids, in the order the
+        ids were given. Duplicate ids are returned once; unknown ids are skipped.
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        by_id = {}
+        for start in range(0, len(unique_ids), IN_CHUNK):
+            for row in db.query(self.model).filter(
+                self.model.id.in_(unique_ids[start:start + IN_CHUNK])
+            ):
+                by_id[row.id] = row
+        return [by_id[id] for id in unique_ids if id in by_id]
+
+    def _ordered(self, query):
+        # display_order is NOT NULL, so both the ORDER BY and the cursor condition use the bare
+        # column and are served by the *_order indexes
+        if hasattr(self.model, 'display_order'):
+            return query.order_by(self.model.display_order, self.model.id)
+        return query.order_by(self.model.id)
+
+    def get_page(self, db: Session, *criteria, cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        """Get rows matching criteria ordered by (display_order, id).
+
+        With a cursor the page starts right after the cursor row (keyset pagination).
+        skip is only honoured without a cursor, for older clients. limit=None returns all rows.
+        """
         query = db.query(self.model)
-        
+        if criteria:
+            query = query.filter(and_(*criteria))
+        if cursor:
+            display_order, last_id = decode_cursor(cursor)
+            if hasattr(self.model, 'display_order'):
+                query = query.filter(or_(
+                    self.model.display_order > display_order,
+                    and_(self.model.display_order == display_order, self.model.id > last_id)
+                ))
+            else:
+                query = query.filter(self.model.id > last_id)
+        query = self._ordered(query)
+        if skip and not cursor:
+            query = query.offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def count(self, db: Session, *criteria, use_cache: bool = True) -> int:
+        """Count rows matching criteria, cached for COUNT_CACHE_TTL seconds per filter"""
+        key = None
+        if use_cache:
+            try:
+                compiled = and_(*criteria).compile(compile_kwargs={"literal_binds": True}) if criteria else ""
+                key = (self.model.__tablename__, str(compiled))
+            except Exception:
+                key = None
+        if key is not None:
+            cached = _count_cache.get(key)
+            if cached and cached[0] > time.time():
+                _count_cache.move_to_end(key)
+                metrics.record_cache("list_total", True)
+                return cached[1]
+            metrics.record_cache("list_total", False)
+
+        query = db.query(func.count(self.model.id))
+        if criteria:
+            query = query.filter(and_(*criteria))
+        total = query.scalar() or 0
+        if key is not None:
+            _count_cache[key] = (time.time() + COUNT_CACHE_TTL, total)
+            _count_cache.move_to_end(key)
+            while len(_count_cache) > COUNT_CACHE_MAX:
+                _count_cache.popitem(last=False)
+        return total
+
+    def _active_criteria(self, is_active: Optional[bool]) -> list:
         # Only filter by is_active if explicitly specified
         if is_active is not None and hasattr(self.model, 'is_active'):
-            query = query.filter(self.model.is_active == is_active)
-        
-        if hasattr(self.model, 'display_order'):
-            query = query.order_by(self.model.display_order, self.model.id)
-        else:
-            query = query.order_by(self.model.id)
-        return query.offset(skip).limit(limit).all()
+            return [self.model.is_active == is_active]
+        return []
+
+    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100, is_active: Optional[bool] = None, cursor: Optional[str] = None):
+        """Get multiple records with optional active filter"""
+        return self.get_page(db, *self._active_criteria(is_active), cursor=cursor, skip=skip, limit=limit)
+
+    def count_multi(self, db: Session, *, is_active: Optional[bool] = None) -> int:
+        return self.count(db, *self._active_criteria(is_active))
 
     def create(self, db: Session, *, obj_in):
         if isinstance(obj_in, dict):
@@ -35,57 +245,117 @@ class BaseCRUD:
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        invalidate_counts(self.model)
         return db_obj
 
     def update(self, db: Session, *, db_obj, obj_in):
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.dict(exclude_unset=True)
+        # display_order is NOT NULL; an explicit null keeps the current position
+        if "display_order" in update_data and update_data["display_order"] is None:
+            update_data.pop("display_order")
+        
+        # Toggling is_active on a hierarchy row deactivates/restores its subtree as well
+        cascade_active = None
+        if self.model in HIERARCHY_CHILDREN and "is_active" in update_data:
+            is_active = update_data.pop("is_active")
+            if is_active is not None and is_active != db_obj.is_active:
+                cascade_active = is_active
+        elif "is_active" in update_data and hasattr(self.model, "deactivated_by"):
+            # Switched on or off directly, no longer part of a soft delete above it
+            update_data["deactivated_by"] = None
         
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
         db.add(db_obj)
+        if cascade_active is not None:
+            db.flush()
+            self._cascade_active(db, db_obj, cascade_active)
         db.commit()
         db.refresh(db_obj)
+        invalidate_counts(self.model)
         return db_obj
 
     def delete(self, db: Session, *, id: int):
+        """Delete a row and its subtree with one set-based DELETE per table"""
         obj = db.query(self.model).get(id)
         if obj:
-            db.delete(obj)
+            # Keep the loaded instance usable for the caller once the row is gone
+            db.expunge(obj)
+            _delete_subtree(db, self.model, select(self.model.id).where(self.model.id == id))
             db.commit()
         return obj
 
     def soft_delete(self, db: Session, *, id: int):
         obj = db.query(self.model).get(id)
         if obj and hasattr(obj, 'is_active'):
-            obj.is_active = False
-            db.add(obj)
+            if self.model in HIERARCHY_CHILDREN:
+                self._cascade_active(db, obj, False)
+            else:
+                obj.is_active = False
+                if hasattr(obj, 'deactivated_by'):
+                    obj.deactivated_by = None
+                db.add(obj)
             db.commit()
             db.refresh(obj)
+            invalidate_counts(self.model)
         return obj
 
+    def restore(self, db: Session, *, id: int):
+        """Reactivate a soft-deleted row and the descendants that were deactivated with it"""
+        obj = db.query(self.model).get(id)
+        if obj and hasattr(obj, 'is_active'):
+            if self.model in HIERARCHY_CHILDREN:
+                self._cascade_active(db, obj, True)
+            else:
+                obj.is_active = True
+                if hasattr(obj, 'deactivated_by'):
+                    obj.deactivated_by = None
+                db.add(obj)
+            db.commit()
+            db.refresh(obj)
+            invalidate_counts(self.model)
+        return obj
+
+    def _cascade_active(self, db: Session, obj, is_active: bool) -> int:
+        keys = [cascade_key(self.model, obj.id)]
+        if is_active and getattr(obj, 'deactivated_by', None):
+            # Restoring a row switched off from above also brings back what went with it
+            keys.append(obj.deactivated_by)
+        ids = select(self.model.id).where(self.model.id == obj.id)
+        affected = _set_active_subtree(db, self.model, ids, is_active, keys)
+        obj.is_active = is_active
+        if hasattr(obj, 'deactivated_by'):
+            obj.deactivated_by = None
+        db.add(obj)
+        db.flush()
+        invalidate_counts(self.model)
+        return affected + 1
+
 class SchoolLevelCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.SchoolLevel)
 
-    def get_all_including_inactive(self, db: Session, skip: int = 0, limit: int = 100):
+    def get_all_including_inactive(self, db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
         """Get all school levels including inactive ones"""
-        return db.query(self.model).order_by(
-            self.model.display_order, 
-            self.model.id
-        ).offset(skip).limit(limit).all()
+        return self.get_page(db, cursor=cursor, skip=skip, limit=limit)
 
-    def get_by_school(self, db: Session, school_id: int, include_inactive: bool = False):
-        """Get school levels by school ID with option to include inactive"""
-        query = db.query(self.model).filter(self.model.school_id == school_id)
-        
+    def _school_criteria(self, school_id: int, include_inactive: bool) -> list:
+        criteria = [self.model.school_id == school_id]
         if not include_inactive:
-            query = query.filter(self.model.is_active == True)
-            
-        return query.order_by(self.model.display_order).all()
+            criteria.append(self.model.is_active == True)
+        return criteria
+
+    def get_by_school(self, db: Session, school_id: int, include_inactive: bool = False,
+                      cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        """Get school levels by school ID with option to include inactive"""
+        return self.get_page(db, *self._school_criteria(school_id, include_inactive), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_school(self, db: Session, school_id: int, include_inactive: bool = False) -> int:
+        return self.count(db, *self._school_criteria(school_id, include_inactive))
 
     def get_by_code(self, db: Session, code: str, school_id: int, include_inactive: bool = False):
         filters = [
@@ -99,14 +369,7 @@ class SchoolLevelCRUD(BaseCRUD):
         return db.query(self.model).filter(and_(*filters)).first()
 
     def get_with_hierarchy(self, db: Session, school_level_id: int):
-        return db.query(self.model).options(
-            joinedload(self.model.sections)
-            .joinedload(models.Section.forms_grades)
-            .joinedload(models.FormGrade.terms)
-            .joinedload(models.Term.subjects)
-            .joinedload(models.Subject.topics)
-            .joinedload(models.Topic.subtopics)
-        ).filter(self.model.id == school_level_id).first()
+        return db.query(self.model).options(*HierarchyCRUD.TREE_OPTIONS).filter(self.model.id == school_level_id).first()
 
     def get_all_with_relations(self, db: Session) -> List[dict]:
         """Get all school levels with their forms/grades and terms"""
@@ -166,20 +429,26 @@ class SchoolLevelCRUD(BaseCRUD):
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        invalidate_counts(self.model)
         return db_obj
 
 class SectionCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.Section)
 
-    def get_by_school_level(self, db: Session, school_level_id: int, include_inactive: bool = False):
-        """Get sections by school level ID with option to include inactive"""
-        query = db.query(self.model).filter(self.model.school_level_id == school_level_id)
-        
+    def _school_level_criteria(self, school_level_id: int, include_inactive: bool) -> list:
+        criteria = [self.model.school_level_id == school_level_id]
         if not include_inactive:
-            query = query.filter(self.model.is_active == True)
-            
-        return query.order_by(self.model.display_order).all()
+            criteria.append(self.model.is_active == True)
+        return criteria
+
+    def get_by_school_level(self, db: Session, school_level_id: int, include_inactive: bool = False,
+                            cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        """Get sections by school level ID with option to include inactive"""
+        return self.get_page(db, *self._school_level_criteria(school_level_id, include_inactive), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_school_level(self, db: Session, school_level_id: int, include_inactive: bool = False) -> int:
+        return self.count(db, *self._school_level_criteria(school_level_id, include_inactive))
 
     def get_by_code(self, db: Session, code: str, school_level_id: int, include_inactive: bool = False):
         filters = [
@@ -205,14 +474,19 @@ class FormGradeCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.FormGrade)
 
-    def get_by_school_level(self, db: Session, school_level_id: int, include_inactive: bool = False):
-        """Get forms/grades by school level ID with option to include inactive"""
-        query = db.query(self.model).filter(self.model.school_level_id == school_level_id)
-        
+    def _school_level_criteria(self, school_level_id: int, include_inactive: bool) -> list:
+        criteria = [self.model.school_level_id == school_level_id]
         if not include_inactive:
-            query = query.filter(self.model.is_active == True)
-            
-        return query.order_by(self.model.display_order).all()
+            criteria.append(self.model.is_active == True)
+        return criteria
+
+    def get_by_school_level(self, db: Session, school_level_id: int, include_inactive: bool = False,
+                            cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        """Get forms/grades by school level ID with option to include inactive"""
+        return self.get_page(db, *self._school_level_criteria(school_level_id, include_inactive), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_school_level(self, db: Session, school_level_id: int, include_inactive: bool = False) -> int:
+        return self.count(db, *self._school_level_criteria(school_level_id, include_inactive))
 
     def get_by_code(self, db: Session, code: str, school_level_id: int):
         """Get form/grade by code within a school level"""
@@ -228,22 +502,34 @@ class TermCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.Term)
 
-    def get_by_form_grade(self, db: Session, form_grade_id: int, include_inactive: bool = False):
-        query = db.query(self.model).filter(self.model.form_grade_id == form_grade_id)
+    def _form_grade_criteria(self, form_grade_id: int, include_inactive: bool) -> list:
+        criteria = [self.model.form_grade_id == form_grade_id]
         if not include_inactive:
-            query = query.filter(self.model.is_active == True)
-        return query.order_by(self.model.display_order).all()
+            criteria.append(self.model.is_active == True)
+        return criteria
+
+    def get_by_form_grade(self, db: Session, form_grade_id: int, include_inactive: bool = False,
+                          cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._form_grade_criteria(form_grade_id, include_inactive), cursor=cursor, skip=skip, limit=limit)
 
-    def get_current_terms(self, db: Session):
+    def count_by_form_grade(self, db: Session, form_grade_id: int, include_inactive: bool = False) -> int:
+        return self.count(db, *self._form_grade_criteria(form_grade_id, include_inactive))
+
+    def _current_criteria(self) -> list:
         from datetime import datetime
         now = datetime.now()
-        return db.query(self.model).filter(
-            and_(
-                self.model.start_date <= now,
-                self.model.end_date >= now,
-                self.model.is_active == True
-            )
-        ).all()
+        return [
+            self.model.start_date <= now,
+            self.model.end_date >= now,
+            self.model.is_active == True
+        ]
+
+    def get_current_terms(self, db: Session, cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._current_criteria(), cursor=cursor, skip=skip, limit=limit)
+
+    def count_current_terms(self, db: Session) -> int:
+        # "now" changes on every call, so this filter is never served from the count cache
+        return self.count(db, *self._current_criteria(), use_cache=False)
 
     def get_by_code(self, db: Session, code: str, form_grade_id: int):
         return db.query(self.model).filter(
@@ -258,10 +544,18 @@ class SubjectCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.Subject)
 
-    def get_by_term(self, db: Session, term_id: int):
-        return db.query(self.model).filter(
-            and_(self.model.term_id == term_id, self.model.is_active == True)
-        ).order_by(self.model.display_order).all()
+    def _term_criteria(self, term_id: int, include_inactive: bool) -> list:
+        criteria = [self.model.term_id == term_id]
+        if not include_inactive:
+            criteria.append(self.model.is_active == True)
+        return criteria
+
+    def get_by_term(self, db: Session, term_id: int, include_inactive: bool = False,
+                    cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._term_criteria(term_id, include_inactive), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_term(self, db: Session, term_id: int, include_inactive: bool = False) -> int:
+        return self.count(db, *self._term_criteria(term_id, include_inactive))
 
     def get_by_code(self, db: Session, code: str, term_id: int):
         return db.query(self.model).filter(
@@ -272,33 +566,87 @@ class SubjectCRUD(BaseCRUD):
             )
         ).first()
 
-    def search_subjects(self, db: Session, query: str, limit: int = 100):
-        return db.query(self.model).filter(
-            and_(
-                or_(
-                    self.model.name.ilike(f"%{query}%"),
-                    self.model.code.ilike(f"%{query}%"),
-                    self.model.description.ilike(f"%{query}%")
-                ),
-                self.model.is_active == True
-            )
-        ).limit(limit).all()
+    def _search_criteria(self, query: str) -> list:
+        return [
+            or_(
+                self.model.name.ilike(f"%{query}%"),
+                self.model.code.ilike(f"%{query}%"),
+                self.model.description.ilike(f"%{query}%")
+            ),
+            self.model.is_active == True
+        ]
 
-    def get_with_topics(self, db: Session, subject_id: int):
-        return db.query(self.model).options(
-            joinedload(self.model.topics).joinedload(models.Topic.subtopics)
+    def search_subjects(self, db: Session, query: str, limit: Optional[int] = 100, cursor: Optional[str] = None,
+                        skip: int = 0):
+        return self.get_page(db, *self._search_criteria(query), cursor=cursor, skip=skip, limit=limit)
+
+    def count_search(self, db: Session, query: str) -> int:
+        return self.count(db, *self._search_criteria(query))
+
+    def get_with_topics(self, db: Session, subject_id: int, include_inactive: bool = True):
+        """Load a subject with its topics and their subtopics, sorted by display order.
+
+        selectinload issues one extra query per level instead of a joined row per subtopic.
+        """
+        topics = self.model.topics
+        subtopics = models.Topic.subtopics
+        if not include_inactive:
+            topics = topics.and_(models.Topic.is_active == True)
+            subtopics = subtopics.and_(models.Subtopic.is_active == True)
+
+        subject = db.query(self.model).options(
+            selectinload(topics).selectinload(subtopics)
         ).filter(self.model.id == subject_id).first()
 
+        if subject:
+            subject.topics.sort(key=lambda t: (t.display_order or 0, t.id))
+            for topic in subject.topics:
+                topic.subtopics.sort(key=lambda st: (st.display_order or 0, st.id))
+        return subject
+
+    def get_content_version(self, db: Session, subject_id: int) -> Optional[str]:
+        """Cheap fingerprint of a subject's topic/subtopic tree, used as an ETag.
+
+        Any create, update, (soft) delete or move below the subject changes a timestamp or a count;
+        the timestamps are stamped in Python with microseconds, so two edits within a second differ.
+        """
+        return self.get_content_versions(db, [subject_id]).get(subject_id)
+
+    def get_content_versions(self, db: Session, subject_ids: List[int]) -> Dict[int, str]:
+        """get_content_version of many subjects in three grouped queries (missing subjects are left out)"""
+        versions = {}
+        for start in range(0, len(subject_ids), IN_CHUNK):
+            chunk = subject_ids[start:start + IN_CHUNK]
+            topic_stats = {row[0]: tuple(row[1:]) for row in db.query(
+                models.Topic.subject_id,
+                func.count(models.Topic.id), func.max(models.Topic.updated_at), func.sum(models.Topic.id)
+            ).filter(models.Topic.subject_id.in_(chunk)).group_by(models.Topic.subject_id)}
+            subtopic_stats = {row[0]: tuple(row[1:]) for row in db.query(
+                models.Topic.subject_id,
+                func.count(models.Subtopic.id), func.max(models.Subtopic.updated_at), func.sum(models.Subtopic.id)
+            ).join(models.Topic, models.Subtopic.topic_id == models.Topic.id).filter(
+                models.Topic.subject_id.in_(chunk)
+            ).group_by(models.Topic.subject_id)}
+            empty = (0, None, None)
+            for subject_id, updated_at in db.query(self.model.id, self.model.updated_at).filter(self.model.id.in_(chunk)):
+                versions[subject_id] = (f"{subject_id}:{updated_at}:{topic_stats.get(subject_id, empty)}:"
+                                        f"{subtopic_stats.get(subject_id, empty)}")
+        return versions
+
 class TopicCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.Topic)
 
-    def get_by_subject(self, db: Session, subject_id: int):
-        return db.query(self.model).filter(
-            and_(self.model.subject_id == subject_id, self.model.is_active == True)
-        ).order_by(self.model.display_order).all()
+    def _subject_criteria(self, subject_id: int) -> list:
+        return [self.model.subject_id == subject_id, self.model.is_active == True]
 
-    def search_topics(self, db: Session, query: str, subject_id: Optional[int] = None):
+    def get_by_subject(self, db: Session, subject_id: int, cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._subject_criteria(subject_id), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_subject(self, db: Session, subject_id: int) -> int:
+        return self.count(db, *self._subject_criteria(subject_id))
+
+    def _search_criteria(self, query: str, subject_id: Optional[int] = None) -> list:
         filters = [
             or_(
                 self.model.title.ilike(f"%{query}%"),
@@ -309,28 +657,47 @@ class TopicCRUD(BaseCRUD):
         
         if subject_id:
             filters.append(self.model.subject_id == subject_id)
-        
-        return db.query(self.model).filter(and_(*filters)).all()
+        return filters
 
-    def get_by_duration(self, db: Session, min_weeks: int, max_weeks: int):
-        return db.query(self.model).filter(
-            and_(
-                self.model.duration_weeks >= min_weeks,
-                self.model.duration_weeks <= max_weeks,
-                self.model.is_active == True
-            )
-        ).all()
+    def search_topics(self, db: Session, query: str, subject_id: Optional[int] = None,
+                      cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._search_criteria(query, subject_id), cursor=cursor, skip=skip, limit=limit)
+
+    def count_search(self, db: Session, query: str, subject_id: Optional[int] = None) -> int:
+        return self.count(db, *self._search_criteria(query, subject_id))
+
+    def _duration_criteria(self, min_weeks: int, max_weeks: int) -> list:
+        return [
+            self.model.duration_weeks >= min_weeks,
+            self.model.duration_weeks <= max_weeks,
+            self.model.is_active == True
+        ]
+
+    def get_by_duration(self, db: Session, min_weeks: int, max_weeks: int,
+                        cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._duration_criteria(min_weeks, max_weeks), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_duration(self, db: Session, min_weeks: int, max_weeks: int) -> int:
+        return self.count(db, *self._duration_criteria(min_weeks, max_weeks))
 
 class SubtopicCRUD(BaseCRUD):
     def __init__(self):
         super().__init__(models.Subtopic)
 
-    def get_by_topic(self, db: Session, topic_id: int):
-        return db.query(self.model).filter(
-            and_(self.model.topic_id == topic_id, self.model.is_active == True)
-        ).order_by(self.model.display_order).all()
+    def _topic_criteria(self, topic_id: int, include_inactive: bool = False) -> list:
+        criteria = [self.model.topic_id == topic_id]
+        if not include_inactive:
+            criteria.append(self.model.is_active == True)
+        return criteria
+
+    def get_by_topic(self, db: Session, topic_id: int, include_inactive: bool = False,
+                     cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._topic_criteria(topic_id, include_inactive), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_topic(self, db: Session, topic_id: int, include_inactive: bool = False) -> int:
+        return self.count(db, *self._topic_criteria(topic_id, include_inactive))
 
-    def search_subtopics(self, db: Session, query: str, topic_id: Optional[int] = None):
+    def _search_criteria(self, query: str, topic_id: Optional[int] = None) -> list:
         filters = [
             or_(
                 self.model.title.ilike(f"%{query}%"),
@@ -341,33 +708,47 @@ class SubtopicCRUD(BaseCRUD):
         
         if topic_id:
             filters.append(self.model.topic_id == topic_id)
-        
-        return db.query(self.model).filter(and_(*filters)).all()
+        return filters
 
-    def get_by_duration(self, db: Session, min_lessons: int, max_lessons: int):
-        return db.query(self.model).filter(
-            and_(
-                self.model.duration_lessons >= min_lessons,
-                self.model.duration_lessons <= max_lessons,
-                self.model.is_active == True
-            )
-        ).all()
+    def search_subtopics(self, db: Session, query: str, topic_id: Optional[int] = None,
+                         cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._search_criteria(query, topic_id), cursor=cursor, skip=skip, limit=limit)
+
+    def count_search(self, db: Session, query: str, topic_id: Optional[int] = None) -> int:
+        return self.count(db, *self._search_criteria(query, topic_id))
+
+    def _duration_criteria(self, min_lessons: int, max_lessons: int) -> list:
+        return [
+            self.model.duration_lessons >= min_lessons,
+            self.model.duration_lessons <= max_lessons,
+            self.model.is_active == True
+        ]
+
+    def get_by_duration(self, db: Session, min_lessons: int, max_lessons: int,
+                        cursor: Optional[str] = None, skip: int = 0, limit: Optional[int] = None):
+        return self.get_page(db, *self._duration_criteria(min_lessons, max_lessons), cursor=cursor, skip=skip, limit=limit)
+
+    def count_by_duration(self, db: Session, min_lessons: int, max_lessons: int) -> int:
+        return self.count(db, *self._duration_criteria(min_lessons, max_lessons))
 
 # Utility functions
 class HierarchyCRUD:
+    # School level → forms/grades → terms → subjects → topics → subtopics, one SELECT per level
+    # (forms/grades hang off the school level, not its sections)
+    TREE_OPTIONS = (
+        selectinload(models.SchoolLevel.forms_grades)
+        .selectinload(models.FormGrade.terms)
+        .selectinload(models.Term.subjects)
+        .selectinload(models.Subject.topics)
+        .selectinload(models.Topic.subtopics),
+    )
+
     def __init__(self):
         pass
 
     def get_full_hierarchy(self, db: Session, school_id: int):
         """Get complete curriculum hierarchy for a school"""
-        return db.query(models.SchoolLevel).options(
-            joinedload(models.SchoolLevel.sections)
-            .joinedload(models.Section.forms_grades)
-            .joinedload(models.FormGrade.terms)
-            .joinedload(models.Term.subjects)
-            .joinedload(models.Subject.topics)
-            .joinedload(models.Topic.subtopics)
-        ).filter(
+        return db.query(models.SchoolLevel).options(*self.TREE_OPTIONS).filter(
             and_(
                 models.SchoolLevel.school_id == school_id,
                 models.SchoolLevel.is_active == True
@@ -433,11 +814,131 @@ class HierarchyCRUD:
             "active_subtopics": active_subtopics
         }
 
-    def duplicate_structure(self, db: Session, source_id: int, target_id: int, level: str):
-        """Duplicate curriculum structure from one entity to another"""
-        # Implementation for duplicating curriculum structures
-        # This would be useful for copying term structures, etc.
-        pass
+    def duplicate_structure(self, db: Session, source_id: int, target_id: int, level: str,
+                            include_inactive: bool = False, display_order: Optional[int] = None,
+                            renumber: bool = False, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Copy a form/grade, term, subject or topic with all its descendants under another parent.
+
+        Each table below the copied row is filled with one INSERT ... SELECT. New ids are
+        allocated up front and recorded in a temporary old_id -> new_id map, which the next
+        level joins to find its new parent ids. Everything runs in one transaction.
+
+        include_inactive also copies deactivated descendants; renumber rewrites the copied
+        children's display_order to 0..n-1 within each parent. The copy itself is placed
+        after the target's existing children unless display_order is given. overrides sets
+        columns on the copied row only (e.g. a new name/code).
+        """
+        model = DUPLICATABLE_LEVELS.get(level)
+        if model is None:
+            raise ValueError(f"Cannot duplicate '{level}', expected one of {', '.join(DUPLICATABLE_LEVELS)}")
+        parent_model, parent_fk = PARENTS[model]
+        if not db.query(model.id).filter(model.id == source_id).first():
+            raise ValueError(f"{level} {source_id} not found")
+        if not db.query(parent_model.id).filter(parent_model.id == target_id).first():
+            raise ValueError(f"Target {parent_model.__tablename__} {target_id} not found")
+
+        if display_order is None:
+            last = db.query(func.max(model.display_order)).filter(parent_fk == target_id).scalar()
+            display_order = 0 if last is None else last + 1
+
+        conn = db.connection()
+        conn.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS hierarchy_copy_map ("
+            "tbl TEXT NOT NULL, old_id INTEGER NOT NULL, new_id INTEGER NOT NULL, PRIMARY KEY (tbl, old_id))"
+        ))
+        conn.execute(text("DELETE FROM hierarchy_copy_map"))
+
+        try:
+            table = model.__tablename__
+            new_id = self._next_id(db, model) + 1
+            conn.execute(
+                text("INSERT INTO hierarchy_copy_map (tbl, old_id, new_id) VALUES (:tbl, :old_id, :new_id)"),
+                {"tbl": table, "old_id": source_id, "new_id": new_id},
+            )
+            fixed = {parent_fk.key: ":target_id", "display_order": ":display_order"}
+            params = {"target_id": target_id, "display_order": display_order, "source_id": source_id}
+            for column, value in (overrides or {}).items():
+                if value is not None and column in model.__table__.c and column not in ("id", parent_fk.key):
+                    fixed[column] = f":override_{column}"
+                    params[f"override_{column}"] = value
+            columns, values = self._copy_columns(model, "s", fixed)
+            conn.execute(text(
+                f"INSERT INTO {table} (id, {columns}) "
+                f"SELECT m.new_id, {values} FROM {table} s "
+                f"JOIN hierarchy_copy_map m ON m.tbl = '{table}' AND m.old_id = s.id "
+                f"WHERE s.id = :source_id"
+            ), params)
+            copied = {table: 1}
+
+            # Parents are always copied before their children
+            pending = [model]
+            while pending:
+                parent = pending.pop(0)
+                for child, child_fk in HIERARCHY_CHILDREN.get(parent, []):
+                    copied[child.__tablename__] = self._copy_children(
+                        db, child, child_fk, parent.__tablename__, include_inactive, renumber
+                    )
+                    pending.append(child)
+            conn.execute(text("DELETE FROM hierarchy_copy_map"))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        for copied_model in PARENTS:
+            if copied_model.__tablename__ in copied:
+                invalidate_counts(copied_model)
+        return {"id": new_id, "level": level, "copied": copied}
+
+    def _next_id(self, db: Session, model) -> int:
+        return db.query(func.coalesce(func.max(model.id), 0)).scalar()
+
+    def _copy_columns(self, model, alias: str, fixed: Dict[str, str]) -> Tuple[str, str]:
+        """Column list and matching SELECT expressions for copying rows of model (id excluded)"""
+        columns, values = [], []
+        for column in model.__table__.columns:
+            if column.name == "id":
+                continue
+            columns.append(column.name)
+            if column.name in fixed:
+                values.append(fixed[column.name])
+            elif column.name in ("created_at", "updated_at"):
+                values.append("CURRENT_TIMESTAMP")
+            elif column.name == "deactivated_by":
+                # A copied inactive row counts as switched off on its own
+                values.append("NULL")
+            else:
+                values.append(f"{alias}.{column.name}")
+        return ", ".join(columns), ", ".join(values)
+
+    def _copy_children(self, db: Session, model, parent_fk, parent_table: str,
+                       include_inactive: bool, renumber: bool) -> int:
+        conn = db.connection()
+        table = model.__tablename__
+        fk = parent_fk.key
+        active_filter = "" if include_inactive else "AND s.is_active = :active"
+        params = {"tbl": table, "parent_tbl": parent_table, "base": self._next_id(db, model), "active": True}
+
+        # Allocate new ids for every child of an already copied parent
+        conn.execute(text(
+            f"INSERT INTO hierarchy_copy_map (tbl, old_id, new_id) "
+            f"SELECT :tbl, s.id, :base + ROW_NUMBER() OVER (ORDER BY s.id) FROM {table} s "
+            f"JOIN hierarchy_copy_map p ON p.tbl = :parent_tbl AND p.old_id = s.{fk} "
+            f"WHERE 1 = 1 {active_filter}"
+        ), params)
+
+        display_order = (
+            f"ROW_NUMBER() OVER (PARTITION BY s.{fk} ORDER BY s.display_order, s.id) - 1"
+            if renumber else "s.display_order"
+        )
+        columns, values = self._copy_columns(model, "s", {fk: "p.new_id", "display_order": display_order})
+        result = conn.execute(text(
+            f"INSERT INTO {table} (id, {columns}) "
+            f"SELECT m.new_id, {values} FROM {table} s "
+            f"JOIN hierarchy_copy_map m ON m.tbl = :tbl AND m.old_id = s.id "
+            f"JOIN hierarchy_copy_map p ON p.tbl = :parent_tbl AND p.old_id = s.{fk}"
+        ), params)
+        return result.rowcount
 
 class UserCRUD:
     def get(self, db: Session, id: int) -> Optional[User]:
@@ -550,6 +1051,8 @@ class SchemeOfWorkCRUD:
         ).all()
 
 class LessonPlanCRUD:
+    INSERT_BATCH_SIZE = 500
+
     def get(self, db: Session, id: int) -> Optional[LessonPlan]:
         return db.query(LessonPlan).filter(LessonPlan.id == id).first()
     
@@ -569,6 +1072,512 @@ class LessonPlanCRUD:
     def count_by_user(self, db: Session, user_id: int) -> int:
         return db.query(LessonPlan).filter(LessonPlan.user_id == user_id).count()
 
+    def get_ordered(self, db: Session, scheme_id: int) -> List[LessonPlan]:
+        return db.query(LessonPlan).filter(LessonPlan.scheme_id == scheme_id).order_by(
+            LessonPlan.lesson_number, LessonPlan.id
+        ).all()
+
+    def replace_for_scheme(self, db: Session, scheme_id: int, rows: List[Dict[str, Any]]) -> int:
+        """Replace a scheme's lesson plans with the given mappings in bulk (not committed)"""
+        db.query(LessonPlan).filter(LessonPlan.scheme_id == scheme_id).delete(synchronize_session=False)
+        for start in range(0, len(rows), self.INSERT_BATCH_SIZE):
+            db.bulk_insert_mappings(LessonPlan, rows[start:start + self.INSERT_BATCH_SIZE])
+        return len(rows)
+
+    def create_batch(self, db: Session, scheme_id: int, user_id: int) -> models.LessonPlanBatch:
+        batch = models.LessonPlanBatch(scheme_id=scheme_id, user_id=user_id, status="queued")
+        db.add(batch)
+        db.commit()
+        db.refresh(batch)
+        return batch
+
+    def get_batch(self, db: Session, batch_id: str) -> Optional[models.LessonPlanBatch]:
+        return db.query(models.LessonPlanBatch).filter(models.LessonPlanBatch.id == batch_id).first()
+
+    def get_active_batch(self, db: Session, scheme_id: int, since: datetime) -> Optional[models.LessonPlanBatch]:
+        """The scheme's queued or running batch started after since (older ones are taken as abandoned)"""
+        return db.query(models.LessonPlanBatch).filter(
+            models.LessonPlanBatch.scheme_id == scheme_id,
+            models.LessonPlanBatch.status.in_(["queued", "running"]),
+            models.LessonPlanBatch.created_at >= since
+        ).order_by(desc(models.LessonPlanBatch.created_at)).first()
+
+    def update_batch(self, db: Session, batch: models.LessonPlanBatch, **values) -> models.LessonPlanBatch:
+        for name, value in values.items():
+            setattr(batch, name, value)
+        db.commit()
+        return batch
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return round(sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low), 1)
+
+class TopicPrerequisiteCRUD:
+    """Explicit prerequisite edges between topics of one subject (read by services.topic_graph)"""
+
+    def get_by_subject(self, db: Session, subject_id: int) -> List[Tuple[int, int]]:
+        """(topic_id, prerequisite_id) pairs for every topic of the subject"""
+        rows = db.query(
+            models.TopicPrerequisite.topic_id, models.TopicPrerequisite.prerequisite_id
+        ).join(models.Topic, models.TopicPrerequisite.topic_id == models.Topic.id).filter(
+            models.Topic.subject_id == subject_id
+        ).all()
+        return [(topic_id, prerequisite_id) for topic_id, prerequisite_id in rows]
+
+    def get_for_topic(self, db: Session, topic_id: int) -> List[models.Topic]:
+        return db.query(models.Topic).join(
+            models.TopicPrerequisite, models.TopicPrerequisite.prerequisite_id == models.Topic.id
+        ).filter(models.TopicPrerequisite.topic_id == topic_id).order_by(
+            models.Topic.display_order, models.Topic.id
+        ).all()
+
+    def set_for_topic(self, db: Session, db_topic: models.Topic, prerequisite_ids: List[int]) -> List[models.Topic]:
+        """Replace a topic's prerequisites. They must belong to the same subject and must not
+        lead back to the topic. Touches the topic so cached graphs of the subject are rebuilt."""
+        prerequisite_ids = list(dict.fromkeys(prerequisite_ids))
+        if db_topic.id in prerequisite_ids:
+            raise ValueError("A topic cannot be its own prerequisite")
+        found = {
+            t.id for t in db.query(models.Topic.id).filter(
+                models.Topic.id.in_(prerequisite_ids), models.Topic.subject_id == db_topic.subject_id
+            )
+        } if prerequisite_ids else set()
+        missing = [i for i in prerequisite_ids if i not in found]
+        if missing:
+            raise ValueError(f"Topics {missing} do not exist in this subject")
+
+        requires: Dict[int, List[int]] = {}
+        for topic_id, prerequisite_id in self.get_by_subject(db, db_topic.subject_id):
+            if topic_id != db_topic.id:
+                requires.setdefault(topic_id, []).append(prerequisite_id)
+        stack, seen = list(prerequisite_ids), set()
+        while stack:
+            current = stack.pop()
+            if current == db_topic.id:
+                raise ValueError("These prerequisites would create a cycle")
+            if current not in seen:
+                seen.add(current)
+                stack.extend(requires.get(current, ()))
+
+        db.query(models.TopicPrerequisite).filter(
+            models.TopicPrerequisite.topic_id == db_topic.id
+        ).delete(synchronize_session=False)
+        db.add_all([
+            models.TopicPrerequisite(topic_id=db_topic.id, prerequisite_id=prerequisite_id)
+            for prerequisite_id in prerequisite_ids
+        ])
+        db_topic.updated_at = datetime.utcnow()
+        db.commit()
+        return self.get_for_topic(db, db_topic.id)
+
+class LLMCallCRUD:
+    """Append-only LLM usage log"""
+    MAX_DAYS = 90
+
+    def record(self, db: Session, **values) -> models.LLMCall:
+        db_obj = models.LLMCall(**values)
+        db.add(db_obj)
+        db.commit()
+        return db_obj
+
+    def usage_by_subject_day(self, db: Session, days: int = 7, subject_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Calls, cache hits, fallbacks, token totals and p50/p95 latency, time to first token and
+        tokens per (day, subject). Latency percentiles only count calls that reached the LLM."""
+        since = datetime.utcnow() - timedelta(days=min(max(days, 1), self.MAX_DAYS))
+        query = db.query(
+            func.date(models.LLMCall.created_at),
+            models.LLMCall.subject_name,
+            models.LLMCall.latency_ms,
+            models.LLMCall.ttft_ms,
+            models.LLMCall.prompt_tokens,
+            models.LLMCall.completion_tokens,
+            models.LLMCall.attempts,
+            models.LLMCall.cache_hit,
+            models.LLMCall.parse_success,
+            models.LLMCall.fallback_reason,
+        ).filter(models.LLMCall.created_at >= since)
+        if subject_name:
+            query = query.filter(models.LLMCall.subject_name == subject_name)
+
+        groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for day, row_subject, latency, ttft, prompt_tokens, completion_tokens, attempts, cache_hit, parsed, fallback in query.yield_per(1000):
+            group = groups.setdefault((str(day), row_subject or "Unknown"), {
+                "calls": 0, "cache_hits": 0, "fallbacks": 0, "parse_failures": 0, "retries": 0,
+                "latency": [], "ttft": [], "prompt": [], "completion": [],
+            })
+            group["calls"] += 1
+            if cache_hit:
+                group["cache_hits"] += 1
+                continue
+            if fallback:
+                group["fallbacks"] += 1
+            if attempts and not parsed:
+                group["parse_failures"] += 1
+            group["retries"] += max(0, (attempts or 0) - 1)
+            if attempts:
+                if latency is not None:
+                    group["latency"].append(latency)
+                if ttft is not None:
+                    group["ttft"].append(ttft)
+                group["prompt"].append(prompt_tokens or 0)
+                group["completion"].append(completion_tokens or 0)
+
+        rows = []
+        for (day, subject), group in sorted(groups.items()):
+            for key in ("latency", "ttft", "prompt", "completion"):
+                group[key].sort()
+            rows.append({
+                "day": day,
+                "subject_name": subject,
+                "calls": group["calls"],
+                "llm_calls": len(group["prompt"]),
+                "cache_hits": group["cache_hits"],
+                "fallbacks": group["fallbacks"],
+                "parse_failures": group["parse_failures"],
+                "retries": group["retries"],
+                "latency_ms": {"p50": _percentile(group["latency"], 50), "p95": _percentile(group["latency"], 95)},
+                "ttft_ms": {"p50": _percentile(group["ttft"], 50), "p95": _percentile(group["ttft"], 95)},
+                "prompt_tokens": {"total": sum(group["prompt"]), "p50": _percentile(group["prompt"], 50), "p95": _percentile(group["prompt"], 95)},
+                "completion_tokens": {"total": sum(group["completion"]), "p50": _percentile(group["completion"], 50), "p95": _percentile(group["completion"], 95)},
+            })
+        return rows
+
+class TimetableCRUD:
+    """Timetable lookups for reports over many timetables (read by services.timetable_analytics)"""
+
+    def get_versions(self, db: Session, timetable_id: Optional[str] = None, user_id: Optional[int] = None,
+                     school_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Active timetables in scope with a version that changes whenever they are saved:
+        updated_at together with the number of slots"""
+        slot_counts = db.query(
+            models.TimetableSlot.timetable_id, func.count(models.TimetableSlot.id).label("slots")
+        ).group_by(models.TimetableSlot.timetable_id).subquery()
+        query = db.query(
+            models.Timetable.id, models.Timetable.name, models.Timetable.user_id,
+            models.Timetable.updated_at, func.coalesce(slot_counts.c.slots, 0)
+        ).outerjoin(slot_counts, slot_counts.c.timetable_id == models.Timetable.id).filter(
+            models.Timetable.is_active == True
+        )
+        if timetable_id is not None:
+            query = query.filter(models.Timetable.id == timetable_id)
+        if user_id is not None:
+            query = query.filter(models.Timetable.user_id == user_id)
+        if school_id is not None:
+            query = query.join(models.SchemeOfWork, models.SchemeOfWork.id == models.Timetable.scheme_id).join(
+                models.SchoolLevel, models.SchoolLevel.id == models.SchemeOfWork.school_level_id
+            ).filter(models.SchoolLevel.school_id == school_id)
+        return [
+            {
+                "id": id,
+                "name": name,
+                "user_id": user_id,
+                "version": f"{updated_at.isoformat() if updated_at else ''}:{slots}",
+            }
+            for id, name, user_id, updated_at, slots in query.order_by(models.Timetable.id)
+        ]
+
+    def get_slot_rows(self, db: Session, timetable_ids: List[str]) -> List[Tuple]:
+        """(timetable_id, day_of_week, period_number, time_slot, is_double_lesson, double_position,
+        is_evening) for every slot of the given timetables"""
+        rows = []
+        for start in range(0, len(timetable_ids), IN_CHUNK):
+            rows.extend(db.query(
+                models.TimetableSlot.timetable_id,
+                models.TimetableSlot.day_of_week,
+                models.TimetableSlot.period_number,
+                models.TimetableSlot.time_slot,
+                models.TimetableSlot.is_double_lesson,
+                models.TimetableSlot.double_position,
+                models.TimetableSlot.is_evening,
+            ).filter(models.TimetableSlot.timetable_id.in_(timetable_ids[start:start + IN_CHUNK])).all())
+        return rows
+
+    def get_scheme_periods(self, db: Session, scheme_id: int) -> List[Tuple]:
+        """(day_of_week, period_number, time_slot) of every slot of the scheme's most recently
+        saved active timetable"""
+        latest = db.query(models.Timetable.id).filter(
+            models.Timetable.scheme_id == scheme_id, models.Timetable.is_active == True
+        ).order_by(desc(models.Timetable.updated_at)).first()
+        if latest is None:
+            return []
+        return db.query(
+            models.TimetableSlot.day_of_week, models.TimetableSlot.period_number, models.TimetableSlot.time_slot
+        ).filter(models.TimetableSlot.timetable_id == latest[0]).all()
+
+    def set_occupancy(self, db: Session, timetable_id: str, user_id: int, school_id: Optional[int],
+                      class_key: Optional[str], term_id: Optional[int], cells: List[Tuple[str, int, Optional[str]]]):
+        """Replace a timetable's (day, period_number, time_slot) cells in timetable_occupancy.
+        Not committed: the caller commits together with the slots."""
+        db.query(models.TimetableOccupancy).filter(
+            models.TimetableOccupancy.timetable_id == timetable_id
+        ).delete(synchronize_session=False)
+        db.add_all([
+            models.TimetableOccupancy(
+                timetable_id=timetable_id, day=day, period_number=period_number, user_id=user_id,
+                school_id=school_id, class_key=class_key, term_id=term_id, time_slot=time_slot
+            )
+            for day, period_number, time_slot in cells
+        ])
+
+    def get_occupancy(self, db: Session, user_id: Optional[int] = None, school_id: Optional[int] = None,
+                      class_key: Optional[str] = None, term_id: Optional[int] = None,
+                      exclude_timetable_id: Optional[str] = None) -> List[Tuple]:
+        """(day, period_number, timetable_id, timetable name, user_id, school_id, class_key) of every
+        cell used by the teacher's or the class's active timetables of the term"""
+        occupancy = models.TimetableOccupancy
+        criteria = []
+        if user_id is not None:
+            criteria.append(occupancy.user_id == user_id)
+        if school_id is not None and class_key:
+            criteria.append(and_(occupancy.school_id == school_id, occupancy.class_key == class_key))
+        if not criteria:
+            return []
+        query = db.query(
+            occupancy.day, occupancy.period_number, occupancy.timetable_id, models.Timetable.name,
+            occupancy.user_id, occupancy.school_id, occupancy.class_key
+        ).join(models.Timetable, models.Timetable.id == occupancy.timetable_id).filter(
+            or_(*criteria), occupancy.term_id == term_id, models.Timetable.is_active == True
+        )
+        if exclude_timetable_id is not None:
+            query = query.filter(occupancy.timetable_id != exclude_timetable_id)
+        return query.all()
+
+    def get_clashes(self, db: Session, school_id: int, by: str) -> List[Tuple]:
+        """(user_id or class_key, term_id, day, period_number, time_slot, timetable_id, timetable name)
+        of the school's cells used by more than one active timetable of the same teacher
+        (by="user_id") or class (by="class_key") in the same term"""
+        occupancy = models.TimetableOccupancy
+        owner = getattr(occupancy, by)
+        active = and_(
+            occupancy.school_id == school_id, owner.isnot(None), models.Timetable.is_active == True
+        )
+        shared = db.query(owner.label("owner"), occupancy.term_id, occupancy.day, occupancy.period_number).join(
+            models.Timetable, models.Timetable.id == occupancy.timetable_id
+        ).filter(active).group_by(owner, occupancy.term_id, occupancy.day, occupancy.period_number).having(
+            func.count(occupancy.timetable_id) > 1
+        ).subquery()
+        return db.query(
+            owner, occupancy.term_id, occupancy.day, occupancy.period_number, occupancy.time_slot,
+            occupancy.timetable_id, models.Timetable.name
+        ).join(models.Timetable, models.Timetable.id == occupancy.timetable_id).join(
+            shared, and_(shared.c.owner == owner, shared.c.term_id.is_not_distinct_from(occupancy.term_id),
+                         shared.c.day == occupancy.day, shared.c.period_number == occupancy.period_number)
+        ).filter(active).order_by(
+            owner, occupancy.term_id, occupancy.day, occupancy.period_number, occupancy.timetable_id
+        ).all()
+
+class CoverageCRUD:
+    """Curriculum coverage rollups (maintained by services.curriculum_coverage). Nothing here commits."""
+
+    def get_scope(self, db: Session, school_id: int, form_grade_id: Optional[int] = None,
+                  term_id: Optional[int] = None) -> List[Tuple]:
+        """(subject_id, subject name, form_grade_id, form/grade name, term_id, term name) of the
+        school's active subjects"""
+        query = db.query(
+            models.Subject.id, models.Subject.name, models.FormGrade.id, models.FormGrade.name,
+            models.Term.id, models.Term.name
+        ).join(models.Term, models.Term.id == models.Subject.term_id).join(
+            models.FormGrade, models.FormGrade.id == models.Term.form_grade_id
+        ).join(models.SchoolLevel, models.SchoolLevel.id == models.FormGrade.school_level_id).filter(
+            models.SchoolLevel.school_id == school_id, models.Subject.is_active == True
+        )
+        if form_grade_id is not None:
+            query = query.filter(models.FormGrade.id == form_grade_id)
+        if term_id is not None:
+            query = query.filter(models.Term.id == term_id)
+        return query.order_by(models.FormGrade.display_order, models.Term.display_order,
+                              models.Subject.display_order, models.Subject.id).all()
+
+    def get_rollups(self, db: Session, subject_ids: List[int]) -> Dict[int, models.SubjectCoverage]:
+        rollups = {}
+        for start in range(0, len(subject_ids), IN_CHUNK):
+            for rollup in db.query(models.SubjectCoverage).filter(
+                models.SubjectCoverage.subject_id.in_(subject_ids[start:start + IN_CHUNK])
+            ):
+                rollups[rollup.subject_id] = rollup
+        return rollups
+
+    def get_required(self, db: Session, subject_id: int) -> List[Tuple]:
+        """(subtopic_id, topic_id, duration_lessons) of the subject's active subtopics"""
+        return db.query(models.Subtopic.id, models.Topic.id, models.Subtopic.duration_lessons).join(
+            models.Topic, models.Subtopic.topic_id == models.Topic.id
+        ).filter(
+            models.Topic.subject_id == subject_id, models.Topic.is_active == True, models.Subtopic.is_active == True
+        ).all()
+
+    def get_scheduled(self, db: Session, subtopic_ids: List[int]) -> Dict[int, int]:
+        """Slots of active timetables per subtopic"""
+        scheduled = {}
+        for start in range(0, len(subtopic_ids), IN_CHUNK):
+            scheduled.update(db.query(models.TimetableSlot.subtopic_id, func.count(models.TimetableSlot.id)).join(
+                models.Timetable, models.Timetable.id == models.TimetableSlot.timetable_id
+            ).filter(
+                models.TimetableSlot.subtopic_id.in_(subtopic_ids[start:start + IN_CHUNK]),
+                models.Timetable.is_active == True
+            ).group_by(models.TimetableSlot.subtopic_id).all())
+        return scheduled
+
+    def replace_subject(self, db: Session, subject_id: int, school_id: int, form_grade_id: int, term_id: int,
+                        content_version: str, rows: List[Tuple[int, int, int, int]]) -> models.SubjectCoverage:
+        """Rebuild a subject's rollup from (subtopic_id, topic_id, required, scheduled) rows;
+        its totals are left for set_totals"""
+        db.query(models.SubtopicCoverage).filter(
+            models.SubtopicCoverage.subject_id == subject_id
+        ).delete(synchronize_session=False)
+        db.add_all([
+            models.SubtopicCoverage(
+                subject_id=subject_id, subtopic_id=subtopic_id, topic_id=topic_id, school_id=school_id,
+                form_grade_id=form_grade_id, term_id=term_id, required_lessons=required, scheduled_lessons=scheduled
+            )
+            for subtopic_id, topic_id, required, scheduled in rows
+        ])
+        rollup = db.query(models.SubjectCoverage).filter(models.SubjectCoverage.subject_id == subject_id).first()
+        if rollup is None:
+            rollup = models.SubjectCoverage(subject_id=subject_id)
+            db.add(rollup)
+        rollup.school_id, rollup.form_grade_id, rollup.term_id = school_id, form_grade_id, term_id
+        rollup.content_version = content_version
+        db.flush()
+        return rollup
+
+    def add_scheduled(self, db: Session, deltas: Dict[int, int]) -> List[int]:
+        """Add lesson deltas to the subtopics' scheduled counts (one UPDATE per distinct delta);
+        returns the subjects whose rollups were changed"""
+        by_delta: Dict[int, List[int]] = {}
+        for subtopic_id, delta in deltas.items():
+            by_delta.setdefault(delta, []).append(subtopic_id)
+        column = models.SubtopicCoverage.scheduled_lessons
+        for delta, subtopic_ids in by_delta.items():
+            for start in range(0, len(subtopic_ids), IN_CHUNK):
+                db.query(models.SubtopicCoverage).filter(
+                    models.SubtopicCoverage.subtopic_id.in_(subtopic_ids[start:start + IN_CHUNK])
+                ).update({column: column + delta}, synchronize_session=False)
+        subject_ids = set()
+        ids = list(deltas)
+        for start in range(0, len(ids), IN_CHUNK):
+            subject_ids.update(subject_id for subject_id, in db.query(models.SubtopicCoverage.subject_id).filter(
+                models.SubtopicCoverage.subtopic_id.in_(ids[start:start + IN_CHUNK])
+            ).distinct())
+        return sorted(subject_ids)
+
+    def get_counts(self, db: Session, subject_id: int) -> List[Tuple]:
+        """(topic_id, required_lessons, scheduled_lessons) of every subtopic in a subject's rollup"""
+        return db.query(
+            models.SubtopicCoverage.topic_id, models.SubtopicCoverage.required_lessons,
+            models.SubtopicCoverage.scheduled_lessons
+        ).filter(models.SubtopicCoverage.subject_id == subject_id).all()
+
+    def set_totals(self, db: Session, subject_id: int, totals: Dict[str, int]):
+        db.query(models.SubjectCoverage).filter(models.SubjectCoverage.subject_id == subject_id).update(
+            {getattr(models.SubjectCoverage, name): value for name, value in totals.items()},
+            synchronize_session=False
+        )
+
+    def _scope_filter(self, query, model, school_id: int, form_grade_id: Optional[int], term_id: Optional[int]):
+        query = query.filter(model.school_id == school_id)
+        if form_grade_id is not None:
+            query = query.filter(model.form_grade_id == form_grade_id)
+        if term_id is not None:
+            query = query.filter(model.term_id == term_id)
+        return query
+
+    def get_uncovered(self, db: Session, school_id: int, form_grade_id: Optional[int] = None,
+                      term_id: Optional[int] = None) -> List[Tuple]:
+        """(subject_id, subtopic_id, subtopic title, topic_id, topic title, required, scheduled) of
+        subtopics scheduled for fewer lessons than they require"""
+        coverage = models.SubtopicCoverage
+        query = db.query(
+            coverage.subject_id, coverage.subtopic_id, models.Subtopic.title, coverage.topic_id,
+            models.Topic.title, coverage.required_lessons, coverage.scheduled_lessons
+        ).join(models.Subtopic, models.Subtopic.id == coverage.subtopic_id).join(
+            models.Topic, models.Topic.id == coverage.topic_id
+        ).filter(coverage.scheduled_lessons < coverage.required_lessons)
+        query = self._scope_filter(query, coverage, school_id, form_grade_id, term_id)
+        return query.order_by(coverage.subject_id, models.Topic.display_order, models.Subtopic.display_order,
+                              coverage.subtopic_id).all()
+
+    def get_over_allocated(self, db: Session, school_id: int, form_grade_id: Optional[int] = None,
+                           term_id: Optional[int] = None) -> List[Tuple]:
+        """(subject_id, topic_id, topic title, required, scheduled) of topics scheduled for more
+        lessons than their subtopics require"""
+        coverage = models.SubtopicCoverage
+        required = func.sum(coverage.required_lessons)
+        scheduled = func.sum(coverage.scheduled_lessons)
+        query = db.query(coverage.subject_id, coverage.topic_id, models.Topic.title, required, scheduled).join(
+            models.Topic, models.Topic.id == coverage.topic_id
+        )
+        query = self._scope_filter(query, coverage, school_id, form_grade_id, term_id)
+        return query.group_by(coverage.subject_id, coverage.topic_id, models.Topic.title).having(
+            scheduled > required
+        ).order_by(coverage.subject_id, coverage.topic_id).all()
+
+class ContentLibraryCRUD:
+    """Shared generated content (maintained by services.content_library). Nothing here commits."""
+
+    def get(self, db: Session, id: int) -> Optional[models.ContentFragment]:
+        return db.query(models.ContentFragment).filter(models.ContentFragment.id == id).first()
+
+    def get_entries(self, db: Session, kind: str, subtopic_ids: List[int], form_key: str, style_key: str,
+                    prompt_version: int) -> Dict[int, Tuple[models.ContentFragment, Optional[datetime]]]:
+        """(entry, its subtopic's updated_at) by subtopic for one form, style and prompt version"""
+        fragment = models.ContentFragment
+        entries = {}
+        for start in range(0, len(subtopic_ids), IN_CHUNK):
+            for entry, subtopic_updated_at in db.query(fragment, models.Subtopic.updated_at).join(
+                models.Subtopic, models.Subtopic.id == fragment.subtopic_id
+            ).filter(
+                fragment.kind == kind,
+                fragment.subtopic_id.in_(subtopic_ids[start:start + IN_CHUNK]),
+                fragment.form_key == form_key,
+                fragment.style_key == style_key,
+                fragment.prompt_version == prompt_version
+            ):
+                entries[entry.subtopic_id] = (entry, subtopic_updated_at)
+        return entries
+
+    def touch(self, db: Session, ids: List[int], used_at: datetime):
+        column = models.ContentFragment.hits
+        for start in range(0, len(ids), IN_CHUNK):
+            db.query(models.ContentFragment).filter(
+                models.ContentFragment.id.in_(ids[start:start + IN_CHUNK])
+            ).update({column: column + 1, models.ContentFragment.last_used_at: used_at}, synchronize_session=False)
+
+    def count(self, db: Session) -> int:
+        return db.query(func.count(models.ContentFragment.id)).scalar() or 0
+
+    def evict(self, db: Session, prompt_versions: Dict[str, int], limit: int) -> int:
+        """Delete up to limit entries: those of an older prompt version first, then the least recently used"""
+        fragment = models.ContentFragment
+        current = or_(*(and_(fragment.kind == kind, fragment.prompt_version == version)
+                        for kind, version in prompt_versions.items()))
+        ids = [id for id, in db.query(fragment.id).order_by(
+            case((current, 1), else_=0), fragment.last_used_at, fragment.id
+        ).limit(limit)]
+        for start in range(0, len(ids), IN_CHUNK):
+            db.query(fragment).filter(
+                fragment.id.in_(ids[start:start + IN_CHUNK])
+            ).delete(synchronize_session=False)
+        return len(ids)
+
+    def get_stats(self, db: Session) -> List[Tuple]:
+        """(kind, prompt_version, quality, entries, hits) groups"""
+        fragment = models.ContentFragment
+        return db.query(
+            fragment.kind, fragment.prompt_version, fragment.quality, func.count(fragment.id), func.sum(fragment.hits)
+        ).group_by(fragment.kind, fragment.prompt_version, fragment.quality).order_by(
+            fragment.kind, fragment.prompt_version, fragment.quality
+        ).all()
+
+    def get_by_subtopic(self, db: Session, subtopic_id: int) -> List[models.ContentFragment]:
+        return db.query(models.ContentFragment).filter(models.ContentFragment.subtopic_id == subtopic_id).order_by(
+            models.ContentFragment.kind, desc(models.ContentFragment.last_used_at)
+        ).all()
+
 # Initialize CRUD instances
 school_level = SchoolLevelCRUD()
 section = SectionCRUD()
@@ -580,4 +1589,51 @@ subtopic = SubtopicCRUD()
 hierarchy = HierarchyCRUD()
 user = UserCRUD()
 scheme = SchemeOfWorkCRUD()
-lesson_plan = LessonPlanCRUD()
\ No newline at end of file
+lesson_plan = LessonPlanCRUD()
+topic_prerequisite = TopicPrerequisiteCRUD()
+llm_call = LLMCallCRUD()
+timetable = TimetableCRUD()
+coverage = CoverageCRUD()
+content_library = ContentLibraryCRUD()
+
+def resolve_selected_content(db: Session, timetable_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace bare topic/subtopic ids in timetable_data with the fields the AI context builder reads.
+
+    Each collection is resolved with chunked IN queries (no MAX_BATCH_IDS limit); entries that are
+    already dicts are kept and ids that no longer exist are dropped.
+    """
+    resolved = dict(timetable_data)
+
+    selected_topics = resolved.get("selected_topics") or []
+    topic_ids = [item for item in selected_topics if isinstance(item, int)]
+    if topic_ids:
+        topics_by_id = {t.id: t for t in topic.get_many(db, topic_ids)}
+        resolved_topics = []
+        for item in selected_topics:
+            if not isinstance(item, int):
+                resolved_topics.append(item)
+            elif item in topics_by_id:
+                t = topics_by_id[item]
+                resolved_topics.append({"id": t.id, "title": t.title, "name": t.title, "subject_id": t.subject_id})
+        resolved["selected_topics"] = resolved_topics
+
+    selected_subtopics = resolved.get("selected_subtopics") or []
+    subtopic_ids = [item for item in selected_subtopics if isinstance(item, int)]
+    if subtopic_ids:
+        subtopics_by_id = {st.id: st for st in subtopic.get_many(db, subtopic_ids)}
+        resolved_subtopics = []
+        for item in selected_subtopics:
+            if not isinstance(item, int):
+                resolved_subtopics.append(item)
+            elif item in subtopics_by_id:
+                st = subtopics_by_id[item]
+                resolved_subtopics.append({
+                    "id": st.id,
+                    "title": st.title,
+                    "name": st.title,
+                    "topic_id": st.topic_id,
+                    "duration_lessons": st.duration_lessons,
+                })
+        resolved["selected_subtopics"] = resolved_subtopics
+
+    return resolved
@@ -8,7 +8,8 @@ import os
 # Use relative path for cross-platform compatibility
 DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = os.path.join(DATABASE_DIR, "eduscheme.db")
-DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# DATABASE_URL points the app at another SQLite file (e.g. a seeded benchmark database)
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
 
 
 # SQLite-specific engine configuration
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Groq chat-completions API, for exercising the real
+prompt → completion → parse path of GroqAIService offline and under load.
+
+Point the backend at it with GROQ_BASE_URL (any GROQ_API_KEY is accepted):
+
+    python fake_groq_server.py --port 8090 --latency lognormal:0.8,0.4 --tokens-per-second 400 \
+        --error 429:0.05 --error 503:0.02 --malformed-rate 0.05
+    GROQ_BASE_URL=http://127.0.0.1:8090 uvicorn main:app
+
+Serves POST /openai/v1/chat/completions (the path the groq SDK calls, also at
+/v1/chat/completions) with or without "stream": true, answering scheme and lesson-plan prompts. Each call waits a time-to-first-token
+drawn from the latency distribution and then emits the completion at the configured token
+rate. Calls may instead fail with an injected status (429 carries Retry-After) or return
+content that is not valid scheme JSON. GET /stats reports counts per outcome.
+
+Latency distributions: fixed:S, uniform:LOW,HIGH, normal:MEAN,STDDEV, lognormal:MEDIAN,SIGMA,
+exponential:MEAN (all in seconds).
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Roughly four characters per token, as in the benchmark stub
+CHARS_PER_TOKEN = 4
+# Completion characters sent per stream chunk
+STREAM_CHUNK_CHARS = 32
+
+ERROR_BODIES = {
+    429: ("rate_limit_exceeded", "Rate limit reached for model. Please try again in 1s."),
+    500: ("internal_server_error", "Internal server error"),
+    502: ("bad_gateway", "Bad gateway"),
+    503: ("service_unavailable", "Service temporarily unavailable"),
+}
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """'lognormal:0.8,0.4' → sampler returning seconds (never negative)"""
+    kind, _, raw = spec.partition(":")
+    params = [float(value) for value in raw.split(",") if value.strip()]
+    samplers = {
+        "fixed": (1, lambda rng, p: p[0]),
+        "uniform": (2, lambda rng, p: rng.uniform(p[0], p[1])),
+        "normal": (2, lambda rng, p: rng.gauss(p[0], p[1])),
+        "lognormal": (2, lambda rng, p: rng.lognormvariate(math.log(p[0]), p[1])),
+        "exponential": (1, lambda rng, p: rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0),
+    }
+    if kind not in samplers or len(params) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency distribution '{spec}'")
+    sample = samplers[kind][1]
+    return lambda rng: max(0.0, sample(rng, params))
+
+
+def parse_error(spec: str) -> Tuple[int, float]:
+    """'429:0.05' → (429, 0.05)"""
+    status, _, rate = spec.partition(":")
+    return int(status), float(rate)
+
+
+def scheme_completion(weeks: int, lessons_per_week: int) -> str:
+    """A scheme in the shape _build_enhanced_prompt asks for"""
+    return json.dumps({
+        "scheme_header": {"total_weeks": weeks, "total_lessons": weeks * lessons_per_week},
+        "weeks": [
+            {
+                "week_number": week,
+                "theme": f"Week {week} theme",
+                "learning_focus": f"Focus for week {week}",
+                "lessons": [
+                    {
+                        "lesson_number": lesson,
+                        "topic_subtopic": f"Topic {week}.{lesson}",
+                        "specific_objectives": ["Describe the concept", "Apply it to a local example"],
+                        "teaching_learning_activities": ["Q/A session", "Group work", "Practical activity"],
+                        "materials_resources": ["Textbook", "Charts"],
+                        "references": "KLB Book 2",
+                        "remarks": "",
+                    }
+                    for lesson in range(1, lessons_per_week + 1)
+                ],
+            }
+            for week in range(1, weeks + 1)
+        ],
+    }, separators=(",", ":"))
+
+
+def lesson_plans_completion(lessons: int) -> str:
+    """Lesson plans in the shape _build_lesson_plan_prompt asks for"""
+    return json.dumps({
+        "lessons": [
+            {
+                "lesson_number": lesson,
+                "objectives": ["Describe the concept", "Apply it to a local example"],
+                "introduction": "Review of the previous lesson",
+                "development": ["Teacher demonstration", "Group work", "Presentations"],
+                "conclusion": "Summary of key points",
+                "resources": ["Textbook", "Charts"],
+                "assessment": ["Oral questions", "Written exercise"],
+            }
+            for lesson in range(1, lessons + 1)
+        ],
+    }, separators=(",", ":"))
+
+
+def malformed_completion(rng: random.Random, content: str) -> str:
+    """Content GroqAIService cannot parse: truncated JSON, prose only, or a wrong shape"""
+    choice = rng.randrange(3)
+    if choice == 0:
+        return "Here is the scheme of work:\n" + content[: len(content) // 2]
+    if choice == 1:
+        return "I'm sorry, I can't produce a scheme of work for that request."
+    return json.dumps({"scheme": "weeks are missing"})
+
+
+class FakeGroq:
+    """Decides each call's outcome and timing; state is shared by all requests"""
+
+    def __init__(self, latency: str = "fixed:0.5", tokens_per_second: float = 0.0,
+                 errors: Optional[List[Tuple[int, float]]] = None, malformed_rate: float = 0.0,
+                 weeks: int = 12, lessons_per_week: int = 4, seed: Optional[int] = None):
+        self.sample_latency = parse_distribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.errors = errors or []
+        self.malformed_rate = malformed_rate
+        self.content = scheme_completion(weeks, lessons_per_week)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    def plan(self, lesson_plans: Optional[int] = None) -> Dict[str, Any]:
+        """Draw the outcome of one call; lesson_plans is the number of lessons a lesson-plan
+        request asks for (None for scheme requests)"""
+        with self.lock:
+            ttft = self.sample_latency(self.rng)
+            roll = self.rng.random()
+            for status, rate in self.errors:
+                if roll < rate:
+                    self.stats[f"error_{status}"] += 1
+                    return {"status": status, "ttft": ttft}
+                roll -= rate
+            content = self.content if lesson_plans is None else lesson_plans_completion(lesson_plans)
+            if self.rng.random() < self.malformed_rate:
+                content = malformed_completion(self.rng, content)
+                self.stats["malformed"] += 1
+            else:
+                self.stats["ok"] += 1
+            return {"status": 200, "ttft": ttft, "content": content}
+
+    def generation_time(self, completion_tokens: int) -> float:
+        return completion_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+def _usage(prompt_tokens: int, completion_tokens: int, ttft: float, completion_time: float) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_time": ttft,
+        "completion_time": completion_time,
+        "total_time": ttft + completion_time,
+    }
+
+
+def _error_response(status: int) -> JSONResponse:
+    error_type, message = ERROR_BODIES.get(status, ("api_error", "Injected failure"))
+    headers = {"retry-after": "1"} if status == 429 else None
+    return JSONResponse(status_code=status, headers=headers,
+                        content={"error": {"message": message, "type": error_type, "code": error_type}})
+
+
+def create_app(fake: FakeGroq) -> FastAPI:
+    app = FastAPI(title="Fake Groq", docs_url=None, redoc_url=None)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": sum(fake.stats.values()), "outcomes": dict(fake.stats)}
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        fake.stats.clear()
+        return {"calls": 0, "outcomes": {}}
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = body.get("model", "llama3-8b-8192")
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // CHARS_PER_TOKEN
+
+        prompt = str(messages[-1].get("content", "")) if messages else ""
+        requested = re.search(r"with exactly (\d+) lessons", prompt)
+        plan = fake.plan(int(requested.group(1)) if requested else None)
+        await asyncio.sleep(plan["ttft"])
+        if plan["status"] != 200:
+            return _error_response(plan["status"])
+
+        content = plan["content"]
+        max_tokens = body.get("max_tokens")
+        if max_tokens:
+            content = content[: int(max_tokens) * CHARS_PER_TOKEN]
+        completion_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+        finish_reason = "length" if content != plan["content"] else "stop"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(fake, completion_id, created, model, content, prompt_tokens, completion_tokens,
+                        finish_reason, plan["ttft"]),
+                media_type="text/event-stream",
+            )
+
+        completion_time = fake.generation_time(completion_tokens)
+        await asyncio.sleep(completion_time)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": finish_reason, "logprobs": None}],
+            "usage": _usage(prompt_tokens, completion_tokens, plan["ttft"], completion_time),
+        }
+
+    return app
+
+
+async def _stream(fake: FakeGroq, completion_id: str, created: int, model: str, content: str,
+                  prompt_tokens: int, completion_tokens: int, finish_reason: str, ttft: float):
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None, extra: Optional[Dict] = None) -> str:
+        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                   "choices": [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}]}
+        if extra:
+            payload.update(extra)
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    delay = fake.generation_time(STREAM_CHUNK_CHARS // CHARS_PER_TOKEN)
+    for start in range(0, len(content), STREAM_CHUNK_CHARS):
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk({"content": content[start:start + STREAM_CHUNK_CHARS]})
+    completion_time = fake.generation_time(completion_tokens)
+    usage = _usage(prompt_tokens, completion_tokens, ttft, completion_time)
+    # Groq reports usage on the final chunk under x_groq
+    yield chunk({}, finish_reason, extra={"x_groq": {"id": completion_id, "usage": usage}})
+    yield "data: [DONE]\n\n"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Fake Groq chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:0.5", help="Time to first token distribution, e.g. lognormal:0.8,0.4")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Completion token rate (0 = instant)")
+    parser.add_argument("--error", action="append", default=[], type=parse_error,
+                        help="STATUS:RATE failure injection, repeatable (e.g. 429:0.05)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of successful calls with unparseable content")
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--lessons-per-week", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible outcome sequences")
+    args = parser.parse_args(argv)
+
+    fake = FakeGroq(latency=args.latency, tokens_per_second=args.tokens_per_second, errors=args.error,
+                    malformed_rate=args.malformed_rate, weeks=args.weeks,
+                    lessons_per_week=args.lessons_per_week, seed=args.seed)
+
+    import uvicorn
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# backend/gunicorn.conf.py
+# Usage: PROMETHEUS_MULTIPROC_DIR=/tmp/eduscheme-metrics gunicorn main:app -c gunicorn.conf.py
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory so stale worker files are not aggregated"""
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges (in-flight requests, pool usage) of a dead worker"""
+    from services.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -1,14 +1,16 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException, Depends, Query, Path
+from fastapi import FastAPI, HTTPException, Depends, Query, Path, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, FileResponse
 from sqlalchemy.orm import Session, joinedload  # Add joinedload import
 from sqlalchemy.sql import func
 from typing import List, Optional
 import time
 import logging
 import os
+import codecs
+import hashlib
 from database import create_tables, get_db
 import schemas
 import crud
@@ -24,7 +26,9 @@ from datetime import datetime
 import logging
 
 from services.ai_service import GroqAIService
-from database import get_db
+from services import metrics, profiling, curriculum_import, single_flight, fallback_templates, topic_graph, timetable_analytics, timetable_clashes, timetable_solver, curriculum_coverage, lesson_plans, content_library
+from starlette.concurrency import run_in_threadpool
+from database import get_db, engine, SessionLocal
 
 
 # Configure logging
@@ -213,15 +217,48 @@ app.add_middleware(
 
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# Custom middleware for request timing
+# Custom middleware for request timing and per-route metrics
 @app.middleware("http")
 async def add_process_time_header(request, call_next):
     start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+    status_code = 500
+    try:
+        with metrics.track_in_flight(request.method):
+            response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        process_time = time.time() - start_time
+        metrics.observe_request(request.method, metrics.route_template(request), status_code, process_time)
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
+metrics.instrument_engine(engine)
+
+# On-demand profiling for requests carrying a signed X-Profile-Signature header
+@app.middleware("http")
+async def profile_signed_requests(request, call_next):
+    signature = request.headers.get(profiling.PROFILE_HEADER)
+    if signature is None or request.url.path.startswith(profiling.PROFILE_ROUTES):
+        return await call_next(request)
+    if not profiling.verify(signature, request.method, request.url.path):
+        logger.warning(f"Rejected profiling signature for {request.method} {request.url.path}")
+        return await call_next(request)
+    sampler = profiling.StackSampler()
+    start_time = time.time()
+    sampler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+    profile_name = profiling.save_profile(sampler, request.method, request.url.path, time.time() - start_time)
+    response.headers["X-Profile-Id"] = profile_name
+    return response
+
+def require_profiling_signature(request: Request):
+    """Admin-only guard: the request itself must carry a valid profiling signature"""
+    if not profiling.verify(request.headers.get(profiling.PROFILE_HEADER), request.method, request.url.path):
+        raise HTTPException(status_code=403, detail="Valid profiling signature required")
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -271,6 +308,13 @@ async def health_check():
         "timestamp": time.time()
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Expose Prometheus metrics (aggregated across workers in multiprocess mode)"""
+    payload, content_type = metrics.render_latest()
+    return Response(content=payload, media_type=content_type)
+
 # ============= USER ENDPOINTS =============
 
 @app.post("/api/users", response_model=schemas.User, tags=["Users"])
@@ -624,6 +668,46 @@ async def get_subjects_by_term(
         logger.error(f"Error fetching subjects for term {term_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch subjects")
 
+@app.get("/api/v1/subjects/{subject_id}/content-tree", response_model=schemas.ResponseWrapper, tags=["Subjects"])
+def get_subject_content_tree(
+    request: Request,
+    response: Response,
+    subject_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    """Active topics of a subject with their active subtopics and lesson totals, in one round trip.
+
+    Send the returned ETag back as If-None-Match to get a 304 while the tree is unchanged.
+    """
+    try:
+        version = crud.subject.get_content_version(db=db, subject_id=subject_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        etag = f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=cache_headers)
+
+        subject = crud.subject.get_with_topics(db=db, subject_id=subject_id, include_inactive=False)
+        tree = schemas.SubjectContentTree.model_validate(subject)
+        for topic in tree.topics:
+            topic.total_lessons = sum(st.duration_lessons for st in topic.subtopics)
+        tree.total_topics = len(tree.topics)
+        tree.total_subtopics = sum(len(t.subtopics) for t in tree.topics)
+        tree.total_lessons = sum(t.total_lessons for t in tree.topics)
+
+        response.headers.update(cache_headers)
+        return schemas.ResponseWrapper(
+            message="Subject content tree retrieved successfully",
+            data=tree
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error building content tree for subject {subject_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ================== ADMIN API ROUTES ==================
 
 # School Levels Endpoints
@@ -711,34 +795,47 @@ def debug_create_school_level(
 def list_school_levels(
     school_id: Optional[int] = Query(None),
     include_inactive: bool = Query(True, description="Include inactive school levels"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all school levels, optionally filtered by school"""
     try:
+        total = None
         if school_id:
             school_levels = crud.school_level.get_by_school(
                 db=db, 
                 school_id=school_id, 
-                include_inactive=include_inactive
+                include_inactive=include_inactive,
+                cursor=cursor,
+                skip=skip,
+                limit=limit
             )
+            if include_total:
+                total = crud.school_level.count_by_school(db=db, school_id=school_id, include_inactive=include_inactive)
         else:
             if include_inactive:
                 # Get all school levels including inactive
                 school_levels = crud.school_level.get_all_including_inactive(
-                    db=db, skip=skip, limit=limit
+                    db=db, skip=skip, limit=limit, cursor=cursor
                 )
+                if include_total:
+                    total = crud.school_level.count_multi(db=db)
             else:
                 # Get only active school levels
                 school_levels = crud.school_level.get_multi(
-                    db=db, skip=skip, limit=limit, is_active=True
+                    db=db, skip=skip, limit=limit, is_active=True, cursor=cursor
                 )
+                if include_total:
+                    total = crud.school_level.count_multi(db=db, is_active=True)
                 
         return schemas.ResponseWrapper(
             message="School levels retrieved successfully",
             data=[schemas.SchoolLevel.model_validate(sl) for sl in school_levels],
-            total=len(school_levels)
+            total=total,
+            next_cursor=crud.next_cursor(school_levels, limit)
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -753,15 +850,14 @@ def get_school_level(
     try:
         if include_hierarchy:
             school_level = crud.school_level.get_with_hierarchy(db=db, school_level_id=school_level_id)
-            # You may want to use a nested schema here if you have one
-            # For now, fallback to normal
         else:
             school_level = crud.school_level.get(db=db, id=school_level_id)
         if not school_level:
             raise HTTPException(status_code=404, detail="School level not found")
+        schema = schemas.SchoolLevelWithHierarchy if include_hierarchy else schemas.SchoolLevel
         return schemas.ResponseWrapper(
             message="School level retrieved successfully",
-            data=schemas.SchoolLevel.model_validate(school_level)
+            data=schema.model_validate(school_level)
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -835,28 +931,37 @@ def create_section(
 def list_sections(
     school_level_id: Optional[int] = Query(None),
     include_inactive: bool = Query(True, description="Include inactive sections"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all sections, optionally filtered by school level"""
     try:
+        total = None
         if school_level_id:
             sections = crud.section.get_by_school_level(
                 db=db, 
                 school_level_id=school_level_id, 
-                include_inactive=include_inactive
+                include_inactive=include_inactive,
+                cursor=cursor,
+                skip=skip,
+                limit=limit
             )
+            if include_total:
+                total = crud.section.count_by_school_level(db=db, school_level_id=school_level_id, include_inactive=include_inactive)
         else:
-            if include_inactive:
-                sections = crud.section.get_multi(db=db, skip=skip, limit=limit)
-            else:
-                sections = crud.section.get_multi(db=db, skip=skip, limit=limit, is_active=True)
+            is_active = None if include_inactive else True
+            sections = crud.section.get_multi(db=db, skip=skip, limit=limit, is_active=is_active, cursor=cursor)
+            if include_total:
+                total = crud.section.count_multi(db=db, is_active=is_active)
         
         return schemas.ResponseWrapper(
             message="Sections retrieved successfully",
             data=[schemas.Section.model_validate(s) for s in sections],
-            total=len(sections)
+            total=total,
+            next_cursor=crud.next_cursor(sections, limit)
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -965,21 +1070,31 @@ def create_form_grade(
 def list_forms_grades(
     school_level_id: Optional[int] = Query(None),
     include_inactive: bool = Query(False, description="Include inactive forms/grades"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all forms/grades, optionally filtered by school level"""
     try:
+        total = None
         if school_level_id:
-            forms_grades = crud.form_grade.get_by_school_level(db=db, school_level_id=school_level_id, include_inactive=include_inactive)
+            forms_grades = crud.form_grade.get_by_school_level(
+                db=db, school_level_id=school_level_id, include_inactive=include_inactive, cursor=cursor, skip=skip, limit=limit
+            )
+            if include_total:
+                total = crud.form_grade.count_by_school_level(db=db, school_level_id=school_level_id, include_inactive=include_inactive)
         else:
-            forms_grades = crud.form_grade.get_multi(db=db, skip=skip, limit=limit)
+            forms_grades = crud.form_grade.get_multi(db=db, skip=skip, limit=limit, cursor=cursor)
+            if include_total:
+                total = crud.form_grade.count_multi(db=db)
         
         return schemas.ResponseWrapper(
             message="Forms/Grades retrieved successfully",
             data=[schemas.FormGrade.model_validate(fg) for fg in forms_grades],
-            total=len(forms_grades)
+            total=total,
+            next_cursor=crud.next_cursor(forms_grades, limit)
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1082,30 +1197,40 @@ def list_terms(
     form_grade_id: Optional[int] = Query(None),
     include_inactive: bool = Query(False, description="Include inactive terms"),
     current_only: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all terms, with various filters"""
     try:
         print(f"Listing terms with filters: form_grade_id={form_grade_id}, include_inactive={include_inactive}")
         
+        total = None
         if form_grade_id:
-            terms = crud.term.get_by_form_grade(db=db, form_grade_id=form_grade_id, include_inactive=include_inactive)
+            terms = crud.term.get_by_form_grade(
+                db=db, form_grade_id=form_grade_id, include_inactive=include_inactive, cursor=cursor, skip=skip, limit=limit
+            )
+            if include_total:
+                total = crud.term.count_by_form_grade(db=db, form_grade_id=form_grade_id, include_inactive=include_inactive)
         elif current_only:
-            terms = crud.term.get_current_terms(db=db)
+            terms = crud.term.get_current_terms(db=db, cursor=cursor, skip=skip, limit=limit)
+            if include_total:
+                total = crud.term.count_current_terms(db=db)
         else:
-            if include_inactive:
-                terms = crud.term.get_multi(db=db, skip=skip, limit=limit)
-            else:
-                terms = crud.term.get_multi(db=db, skip=skip, limit=limit, is_active=True)
+            is_active = None if include_inactive else True
+            terms = crud.term.get_multi(db=db, skip=skip, limit=limit, is_active=is_active, cursor=cursor)
+            if include_total:
+                total = crud.term.count_multi(db=db, is_active=is_active)
         
         print(f"Found {len(terms)} terms")
         
         return schemas.ResponseWrapper(
             message="Terms retrieved successfully",
             data=[schemas.Term.model_validate(t) for t in terms],
-            total=len(terms)
+            total=total,
+            next_cursor=crud.next_cursor(terms, limit)
         )
     except Exception as e:
         print(f"Error listing terms: {e}")
@@ -1244,38 +1369,41 @@ def list_subjects(
     term_id: Optional[int] = Query(None),
     include_inactive: bool = Query(False, description="Include inactive subjects"),
     search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all subjects with search functionality"""
     try:
         print(f"Listing subjects with filters: term_id={term_id}, include_inactive={include_inactive}")
         
+        total = None
         if term_id:
-            # Get subjects for specific term
-            if include_inactive:
-                # Include both active and inactive subjects
-                subjects = db.query(models.Subject).filter(
-                    models.Subject.term_id == term_id
-                ).order_by(models.Subject.display_order).all()
-            else:
-                # Only active subjects
-                subjects = crud.subject.get_by_term(db=db, term_id=term_id)
+            # Get subjects for specific term, optionally including inactive ones
+            subjects = crud.subject.get_by_term(
+                db=db, term_id=term_id, include_inactive=include_inactive, cursor=cursor, skip=skip, limit=limit
+            )
+            if include_total:
+                total = crud.subject.count_by_term(db=db, term_id=term_id, include_inactive=include_inactive)
         elif search:
-            subjects = crud.subject.search_subjects(db=db, query=search)
+            subjects = crud.subject.search_subjects(db=db, query=search, cursor=cursor, skip=skip, limit=limit)
+            if include_total:
+                total = crud.subject.count_search(db=db, query=search)
         else:
-            if include_inactive:
-                subjects = crud.subject.get_multi(db=db, skip=skip, limit=limit)
-            else:
-                subjects = crud.subject.get_multi(db=db, skip=skip, limit=limit, is_active=True)
+            is_active = None if include_inactive else True
+            subjects = crud.subject.get_multi(db=db, skip=skip, limit=limit, is_active=is_active, cursor=cursor)
+            if include_total:
+                total = crud.subject.count_multi(db=db, is_active=is_active)
         
         print(f"Found {len(subjects)} subjects")
         
         return schemas.ResponseWrapper(
             message="Subjects retrieved successfully",
             data=[schemas.Subject.model_validate(s) for s in subjects],
-            total=len(subjects)
+            total=total,
+            next_cursor=crud.next_cursor(subjects, limit)
         )
     except Exception as e:
         print(f"Error listing subjects: {e}")
@@ -1385,23 +1513,53 @@ def create_topic(
 def list_topics(
     subject_id: Optional[int] = Query(None),
     search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all topics with search functionality"""
     try:
+        total = None
         if subject_id:
-            topics = crud.topic.get_by_subject(db=db, subject_id=subject_id)
+            topics = crud.topic.get_by_subject(db=db, subject_id=subject_id, cursor=cursor, skip=skip, limit=limit)
+            if include_total:
+                total = crud.topic.count_by_subject(db=db, subject_id=subject_id)
         elif search:
-            topics = crud.topic.search_topics(db=db, query=search)
+            topics = crud.topic.search_topics(db=db, query=search, cursor=cursor, skip=skip, limit=limit)
+            if include_total:
+                total = crud.topic.count_search(db=db, query=search)
         else:
-            topics = crud.topic.get_multi(db=db, skip=skip, limit=limit)
+            topics = crud.topic.get_multi(db=db, skip=skip, limit=limit, cursor=cursor)
+            if include_total:
+                total = crud.topic.count_multi(db=db)
         
         return schemas.ResponseWrapper(
             message="Topics retrieved successfully",
             data=[schemas.Topic.model_validate(t) for t in topics],
-            total=len(topics)
+            total=total,
+            next_cursor=crud.next_cursor(topics, limit)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/topics:batch", response_model=schemas.ResponseWrapper)
+def get_topics_batch(
+    ids: str = Query(..., description=f"Comma-separated topic ids (at most {crud.MAX_BATCH_IDS})"),
+    db: Session = Depends(get_db)
+):
+    """Get several topics in one query, in the order the ids were requested"""
+    try:
+        requested_ids = crud.parse_ids(ids)
+        topics = crud.topic.get_many(db=db, ids=requested_ids)
+        found_ids = {t.id for t in topics}
+        missing_ids = [id for id in dict.fromkeys(requested_ids) if id not in found_ids]
+        return schemas.ResponseWrapper(
+            message="Topics retrieved successfully",
+            data=[schemas.Topic.model_validate(t) for t in topics],
+            total=len(topics),
+            errors={"missing_ids": missing_ids} if missing_ids else None
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1422,10 +1580,60 @@ def get_topic(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/v1/admin/topics/{topic_id}/prerequisites", response_model=schemas.ResponseWrapper)
+def get_topic_prerequisites(
+    topic_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    """Topics that must be taught before this one"""
+    try:
+        topic = crud.topic.get(db=db, id=topic_id)
+        if not topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        prerequisites = crud.topic_prerequisite.get_for_topic(db=db, topic_id=topic_id)
+        return schemas.ResponseWrapper(
+            message="Topic prerequisites retrieved successfully",
+            data=[schemas.Topic.model_validate(t) for t in prerequisites],
+            total=len(prerequisites)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put("/api/v1/admin/topics/{topic_id}/prerequisites", response_model=schemas.ResponseWrapper)
+def set_topic_prerequisites(
+    update: schemas.TopicPrerequisitesUpdate,
+    topic_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    """Replace the topics that must be taught before this one (same subject, no cycles)"""
+    try:
+        topic = crud.topic.get(db=db, id=topic_id)
+        if not topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        prerequisites = crud.topic_prerequisite.set_for_topic(
+            db=db, db_topic=topic, prerequisite_ids=update.prerequisite_ids
+        )
+        return schemas.ResponseWrapper(
+            message="Topic prerequisites updated successfully",
+            data=[schemas.Topic.model_validate(t) for t in prerequisites],
+            total=len(prerequisites)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/v1/admin/topics/{topic_id}/subtopics", response_model=schemas.ResponseWrapper)
 def get_subtopics_by_topic(
     topic_id: int = Path(..., gt=0),
     include_inactive: bool = Query(False, description="Include inactive subtopics"),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """Get all subtopics for a specific topic"""
@@ -1433,16 +1641,15 @@ def get_subtopics_by_topic(
         topic = crud.topic.get(db=db, id=topic_id)
         if not topic:
             raise HTTPException(status_code=404, detail="Topic not found")
-        if include_inactive:
-            subtopics = db.query(models.Subtopic).filter(
-                models.Subtopic.topic_id == topic_id
-            ).order_by(models.Subtopic.display_order).all()
-        else:
-            subtopics = crud.subtopic.get_by_topic(db=db, topic_id=topic_id)
+        subtopics = crud.subtopic.get_by_topic(
+            db=db, topic_id=topic_id, include_inactive=include_inactive, cursor=cursor, skip=skip, limit=limit
+        )
+        total = crud.subtopic.count_by_topic(db=db, topic_id=topic_id, include_inactive=include_inactive) if include_total else None
         return schemas.ResponseWrapper(
             message="Subtopics retrieved successfully",
             data=[schemas.Subtopic.model_validate(st) for st in subtopics],
-            total=len(subtopics)
+            total=total,
+            next_cursor=crud.next_cursor(subtopics, limit)
         )
     except HTTPException:
         raise
@@ -1515,25 +1722,59 @@ def list_subtopics(
     search: Optional[str] = Query(None),
     min_lessons: Optional[int] = Query(None, ge=1),
     max_lessons: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = Query(True, description="Include the (cached) total row count"),
     db: Session = Depends(get_db)
 ):
     """List all subtopics with various filters"""
     try:
+        total = None
         if topic_id:
-            subtopics = crud.subtopic.get_by_topic(db=db, topic_id=topic_id)
+            subtopics = crud.subtopic.get_by_topic(db=db, topic_id=topic_id, cursor=cursor, skip=skip, limit=limit)
+            if include_total:
+                total = crud.subtopic.count_by_topic(db=db, topic_id=topic_id)
         elif search:
-            subtopics = crud.subtopic.search_subtopics(db=db, query=search)
+            subtopics = crud.subtopic.search_subtopics(db=db, query=search, cursor=cursor, skip=skip, limit=limit)
+            if include_total:
+                total = crud.subtopic.count_search(db=db, query=search)
         elif min_lessons is not None and max_lessons is not None:
-            subtopics = crud.subtopic.get_by_duration(db=db, min_lessons=min_lessons, max_lessons=max_lessons)
+            subtopics = crud.subtopic.get_by_duration(
+                db=db, min_lessons=min_lessons, max_lessons=max_lessons, cursor=cursor, skip=skip, limit=limit
+            )
+            if include_total:
+                total = crud.subtopic.count_by_duration(db=db, min_lessons=min_lessons, max_lessons=max_lessons)
         else:
-            subtopics = crud.subtopic.get_multi(db=db, skip=skip, limit=limit)
+            subtopics = crud.subtopic.get_multi(db=db, skip=skip, limit=limit, cursor=cursor)
+            if include_total:
+                total = crud.subtopic.count_multi(db=db)
         
         return schemas.ResponseWrapper(
             message="Subtopics retrieved successfully",
             data=[schemas.Subtopic.model_validate(st) for st in subtopics],
-            total=len(subtopics)
+            total=total,
+            next_cursor=crud.next_cursor(subtopics, limit)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/subtopics:batch", response_model=schemas.ResponseWrapper)
+def get_subtopics_batch(
+    ids: str = Query(..., description=f"Comma-separated subtopic ids (at most {crud.MAX_BATCH_IDS})"),
+    db: Session = Depends(get_db)
+):
+    """Get several subtopics in one query, in the order the ids were requested"""
+    try:
+        requested_ids = crud.parse_ids(ids)
+        subtopics = crud.subtopic.get_many(db=db, ids=requested_ids)
+        found_ids = {st.id for st in subtopics}
+        missing_ids = [id for id in dict.fromkeys(requested_ids) if id not in found_ids]
+        return schemas.ResponseWrapper(
+            message="Subtopics retrieved successfully",
+            data=[schemas.Subtopic.model_validate(st) for st in subtopics],
+            total=len(subtopics),
+            errors={"missing_ids": missing_ids} if missing_ids else None
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1562,10 +1803,11 @@ def get_full_hierarchy(
 ):
     """Get the complete curriculum hierarchy for a school"""
     try:
-        hierarchy_data = crud.hierarchy.get_full_hierarchy(db=db, school_id=school_id)
+        school_levels = crud.hierarchy.get_full_hierarchy(db=db, school_id=school_id)
         return schemas.ResponseWrapper(
             message="Hierarchy retrieved successfully",
-            data=hierarchy_data
+            data=[schemas.SchoolLevelWithHierarchy.model_validate(level) for level in school_levels],
+            total=len(school_levels)
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1585,6 +1827,97 @@ def get_statistics(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/v1/admin/llm-usage/", response_model=schemas.ResponseWrapper)
+def get_llm_usage(
+    days: int = Query(7, ge=1, le=90, description="Days back from now"),
+    subject_name: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """LLM calls per subject and day: counts, cache hits, fallbacks, token totals and p50/p95 latency"""
+    try:
+        rows = crud.llm_call.usage_by_subject_day(db=db, days=days, subject_name=subject_name)
+        return schemas.ResponseWrapper(
+            message="LLM usage retrieved successfully",
+            data=rows,
+            total=len(rows)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+RESTORABLE_ENTITIES = {
+    "school-levels": crud.school_level,
+    "sections": crud.section,
+    "forms-grades": crud.form_grade,
+    "terms": crud.term,
+    "subjects": crud.subject,
+    "topics": crud.topic,
+    "subtopics": crud.subtopic,
+}
+
+@app.post("/api/v1/admin/{entity_type}/{entity_id}/restore", response_model=schemas.ResponseWrapper)
+def restore_entity(
+    entity_type: str = Path(..., description="school-levels, sections, forms-grades, terms, subjects, topics or subtopics"),
+    entity_id: int = Path(..., gt=0),
+    db: Session = Depends(get_db)
+):
+    """Reactivate a soft-deleted item together with the children that were deactivated with it"""
+    entity_crud = RESTORABLE_ENTITIES.get(entity_type)
+    if not entity_crud:
+        raise HTTPException(status_code=404, detail=f"Unknown entity type '{entity_type}'")
+    try:
+        restored = entity_crud.restore(db=db, id=entity_id)
+        if not restored:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return schemas.ResponseWrapper(
+            message="Item restored successfully",
+            data={"id": restored.id, "is_active": restored.is_active}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+DUPLICATABLE_ENTITIES = {
+    "forms-grades": "form_grade",
+    "terms": "term",
+    "subjects": "subject",
+    "topics": "topic",
+}
+
+@app.post("/api/v1/admin/{entity_type}/{entity_id}/duplicate", response_model=schemas.ResponseWrapper)
+def duplicate_entity(
+    entity_type: str = Path(..., description="forms-grades, terms, subjects or topics"),
+    entity_id: int = Path(..., gt=0),
+    target_id: int = Query(..., gt=0, description="Parent to copy into (school level, form/grade, term or subject)"),
+    include_inactive: bool = Query(False, description="Also copy deactivated descendants"),
+    display_order: Optional[int] = Query(None, ge=0, description="Position of the copy; defaults to after the target's last child"),
+    renumber: bool = Query(False, description="Renumber the copied children's display order from 0"),
+    name: Optional[str] = Query(None, description="New name (or title for topics) for the copy"),
+    code: Optional[str] = Query(None, description="New code for the copy"),
+    db: Session = Depends(get_db)
+):
+    """Copy an item and everything beneath it under another parent, e.g. a whole term into another form"""
+    level = DUPLICATABLE_ENTITIES.get(entity_type)
+    if not level:
+        raise HTTPException(status_code=404, detail=f"Cannot duplicate '{entity_type}'")
+    try:
+        result = crud.hierarchy.duplicate_structure(
+            db=db,
+            source_id=entity_id,
+            target_id=target_id,
+            level=level,
+            include_inactive=include_inactive,
+            display_order=display_order,
+            renumber=renumber,
+            overrides={"name": name, "title": name, "code": code}
+        )
+        return schemas.ResponseWrapper(
+            message=f"Copied {sum(result['copied'].values())} items successfully",
+            data=result
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/v1/admin/subject-options/", response_model=schemas.ResponseWrapper)
 def get_subject_options():
     """Get available colors, icons, and animations for subjects"""
@@ -1609,29 +1942,93 @@ def get_subject_options():
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Profiling Endpoints
+@app.get("/api/v1/admin/profiles/", response_model=schemas.ResponseWrapper, dependencies=[Depends(require_profiling_signature)])
+def list_request_profiles():
+    """List stored request profiles, newest first"""
+    profiles = profiling.list_profiles()
+    return schemas.ResponseWrapper(
+        message="Profiles retrieved successfully",
+        data=profiles,
+        total=len(profiles)
+    )
+
+@app.get("/api/v1/admin/profiles/{profile_name}", dependencies=[Depends(require_profiling_signature)])
+def download_request_profile(profile_name: str = Path(...)):
+    """Download a stored profile as collapsed stacks (load into speedscope or flamegraph.pl)"""
+    file_path = profiling.profile_path(profile_name)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(file_path, media_type="text/plain", filename=profile_name)
+
 # Bulk Operations
 @app.post("/api/v1/admin/bulk/create-structure/", response_model=schemas.ResponseWrapper)
-def create_bulk_structure(
-    structure_data: dict,
+async def create_bulk_structure(
+    request: Request,
+    school_id: int = Query(1, gt=0, description="School that new top-level school levels belong to"),
+    upsert: bool = Query(True, description="Update rows that already exist (matched by code, or title for topics/subtopics)"),
+    dry_run: bool = Query(False, description="Validate and resolve everything, then roll back"),
     db: Session = Depends(get_db)
 ):
-    """Create multiple curriculum levels in bulk"""
+    """Import a curriculum structure in one transaction.
+
+    Accepts a nested JSON document (application/json), NDJSON rows (application/x-ndjson)
+    or CSV rows (text/csv); see services/curriculum_import.py for the formats. Nothing is
+    written unless every row is valid.
+    """
     try:
-        # Implementation for bulk creation
-        # This would allow creating entire grade structures at once
-        created_items = []
-        
-        # Example: Create multiple terms for a form/grade
-        if "terms" in structure_data:
-            for term_data in structure_data["terms"]:
-                term = crud.term.create(db=db, obj_in=term_data)
-                created_items.append({"type": "term", "data": term})
-        
+        content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+        result = curriculum_import.ImportResult()
+
+        if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+            lines = []
+            buffer = ""
+            # Chunks can end inside a multibyte character; the decoder carries it to the next one
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            async for chunk in request.stream():
+                buffer += decoder.decode(chunk)
+                *complete, buffer = buffer.split("\n")
+                lines.extend(complete)
+            lines.append(buffer + decoder.decode(b"", final=True))
+            roots = curriculum_import.parse_rows(curriculum_import.iter_ndjson_lines(lines), school_id, result)
+        elif content_type == "text/csv":
+            text = (await request.body()).decode("utf-8-sig")
+            roots = curriculum_import.parse_rows(curriculum_import.iter_csv_rows(text), school_id, result)
+        else:
+            document = await request.json()
+            if not isinstance(document, dict):
+                raise HTTPException(status_code=400, detail="Expected a JSON object")
+            roots = curriculum_import.parse_document(document, school_id, result)
+
+        if not result.errors:
+            await run_in_threadpool(curriculum_import.import_structure, db, roots, result, upsert, dry_run)
+            if not result.errors and not dry_run:
+                for level in curriculum_import.LEVELS:
+                    crud.invalidate_counts(level.model)
+
+        if result.errors:
+            return JSONResponse(
+                status_code=422,
+                content=schemas.ResponseWrapper(
+                    success=False,
+                    message=f"Import failed with {len(result.errors)} error(s); nothing was written",
+                    data=result.to_dict(dry_run),
+                    errors={"rows": result.errors}
+                ).model_dump()
+            )
+
+        summary = result.to_dict(dry_run)
         return schemas.ResponseWrapper(
-            message=f"Bulk structure created successfully. {len(created_items)} items created.",
-            data=created_items
+            message=(
+                f"Bulk structure {'validated' if dry_run else 'imported'} successfully. "
+                f"{summary['total_created']} items created, {summary['total_updated']} updated."
+            ),
+            data=summary
         )
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.error(f"Bulk import failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 # ============= TIMETABLE ENDPOINTS =============
@@ -1654,6 +2051,15 @@ async def create_timetable(
         scheme = crud.scheme.get(db=db, id=scheme_id)
         if not scheme or scheme.user_id != user.id:
             raise HTTPException(status_code=404, detail="Scheme not found or not authorized")
+        slots_data = timetable_data.get('slots', [])
+        school_id = timetable_clashes.school_id_for(scheme)
+        term_id = timetable_clashes.term_id_for(scheme)
+        conflicts = timetable_clashes.find_conflicts(
+            db, user.id, slots_data, school_id=school_id, class_name=timetable_data.get('class_name'),
+            term_id=term_id
+        )
+        if conflicts and timetable_data.get('reject_conflicts'):
+            raise HTTPException(status_code=409, detail={"message": "Timetable clashes with other timetables", "conflicts": conflicts})
         timetable_id = str(uuid.uuid4())
         db_timetable = models.Timetable(
             id=timetable_id,
@@ -1663,10 +2069,10 @@ async def create_timetable(
             description=timetable_data.get('description', f"Timetable for {scheme.subject_name}"),
             selected_topics=timetable_data.get('selected_topics', []),
             selected_subtopics=timetable_data.get('selected_subtopics', []),
+            class_name=timetable_data.get('class_name'),
             status='draft'
         )
         db.add(db_timetable)
-        slots_data = timetable_data.get('slots', [])
         for slot_data in slots_data:
             db_slot = models.TimetableSlot(
                 id=str(uuid.uuid4()),
@@ -1678,9 +2084,12 @@ async def create_timetable(
                 subtopic_id=slot_data.get('subtopic_id'),
                 lesson_title=slot_data.get('lesson_title'),
                 is_double_lesson=slot_data.get('is_double_lesson', False),
+                double_position=slot_data.get('double_position'),
                 is_evening=slot_data.get('is_evening', False)
             )
             db.add(db_slot)
+        timetable_clashes.record(db, db_timetable, timetable_clashes.slot_cells(slots_data), school_id, term_id)
+        curriculum_coverage.apply(db, None, curriculum_coverage.slot_counts(slots_data))
         db.commit()
         db.refresh(db_timetable)
         logger.info(f"Timetable created successfully: {db_timetable.id}")
@@ -1693,7 +2102,9 @@ async def create_timetable(
                 "scheme_id": db_timetable.scheme_id,
                 "selected_topics": db_timetable.selected_topics,
                 "selected_subtopics": db_timetable.selected_subtopics,
+                "class_name": db_timetable.class_name,
                 "total_slots": len(slots_data),
+                "conflicts": conflicts,
                 "created_at": db_timetable.created_at.isoformat()
             }
         )
@@ -1804,6 +2215,7 @@ async def get_timetable_by_scheme(
             "scheme_id": timetable.scheme_id,
             "selected_topics": timetable.selected_topics or [],
             "selected_subtopics": timetable.selected_subtopics or [],
+            "class_name": timetable.class_name,
             "slots": [
                 {
                     "id": slot.id,
@@ -1862,6 +2274,20 @@ async def update_timetable(
         ).first()
         if not timetable:
             raise HTTPException(status_code=404, detail="Timetable not found")
+        conflicts = []
+        reindex = 'slots' in timetable_data or 'class_name' in timetable_data
+        if reindex:
+            slots_data = timetable_data['slots'] if 'slots' in timetable_data else timetable.slots
+            class_name = timetable_data['class_name'] if 'class_name' in timetable_data else timetable.class_name
+            school_id = timetable_clashes.school_id_for(timetable.scheme)
+            term_id = timetable_clashes.term_id_for(timetable.scheme)
+            conflicts = timetable_clashes.find_conflicts(
+                db, user.id, slots_data, school_id=school_id, class_name=class_name, term_id=term_id,
+                timetable_id=timetable.id
+            )
+            if conflicts and timetable_data.get('reject_conflicts'):
+                raise HTTPException(status_code=409, detail={"message": "Timetable clashes with other timetables", "conflicts": conflicts})
+            cells = timetable_clashes.slot_cells(slots_data)
         if 'selected_topics' in timetable_data:
             timetable.selected_topics = timetable_data['selected_topics']
         if 'selected_subtopics' in timetable_data:
@@ -1870,8 +2296,12 @@ async def update_timetable(
             timetable.name = timetable_data['name']
         if 'description' in timetable_data:
             timetable.description = timetable_data['description']
+        if 'class_name' in timetable_data:
+            timetable.class_name = timetable_data['class_name']
         timetable.updated_at = datetime.utcnow()
         if 'slots' in timetable_data:
+            curriculum_coverage.apply(db, curriculum_coverage.slot_counts(timetable.slots),
+                                      curriculum_coverage.slot_counts(timetable_data['slots']))
             db.query(models.TimetableSlot).filter(
                 models.TimetableSlot.timetable_id == timetable_id
             ).delete()
@@ -1886,9 +2316,12 @@ async def update_timetable(
                     subtopic_id=slot_data.get('subtopic_id'),
                     lesson_title=slot_data.get('lesson_title'),
                     is_double_lesson=slot_data.get('is_double_lesson', False),
+                    double_position=slot_data.get('double_position'),
                     is_evening=slot_data.get('is_evening', False)
                 )
                 db.add(db_slot)
+        if reindex:
+            timetable_clashes.record(db, timetable, cells, school_id, term_id)
         db.commit()
         db.refresh(timetable)
         return schemas.ResponseWrapper(
@@ -1896,6 +2329,7 @@ async def update_timetable(
             message="Timetable updated successfully",
             data={
                 "id": timetable.id,
+                "conflicts": conflicts,
                 "updated_at": timetable.updated_at.isoformat()
             }
         )
@@ -1911,6 +2345,297 @@ async def update_timetable(
             data=None
         )
 
+@app.get("/api/timetables/analytics", response_model=schemas.ResponseWrapper, tags=["Timetables"])
+def get_teacher_timetable_analytics(
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """Analytics of each of the user's timetables and of all of them together (clashes between timetables included)"""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found and could not be created")
+        report = timetable_analytics.teacher_report(db, user.id)
+        return schemas.ResponseWrapper(
+            message="Timetable analytics retrieved successfully",
+            data=report,
+            total=report["timetable_count"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/timetables/analytics", response_model=schemas.ResponseWrapper, tags=["Timetables"])
+def analyze_timetable_draft(timetable_data: dict):
+    """Analytics of unsaved slots, sent in the same shape as when saving a timetable"""
+    try:
+        slots = timetable_data.get('slots') or []
+        if not isinstance(slots, list):
+            raise HTTPException(status_code=400, detail="slots must be a list")
+        return schemas.ResponseWrapper(
+            message="Timetable analytics computed successfully",
+            data=timetable_analytics.draft_report(slots)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/timetables/{timetable_id}/analytics", response_model=schemas.ResponseWrapper, tags=["Timetables"])
+def get_timetable_analytics(
+    timetable_id: str,
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """Daily distribution, workload, pattern and clashes of a saved timetable"""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found and could not be created")
+        report = timetable_analytics.timetable_report(db, timetable_id, user_id=user.id)
+        if report is None:
+            raise HTTPException(status_code=404, detail="Timetable not found")
+        return schemas.ResponseWrapper(
+            message="Timetable analytics retrieved successfully",
+            data=report
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/schools/{school_id}/timetable-analytics/", response_model=schemas.ResponseWrapper)
+def get_school_timetable_analytics(school_id: int, db: Session = Depends(get_db)):
+    """Lessons per day and period across a school's timetables, with workload and clashes per teacher"""
+    try:
+        report = timetable_analytics.school_report(db, school_id)
+        return schemas.ResponseWrapper(
+            message="School timetable analytics retrieved successfully",
+            data=report,
+            total=report["timetable_count"]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/timetables/conflicts", response_model=schemas.ResponseWrapper, tags=["Timetables"])
+def check_timetable_conflicts(
+    timetable_data: dict,
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """Slots that clash with the user's other timetables or, with class_name, the class's timetables.
+    Takes the same body as saving a timetable (scheme_id, slots, optional timetable_id and class_name)."""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found and could not be created")
+        scheme = crud.scheme.get(db=db, id=timetable_data.get('scheme_id')) if timetable_data.get('scheme_id') else None
+        conflicts = timetable_clashes.find_conflicts(
+            db, user.id, timetable_data.get('slots') or [],
+            school_id=timetable_clashes.school_id_for(scheme),
+            class_name=timetable_data.get('class_name'),
+            term_id=timetable_clashes.term_id_for(scheme),
+            timetable_id=timetable_data.get('timetable_id')
+        )
+        return schemas.ResponseWrapper(
+            message="No clashes found" if not conflicts else f"{len(conflicts)} clashes found",
+            data=conflicts,
+            total=len(conflicts)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/timetables/solve", response_model=schemas.ResponseWrapper, tags=["Timetables"])
+def solve_timetable(
+    solve_data: dict,
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """Place the scheme's selected topics/subtopics onto free periods: a weekly timetable (slots, ready
+    to save) and the term plan. Periods taken by the teacher's or the class's other timetables are skipped."""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found and could not be created")
+        scheme_id = solve_data.get('scheme_id')
+        if not scheme_id:
+            raise HTTPException(status_code=400, detail="scheme_id is required")
+        scheme = crud.scheme.get(db=db, id=scheme_id)
+        if not scheme or scheme.user_id != user.id:
+            raise HTTPException(status_code=404, detail="Scheme not found or not authorized")
+
+        try:
+            counts = {name: timetable_solver.parse_count(solve_data.get(name), name)
+                      for name in ('total_weeks', 'lessons_per_week', 'doubles_per_week', 'max_lessons_per_day')}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        taken = crud.timetable.get_occupancy(
+            db, user_id=user.id, school_id=timetable_clashes.school_id_for(scheme),
+            class_key=timetable_clashes.class_key(solve_data.get('class_name')),
+            term_id=timetable_clashes.term_id_for(scheme),
+            exclude_timetable_id=solve_data.get('timetable_id')
+        )
+        periods = timetable_solver.parse_periods(
+            solve_data.get('available_periods'), {(row[0], row[1]) for row in taken},
+            allow_evening=bool(solve_data.get('allow_evening'))
+        )
+        placement = timetable_solver.solve_for_subject(
+            db, scheme.subject_id, timetable_solver.selected_ids(solve_data.get('selected_topics')),
+            timetable_solver.selected_ids(solve_data.get('selected_subtopics')),
+            periods,
+            time_budget=float(solve_data.get('time_budget_ms') or 250) / 1000,
+            **counts
+        )
+        if placement is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        return schemas.ResponseWrapper(
+            message="Timetable placed" if not placement.unplaced else f"{len(placement.unplaced)} lessons could not be placed",
+            data=placement._asdict(),
+            total=len(placement.plan)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/schools/{school_id}/timetable-conflicts/", response_model=schemas.ResponseWrapper)
+def get_school_timetable_conflicts(school_id: int, db: Session = Depends(get_db)):
+    """Periods in which a teacher or a class of the school is booked by more than one timetable"""
+    try:
+        report = timetable_clashes.school_report(db, school_id)
+        return schemas.ResponseWrapper(
+            message="School timetable conflicts retrieved successfully",
+            data=report,
+            total=len(report["teacher_clashes"]) + len(report["class_clashes"])
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/schools/{school_id}/curriculum-coverage/", response_model=schemas.ResponseWrapper)
+def get_school_curriculum_coverage(
+    school_id: int,
+    form_grade_id: Optional[int] = Query(None, description="Only this form/grade"),
+    term_id: Optional[int] = Query(None, description="Only this term"),
+    db: Session = Depends(get_db)
+):
+    """Lessons scheduled by the school's timetables against the lessons each subject's subtopics
+    require, with uncovered subtopics and over-allocated topics"""
+    try:
+        report = curriculum_coverage.school_report(db, school_id, form_grade_id=form_grade_id, term_id=term_id)
+        return schemas.ResponseWrapper(
+            message="Curriculum coverage retrieved successfully",
+            data=report,
+            total=report["totals"]["subjects"]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/content-library/", response_model=schemas.ResponseWrapper)
+def get_content_library(
+    subtopic_id: Optional[int] = Query(None, description="The entries of this subtopic instead of the totals"),
+    db: Session = Depends(get_db)
+):
+    """Entries and hits of the shared generated-content library by kind, prompt version and quality"""
+    try:
+        if subtopic_id is not None:
+            entries = crud.content_library.get_by_subtopic(db, subtopic_id)
+            return schemas.ResponseWrapper(
+                message="Content library entries retrieved successfully",
+                data=[entry.to_dict() for entry in entries],
+                total=len(entries)
+            )
+        report = content_library.stats(db)
+        return schemas.ResponseWrapper(
+            message="Content library retrieved successfully",
+            data=report,
+            total=report["entries"]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put("/api/v1/admin/content-library/{entry_id}/quality", response_model=schemas.ResponseWrapper)
+def set_content_library_quality(entry_id: int, quality_data: dict, db: Session = Depends(get_db)):
+    """Approve (2), reset (1) or reject (0) a library entry; rejected entries are regenerated on next use"""
+    try:
+        entry = crud.content_library.get(db, entry_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Content library entry not found")
+        entry = content_library.set_quality(db, entry, quality_data.get("quality"))
+        return schemas.ResponseWrapper(message="Content library entry updated successfully", data=entry.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/api/v1/admin/content-library/{entry_id}", response_model=schemas.ResponseWrapper)
+def delete_content_library_entry(entry_id: int, db: Session = Depends(get_db)):
+    """Delete a library entry; its subtopic is generated again on next use"""
+    try:
+        entry = crud.content_library.get(db, entry_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Content library entry not found")
+        db.delete(entry)
+        db.commit()
+        return schemas.ResponseWrapper(message="Content library entry deleted successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def record_llm_call(db: Session, user_id: int, scheme_id: Optional[int], context: dict, telemetry: dict):
+    """Append a generation to llm_calls; telemetry must never fail the request"""
+    try:
+        crud.llm_call.record(
+            db,
+            user_id=user_id,
+            scheme_id=scheme_id if isinstance(scheme_id, int) else None,
+            subject_name=context.get("subject_name"),
+            form_grade=context.get("form_grade"),
+            model=telemetry.get("model"),
+            prompt_tokens=0 if telemetry["cache_hit"] else telemetry.get("prompt_tokens") or 0,
+            completion_tokens=0 if telemetry["cache_hit"] else telemetry.get("completion_tokens") or 0,
+            total_tokens=0 if telemetry["cache_hit"] else telemetry.get("total_tokens") or 0,
+            ttft_ms=telemetry.get("ttft_ms"),
+            latency_ms=telemetry.get("latency_ms"),
+            attempts=0 if telemetry["cache_hit"] else telemetry.get("attempts") or 0,
+            cache_hit=telemetry["cache_hit"],
+            parse_success=bool(telemetry.get("parse_success")),
+            fallback_reason=telemetry.get("fallback_reason"),
+            details={
+                "retry_statuses": telemetry.get("retry_statuses") or [],
+                "prompt_budget": telemetry.get("prompt_budget"),
+                "routing": telemetry.get("routing"),
+            },
+        )
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not record LLM call: {e}")
+
+def generation_subject_id(db: Session, scheme_id: Optional[int], context: dict) -> Optional[int]:
+    """Subject being generated: from the context, the scheme, or the selected topics"""
+    subject_id = context.get("subject_id")
+    if not subject_id and isinstance(scheme_id, int):
+        scheme = crud.scheme.get(db=db, id=scheme_id)
+        subject_id = scheme.subject_id if scheme else None
+    if not subject_id:
+        topics = (context.get("timetable_data") or {}).get("selected_topics") or []
+        subject_id = next((t.get("subject_id") for t in topics if isinstance(t, dict) and t.get("subject_id")), None)
+    return subject_id if isinstance(subject_id, int) else None
+
+def load_subject_cache(load, db: Session, subject_id: Optional[int], name: str):
+    """Per-subject cached structure (fallback template, topic graph), or None if unavailable"""
+    if subject_id is None:
+        return None
+    try:
+        return load(db, subject_id)
+    except Exception as e:
+        logger.warning(f"Could not load {name} for subject {subject_id}: {e}")
+        return None
+
 @app.post("/api/schemes/generate", response_model=schemas.ResponseWrapper, tags=["Schemes"])
 async def generate_scheme_of_work(
     generation_data: dict,
@@ -1930,6 +2655,9 @@ async def generate_scheme_of_work(
         
         # Extract context and ensure Biology Form 2 Term 1 defaults
         context = generation_data.get("context", {})
+        if context.get("timetable_data"):
+            # Selected topics/subtopics may arrive as bare ids; resolve them in one query each
+            context["timetable_data"] = crud.resolve_selected_content(db, context["timetable_data"])
         
         # Enhance context with Biology Form 2 Term 1 specifics
         enhanced_context = {
@@ -1953,60 +2681,106 @@ async def generate_scheme_of_work(
         logger.info(f"✅ User found: {user.email}, generating Biology Form 2 Term 1 scheme...")
         logger.info(f"Context: {enhanced_context}")
         
-        try:
-            ai_service = GroqAIService()
-            result = ai_service.generate_scheme_of_work(context=enhanced_context, config=config)
-            
-            if isinstance(result, dict) and "scheme_content" in result:
-                scheme_content = result["scheme_content"]
-                weeks_data = scheme_content.get("weeks", [])
-                
-                # Ensure we have exactly 12 weeks
-                if len(weeks_data) != 12:
-                    logger.warning(f"Generated {len(weeks_data)} weeks instead of 12, adjusting...")
-                
-                return schemas.ResponseWrapper(
-                    success=True,
-                    message="Biology Form 2 Term 1 scheme generated successfully",
-                    data={
-                        "weeks": weeks_data,
-                        "metadata": result.get("metadata", {}),
-                        "scheme_header": scheme_content.get("scheme_header", {})
-                    }
-                )
-            else:
-                logger.warning("Invalid AI service response format, using fallback")
-                # Create fallback response
-                ai_service = GroqAIService()
-                fallback_result = ai_service._create_fallback_scheme(enhanced_context)
-                scheme_content = fallback_result["scheme_content"]
-                
-                return schemas.ResponseWrapper(
-                    success=True,
-                    message="Biology Form 2 Term 1 scheme generated using template",
-                    data={
+        scheme_id = generation_data.get("scheme_id") or context.get("scheme_id")
+        scheme_label = f"{enhanced_context['subject_name']} {enhanced_context['form_grade']} {enhanced_context['term']}"
+        
+        def run_generation() -> dict:
+            subject_id = generation_subject_id(db, scheme_id, enhanced_context)
+            fallback_template = load_subject_cache(fallback_templates.get_template, db, subject_id, "fallback template")
+            # Every subtopic of the scheme already written for this form and style: no LLM call
+            try:
+                library_result = content_library.scheme_from_library(db, fallback_template, enhanced_context, config)
+            except Exception as library_error:
+                logger.warning(f"Content library lookup failed: {library_error}")
+                db.rollback()
+                library_result = None
+            if library_result is not None:
+                scheme_content = library_result["scheme_content"]
+                return {
+                    "message": f"{scheme_label} scheme generated from the content library",
+                    "data": {
                         "weeks": scheme_content["weeks"],
-                        "metadata": fallback_result.get("metadata", {}),
+                        "metadata": library_result.get("metadata", {}),
                         "scheme_header": scheme_content.get("scheme_header", {})
                     }
+                }
+            try:
+                ai_service = GroqAIService(
+                    fallback_template=fallback_template,
+                    dependency_graph=load_subject_cache(topic_graph.get_graph, db, subject_id, "topic graph")
                 )
+                result = ai_service.generate_scheme_of_work(context=enhanced_context, config=config)
                 
-        except Exception as ai_error:
-            logger.error(f"AI service error: {str(ai_error)}")
-            # Return Biology-specific fallback
-            ai_service = GroqAIService()
+                if isinstance(result, dict) and "scheme_content" in result:
+                    scheme_content = result["scheme_content"]
+                    weeks_data = scheme_content.get("weeks", [])
+                    
+                    # Ensure we have exactly 12 weeks
+                    if len(weeks_data) != 12:
+                        logger.warning(f"Generated {len(weeks_data)} weeks instead of 12, adjusting...")
+                    
+                    metadata = result.get("metadata", {})
+                    if metadata.get("generation_source") == "timetable_based":
+                        try:
+                            content_library.store_scheme(db, fallback_template, enhanced_context, config, weeks_data,
+                                                         metadata.get("ai_model"))
+                        except Exception as library_error:
+                            logger.warning(f"Could not add the scheme to the content library: {library_error}")
+                            db.rollback()
+                    
+                    generated = metadata.get("generation_source") == "timetable_based"
+                    return {
+                        "message": f"{scheme_label} scheme generated " + ("successfully" if generated else "using template"),
+                        "data": {
+                            "weeks": weeks_data,
+                            "metadata": metadata,
+                            "scheme_header": scheme_content.get("scheme_header", {})
+                        }
+                    }
+                logger.warning("Invalid AI service response format, using fallback")
+                message = f"{scheme_label} scheme generated using template"
+            except Exception as ai_error:
+                logger.error(f"AI service error: {str(ai_error)}")
+                message = f"{scheme_label} scheme generated using fallback template"
+            
+            # Template built from the subject's curriculum
+            ai_service = GroqAIService(fallback_template=fallback_template)
             fallback_result = ai_service._create_fallback_scheme(enhanced_context)
             scheme_content = fallback_result["scheme_content"]
-            
-            return schemas.ResponseWrapper(
-                success=True,
-                message="Biology Form 2 Term 1 scheme generated using fallback template",
-                data={
+            return {
+                "message": message,
+                "data": {
                     "weeks": scheme_content["weeks"],
                     "metadata": fallback_result.get("metadata", {}),
                     "scheme_header": scheme_content.get("scheme_header", {})
                 }
-            )
+            }
+        
+        # Identical concurrent requests (double clicks, client retries) share one generation
+        flight_key = single_flight.make_key("scheme-generate", user.id, enhanced_context, config)
+        request_start = time.perf_counter()
+        outcome, shared = await run_in_threadpool(single_flight.scheme_generation.do, flight_key, run_generation)
+        if shared:
+            logger.info(f"Reused in-flight generation for user {user.id}")
+        
+        # Copy before annotating: shared outcomes are the same object for every waiter
+        metadata = dict(outcome["data"].get("metadata") or {})
+        telemetry = {**(metadata.get("telemetry") or {}), "cache_hit": shared}
+        if shared:
+            telemetry["latency_ms"] = int((time.perf_counter() - request_start) * 1000)
+        metadata["telemetry"] = telemetry
+        record_llm_call(db, user.id, scheme_id, enhanced_context, telemetry)
+        if isinstance(scheme_id, int):
+            scheme = crud.scheme.get(db=db, id=scheme_id)
+            if scheme and scheme.user_id == user.id:
+                scheme.generation_metadata = metadata
+                db.commit()
+        
+        return schemas.ResponseWrapper(
+            success=True,
+            message=outcome["message"],
+            data={**outcome["data"], "metadata": metadata}
+        )
             
     except Exception as e:
         logger.error(f"Generation error: {str(e)}")
@@ -2032,6 +2806,8 @@ async def save_generated_scheme_content(
         if not scheme or scheme.user_id != user.id:
             raise HTTPException(status_code=404, detail="Scheme not found")
         scheme.generated_content = content_data.get("generated_content")
+        if content_data.get("generation_metadata") is not None:
+            scheme.generation_metadata = content_data["generation_metadata"]
         scheme.ai_model_used = content_data.get("ai_model_used", "groq-llama")
         scheme.generation_date = datetime.utcnow()
         scheme.is_ai_generated = True
@@ -2051,6 +2827,101 @@ async def save_generated_scheme_content(
             data=None
         )
 
+def run_lesson_plan_batch(batch_id: str, config: dict):
+    """Generate a batch's lesson plans with a session of its own (runs after the response)"""
+    db = SessionLocal()
+    try:
+        batch = crud.lesson_plan.get_batch(db, batch_id)
+        scheme = crud.scheme.get(db=db, id=batch.scheme_id) if batch else None
+        if scheme is None:
+            return
+        ai_service = GroqAIService(
+            fallback_template=load_subject_cache(fallback_templates.get_template, db, scheme.subject_id, "fallback template")
+        )
+        batch = lesson_plans.run(db, batch, scheme, ai_service, config)
+        logger.info(f"Lesson plan batch {batch_id}: {batch.status}, {batch.completed_lessons}/{batch.total_lessons} lessons, "
+                    f"{batch.llm_calls} LLM calls, {batch.cache_hits} cached, {batch.fallbacks} from template")
+    finally:
+        db.close()
+
+@app.post("/api/schemes/{scheme_id}/lesson-plans/generate", response_model=schemas.ResponseWrapper, tags=["Lesson Plans"])
+async def generate_lesson_plans(
+    scheme_id: int,
+    background_tasks: BackgroundTasks,
+    generation_data: Optional[dict] = None,
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """Generate one lesson plan per lesson of the scheme's generated content, replacing its earlier plans.
+    Returns the batch at once (poll GET /api/lesson-plans/batches/{id}); with "wait": true, when finished."""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found and could not be created")
+        scheme = crud.scheme.get(db=db, id=scheme_id)
+        if not scheme or scheme.user_id != user.id:
+            raise HTTPException(status_code=404, detail="Scheme not found or not authorized")
+        if not lesson_plans.count_lessons(scheme.generated_content):
+            raise HTTPException(status_code=400, detail="The scheme has no generated lessons yet")
+        generation_data = generation_data or {}
+        batch, created = lesson_plans.start_batch(db, scheme, user.id)
+        if created:
+            config = generation_data.get("generation_config") or generation_data.get("config") or {}
+            if generation_data.get("wait"):
+                await run_in_threadpool(run_lesson_plan_batch, batch.id, config)
+            else:
+                background_tasks.add_task(run_lesson_plan_batch, batch.id, config)
+        db.refresh(batch)
+        return schemas.ResponseWrapper(
+            message="Lesson plan generation started" if created else "Lesson plan generation already in progress",
+            data=batch.to_dict()
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/lesson-plans/batches/{batch_id}", response_model=schemas.ResponseWrapper, tags=["Lesson Plans"])
+def get_lesson_plan_batch(
+    batch_id: str,
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """Status and progress of a lesson plan batch"""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        batch = crud.lesson_plan.get_batch(db, batch_id)
+        if not user or not batch or batch.user_id != user.id:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        return schemas.ResponseWrapper(message=f"Batch {batch.status}", data=batch.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/schemes/{scheme_id}/lesson-plans", response_model=schemas.ResponseWrapper, tags=["Lesson Plans"])
+def get_scheme_lesson_plans(
+    scheme_id: int,
+    user_google_id: str = Query(..., description="User's Google ID"),
+    db: Session = Depends(get_db)
+):
+    """The scheme's lesson plans in lesson order"""
+    try:
+        user = get_or_create_user(db, user_google_id)
+        scheme = crud.scheme.get(db=db, id=scheme_id)
+        if not user or not scheme or scheme.user_id != user.id:
+            raise HTTPException(status_code=404, detail="Scheme not found or not authorized")
+        plans = crud.lesson_plan.get_ordered(db, scheme_id)
+        return schemas.ResponseWrapper(
+            message="Lesson plans retrieved successfully",
+            data=[plan.to_dict() for plan in plans],
+            total=len(plans)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/schemes/export", tags=["Schemes"])
 async def export_scheme(
     export_data: dict,
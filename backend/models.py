@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -144,6 +144,9 @@ class SchemeOfWork(Base):
 # Lesson Plan model
 class LessonPlan(Base):
     __tablename__ = "lesson_plans"
+    __table_args__ = (
+        Index("ix_lesson_plans_scheme", "scheme_id", "lesson_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(JSONType)  # Store lesson content as JSON
@@ -157,8 +160,8 @@ class LessonPlan(Base):
     # Foreign Keys
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     scheme_id = Column(Integer, ForeignKey("schemes_of_work.id"), nullable=False)
-    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=True)
-    subtopic_id = Column(Integer, ForeignKey("subtopics.id"), nullable=True)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="SET NULL"), nullable=True)
+    subtopic_id = Column(Integer, ForeignKey("subtopics.id", ondelete="SET NULL"), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime, default=func.now())
@@ -171,6 +174,64 @@ class LessonPlan(Base):
     topic = relationship("Topic")
     subtopic = relationship("Subtopic")
 
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "lesson_number": self.lesson_number,
+            "content": self.content,
+            "objectives": self.objectives,
+            "activities": self.activities,
+            "resources": self.resources,
+            "assessment": self.assessment,
+            "duration_minutes": self.duration_minutes,
+            "user_id": self.user_id,
+            "scheme_id": self.scheme_id,
+            "topic_id": self.topic_id,
+            "subtopic_id": self.subtopic_id,
+            "scheduled_date": self.scheduled_date.isoformat() if self.scheduled_date else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+# Batch generation of a scheme's lesson plans (services.lesson_plans); progress is polled from here
+class LessonPlanBatch(Base):
+    __tablename__ = "lesson_plan_batches"
+    __table_args__ = (
+        Index("ix_lesson_plan_batches_scheme", "scheme_id", "status"),
+    )
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    scheme_id = Column(Integer, ForeignKey("schemes_of_work.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(20), default="queued")  # queued, running, completed, failed
+    total_lessons = Column(Integer, default=0)
+    completed_lessons = Column(Integer, default=0)
+    subtopics = Column(Integer, default=0)
+    llm_calls = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    fallbacks = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "scheme_id": self.scheme_id,
+            "status": self.status,
+            "total_lessons": self.total_lessons,
+            "completed_lessons": self.completed_lessons,
+            "progress": round(100 * self.completed_lessons / self.total_lessons) if self.total_lessons else 0,
+            "subtopics": self.subtopics,
+            "llm_calls": self.llm_calls,
+            "cache_hits": self.cache_hits,
+            "fallbacks": self.fallbacks,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 class School(Base):
     __tablename__ = "schools"
     
@@ -186,36 +247,48 @@ class School(Base):
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
-    school_levels = relationship("SchoolLevel", back_populates="school", cascade="all, delete-orphan")
+    school_levels = relationship("SchoolLevel", back_populates="school", cascade="all, delete-orphan", passive_deletes=True)
 
 class SchoolLevel(Base):
     __tablename__ = "school_levels"
+    __table_args__ = (
+        # Keyset pagination indexes: (display_order, id) within a parent and across the table
+        Index("ix_school_levels_parent_order", "school_id", "display_order", "id"),
+        Index("ix_school_levels_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)  # Primary, Secondary, High School
     code = Column(String(20), nullable=False)  # PS, SS, HS, etc.
     description = Column(Text)
-    display_order = Column(Integer, default=0)
-    school_id = Column(Integer, ForeignKey("schools.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="CASCADE"), nullable=False)
     grade_type = Column(String(20), default="grade")  # "form" or "grade"
     is_active = Column(Boolean, default=True)
+    # "<table>:<id>" of the row whose soft delete switched this one off; None when switched off directly
+    deactivated_by = Column(String(64))
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     school = relationship("School", back_populates="school_levels")
-    sections = relationship("Section", back_populates="school_level", cascade="all, delete-orphan")
-    forms_grades = relationship("FormGrade", back_populates="school_level", cascade="all, delete-orphan")
+    sections = relationship("Section", back_populates="school_level", cascade="all, delete-orphan", passive_deletes=True)
+    forms_grades = relationship("FormGrade", back_populates="school_level", cascade="all, delete-orphan", passive_deletes=True)
 
 class Section(Base):
     __tablename__ = "sections"
+    __table_args__ = (
+        Index("ix_sections_parent_order", "school_level_id", "display_order", "id"),
+        Index("ix_sections_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)  # Lower Primary, Upper Primary, etc.
     description = Column(Text)
-    display_order = Column(Integer, default=0)
-    school_level_id = Column(Integer, ForeignKey("school_levels.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    school_level_id = Column(Integer, ForeignKey("school_levels.id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
+    deactivated_by = Column(String(64))
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -224,41 +297,55 @@ class Section(Base):
 
 class FormGrade(Base):
     __tablename__ = "forms_grades"
+    __table_args__ = (
+        Index("ix_forms_grades_parent_order", "school_level_id", "display_order", "id"),
+        Index("ix_forms_grades_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)  # Form 1, Grade 1, etc.
     code = Column(String(20), nullable=False)  # F1, G1, etc.
     description = Column(Text)
-    display_order = Column(Integer, default=0)
-    school_level_id = Column(Integer, ForeignKey("school_levels.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    school_level_id = Column(Integer, ForeignKey("school_levels.id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
+    deactivated_by = Column(String(64))
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     school_level = relationship("SchoolLevel", back_populates="forms_grades")
-    terms = relationship("Term", back_populates="form_grade", cascade="all, delete-orphan")
+    terms = relationship("Term", back_populates="form_grade", cascade="all, delete-orphan", passive_deletes=True)
 
 class Term(Base):
     __tablename__ = "terms"
+    __table_args__ = (
+        Index("ix_terms_parent_order", "form_grade_id", "display_order", "id"),
+        Index("ix_terms_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)  # Term 1, Term 2, etc.
     code = Column(String(20), nullable=False)  # T1, T2, etc.
     start_date = Column(DateTime)
     end_date = Column(DateTime)
-    display_order = Column(Integer, default=0)
-    form_grade_id = Column(Integer, ForeignKey("forms_grades.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    form_grade_id = Column(Integer, ForeignKey("forms_grades.id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
+    deactivated_by = Column(String(64))
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     form_grade = relationship("FormGrade", back_populates="terms")
-    subjects = relationship("Subject", back_populates="term", cascade="all, delete-orphan")
+    subjects = relationship("Subject", back_populates="term", cascade="all, delete-orphan", passive_deletes=True)
 
 class Subject(Base):
     __tablename__ = "subjects"
+    __table_args__ = (
+        Index("ix_subjects_parent_order", "term_id", "display_order", "id"),
+        Index("ix_subjects_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(150), nullable=False)  # Mathematics, English, etc.
@@ -267,36 +354,48 @@ class Subject(Base):
     color = Column(String(7), default="#3B82F6")  # Hex color for theming
     icon = Column(String(50), default="book")  # Icon name for animations
     animation_type = Column(String(50), default="bounce")  # Animation preference
-    display_order = Column(Integer, default=0)
-    term_id = Column(Integer, ForeignKey("terms.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    term_id = Column(Integer, ForeignKey("terms.id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    deactivated_by = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Stamped in Python (microseconds) rather than by SQLite's CURRENT_TIMESTAMP (seconds): subject,
+    # topic and subtopic updated_at make up crud.subject.get_content_version
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     term = relationship("Term", back_populates="subjects")
-    topics = relationship("Topic", back_populates="subject", cascade="all, delete-orphan")
+    topics = relationship("Topic", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
 
 class Topic(Base):
     __tablename__ = "topics"
+    __table_args__ = (
+        Index("ix_topics_parent_order", "subject_id", "display_order", "id"),
+        Index("ix_topics_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text)
     learning_objectives = Column(JSONType)  # Store as JSON using custom type
     duration_weeks = Column(Integer, default=1)
-    display_order = Column(Integer, default=0)
-    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    deactivated_by = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     subject = relationship("Subject", back_populates="topics")
-    subtopics = relationship("Subtopic", back_populates="topic", cascade="all, delete-orphan")
+    subtopics = relationship("Subtopic", back_populates="topic", cascade="all, delete-orphan", passive_deletes=True)
 
 class Subtopic(Base):
     __tablename__ = "subtopics"
+    __table_args__ = (
+        Index("ix_subtopics_parent_order", "topic_id", "display_order", "id"),
+        Index("ix_subtopics_order", "display_order", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -305,15 +404,27 @@ class Subtopic(Base):
     assessment_criteria = Column(JSONType)  # Assessment criteria as JSON using custom type
     resources = Column(JSONType)  # Learning resources as JSON using custom type
     duration_lessons = Column(Integer, default=1)
-    display_order = Column(Integer, default=0)
-    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    display_order = Column(Integer, nullable=False, default=0, server_default="0")
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    deactivated_by = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     topic = relationship("Topic", back_populates="subtopics")
 
+# Explicit "must be taught before" edges between topics of the same subject
+class TopicPrerequisite(Base):
+    __tablename__ = "topic_prerequisites"
+    __table_args__ = (
+        Index("ix_topic_prerequisites_prerequisite", "prerequisite_id"),
+    )
+    
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    prerequisite_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=func.now())
+
 # Admin User model for authentication
 class AdminUser(Base):
     __tablename__ = "admin_users"
@@ -331,6 +442,9 @@ class AdminUser(Base):
 # --- Timetable Models for Save & Continue System ---
 class Timetable(Base):
     __tablename__ = "timetables"
+    __table_args__ = (
+        Index("ix_timetables_user", "user_id", "is_active"),
+    )
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     scheme_id = Column(Integer, ForeignKey("schemes_of_work.id"), nullable=False)
@@ -341,6 +455,7 @@ class Timetable(Base):
     selected_subtopics = Column(JSONType)
     total_lessons = Column(Integer, default=0)
     total_weeks = Column(Integer, default=0)
+    class_name = Column(String(100))  # class or stream taught, e.g. "2 East"; optional
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
@@ -351,13 +466,16 @@ class Timetable(Base):
 
 class TimetableSlot(Base):
     __tablename__ = "timetable_slots"
+    __table_args__ = (
+        Index("ix_timetable_slots_timetable", "timetable_id"),
+    )
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     timetable_id = Column(String, ForeignKey("timetables.id", ondelete="CASCADE"), nullable=False)
     day_of_week = Column(String(10), nullable=False)
     time_slot = Column(String(20), nullable=False)
     period_number = Column(Integer, nullable=False)
-    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=True)
-    subtopic_id = Column(Integer, ForeignKey("subtopics.id"), nullable=True)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="SET NULL"), nullable=True)
+    subtopic_id = Column(Integer, ForeignKey("subtopics.id", ondelete="SET NULL"), nullable=True)
     lesson_title = Column(String(255))
     lesson_objectives = Column(Text)
     activities = Column(JSONType)
@@ -369,4 +487,128 @@ class TimetableSlot(Base):
     created_at = Column(DateTime, default=func.now())
     timetable = relationship("Timetable", back_populates="slots")
     topic = relationship("Topic")
-    subtopic = relationship("Subtopic")
\ No newline at end of file
+    subtopic = relationship("Subtopic")
+
+# --- Timetable occupancy (one row per day and period a timetable uses) ---
+# Rewritten with the timetable's slots on every timetable write, so clashes with a teacher's or a
+# class's other timetables are found by an index lookup instead of scanning timetables
+class TimetableOccupancy(Base):
+    __tablename__ = "timetable_occupancy"
+    __table_args__ = (
+        Index("ix_timetable_occupancy_user_term_cell", "user_id", "term_id", "day", "period_number"),
+        Index("ix_timetable_occupancy_class_term_cell", "school_id", "class_key", "term_id", "day", "period_number"),
+    )
+    timetable_id = Column(String, ForeignKey("timetables.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(String(3), primary_key=True)  # MON … SUN
+    period_number = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="SET NULL"), nullable=True)
+    class_key = Column(String(100), nullable=True)  # normalized Timetable.class_name
+    term_id = Column(Integer, nullable=True)  # the scheme's term; timetables of different terms never clash
+    time_slot = Column(String(20))
+
+# --- Curriculum coverage rollups ---
+# Lessons the active timetables schedule for each subtopic against its duration_lessons. Timetable
+# writes add the change in their slot counts; a subject is rebuilt from its slots only when its
+# curriculum (crud.subject.get_content_version) has changed since the rollup was built
+class SubtopicCoverage(Base):
+    __tablename__ = "coverage_subtopics"
+    __table_args__ = (
+        Index("ix_coverage_subtopics_subtopic", "subtopic_id"),
+        Index("ix_coverage_subtopics_scope", "school_id", "form_grade_id", "term_id"),
+    )
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True)
+    subtopic_id = Column(Integer, primary_key=True)
+    topic_id = Column(Integer, nullable=False)
+    school_id = Column(Integer, nullable=True)
+    form_grade_id = Column(Integer, nullable=False)
+    term_id = Column(Integer, nullable=False)
+    required_lessons = Column(Integer, default=0)   # Subtopic.duration_lessons
+    scheduled_lessons = Column(Integer, default=0)  # slots of active timetables
+
+class SubjectCoverage(Base):
+    __tablename__ = "coverage_subjects"
+    __table_args__ = (
+        Index("ix_coverage_subjects_scope", "school_id", "form_grade_id", "term_id"),
+    )
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True)
+    school_id = Column(Integer, nullable=True)
+    form_grade_id = Column(Integer, nullable=False)
+    term_id = Column(Integer, nullable=False)
+    content_version = Column(String(255))
+    subtopics = Column(Integer, default=0)
+    required_lessons = Column(Integer, default=0)
+    scheduled_lessons = Column(Integer, default=0)
+    covered_lessons = Column(Integer, default=0)        # scheduled, up to each subtopic's requirement
+    uncovered_subtopics = Column(Integer, default=0)    # fewer lessons scheduled than required
+    over_allocated_topics = Column(Integer, default=0)  # more lessons scheduled than the topic requires
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+# Generated lesson content shared by every teacher of a subtopic (services.content_library):
+# scheme lesson fields or lesson plans, one fragment per lesson of the subtopic, per form, style
+# and prompt version. Entries that were not used for longest are evicted first
+class ContentFragment(Base):
+    __tablename__ = "content_library"
+    __table_args__ = (
+        Index("ix_content_library_key", "kind", "subtopic_id", "form_key", "style_key", "prompt_version", unique=True),
+        Index("ix_content_library_last_used", "last_used_at"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # scheme, lesson_plan
+    subtopic_id = Column(Integer, ForeignKey("subtopics.id", ondelete="CASCADE"), nullable=False)
+    form_key = Column(String(100), nullable=False)
+    style_key = Column(String(80), nullable=False)
+    style = Column(JSONType)
+    prompt_version = Column(Integer, nullable=False)
+    fragments = Column(JSONType)  # by lesson of the subtopic; null where none was generated yet
+    quality = Column(Integer, default=1)  # 0 rejected (not served), 1 generated, 2 approved
+    version = Column(Integer, default=1)  # incremented whenever fragments change
+    model = Column(String(100))
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "subtopic_id": self.subtopic_id,
+            "form_key": self.form_key,
+            "style": self.style,
+            "prompt_version": self.prompt_version,
+            "lessons": sum(fragment is not None for fragment in self.fragments or []),
+            "fragments": self.fragments,
+            "quality": self.quality,
+            "version": self.version,
+            "model": self.model,
+            "hits": self.hits,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "last_used_at": self.last_used_at.isoformat() if self.last_used_at else None,
+        }
+
+# --- LLM usage telemetry (append-only) ---
+class LLMCall(Base):
+    __tablename__ = "llm_calls"
+    __table_args__ = (
+        Index("ix_llm_calls_created_subject", "created_at", "subject_name"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    scheme_id = Column(Integer, ForeignKey("schemes_of_work.id", ondelete="SET NULL"), nullable=True)
+    purpose = Column(String(50), default="scheme_generation")
+    subject_name = Column(String(150))
+    form_grade = Column(String(100))
+    model = Column(String(100))
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    ttft_ms = Column(Integer)  # time to the first streamed token
+    latency_ms = Column(Integer)  # wall time of the generation, retries included
+    attempts = Column(Integer, default=0)  # LLM requests made (0 when no call was needed)
+    cache_hit = Column(Boolean, default=False)  # served from another request's generation
+    parse_success = Column(Boolean, default=False)
+    fallback_reason = Column(String(255))
+    details = Column(JSONType)  # retry statuses, prompt budget report
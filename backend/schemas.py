@@ -18,6 +18,7 @@ class ResponseWrapper(BaseSchema):
     message: str = Field(..., description="Response message")
     data: Optional[Any] = Field(None, description="Response data")
     total: Optional[int] = Field(None, description="Total count for paginated responses")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
     errors: Optional[Dict[str, Any]] = Field(None, description="Error details if any")
 
 # ============= USER SCHEMAS =============
@@ -320,6 +321,9 @@ class TopicUpdate(BaseSchema):
     subject_id: Optional[int] = Field(None, gt=0)
     is_active: Optional[bool] = None
 
+class TopicPrerequisitesUpdate(BaseSchema):
+    prerequisite_ids: List[int] = Field(default_factory=list, description="Topics of the same subject taught before this one")
+
 class Topic(TopicBase):
     id: int
     subject_id: int
@@ -413,6 +417,15 @@ class FormGradeWithTerms(FormGrade):
 class SchoolLevelWithHierarchy(SchoolLevel):
     forms_grades: List[FormGradeWithTerms] = []
 
+class TopicContentTree(TopicWithSubtopics):
+    total_lessons: int = Field(0, description="Sum of duration_lessons over the listed subtopics")
+
+class SubjectContentTree(Subject):
+    topics: List[TopicContentTree] = []
+    total_topics: int = 0
+    total_subtopics: int = 0
+    total_lessons: int = 0
+
 # ============= UTILITY SCHEMAS =============
 
 class SubjectColors(BaseSchema):
@@ -9,6 +9,867 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from database import SessionLocal
 from models import School, SchoolLevel, FormGrade, Term, Subject, Topic, Subtopic
 
+# ============= CANONICAL CURRICULUM DATA =============
+# Module level so seed_fast.py can bulk-load the same dataset
+
+CBC_CURRICULUM = {
+    # GRADES 1-3 (Lower Primary/Early Years)
+    "Grade 1": {
+        "Mathematics": [
+            ("Number Work", [
+                "Counting 1-10",
+                "Number Recognition 1-10",
+                "Number Formation 1-10",
+                "Before and After",
+                "More Than and Less Than"
+            ]),
+            ("Patterns", [
+                "Shape Patterns",
+                "Color Patterns",
+                "Size Patterns",
+                "Number Patterns 1-10"
+            ]),
+            ("Geometry", [
+                "Basic Shapes",
+                "Circle",
+                "Triangle",
+                "Rectangle",
+                "Square"
+            ]),
+            ("Measurement", [
+                "Long and Short",
+                "Big and Small",
+                "Heavy and Light",
+                "Full and Empty"
+            ])
+        ],
+        "English": [
+            ("Pre-Reading Skills", [
+                "Letter Recognition A-Z",
+                "Letter Sounds",
+                "Phonics",
+                "Sight Words"
+            ]),
+            ("Listening and Speaking", [
+                "Following Instructions",
+                "Oral Expression",
+                "Vocabulary Building",
+                "Story Telling"
+            ]),
+            ("Writing Skills", [
+                "Letter Formation",
+                "Copy Writing",
+                "Simple Words",
+                "Sentence Construction"
+            ])
+        ],
+        "Kiswahili": [
+            ("Mazungumzo", [
+                "Salamu",
+                "Kujiambia",
+                "Majina ya Vitu",
+                "Mazungumzo ya Kila Siku"
+            ]),
+            ("Kusoma", [
+                "Herufi za Kiswahili",
+                "Silabi",
+                "Maneno Rahisi",
+                "Sentensi Fupi"
+            ]),
+            ("Kuandika", [
+                "Kuandika Herufi",
+                "Kuandika Maneno",
+                "Kuandika Sentensi",
+                "Kuandika Kwa Ubora"
+            ])
+        ],
+        "Environmental Activities": [
+            ("My Body", [
+                "Body Parts",
+                "Senses",
+                "Keeping Clean",
+                "Healthy Habits"
+            ]),
+            ("My Home", [
+                "Family Members",
+                "Rooms in a House",
+                "Home Safety",
+                "Responsibilities at Home"
+            ]),
+            ("My School", [
+                "School Environment",
+                "School Rules",
+                "People in School",
+                "Learning Materials"
+            ])
+        ],
+        "Creative Activities": [
+            ("Music", [
+                "Simple Songs",
+                "Rhythm",
+                "Musical Instruments",
+                "Body Percussion"
+            ]),
+            ("Art", [
+                "Drawing",
+                "Coloring",
+                "Clay Work",
+                "Paper Cutting"
+            ]),
+            ("Dance", [
+                "Simple Movements",
+                "Traditional Dances",
+                "Creative Movement",
+                "Rhythm and Beat"
+            ])
+        ]
+    },
+    "Grade 2": {
+        "Mathematics": [
+            ("Number Work", [
+                "Counting 1-50",
+                "Number Recognition 1-50",
+                "Place Value - Tens and Ones",
+                "Addition within 20",
+                "Subtraction within 20"
+            ]),
+            ("Patterns", [
+                "Continuing Patterns",
+                "Creating Patterns",
+                "Number Patterns 1-50",
+                "Growing Patterns"
+            ]),
+            ("Geometry", [
+                "2D Shapes",
+                "3D Shapes",
+                "Shape Properties",
+                "Shapes in Environment"
+            ]),
+            ("Measurement", [
+                "Length Comparison",
+                "Weight Comparison",
+                "Capacity",
+                "Time - Days and Months"
+            ])
+        ],
+        "English": [
+            ("Reading Skills", [
+                "Simple Sentences",
+                "Short Stories",
+                "Comprehension",
+                "Reading Aloud"
+            ]),
+            ("Writing Skills", [
+                "Paragraph Writing",
+                "Creative Writing",
+                "Grammar Basics",
+                "Punctuation"
+            ]),
+            ("Vocabulary", [
+                "Word Building",
+                "Synonyms and Antonyms",
+                "Descriptive Words",
+                "Action Words"
+            ])
+        ],
+        "Kiswahili": [
+            ("Mazungumzo", [
+                "Mazungumzo ya Kifamilia",
+                "Mazungumzo ya Kiserikali",
+                "Uongozi wa Mazungumzo",
+                "Kutoa Maelezo"
+            ]),
+            ("Kusoma", [
+                "Kusoma Sentensi",
+                "Kusoma Aya",
+                "Ufahamu wa Kile Kinachosomwa",
+                "Kusoma kwa Sauti"
+            ]),
+            ("Kuandika", [
+                "Kuandika Aya",
+                "Kuandika Insha Fupi",
+                "Sarufi ya Kimsingi",
+                "Alama za Uandishi"
+            ])
+        ]
+    },
+    "Grade 3": {
+        "Mathematics": [
+            ("Number Work", [
+                "Counting 1-100",
+                "Place Value - Hundreds",
+                "Addition with Regrouping",
+                "Subtraction with Regrouping",
+                "Multiplication Tables 1-5"
+            ]),
+            ("Fractions", [
+                "Half and Quarter",
+                "Equal Parts",
+                "Fraction of Objects",
+                "Comparing Fractions"
+            ]),
+            ("Geometry", [
+                "Lines and Angles",
+                "Symmetry",
+                "Tessellation",
+                "Solid Shapes"
+            ]),
+            ("Measurement", [
+                "Standard Units",
+                "Time - Hours and Minutes",
+                "Money - Coins and Notes",
+                "Mass and Weight"
+            ])
+        ],
+        "English": [
+            ("Reading Comprehension", [
+                "Story Elements",
+                "Main Ideas",
+                "Making Predictions",
+                "Drawing Conclusions"
+            ]),
+            ("Writing Skills", [
+                "Narrative Writing",
+                "Descriptive Writing",
+                "Letter Writing",
+                "Poetry Writing"
+            ]),
+            ("Grammar", [
+                "Nouns and Verbs",
+                "Adjectives",
+                "Sentence Types",
+                "Tenses"
+            ])
+        ]
+    },
+
+    # GRADES 4-6 (Upper Primary/Middle School)
+    "Grade 4": {
+        "Mathematics": [
+            ("Number and Operations", [
+                "Place Value to 10,000",
+                "Addition and Subtraction",
+                "Multiplication and Division",
+                "Factors and Multiples",
+                "Prime and Composite Numbers"
+            ]),
+            ("Fractions and Decimals", [
+                "Equivalent Fractions",
+                "Adding and Subtracting Fractions",
+                "Decimal Numbers",
+                "Decimal and Fraction Conversion"
+            ]),
+            ("Geometry", [
+                "Angles and Lines",
+                "Polygons",
+                "Perimeter and Area",
+                "Coordinate Geometry"
+            ]),
+            ("Measurement", [
+                "Metric Units",
+                "Area and Volume",
+                "Time Calculations",
+                "Money Problems"
+            ])
+        ],
+        "English": [
+            ("Reading and Comprehension", [
+                "Fiction and Non-fiction",
+                "Character Analysis",
+                "Setting and Plot",
+                "Inference Skills"
+            ]),
+            ("Writing Skills", [
+                "Paragraph Development",
+                "Essay Writing",
+                "Report Writing",
+                "Creative Writing"
+            ]),
+            ("Grammar and Language", [
+                "Parts of Speech",
+                "Sentence Structure",
+                "Punctuation Rules",
+                "Spelling Patterns"
+            ])
+        ],
+        "Science and Technology": [
+            ("Living Things", [
+                "Plants and Animals",
+                "Life Processes",
+                "Habitats",
+                "Food Chains"
+            ]),
+            ("Materials and Matter", [
+                "Properties of Materials",
+                "States of Matter",
+                "Changes in Matter",
+                "Mixtures and Solutions"
+            ]),
+            ("Energy", [
+                "Forms of Energy",
+                "Heat and Temperature",
+                "Sound and Light",
+                "Electricity"
+            ]),
+            ("Technology", [
+                "Simple Machines",
+                "Tools and Equipment",
+                "ICT Applications",
+                "Innovation"
+            ])
+        ],
+        "Social Studies": [
+            ("Geography", [
+                "Maps and Directions",
+                "Physical Features",
+                "Weather and Climate",
+                "Natural Resources"
+            ]),
+            ("History", [
+                "Early Communities",
+                "Colonial Period",
+                "Independence Struggle",
+                "Modern Kenya"
+            ]),
+            ("Civics", [
+                "Government Structure",
+                "Rights and Responsibilities",
+                "National Unity",
+                "Democratic Processes"
+            ])
+        ]
+    },
+    "Grade 5": {
+        "Mathematics": [
+            ("Number Operations", [
+                "Large Numbers",
+                "Estimation and Rounding",
+                "Mental Mathematics",
+                "Problem Solving"
+            ]),
+            ("Fractions and Decimals", [
+                "Operations with Fractions",
+                "Decimal Operations",
+                "Percentages",
+                "Ratio and Proportion"
+            ]),
+            ("Geometry", [
+                "Angle Measurement",
+                "Triangles and Quadrilaterals",
+                "Circles",
+                "Transformations"
+            ]),
+            ("Data Handling", [
+                "Collecting Data",
+                "Tables and Charts",
+                "Graphs",
+                "Probability"
+            ])
+        ],
+        "Science and Technology": [
+            ("Living Things", [
+                "Classification",
+                "Reproduction",
+                "Growth and Development",
+                "Adaptation"
+            ]),
+            ("Forces and Motion", [
+                "Types of Forces",
+                "Motion",
+                "Simple Machines",
+                "Magnetism"
+            ]),
+            ("Environment", [
+                "Ecosystems",
+                "Conservation",
+                "Pollution",
+                "Sustainability"
+            ])
+        ]
+    },
+    "Grade 6": {
+        "Mathematics": [
+            ("Advanced Operations", [
+                "Complex Problem Solving",
+                "Mathematical Reasoning",
+                "Algebraic Thinking",
+                "Number Patterns"
+            ]),
+            ("Measurement", [
+                "Compound Units",
+                "Scale and Ratio",
+                "3D Measurements",
+                "Accuracy and Precision"
+            ]),
+            ("Geometry", [
+                "Construction",
+                "Nets and Solids",
+                "Similarity",
+                "Tessellations"
+            ])
+        ],
+        "Science and Technology": [
+            ("Earth and Space", [
+                "Solar System",
+                "Weather Patterns",
+                "Natural Disasters",
+                "Space Exploration"
+            ]),
+            ("Technology Applications", [
+                "Digital Literacy",
+                "Communication Technology",
+                "Innovation Projects",
+                "Problem Solving"
+            ])
+        ]
+    },
+
+    # GRADES 7-9 (Junior Secondary)
+    "Grade 7": {
+        "Mathematics": [
+            ("Number Systems", [
+                "Integers",
+                "Rational Numbers",
+                "Powers and Roots",
+                "Scientific Notation"
+            ]),
+            ("Algebra", [
+                "Algebraic Expressions",
+                "Simple Equations",
+                "Inequalities",
+                "Substitution"
+            ]),
+            ("Geometry", [
+                "Angle Properties",
+                "Triangles",
+                "Circles",
+                "Constructions"
+            ]),
+            ("Statistics", [
+                "Data Collection",
+                "Measures of Central Tendency",
+                "Probability",
+                "Graphs and Charts"
+            ])
+        ],
+        "English": [
+            ("Literature", [
+                "Poetry Analysis",
+                "Drama",
+                "Short Stories",
+                "Novels"
+            ]),
+            ("Language Skills", [
+                "Advanced Grammar",
+                "Vocabulary Development",
+                "Writing Techniques",
+                "Speaking Skills"
+            ]),
+            ("Communication", [
+                "Formal Writing",
+                "Presentations",
+                "Debates",
+                "Media Literacy"
+            ])
+        ],
+        "Integrated Science": [
+            ("Biology", [
+                "Cell Structure",
+                "Human Body Systems",
+                "Plant Biology",
+                "Genetics"
+            ]),
+            ("Chemistry", [
+                "Matter and Particles",
+                "Chemical Reactions",
+                "Acids and Bases",
+                "Organic Chemistry"
+            ]),
+            ("Physics", [
+                "Motion and Forces",
+                "Energy",
+                "Waves and Sound",
+                "Electricity"
+            ])
+        ],
+        "Social Studies": [
+            ("Geography", [
+                "Physical Geography",
+                "Human Geography",
+                "Economic Geography",
+                "Environmental Issues"
+            ]),
+            ("History", [
+                "World History",
+                "African History",
+                "Kenyan History",
+                "Historical Skills"
+            ]),
+            ("Government", [
+                "Constitution",
+                "Democracy",
+                "Human Rights",
+                "International Relations"
+            ])
+        ]
+    },
+    "Grade 8": {
+        "Mathematics": [
+            ("Advanced Algebra", [
+                "Linear Equations",
+                "Simultaneous Equations",
+                "Quadratic Expressions",
+                "Graphs"
+            ]),
+            ("Geometry", [
+                "Similarity and Congruence",
+                "Pythagoras Theorem",
+                "Mensuration",
+                "Coordinate Geometry"
+            ]),
+            ("Statistics and Probability", [
+                "Statistical Analysis",
+                "Probability Rules",
+                "Combinations",
+                "Data Interpretation"
+            ])
+        ],
+        "Integrated Science": [
+            ("Advanced Biology", [
+                "Ecology",
+                "Evolution",
+                "Biotechnology",
+                "Health and Disease"
+            ]),
+            ("Advanced Chemistry", [
+                "Atomic Structure",
+                "Periodic Table",
+                "Chemical Bonding",
+                "Rates of Reaction"
+            ]),
+            ("Advanced Physics", [
+                "Heat and Temperature",
+                "Light and Optics",
+                "Magnetism",
+                "Modern Physics"
+            ])
+        ]
+    },
+    "Grade 9": {
+        "Mathematics": [
+            ("Pre-Calculus", [
+                "Functions",
+                "Trigonometry",
+                "Logarithms",
+                "Sequences and Series"
+            ]),
+            ("Advanced Geometry", [
+                "Circle Theorems",
+                "3D Geometry",
+                "Transformations",
+                "Vectors"
+            ]),
+            ("Applications", [
+                "Mathematical Modeling",
+                "Financial Mathematics",
+                "Statistics Projects",
+                "Problem Solving"
+            ])
+        ],
+        "Integrated Science": [
+            ("Scientific Method", [
+                "Research Skills",
+                "Data Analysis",
+                "Scientific Writing",
+                "Experimental Design"
+            ]),
+            ("Applied Sciences", [
+                "Environmental Science",
+                "Material Science",
+                "Energy Systems",
+                "Technology Applications"
+            ])
+        ]
+    }
+}
+
+COMMON_SUBJECTS = {
+    "Religious Education": [
+        ("Christian Religious Education", [
+            "Old Testament",
+            "New Testament",
+            "Christian Living",
+            "Moral Values"
+        ]),
+        ("Islamic Religious Education", [
+            "Quran Studies",
+            "Hadith",
+            "Islamic History",
+            "Islamic Ethics"
+        ])
+    ],
+    "Creative Arts": [
+        ("Visual Arts", [
+            "Drawing and Painting",
+            "Sculpture",
+            "Crafts",
+            "Design"
+        ]),
+        ("Performing Arts", [
+            "Music",
+            "Dance",
+            "Drama",
+            "Storytelling"
+        ])
+    ]
+}
+
+SECONDARY_SUBJECTS = {
+    "English": [
+        ("Literature", [
+            "Poetry",
+            "Drama",
+            "Novels",
+            "Short Stories"
+        ]),
+        ("Language Skills", [
+            "Grammar",
+            "Composition",
+            "Comprehension",
+            "Summary Writing"
+        ])
+    ],
+    "Kiswahili": [
+        ("Fasihi", [
+            "Mashairi",
+            "Hadithi Fupi",
+            "Riwaya",
+            "Tamthiliya"
+        ]),
+        ("Lugha", [
+            "Sarufi",
+            "Uandishi",
+            "Ufahamu",
+            "Muhtasari"
+        ])
+    ],
+    "Mathematics": [
+        ("Algebra", [
+            "Linear Equations",
+            "Quadratic Equations",
+            "Simultaneous Equations",
+            "Inequalities"
+        ]),
+        ("Geometry", [
+            "Coordinate Geometry",
+            "Transformations",
+            "Circle Theorems",
+            "Mensuration"
+        ])
+    ],
+    "Biology": [
+        ("Cell Biology", [
+            "Cell Structure",
+            "Cell Division",
+            "Osmosis and Diffusion",
+            "Enzymes"
+        ]),
+        ("Human Biology", [
+            "Nutrition",
+            "Respiration",
+            "Circulation",
+            "Excretion"
+        ])
+    ],
+    "Chemistry": [
+        ("Atomic Structure", [
+            "Atomic Theory",
+            "Periodic Table",
+            "Chemical Bonding",
+            "Radioactivity"
+        ]),
+        ("Chemical Reactions", [
+            "Acids and Bases",
+            "Salts",
+            "Organic Chemistry",
+            "Rates of Reaction"
+        ])
+    ],
+    "Physics": [
+        ("Mechanics", [
+            "Motion",
+            "Forces",
+            "Energy",
+            "Pressure"
+        ]),
+        ("Waves and Optics", [
+            "Sound",
+            "Light",
+            "Electromagnetic Waves",
+            "Reflection and Refraction"
+        ])
+    ]
+}
+
+GRADE4_SCIENCE_TOPICS = [
+    ("Plants Around Us", [
+        "Parts of a Plant",
+        "Types of Plants",
+        "How Plants Grow",
+        "Uses of Plants",
+        "Caring for Plants"
+    ]),
+    ("Animals Around Us", [
+        "Domestic Animals",
+        "Wild Animals",
+        "Animal Homes",
+        "Animal Sounds",
+        "Animal Products"
+    ]),
+    ("Our Environment", [
+        "Living and Non-living Things",
+        "Water Sources",
+        "Soil Types",
+        "Weather Changes",
+        "Environmental Care"
+    ]),
+    ("Simple Machines", [
+        "Lever",
+        "Pulley",
+        "Wheel and Axle",
+        "Inclined Plane",
+        "Screw"
+    ])
+]
+
+GRADE7_MATH_TOPICS = [
+    ("Directed Numbers", [
+        "Positive and Negative Numbers",
+        "Number Line",
+        "Adding Integers",
+        "Subtracting Integers",
+        "Multiplying Integers",
+        "Dividing Integers"
+    ]),
+    ("Fractions", [
+        "Types of Fractions",
+        "Equivalent Fractions",
+        "Adding Fractions",
+        "Subtracting Fractions",
+        "Multiplying Fractions",
+        "Dividing Fractions"
+    ]),
+    ("Decimals", [
+        "Place Value in Decimals",
+        "Comparing Decimals",
+        "Rounding Decimals",
+        "Operations with Decimals",
+        "Converting Fractions to Decimals"
+    ]),
+    ("Ratio and Proportion", [
+        "Understanding Ratios",
+        "Equivalent Ratios",
+        "Proportion",
+        "Direct Proportion",
+        "Inverse Proportion"
+    ])
+]
+
+JUNIOR_SECONDARY_SUBJECTS = {
+    "Life Skills": [
+        ("Personal Development", [
+            "Self-Awareness",
+            "Self-Esteem",
+            "Goal Setting",
+            "Decision Making",
+            "Stress Management"
+        ]),
+        ("Social Skills", [
+            "Communication",
+            "Teamwork",
+            "Leadership",
+            "Conflict Resolution",
+            "Peer Relationships"
+        ]),
+        ("Health Education", [
+            "Personal Hygiene",
+            "Nutrition",
+            "Disease Prevention",
+            "Mental Health",
+            "Substance Abuse"
+        ])
+    ],
+    "Business Studies": [
+        ("Introduction to Business", [
+            "What is Business",
+            "Types of Business",
+            "Business Environment",
+            "Business Opportunities",
+            "Entrepreneurship"
+        ]),
+        ("Money and Banking", [
+            "Functions of Money",
+            "Banking Services",
+            "Saving and Investment",
+            "Insurance",
+            "Financial Planning"
+        ]),
+        ("Trade and Commerce", [
+            "Local Trade",
+            "International Trade",
+            "Transport and Communication",
+            "Marketing",
+            "Consumer Rights"
+        ])
+    ],
+    "Agriculture": [
+        ("Crop Production", [
+            "Land Preparation",
+            "Planting",
+            "Crop Care",
+            "Harvesting",
+            "Post-Harvest Handling"
+        ]),
+        ("Livestock Production", [
+            "Cattle Keeping",
+            "Poultry Keeping",
+            "Goat Keeping",
+            "Pig Keeping",
+            "Animal Health"
+        ]),
+        ("Soil Management", [
+            "Types of Soil",
+            "Soil Fertility",
+            "Soil Conservation",
+            "Composting",
+            "Organic Farming"
+        ])
+    ],
+    "Home Science": [
+        ("Food and Nutrition", [
+            "Food Groups",
+            "Balanced Diet",
+            "Food Preparation",
+            "Food Storage",
+            "Kitchen Safety"
+        ]),
+        ("Clothing and Textiles", [
+            "Fabric Types",
+            "Clothing Care",
+            "Basic Sewing",
+            "Clothing Design",
+            "Fashion Trends"
+        ]),
+        ("Home Management", [
+            "Home Planning",
+            "Budgeting",
+            "Home Decoration",
+            "Family Relationships",
+            "Child Care"
+        ])
+    ]
+}
+
 def seed_school_levels():
     """Seed the database with comprehensive CBC curriculum from Grade 1-9"""
     db = SessionLocal()
@@ -106,618 +967,10 @@ def seed_school_levels():
 
         # CBC CURRICULUM SEEDING BY GRADE
         # Define CBC curriculum structure
-        cbc_curriculum = {
-            # GRADES 1-3 (Lower Primary/Early Years)
-            "Grade 1": {
-                "Mathematics": [
-                    ("Number Work", [
-                        "Counting 1-10",
-                        "Number Recognition 1-10",
-                        "Number Formation 1-10",
-                        "Before and After",
-                        "More Than and Less Than"
-                    ]),
-                    ("Patterns", [
-                        "Shape Patterns",
-                        "Color Patterns",
-                        "Size Patterns",
-                        "Number Patterns 1-10"
-                    ]),
-                    ("Geometry", [
-                        "Basic Shapes",
-                        "Circle",
-                        "Triangle",
-                        "Rectangle",
-                        "Square"
-                    ]),
-                    ("Measurement", [
-                        "Long and Short",
-                        "Big and Small",
-                        "Heavy and Light",
-                        "Full and Empty"
-                    ])
-                ],
-                "English": [
-                    ("Pre-Reading Skills", [
-                        "Letter Recognition A-Z",
-                        "Letter Sounds",
-                        "Phonics",
-                        "Sight Words"
-                    ]),
-                    ("Listening and Speaking", [
-                        "Following Instructions",
-                        "Oral Expression",
-                        "Vocabulary Building",
-                        "Story Telling"
-                    ]),
-                    ("Writing Skills", [
-                        "Letter Formation",
-                        "Copy Writing",
-                        "Simple Words",
-                        "Sentence Construction"
-                    ])
-                ],
-                "Kiswahili": [
-                    ("Mazungumzo", [
-                        "Salamu",
-                        "Kujiambia",
-                        "Majina ya Vitu",
-                        "Mazungumzo ya Kila Siku"
-                    ]),
-                    ("Kusoma", [
-                        "Herufi za Kiswahili",
-                        "Silabi",
-                        "Maneno Rahisi",
-                        "Sentensi Fupi"
-                    ]),
-                    ("Kuandika", [
-                        "Kuandika Herufi",
-                        "Kuandika Maneno",
-                        "Kuandika Sentensi",
-                        "Kuandika Kwa Ubora"
-                    ])
-                ],
-                "Environmental Activities": [
-                    ("My Body", [
-                        "Body Parts",
-                        "Senses",
-                        "Keeping Clean",
-                        "Healthy Habits"
-                    ]),
-                    ("My Home", [
-                        "Family Members",
-                        "Rooms in a House",
-                        "Home Safety",
-                        "Responsibilities at Home"
-                    ]),
-                    ("My School", [
-                        "School Environment",
-                        "School Rules",
-                        "People in School",
-                        "Learning Materials"
-                    ])
-                ],
-                "Creative Activities": [
-                    ("Music", [
-                        "Simple Songs",
-                        "Rhythm",
-                        "Musical Instruments",
-                        "Body Percussion"
-                    ]),
-                    ("Art", [
-                        "Drawing",
-                        "Coloring",
-                        "Clay Work",
-                        "Paper Cutting"
-                    ]),
-                    ("Dance", [
-                        "Simple Movements",
-                        "Traditional Dances",
-                        "Creative Movement",
-                        "Rhythm and Beat"
-                    ])
-                ]
-            },
-            "Grade 2": {
-                "Mathematics": [
-                    ("Number Work", [
-                        "Counting 1-50",
-                        "Number Recognition 1-50",
-                        "Place Value - Tens and Ones",
-                        "Addition within 20",
-                        "Subtraction within 20"
-                    ]),
-                    ("Patterns", [
-                        "Continuing Patterns",
-                        "Creating Patterns",
-                        "Number Patterns 1-50",
-                        "Growing Patterns"
-                    ]),
-                    ("Geometry", [
-                        "2D Shapes",
-                        "3D Shapes",
-                        "Shape Properties",
-                        "Shapes in Environment"
-                    ]),
-                    ("Measurement", [
-                        "Length Comparison",
-                        "Weight Comparison",
-                        "Capacity",
-                        "Time - Days and Months"
-                    ])
-                ],
-                "English": [
-                    ("Reading Skills", [
-                        "Simple Sentences",
-                        "Short Stories",
-                        "Comprehension",
-                        "Reading Aloud"
-                    ]),
-                    ("Writing Skills", [
-                        "Paragraph Writing",
-                        "Creative Writing",
-                        "Grammar Basics",
-                        "Punctuation"
-                    ]),
-                    ("Vocabulary", [
-                        "Word Building",
-                        "Synonyms and Antonyms",
-                        "Descriptive Words",
-                        "Action Words"
-                    ])
-                ],
-                "Kiswahili": [
-                    ("Mazungumzo", [
-                        "Mazungumzo ya Kifamilia",
-                        "Mazungumzo ya Kiserikali",
-                        "Uongozi wa Mazungumzo",
-                        "Kutoa Maelezo"
-                    ]),
-                    ("Kusoma", [
-                        "Kusoma Sentensi",
-                        "Kusoma Aya",
-                        "Ufahamu wa Kile Kinachosomwa",
-                        "Kusoma kwa Sauti"
-                    ]),
-                    ("Kuandika", [
-                        "Kuandika Aya",
-                        "Kuandika Insha Fupi",
-                        "Sarufi ya Kimsingi",
-                        "Alama za Uandishi"
-                    ])
-                ]
-            },
-            "Grade 3": {
-                "Mathematics": [
-                    ("Number Work", [
-                        "Counting 1-100",
-                        "Place Value - Hundreds",
-                        "Addition with Regrouping",
-                        "Subtraction with Regrouping",
-                        "Multiplication Tables 1-5"
-                    ]),
-                    ("Fractions", [
-                        "Half and Quarter",
-                        "Equal Parts",
-                        "Fraction of Objects",
-                        "Comparing Fractions"
-                    ]),
-                    ("Geometry", [
-                        "Lines and Angles",
-                        "Symmetry",
-                        "Tessellation",
-                        "Solid Shapes"
-                    ]),
-                    ("Measurement", [
-                        "Standard Units",
-                        "Time - Hours and Minutes",
-                        "Money - Coins and Notes",
-                        "Mass and Weight"
-                    ])
-                ],
-                "English": [
-                    ("Reading Comprehension", [
-                        "Story Elements",
-                        "Main Ideas",
-                        "Making Predictions",
-                        "Drawing Conclusions"
-                    ]),
-                    ("Writing Skills", [
-                        "Narrative Writing",
-                        "Descriptive Writing",
-                        "Letter Writing",
-                        "Poetry Writing"
-                    ]),
-                    ("Grammar", [
-                        "Nouns and Verbs",
-                        "Adjectives",
-                        "Sentence Types",
-                        "Tenses"
-                    ])
-                ]
-            },
-            
-            # GRADES 4-6 (Upper Primary/Middle School)
-            "Grade 4": {
-                "Mathematics": [
-                    ("Number and Operations", [
-                        "Place Value to 10,000",
-                        "Addition and Subtraction",
-                        "Multiplication and Division",
-                        "Factors and Multiples",
-                        "Prime and Composite Numbers"
-                    ]),
-                    ("Fractions and Decimals", [
-                        "Equivalent Fractions",
-                        "Adding and Subtracting Fractions",
-                        "Decimal Numbers",
-                        "Decimal and Fraction Conversion"
-                    ]),
-                    ("Geometry", [
-                        "Angles and Lines",
-                        "Polygons",
-                        "Perimeter and Area",
-                        "Coordinate Geometry"
-                    ]),
-                    ("Measurement", [
-                        "Metric Units",
-                        "Area and Volume",
-                        "Time Calculations",
-                        "Money Problems"
-                    ])
-                ],
-                "English": [
-                    ("Reading and Comprehension", [
-                        "Fiction and Non-fiction",
-                        "Character Analysis",
-                        "Setting and Plot",
-                        "Inference Skills"
-                    ]),
-                    ("Writing Skills", [
-                        "Paragraph Development",
-                        "Essay Writing",
-                        "Report Writing",
-                        "Creative Writing"
-                    ]),
-                    ("Grammar and Language", [
-                        "Parts of Speech",
-                        "Sentence Structure",
-                        "Punctuation Rules",
-                        "Spelling Patterns"
-                    ])
-                ],
-                "Science and Technology": [
-                    ("Living Things", [
-                        "Plants and Animals",
-                        "Life Processes",
-                        "Habitats",
-                        "Food Chains"
-                    ]),
-                    ("Materials and Matter", [
-                        "Properties of Materials",
-                        "States of Matter",
-                        "Changes in Matter",
-                        "Mixtures and Solutions"
-                    ]),
-                    ("Energy", [
-                        "Forms of Energy",
-                        "Heat and Temperature",
-                        "Sound and Light",
-                        "Electricity"
-                    ]),
-                    ("Technology", [
-                        "Simple Machines",
-                        "Tools and Equipment",
-                        "ICT Applications",
-                        "Innovation"
-                    ])
-                ],
-                "Social Studies": [
-                    ("Geography", [
-                        "Maps and Directions",
-                        "Physical Features",
-                        "Weather and Climate",
-                        "Natural Resources"
-                    ]),
-                    ("History", [
-                        "Early Communities",
-                        "Colonial Period",
-                        "Independence Struggle",
-                        "Modern Kenya"
-                    ]),
-                    ("Civics", [
-                        "Government Structure",
-                        "Rights and Responsibilities",
-                        "National Unity",
-                        "Democratic Processes"
-                    ])
-                ]
-            },
-            "Grade 5": {
-                "Mathematics": [
-                    ("Number Operations", [
-                        "Large Numbers",
-                        "Estimation and Rounding",
-                        "Mental Mathematics",
-                        "Problem Solving"
-                    ]),
-                    ("Fractions and Decimals", [
-                        "Operations with Fractions",
-                        "Decimal Operations",
-                        "Percentages",
-                        "Ratio and Proportion"
-                    ]),
-                    ("Geometry", [
-                        "Angle Measurement",
-                        "Triangles and Quadrilaterals",
-                        "Circles",
-                        "Transformations"
-                    ]),
-                    ("Data Handling", [
-                        "Collecting Data",
-                        "Tables and Charts",
-                        "Graphs",
-                        "Probability"
-                    ])
-                ],
-                "Science and Technology": [
-                    ("Living Things", [
-                        "Classification",
-                        "Reproduction",
-                        "Growth and Development",
-                        "Adaptation"
-                    ]),
-                    ("Forces and Motion", [
-                        "Types of Forces",
-                        "Motion",
-                        "Simple Machines",
-                        "Magnetism"
-                    ]),
-                    ("Environment", [
-                        "Ecosystems",
-                        "Conservation",
-                        "Pollution",
-                        "Sustainability"
-                    ])
-                ]
-            },
-            "Grade 6": {
-                "Mathematics": [
-                    ("Advanced Operations", [
-                        "Complex Problem Solving",
-                        "Mathematical Reasoning",
-                        "Algebraic Thinking",
-                        "Number Patterns"
-                    ]),
-                    ("Measurement", [
-                        "Compound Units",
-                        "Scale and Ratio",
-                        "3D Measurements",
-                        "Accuracy and Precision"
-                    ]),
-                    ("Geometry", [
-                        "Construction",
-                        "Nets and Solids",
-                        "Similarity",
-                        "Tessellations"
-                    ])
-                ],
-                "Science and Technology": [
-                    ("Earth and Space", [
-                        "Solar System",
-                        "Weather Patterns",
-                        "Natural Disasters",
-                        "Space Exploration"
-                    ]),
-                    ("Technology Applications", [
-                        "Digital Literacy",
-                        "Communication Technology",
-                        "Innovation Projects",
-                        "Problem Solving"
-                    ])
-                ]
-            },
-            
-            # GRADES 7-9 (Junior Secondary)
-            "Grade 7": {
-                "Mathematics": [
-                    ("Number Systems", [
-                        "Integers",
-                        "Rational Numbers",
-                        "Powers and Roots",
-                        "Scientific Notation"
-                    ]),
-                    ("Algebra", [
-                        "Algebraic Expressions",
-                        "Simple Equations",
-                        "Inequalities",
-                        "Substitution"
-                    ]),
-                    ("Geometry", [
-                        "Angle Properties",
-                        "Triangles",
-                        "Circles",
-                        "Constructions"
-                    ]),
-                    ("Statistics", [
-                        "Data Collection",
-                        "Measures of Central Tendency",
-                        "Probability",
-                        "Graphs and Charts"
-                    ])
-                ],
-                "English": [
-                    ("Literature", [
-                        "Poetry Analysis",
-                        "Drama",
-                        "Short Stories",
-                        "Novels"
-                    ]),
-                    ("Language Skills", [
-                        "Advanced Grammar",
-                        "Vocabulary Development",
-                        "Writing Techniques",
-                        "Speaking Skills"
-                    ]),
-                    ("Communication", [
-                        "Formal Writing",
-                        "Presentations",
-                        "Debates",
-                        "Media Literacy"
-                    ])
-                ],
-                "Integrated Science": [
-                    ("Biology", [
-                        "Cell Structure",
-                        "Human Body Systems",
-                        "Plant Biology",
-                        "Genetics"
-                    ]),
-                    ("Chemistry", [
-                        "Matter and Particles",
-                        "Chemical Reactions",
-                        "Acids and Bases",
-                        "Organic Chemistry"
-                    ]),
-                    ("Physics", [
-                        "Motion and Forces",
-                        "Energy",
-                        "Waves and Sound",
-                        "Electricity"
-                    ])
-                ],
-                "Social Studies": [
-                    ("Geography", [
-                        "Physical Geography",
-                        "Human Geography",
-                        "Economic Geography",
-                        "Environmental Issues"
-                    ]),
-                    ("History", [
-                        "World History",
-                        "African History",
-                        "Kenyan History",
-                        "Historical Skills"
-                    ]),
-                    ("Government", [
-                        "Constitution",
-                        "Democracy",
-                        "Human Rights",
-                        "International Relations"
-                    ])
-                ]
-            },
-            "Grade 8": {
-                "Mathematics": [
-                    ("Advanced Algebra", [
-                        "Linear Equations",
-                        "Simultaneous Equations",
-                        "Quadratic Expressions",
-                        "Graphs"
-                    ]),
-                    ("Geometry", [
-                        "Similarity and Congruence",
-                        "Pythagoras Theorem",
-                        "Mensuration",
-                        "Coordinate Geometry"
-                    ]),
-                    ("Statistics and Probability", [
-                        "Statistical Analysis",
-                        "Probability Rules",
-                        "Combinations",
-                        "Data Interpretation"
-                    ])
-                ],
-                "Integrated Science": [
-                    ("Advanced Biology", [
-                        "Ecology",
-                        "Evolution",
-                        "Biotechnology",
-                        "Health and Disease"
-                    ]),
-                    ("Advanced Chemistry", [
-                        "Atomic Structure",
-                        "Periodic Table",
-                        "Chemical Bonding",
-                        "Rates of Reaction"
-                    ]),
-                    ("Advanced Physics", [
-                        "Heat and Temperature",
-                        "Light and Optics",
-                        "Magnetism",
-                        "Modern Physics"
-                    ])
-                ]
-            },
-            "Grade 9": {
-                "Mathematics": [
-                    ("Pre-Calculus", [
-                        "Functions",
-                        "Trigonometry",
-                        "Logarithms",
-                        "Sequences and Series"
-                    ]),
-                    ("Advanced Geometry", [
-                        "Circle Theorems",
-                        "3D Geometry",
-                        "Transformations",
-                        "Vectors"
-                    ]),
-                    ("Applications", [
-                        "Mathematical Modeling",
-                        "Financial Mathematics",
-                        "Statistics Projects",
-                        "Problem Solving"
-                    ])
-                ],
-                "Integrated Science": [
-                    ("Scientific Method", [
-                        "Research Skills",
-                        "Data Analysis",
-                        "Scientific Writing",
-                        "Experimental Design"
-                    ]),
-                    ("Applied Sciences", [
-                        "Environmental Science",
-                        "Material Science",
-                        "Energy Systems",
-                        "Technology Applications"
-                    ])
-                ]
-            }
-        }
+        cbc_curriculum = CBC_CURRICULUM
 
         # Additional subjects for all grades
-        common_subjects = {
-            "Religious Education": [
-                ("Christian Religious Education", [
-                    "Old Testament",
-                    "New Testament",
-                    "Christian Living",
-                    "Moral Values"
-                ]),
-                ("Islamic Religious Education", [
-                    "Quran Studies",
-                    "Hadith",
-                    "Islamic History",
-                    "Islamic Ethics"
-                ])
-            ],
-            "Creative Arts": [
-                ("Visual Arts", [
-                    "Drawing and Painting",
-                    "Sculpture",
-                    "Crafts",
-                    "Design"
-                ]),
-                ("Performing Arts", [
-                    "Music",
-                    "Dance",
-                    "Drama",
-                    "Storytelling"
-                ])
-            ]
-        }
+        common_subjects = COMMON_SUBJECTS
 
         # Seed the curriculum
         for grade_name, subjects in cbc_curriculum.items():
@@ -829,92 +1082,7 @@ def seed_school_levels():
                     db.commit()
 
         # Seed Secondary School subjects (Forms 1-4)
-        secondary_subjects = {
-            "English": [
-                ("Literature", [
-                    "Poetry",
-                    "Drama",
-                    "Novels",
-                    "Short Stories"
-                ]),
-                ("Language Skills", [
-                    "Grammar",
-                    "Composition",
-                    "Comprehension",
-                    "Summary Writing"
-                ])
-            ],
-            "Kiswahili": [
-                ("Fasihi", [
-                    "Mashairi",
-                    "Hadithi Fupi",
-                    "Riwaya",
-                    "Tamthiliya"
-                ]),
-                ("Lugha", [
-                    "Sarufi",
-                    "Uandishi",
-                    "Ufahamu",
-                    "Muhtasari"
-                ])
-            ],
-            "Mathematics": [
-                ("Algebra", [
-                    "Linear Equations",
-                    "Quadratic Equations",
-                    "Simultaneous Equations",
-                    "Inequalities"
-                ]),
-                ("Geometry", [
-                    "Coordinate Geometry",
-                    "Transformations",
-                    "Circle Theorems",
-                    "Mensuration"
-                ])
-            ],
-            "Biology": [
-                ("Cell Biology", [
-                    "Cell Structure",
-                    "Cell Division",
-                    "Osmosis and Diffusion",
-                    "Enzymes"
-                ]),
-                ("Human Biology", [
-                    "Nutrition",
-                    "Respiration",
-                    "Circulation",
-                    "Excretion"
-                ])
-            ],
-            "Chemistry": [
-                ("Atomic Structure", [
-                    "Atomic Theory",
-                    "Periodic Table",
-                    "Chemical Bonding",
-                    "Radioactivity"
-                ]),
-                ("Chemical Reactions", [
-                    "Acids and Bases",
-                    "Salts",
-                    "Organic Chemistry",
-                    "Rates of Reaction"
-                ])
-            ],
-            "Physics": [
-                ("Mechanics", [
-                    "Motion",
-                    "Forces",
-                    "Energy",
-                    "Pressure"
-                ]),
-                ("Waves and Optics", [
-                    "Sound",
-                    "Light",
-                    "Electromagnetic Waves",
-                    "Reflection and Refraction"
-                ])
-            ]
-        }
+        secondary_subjects = SECONDARY_SUBJECTS
 
         # Seed secondary subjects for Forms 1-4
         for i in range(1, 5):
@@ -1013,36 +1181,7 @@ def seed_additional_content():
                 # Add more detailed Science & Technology content
                 science_subject = db.query(Subject).filter(Subject.name == "Science and Technology", Subject.term_id == term1.id).first()
                 if science_subject:
-                    detailed_science_topics = [
-                        ("Plants Around Us", [
-                            "Parts of a Plant",
-                            "Types of Plants",
-                            "How Plants Grow",
-                            "Uses of Plants",
-                            "Caring for Plants"
-                        ]),
-                        ("Animals Around Us", [
-                            "Domestic Animals",
-                            "Wild Animals",
-                            "Animal Homes",
-                            "Animal Sounds",
-                            "Animal Products"
-                        ]),
-                        ("Our Environment", [
-                            "Living and Non-living Things",
-                            "Water Sources",
-                            "Soil Types",
-                            "Weather Changes",
-                            "Environmental Care"
-                        ]),
-                        ("Simple Machines", [
-                            "Lever",
-                            "Pulley",
-                            "Wheel and Axle",
-                            "Inclined Plane",
-                            "Screw"
-                        ])
-                    ]
+                    detailed_science_topics = GRADE4_SCIENCE_TOPICS
                     
                     for topic_idx, (topic_title, subtopics) in enumerate(detailed_science_topics, 1):
                         topic = db.query(Topic).filter(Topic.title == topic_title, Topic.subject_id == science_subject.id).first()
@@ -1076,38 +1215,7 @@ def seed_additional_content():
             if term1:
                 math_subject = db.query(Subject).filter(Subject.name == "Mathematics", Subject.term_id == term1.id).first()
                 if math_subject:
-                    detailed_math_topics = [
-                        ("Directed Numbers", [
-                            "Positive and Negative Numbers",
-                            "Number Line",
-                            "Adding Integers",
-                            "Subtracting Integers",
-                            "Multiplying Integers",
-                            "Dividing Integers"
-                        ]),
-                        ("Fractions", [
-                            "Types of Fractions",
-                            "Equivalent Fractions",
-                            "Adding Fractions",
-                            "Subtracting Fractions",
-                            "Multiplying Fractions",
-                            "Dividing Fractions"
-                        ]),
-                        ("Decimals", [
-                            "Place Value in Decimals",
-                            "Comparing Decimals",
-                            "Rounding Decimals",
-                            "Operations with Decimals",
-                            "Converting Fractions to Decimals"
-                        ]),
-                        ("Ratio and Proportion", [
-                            "Understanding Ratios",
-                            "Equivalent Ratios",
-                            "Proportion",
-                            "Direct Proportion",
-                            "Inverse Proportion"
-                        ])
-                    ]
+                    detailed_math_topics = GRADE7_MATH_TOPICS
                     
                     for topic_idx, (topic_title, subtopics) in enumerate(detailed_math_topics, 1):
                         topic = db.query(Topic).filter(Topic.title == topic_title, Topic.subject_id == math_subject.id).first()
@@ -1135,100 +1243,7 @@ def seed_additional_content():
                                 print(f"Added detailed subtopic '{subtopic_title}' for Grade 7 Mathematics")
         
         # ADDITIONAL SUBJECTS FOR JUNIOR SECONDARY (Grades 7-9)
-        junior_secondary_subjects = {
-            "Life Skills": [
-                ("Personal Development", [
-                    "Self-Awareness",
-                    "Self-Esteem",
-                    "Goal Setting",
-                    "Decision Making",
-                    "Stress Management"
-                ]),
-                ("Social Skills", [
-                    "Communication",
-                    "Teamwork",
-                    "Leadership",
-                    "Conflict Resolution",
-                    "Peer Relationships"
-                ]),
-                ("Health Education", [
-                    "Personal Hygiene",
-                    "Nutrition",
-                    "Disease Prevention",
-                    "Mental Health",
-                    "Substance Abuse"
-                ])
-            ],
-            "Business Studies": [
-                ("Introduction to Business", [
-                    "What is Business",
-                    "Types of Business",
-                    "Business Environment",
-                    "Business Opportunities",
-                    "Entrepreneurship"
-                ]),
-                ("Money and Banking", [
-                    "Functions of Money",
-                    "Banking Services",
-                    "Saving and Investment",
-                    "Insurance",
-                    "Financial Planning"
-                ]),
-                ("Trade and Commerce", [
-                    "Local Trade",
-                    "International Trade",
-                    "Transport and Communication",
-                    "Marketing",
-                    "Consumer Rights"
-                ])
-            ],
-            "Agriculture": [
-                ("Crop Production", [
-                    "Land Preparation",
-                    "Planting",
-                    "Crop Care",
-                    "Harvesting",
-                    "Post-Harvest Handling"
-                ]),
-                ("Livestock Production", [
-                    "Cattle Keeping",
-                    "Poultry Keeping",
-                    "Goat Keeping",
-                    "Pig Keeping",
-                    "Animal Health"
-                ]),
-                ("Soil Management", [
-                    "Types of Soil",
-                    "Soil Fertility",
-                    "Soil Conservation",
-                    "Composting",
-                    "Organic Farming"
-                ])
-            ],
-            "Home Science": [
-                ("Food and Nutrition", [
-                    "Food Groups",
-                    "Balanced Diet",
-                    "Food Preparation",
-                    "Food Storage",
-                    "Kitchen Safety"
-                ]),
-                ("Clothing and Textiles", [
-                    "Fabric Types",
-                    "Clothing Care",
-                    "Basic Sewing",
-                    "Clothing Design",
-                    "Fashion Trends"
-                ]),
-                ("Home Management", [
-                    "Home Planning",
-                    "Budgeting",
-                    "Home Decoration",
-                    "Family Relationships",
-                    "Child Care"
-                ])
-            ]
-        }
+        junior_secondary_subjects = JUNIOR_SECONDARY_SUBJECTS
         
         # Seed additional subjects for Grades 7-9
         for grade_num in range(7, 10):
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Fast seeding for development and benchmarking.
+
+canonical  Bulk-loads the CBC Grade 1-9 / Form 1-4 dataset from seed_data.py through the
+           curriculum import engine: one transaction, a handful of batched statements per
+           level, safe to re-run (rows are matched and updated instead of duplicated).
+synthetic  Generates a curriculum of configurable size - schools, levels, forms, terms,
+           subjects, topics, subtopics, users, schemes and timetables with slots - from a
+           seed. The same seed and sizes always produce the same rows, so benchmark runs
+           are comparable. Rows get explicit ids and go in with batched Core inserts.
+
+    python seed_fast.py canonical
+    python seed_fast.py synthetic --seed 7 --schools 2 --subjects 12 --db /tmp/bench.db --reset
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+import models
+from database import DATABASE_URL
+from seed_data import (
+    CBC_CURRICULUM, COMMON_SUBJECTS, SECONDARY_SUBJECTS, GRADE4_SCIENCE_TOPICS,
+    GRADE7_MATH_TOPICS, JUNIOR_SECONDARY_SUBJECTS,
+)
+from services import curriculum_import
+
+INSERT_BATCH_SIZE = 1000
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+PERIOD_TIMES = [
+    "08:00-08:40", "08:40-09:20", "09:30-10:10", "10:10-10:50",
+    "11:10-11:50", "11:50-12:30", "14:00-14:40", "14:40-15:20",
+]
+
+
+def make_engine(db_path: Optional[str] = None, fast_writes: bool = False):
+    """Engine for a SQLite file; fast_writes turns off fsync for throwaway benchmark databases"""
+    engine = create_engine(
+        f"sqlite:///{db_path}" if db_path else DATABASE_URL,
+        connect_args={"check_same_thread": False},
+    )
+    if fast_writes:
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.close()
+    return engine
+
+
+# ============= CANONICAL DATASET =============
+
+def _merge_subjects(term: Dict[str, Any], subjects: Dict[str, List], topic_order_offset: int = 0):
+    """Merge {subject: [(topic, [subtopics])]} into a term node the way seed_data.py does:
+    subjects by name, topics by title, new subtopics appended"""
+    by_name = term.setdefault("_subjects", {})
+    for subject_name, topics in subjects.items():
+        subject = by_name.get(subject_name)
+        if subject is None:
+            subject = {"name": subject_name, "code": _unique_code(term, subject_name), "display_order": 1, "topics": []}
+            by_name[subject_name] = subject
+            term["subjects"].append(subject)
+        _merge_topics(subject, topics, topic_order_offset)
+
+
+def _merge_topics(subject: Dict[str, Any], topics: List, topic_order_offset: int = 0):
+    existing = {topic["title"].lower(): topic for topic in subject["topics"]}
+    for topic_idx, (topic_title, subtopics) in enumerate(topics, 1):
+        topic = existing.get(topic_title.lower())
+        if topic is None:
+            topic = {"title": topic_title, "display_order": topic_idx + topic_order_offset, "subtopics": []}
+            existing[topic_title.lower()] = topic
+            subject["topics"].append(topic)
+        seen = {subtopic["title"].lower() for subtopic in topic["subtopics"]}
+        for subtopic_idx, subtopic_title in enumerate(subtopics, 1):
+            if subtopic_title.lower() not in seen:
+                seen.add(subtopic_title.lower())
+                topic["subtopics"].append({"title": subtopic_title, "display_order": subtopic_idx})
+
+
+def _unique_code(term: Dict[str, Any], subject_name: str) -> str:
+    """name[:3] like seed_data.py, suffixed when two subjects in a term share it
+    (subjects are matched by code on import)"""
+    used = term.setdefault("_codes", set())
+    base = subject_name[:3].upper()
+    code, n = base, 2
+    while code in used:
+        code, n = f"{base}{n}", n + 1
+    used.add(code)
+    return code
+
+
+def canonical_document() -> Dict[str, Any]:
+    """The seed_data.py curriculum as a nested curriculum_import document"""
+    grades = []
+    for i in range(1, 10):
+        terms = [{"name": f"Term {n}", "code": f"T{n}", "display_order": n, "subjects": []} for n in range(1, 4)]
+        grades.append({"name": f"Grade {i}", "code": f"G{i}", "display_order": i, "terms": terms})
+    forms = []
+    for i in range(1, 5):
+        terms = [{"name": "Term 1", "code": "T1", "display_order": 1, "subjects": []}]
+        forms.append({"name": f"Form {i}", "code": f"F{i}", "display_order": i, "terms": terms})
+
+    # Detailed content is seeded for Term 1 only
+    grade_term1 = {grade["name"]: grade["terms"][0] for grade in grades}
+    for grade_name, subjects in CBC_CURRICULUM.items():
+        if grade_name in grade_term1:
+            _merge_subjects(grade_term1[grade_name], subjects)
+            _merge_subjects(grade_term1[grade_name], COMMON_SUBJECTS)
+    for form in forms:
+        _merge_subjects(form["terms"][0], SECONDARY_SUBJECTS)
+
+    extras = [("Grade 4", "Science and Technology", GRADE4_SCIENCE_TOPICS), ("Grade 7", "Mathematics", GRADE7_MATH_TOPICS)]
+    for grade_name, subject_name, topics in extras:
+        subject = grade_term1[grade_name].get("_subjects", {}).get(subject_name)
+        if subject is not None:
+            _merge_topics(subject, topics, topic_order_offset=10)
+    for grade_num in range(7, 10):
+        _merge_subjects(grade_term1[f"Grade {grade_num}"], JUNIOR_SECONDARY_SUBJECTS)
+
+    for node in grades + forms:
+        for term in node["terms"]:
+            term.pop("_subjects", None)
+            term.pop("_codes", None)
+
+    return {"school_levels": [
+        {"name": "Primary School", "code": "PS", "description": "Primary/Junior School Grades 1-9",
+         "display_order": 1, "grade_type": "grade", "forms_grades": grades},
+        {"name": "Secondary School", "code": "SS", "description": "Secondary School Forms 1-4",
+         "display_order": 2, "grade_type": "form", "forms_grades": forms},
+    ]}
+
+
+def seed_canonical(engine) -> curriculum_import.ImportResult:
+    """Bulk-load the canonical dataset under the DEFAULT school"""
+    db = Session(bind=engine)
+    try:
+        school = db.query(models.School).filter(models.School.code == "DEFAULT").first()
+        if not school:
+            school = models.School(name="Default School", code="DEFAULT", is_active=True)
+            db.add(school)
+            db.commit()
+            db.refresh(school)
+            print(f"Created default school with ID: {school.id}")
+
+        result = curriculum_import.ImportResult()
+        roots = curriculum_import.parse_document(canonical_document(), school.id, result)
+        return curriculum_import.import_structure(db, roots, result, upsert=True)
+    finally:
+        db.close()
+
+
+# ============= SYNTHETIC DATASET =============
+
+WORDS = [
+    "Cell", "Energy", "Motion", "Number", "Pattern", "Water", "Soil", "Plant", "Animal", "Health",
+    "Community", "Map", "Weather", "Fraction", "Algebra", "Geometry", "Reading", "Grammar", "Poetry",
+    "Trade", "History", "Culture", "Electricity", "Magnet", "Sound", "Light", "Matter", "Force",
+    "Ecosystem", "Nutrition", "Transport", "Data", "Probability", "Measurement", "Heritage",
+]
+SUBJECT_NAMES = [
+    "Mathematics", "English", "Kiswahili", "Biology", "Chemistry", "Physics", "Geography", "History",
+    "Agriculture", "Business Studies", "Computer Studies", "Creative Arts", "Religious Education",
+    "Home Science", "Music", "Physical Education", "Social Studies", "Science and Technology",
+]
+
+
+class _IdAllocator:
+    """Hands out explicit integer ids after the current max of each table so children can
+    reference parents without a round trip"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.next_ids: Dict[Any, int] = {}
+
+    def take(self, table) -> int:
+        if table not in self.next_ids:
+            self.next_ids[table] = (self.conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+        value = self.next_ids[table]
+        self.next_ids[table] = value + 1
+        return value
+
+
+def _insert(conn, table, rows: List[Dict[str, Any]]):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(table.insert(), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def _title(rng: random.Random, index: int, words: int = 2) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + f" {index}"
+
+
+def generate_synthetic(engine, seed: int = 1, schools: int = 1, levels: int = 2, forms: int = 4,
+                       terms: int = 3, subjects: int = 10, topics: int = 8, subtopics: int = 6,
+                       users: int = 20, schemes_per_user: int = 2, slots_per_timetable: int = 40) -> Dict[str, int]:
+    """Insert a deterministic synthetic dataset; returns the row count per table.
+    Codes and emails embed the seed, so load each seed into a fresh database."""
+    rng = random.Random(seed)
+    uuid_rng = random.Random(seed ^ 0x5EED)
+    now = datetime(2025, 1, 1) + timedelta(days=seed % 365)
+    models.Base.metadata.create_all(bind=engine)
+    t = {name: models.Base.metadata.tables[name] for name in (
+        "schools", "school_levels", "forms_grades", "terms", "subjects", "topics", "subtopics",
+        "users", "schemes_of_work", "timetables", "timetable_slots",
+    )}
+    rows: Dict[str, List[Dict[str, Any]]] = {name: [] for name in t}
+    # (school, level, form, term, subject) chains plus their topics/subtopics for schemes and slots
+    subject_chains = []
+
+    with engine.begin() as conn:
+        ids = _IdAllocator(conn)
+        for s in range(1, schools + 1):
+            school_id = ids.take(t["schools"])
+            school_name = f"Synthetic School {seed}-{s}"
+            rows["schools"].append({"id": school_id, "name": school_name, "code": f"SYN{seed}-{s}",
+                                    "is_active": True, "created_at": now, "updated_at": now})
+            for l in range(1, levels + 1):
+                level_id = ids.take(t["school_levels"])
+                grade_type = "form" if l % 2 == 0 else "grade"
+                rows["school_levels"].append({
+                    "id": level_id, "name": f"Level {l}", "code": f"L{l}", "display_order": l,
+                    "school_id": school_id, "grade_type": grade_type, "is_active": True,
+                    "created_at": now, "updated_at": now,
+                })
+                for f in range(1, forms + 1):
+                    form_id = ids.take(t["forms_grades"])
+                    label = "Form" if grade_type == "form" else "Grade"
+                    rows["forms_grades"].append({
+                        "id": form_id, "name": f"{label} {f}", "code": f"{label[0]}{f}", "display_order": f,
+                        "school_level_id": level_id, "is_active": True, "created_at": now, "updated_at": now,
+                    })
+                    for n in range(1, terms + 1):
+                        term_id = ids.take(t["terms"])
+                        rows["terms"].append({
+                            "id": term_id, "name": f"Term {n}", "code": f"T{n}", "display_order": n,
+                            "form_grade_id": form_id, "is_active": True, "created_at": now, "updated_at": now,
+                        })
+                        for j in range(1, subjects + 1):
+                            subject_id = ids.take(t["subjects"])
+                            subject_name = SUBJECT_NAMES[(j - 1) % len(SUBJECT_NAMES)]
+                            if j > len(SUBJECT_NAMES):
+                                subject_name = f"{subject_name} {j // len(SUBJECT_NAMES) + 1}"
+                            rows["subjects"].append({
+                                "id": subject_id, "name": subject_name, "code": f"S{j}", "display_order": j,
+                                "term_id": term_id, "is_active": True, "created_at": now, "updated_at": now,
+                            })
+                            topic_subtopics = []
+                            for p in range(1, topics + 1):
+                                topic_id = ids.take(t["topics"])
+                                rows["topics"].append({
+                                    "id": topic_id, "title": _title(rng, p), "display_order": p,
+                                    "duration_weeks": rng.randint(1, 3), "subject_id": subject_id,
+                                    "is_active": True, "created_at": now, "updated_at": now,
+                                })
+                                subtopic_ids = []
+                                for q in range(1, subtopics + 1):
+                                    subtopic_id = ids.take(t["subtopics"])
+                                    subtopic_ids.append(subtopic_id)
+                                    rows["subtopics"].append({
+                                        "id": subtopic_id, "title": _title(rng, q, words=3), "display_order": q,
+                                        "duration_lessons": rng.randint(1, 4), "topic_id": topic_id,
+                                        "is_active": True, "created_at": now, "updated_at": now,
+                                    })
+                                topic_subtopics.append((topic_id, subtopic_ids))
+                            subject_chains.append((school_name, level_id, form_id, term_id, subject_id,
+                                                   subject_name, topic_subtopics))
+
+        periods = [(day, period) for day in DAYS for period in range(1, len(PERIOD_TIMES) + 1)]
+        for u in range(1, users + 1):
+            user_id = ids.take(t["users"])
+            rows["users"].append({
+                "id": user_id, "google_id": f"synthetic-{seed}-{u}", "email": f"user{u}.seed{seed}@example.com",
+                "name": f"Synthetic Teacher {u}", "is_active": True, "created_at": now,
+            })
+            for _ in range(schemes_per_user if subject_chains else 0):
+                school_name, level_id, form_id, term_id, subject_id, subject_name, topic_subtopics = rng.choice(subject_chains)
+                scheme_id = ids.take(t["schemes_of_work"])
+                rows["schemes_of_work"].append({
+                    "id": scheme_id, "school_name": school_name, "subject_name": subject_name,
+                    "status": rng.choice(["draft", "in-progress", "completed"]), "progress": rng.randint(0, 100),
+                    "user_id": user_id, "school_level_id": level_id, "form_grade_id": form_id,
+                    "term_id": term_id, "subject_id": subject_id, "created_at": now, "updated_at": now,
+                })
+
+                timetable_id = str(uuid.UUID(int=uuid_rng.getrandbits(128)))
+                chosen = rng.sample(periods, min(slots_per_timetable, len(periods)))
+                chosen.sort(key=lambda slot: (DAYS.index(slot[0]), slot[1]))
+                lessons = [(topic_id, subtopic_id) for topic_id, subtopic_ids in topic_subtopics for subtopic_id in subtopic_ids]
+                for index, (day, period) in enumerate(chosen):
+                    topic_id, subtopic_id = lessons[index % len(lessons)] if lessons else (None, None)
+                    rows["timetable_slots"].append({
+                        "id": str(uuid.UUID(int=uuid_rng.getrandbits(128))), "timetable_id": timetable_id,
+                        "day_of_week": day, "time_slot": PERIOD_TIMES[period - 1], "period_number": period,
+                        "topic_id": topic_id, "subtopic_id": subtopic_id, "lesson_title": f"Lesson {index + 1}",
+                        "is_double_lesson": False, "is_evening": False, "created_at": now,
+                    })
+                rows["timetables"].append({
+                    "id": timetable_id, "user_id": user_id, "scheme_id": scheme_id,
+                    "name": f"{subject_name} Timetable", "status": "draft",
+                    "selected_topics": [topic_id for topic_id, _ in topic_subtopics],
+                    "selected_subtopics": [sid for _, subtopic_ids in topic_subtopics for sid in subtopic_ids],
+                    "total_lessons": len(chosen), "total_weeks": 12, "is_active": True,
+                    "created_at": now, "updated_at": now,
+                })
+
+        # Parents before children
+        for name in t:
+            _insert(conn, t[name], rows[name])
+
+    return {name: len(table_rows) for name, table_rows in rows.items()}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Fast curriculum seeding")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    canonical = commands.add_parser("canonical", help="Bulk-load the CBC dataset from seed_data.py")
+    canonical.add_argument("--db", help="SQLite file (default: the app database)")
+
+    synthetic = commands.add_parser("synthetic", help="Generate a deterministic synthetic dataset")
+    synthetic.add_argument("--db", required=True, help="SQLite file to write")
+    synthetic.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    synthetic.add_argument("--seed", type=int, default=1)
+    for name, default in [("schools", 1), ("levels", 2), ("forms", 4), ("terms", 3), ("subjects", 10),
+                          ("topics", 8), ("subtopics", 6), ("users", 20), ("schemes-per-user", 2),
+                          ("slots-per-timetable", 40)]:
+        synthetic.add_argument(f"--{name}", type=int, default=default)
+
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    if args.command == "canonical":
+        engine = make_engine(args.db)
+        models.Base.metadata.create_all(bind=engine)
+        result = seed_canonical(engine)
+        if result.errors:
+            print(f"❌ Canonical seed failed with {len(result.errors)} errors:")
+            for error in result.errors[:20]:
+                print(f"   {error}")
+            sys.exit(1)
+        counts = result.to_dict()
+        print(f"✅ Canonical curriculum loaded: {counts['total_created']} created, {counts['total_updated']} updated")
+    else:
+        engine = make_engine(args.db, fast_writes=True)
+        if args.reset:
+            models.Base.metadata.drop_all(bind=engine)
+        counts = generate_synthetic(
+            engine, seed=args.seed, schools=args.schools, levels=args.levels, forms=args.forms,
+            terms=args.terms, subjects=args.subjects, topics=args.topics, subtopics=args.subtopics,
+            users=args.users, schemes_per_user=args.schemes_per_user,
+            slots_per_timetable=args.slots_per_timetable,
+        )
+        print(f"✅ Synthetic dataset (seed {args.seed}) written to {args.db}")
+        for name, count in counts.items():
+            print(f"   {name}: {count}")
+    print(f"⏱️  {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,69 @@
 import os
 import json
-from typing import Dict, List, Any
+import time
+from typing import Dict, List, Any, Optional, Tuple
 from groq import Groq
 import logging
+from datetime import datetime
 from database import get_db
 from sqlalchemy.orm import Session
 import models
+from services import fallback_templates, kenya_curriculum, model_router, prompt_budget, topic_graph
 
 logger = logging.getLogger(__name__)
 
+# Retries after the first attempt for 429/5xx/connection failures
+LLM_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+
+# Lesson plans: output tokens per lesson and per request
+LESSON_PLAN_TOKENS = 450
+LESSON_PLAN_OVERHEAD_TOKENS = 100
+LESSON_PLAN_SYSTEM_PROMPT = (
+    "You are an experienced Kenyan teacher writing lesson plans that follow the KICD curriculum. "
+    "Each plan has measurable objectives, an introduction, development steps, a conclusion, "
+    "resources and assessment. Respond with JSON only."
+)
+
+class TimetableIndex:
+    """Slots and subtopics of a timetable grouped in one pass, shared by the context helpers"""
+    
+    def __init__(self, timetable_data: Dict[str, Any]):
+        self.topics = timetable_data.get("selected_topics") or []
+        self.slots = timetable_data.get("slots") or []
+        self.by_topic: Dict[Any, List[Dict]] = {}
+        # (topic name, subtopic name) → lessons
+        self.lesson_counts: Dict[tuple, int] = {}
+        for slot in self.slots:
+            topic_name = slot.get("topic_name")
+            self.by_topic.setdefault(topic_name, []).append(slot)
+            key = (topic_name, slot.get("subtopic_name"))
+            self.lesson_counts[key] = self.lesson_counts.get(key, 0) + 1
+        
+        self.subtopics_by_topic: Dict[Any, List[Dict]] = {}
+        for subtopic in timetable_data.get("selected_subtopics") or []:
+            self.subtopics_by_topic.setdefault(subtopic.get("topic_id"), []).append(subtopic)
+
 class GroqAIService:
-    def __init__(self):
+    def __init__(self, fallback_template: Optional[fallback_templates.SubjectTemplate] = None,
+                 dependency_graph: Optional[topic_graph.TopicGraph] = None):
+        # Compiled curriculum of the requested subject, used when the LLM cannot answer
+        self.fallback_template = fallback_template
+        # Dependency graph of the subject's topics; without one, topics are related by keywords only
+        self.topic_graph = dependency_graph or topic_graph.TopicGraph([])
         # Get API key from environment or use placeholder
         self.api_key = os.getenv("GROQ_API_KEY", "gsk_your_groq_api_key_here")
+        # Each generation picks its model through the router; this is the preferred one
+        self.router = model_router.router
+        self.model = self.router.routes[0].model
+        # GROQ_BASE_URL points the client at a compatible server such as fake_groq_server.py,
+        # which accepts any key
+        self.base_url = os.getenv("GROQ_BASE_URL") or None
         # Only initialize client if we have a real API key
-        if self.api_key and self.api_key != "gsk_your_groq_api_key_here":
+        if self.base_url or (self.api_key and self.api_key != "gsk_your_groq_api_key_here"):
             try:
-                self.client = Groq(api_key=self.api_key)
-                self.model = "llama3-8b-8192"
+                # Retries happen in _complete so each attempt is visible in telemetry
+                self.client = Groq(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+                self._clients = {None: self.client}
                 self.api_available = True
             except Exception as e:
                 logger.warning(f"Groq client initialization failed: {e}")
@@ -27,7 +73,26 @@ class GroqAIService:
             self.api_available = False
     
     def generate_scheme_of_work(self, context: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate scheme of work using Groq with proper Biology Form 2 Term 1 context"""
+        """Generate scheme of work using Groq with proper Biology Form 2 Term 1 context.
+        Usage telemetry (tokens, latency, retries, parse outcome) is returned under
+        metadata.telemetry and kept on self.last_telemetry."""
+        started = time.perf_counter()
+        telemetry = {
+            "model": self.model if self.api_available else None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "ttft_ms": None,
+            "latency_ms": None,
+            "attempts": 0,
+            "retry_statuses": [],
+            "parse_success": False,
+            "fallback_reason": None,
+            "prompt_budget": None,
+            "routing": None,
+        }
+        self.last_telemetry = telemetry
+        enhanced_context = context
         try:
             # Ensure we have the right context for Biology Form 2 Term 1
             enhanced_context = self._enhance_biology_context(context)
@@ -38,35 +103,167 @@ class GroqAIService:
             if self.api_available:
                 logger.info("Using Groq API for scheme generation")
                 enhanced_context_with_timetable = self._enhance_context_with_timetable(enhanced_context)
-                prompt = self._build_enhanced_prompt(enhanced_context_with_timetable, config)
+                system_prompt = self._get_subject_system_prompt(enhanced_context_with_timetable)
+                system_tokens = prompt_budget.estimate_tokens(system_prompt)
+                lessons = enhanced_context_with_timetable.get("total_teaching_periods") or enhanced_context.get("total_teaching_periods") or 48
+                plan = self.router.plan(model_router.estimate_output_tokens(lessons))
+                # The prompt must fit whichever route ends up answering
+                budget_model = min(
+                    [route.model for route in (plan.primary, plan.hedge) if route is not None],
+                    key=prompt_budget.context_tokens
+                )
+                prompt = self._build_enhanced_prompt(
+                    enhanced_context_with_timetable,
+                    config,
+                    token_budget=prompt_budget.prompt_budget(budget_model, system_tokens)
+                )
+                report = self.last_prompt_report
+                prompt_tokens = system_tokens + report["tokens"]
+                max_tokens = prompt_budget.completion_budget(plan.primary.model, prompt_tokens)
+                logger.info(
+                    f"Prompt tokens: system={system_tokens} user={report['tokens']}/{report['budget']} "
+                    f"max_tokens={max_tokens} compacted={report['compacted']} dropped={report['dropped']}; "
+                    f"route={plan.primary.key} hedge={plan.hedge.key if plan.hedge else None} "
+                    f"predicted={plan.predicted_seconds:.1f}s"
+                )
+                telemetry["prompt_budget"] = {**report, "system_tokens": system_tokens, "max_tokens": max_tokens}
+                telemetry["routing"] = {
+                    "primary": plan.primary.key,
+                    "hedge": plan.hedge.key if plan.hedge else None,
+                    "output_tokens": plan.output_tokens,
+                    "predicted_seconds": round(plan.predicted_seconds, 2),
+                }
                 
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
+                content = self._complete(
+                    [
                         {
                             "role": "system",
-                            "content": self._get_subject_system_prompt(enhanced_context_with_timetable)
+                            "content": system_prompt
                         },
                         {
                             "role": "user",
                             "content": prompt
                         }
                     ],
-                    temperature=0.7,
-                    max_tokens=4000
+                    prompt_tokens,
+                    plan,
+                    telemetry
                 )
-                content = response.choices[0].message.content
-                result = self._parse_scheme_response(content, enhanced_context_with_timetable)
+                result = self._parse_scheme_response(content, enhanced_context_with_timetable, telemetry)
                 logger.info("Successfully generated scheme using Groq API")
-                return result
             else:
                 logger.info("Groq API not available, using enhanced fallback")
-                return self._create_fallback_scheme(enhanced_context)
+                telemetry["fallback_reason"] = "api_unavailable"
+                result = self._create_fallback_scheme(enhanced_context)
                 
         except Exception as e:
             logger.error(f"AI generation error: {str(e)}")
             logger.info("Falling back to Biology-specific template")
-            return self._create_fallback_scheme(enhanced_context)
+            telemetry["fallback_reason"] = f"llm_error: {type(e).__name__}"
+            result = self._create_fallback_scheme(enhanced_context)
+        
+        telemetry["latency_ms"] = int((time.perf_counter() - started) * 1000)
+        result.setdefault("metadata", {})["telemetry"] = telemetry
+        return result
+    
+    def generate_lesson_plans(self, context: Dict[str, Any], lessons: List[Dict[str, Any]],
+                              config: Optional[Dict[str, Any]] = None) -> Tuple[Optional[List[Dict[str, Any]]], Dict[str, Any]]:
+        """Lesson plans for consecutive lessons of one subtopic in a single completion.
+        Returns (plans, telemetry); plans is None when the LLM is unavailable or its answer has
+        no usable plan for every lesson. Keeps no state on self, so threads can share the service."""
+        started = time.perf_counter()
+        telemetry = {"model": None, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "ttft_ms": None,
+                     "latency_ms": None, "attempts": 0, "retry_statuses": [], "parse_success": False,
+                     "fallback_reason": None}
+        plans = None
+        if not self.api_available:
+            telemetry["fallback_reason"] = "api_unavailable"
+        else:
+            try:
+                prompt = self._build_lesson_plan_prompt(context, lessons, config or {})
+                prompt_tokens = prompt_budget.estimate_tokens(LESSON_PLAN_SYSTEM_PROMPT) + prompt_budget.estimate_tokens(prompt)
+                plan = self.router.plan(LESSON_PLAN_TOKENS * len(lessons) + LESSON_PLAN_OVERHEAD_TOKENS)
+                content = self._complete(
+                    [{"role": "system", "content": LESSON_PLAN_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+                    prompt_tokens, plan, telemetry
+                )
+                start_idx, end_idx = content.find('{'), content.rfind('}') + 1
+                parsed = json.loads(content[start_idx:end_idx]) if start_idx != -1 and end_idx else {}
+                candidates = [item for item in parsed.get("lessons") or [] if isinstance(item, dict) and item.get("objectives")]
+                if len(candidates) >= len(lessons):
+                    plans = candidates[:len(lessons)]
+                    telemetry["parse_success"] = True
+                else:
+                    telemetry["fallback_reason"] = f"parse_error: {len(candidates)} of {len(lessons)} lessons"
+            except Exception as e:
+                logger.error(f"Lesson plan generation error: {str(e)}")
+                telemetry["fallback_reason"] = f"llm_error: {type(e).__name__}"
+        telemetry["latency_ms"] = int((time.perf_counter() - started) * 1000)
+        return plans, telemetry
+
+    def _build_lesson_plan_prompt(self, context: Dict[str, Any], lessons: List[Dict[str, Any]], config: Dict[str, Any]) -> str:
+        entries = "\n".join(
+            f"- Lesson {number}: {lesson.get('topic_subtopic', '')}. Objectives: "
+            f"{'; '.join(lesson.get('specific_objectives') or [])}. Activities: "
+            f"{'; '.join(lesson.get('teaching_learning_activities') or [])}"
+            for number, lesson in enumerate(lessons, start=1)
+        )
+        return f"""Write detailed {context.get('lesson_minutes', 40)}-minute lesson plans for {context.get('subject_name', '')} {context.get('form_grade', '')} ({config.get('curriculum_standard', 'KICD')} curriculum, {config.get('style', 'detailed')} style, {config.get('language_complexity', 'intermediate')} language).
+Topic: {context.get('topic_title', '')}
+Subtopic: {context.get('subtopic_title', '')}
+The scheme of work plans these {len(lessons)} consecutive lessons:
+{entries}
+
+Return only JSON: {{"lessons": [{{"lesson_number": 1, "objectives": ["..."], "introduction": "...", "development": ["step", "..."], "conclusion": "...", "resources": ["..."], "assessment": ["..."]}}]}} with exactly {len(lessons)} lessons in order."""
+
+    def _complete(self, messages: List[Dict[str, str]], prompt_tokens: int, plan: model_router.RoutePlan,
+                  telemetry: Dict[str, Any]) -> str:
+        """One routed (and possibly hedged) completion, retried on rate limits, 5xx and connection errors"""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            telemetry["attempts"] = attempt + 1
+            try:
+                result = self.router.complete(plan, self._client_for, messages, prompt_tokens)
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                retryable = status in (408, 409, 429) or (status or 0) >= 500 or (
+                    status is None and type(e).__name__ in ("APIConnectionError", "APITimeoutError")
+                )
+                if not retryable or attempt == LLM_MAX_RETRIES:
+                    raise
+                telemetry["retry_statuses"].append(status or type(e).__name__)
+                time.sleep(self._retry_delay(e, attempt))
+                continue
+            
+            telemetry["model"] = result.route.model
+            telemetry["ttft_ms"] = int(result.ttft * 1000)
+            telemetry["routing"] = {
+                **(telemetry.get("routing") or {}),
+                "winner": result.route.key,
+                "hedge_launched": result.hedge_launched,
+                "hedge_won": result.hedge_won,
+            }
+            usage = result.usage
+            if usage is not None:
+                telemetry["prompt_tokens"] = getattr(usage, "prompt_tokens", None) or 0
+                telemetry["completion_tokens"] = getattr(usage, "completion_tokens", None) or 0
+                telemetry["total_tokens"] = getattr(usage, "total_tokens", None) or (
+                    telemetry["prompt_tokens"] + telemetry["completion_tokens"]
+                )
+            return result.content
+    
+    def _client_for(self, route: model_router.Route):
+        if route.base_url not in self._clients:
+            self._clients[route.base_url] = Groq(api_key=self.api_key, base_url=route.base_url, max_retries=0)
+        return self._clients[route.base_url]
+    
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return min(float(retry_after), 10.0)
+        except (TypeError, ValueError):
+            return 0.5 * (2 ** attempt)
     
     def _enhance_biology_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Enhance context specifically for Biology Form 2 Term 1"""
@@ -106,35 +303,28 @@ class GroqAIService:
     
     def _enhance_context_with_timetable(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Enhance context with actual timetable data from database"""
-        timetable_data = context.get("timetable_data", {})
+        index = TimetableIndex(context.get("timetable_data", {}))
         
         # Organize lessons by week
-        weekly_breakdown = self._organize_lessons_by_week(timetable_data.get("slots", []))
+        weekly_breakdown = self._organize_lessons_by_week(index)
         
         # Calculate lesson distribution
-        lesson_distribution = self._analyze_lesson_distribution(timetable_data.get("slots", []))
+        lesson_distribution = self._analyze_lesson_distribution(index)
         
         return {
             **context,
             "weekly_breakdown": weekly_breakdown,
             "lesson_distribution": lesson_distribution,
-            "actual_topic_coverage": self._map_topic_coverage(timetable_data),
-            "total_teaching_periods": len(timetable_data.get("slots", []))
+            "actual_topic_coverage": self._map_topic_coverage(index),
+            "total_teaching_periods": len(index.slots)
         }
     
-    def _organize_lessons_by_week(self, slots: List[Dict]) -> Dict[int, List[Dict]]:
+    def _organize_lessons_by_week(self, index: TimetableIndex) -> Dict[int, List[Dict]]:
         """Organize lesson slots by week number with enhanced learning sequence intelligence"""
         weekly_lessons = {}
         
-        # Group slots by topic to understand topic progression
-        topic_groups = {}
-        for slot in slots:
-            topic_name = slot.get("topic_name", "Unknown Topic")
-            if topic_name not in topic_groups:
-                topic_groups[topic_name] = []
-            topic_groups[topic_name].append(slot)
-        
-        # Sort topics by complexity and dependencies
+        # Slots are already grouped by topic; sort topics by complexity and dependencies
+        topic_groups = {name if name is not None else "Unknown Topic": slots for name, slots in index.by_topic.items()}
         sorted_topics = self._sort_topics_by_complexity(topic_groups.keys())
         
         # Distribute lessons across weeks with logical progression
@@ -176,96 +366,50 @@ class GroqAIService:
         return weekly_lessons
     
     def _sort_topics_by_complexity(self, topics: List[str]) -> List[str]:
-        """Sort topics by complexity and learning dependencies"""
-        # Define topic complexity levels and dependencies
-        topic_complexity = {
-            # Mathematics progression
-            "numbers": 1,
-            "algebra": 2,
-            "geometry": 2,
-            "statistics": 3,
-            "calculus": 4,
-            
-            # Science progression
-            "introduction": 1,
-            "basic_concepts": 1,
-            "fundamentals": 1,
-            "applications": 2,
-            "advanced_concepts": 3,
-            "research": 4,
-            
-            # Language progression
-            "vocabulary": 1,
-            "grammar": 2,
-            "reading": 2,
-            "writing": 3,
-            "literature": 3,
-            "analysis": 4,
-            
-            # Humanities progression
-            "overview": 1,
-            "basic_principles": 1,
-            "detailed_study": 2,
-            "analysis": 3,
-            "evaluation": 4,
-            "synthesis": 4
-        }
-        
-        # Sort topics by complexity
-        def get_complexity(topic):
-            topic_lower = topic.lower()
-            for key, level in topic_complexity.items():
-                if key in topic_lower:
-                    return level
-            return 2  # Default complexity level
-        
-        return sorted(topics, key=get_complexity)
+        """Sort topics by prerequisites, then complexity, then curriculum order"""
+        return self.topic_graph.order(topics)
     
-    def _analyze_lesson_distribution(self, slots: List[Dict]) -> Dict[str, int]:
+    def _analyze_lesson_distribution(self, index: TimetableIndex) -> Dict[str, int]:
         """Analyze how lessons are distributed across topics"""
-        distribution = {}
-        for slot in slots:
-            topic = slot.get("topic_name", "Unknown Topic")
-            distribution[topic] = distribution.get(topic, 0) + 1
-        return distribution
+        return {
+            topic if topic is not None else "Unknown Topic": len(slots)
+            for topic, slots in index.by_topic.items()
+        }
     
-    def _map_topic_coverage(self, timetable_data: Dict) -> List[Dict]:
+    def _map_topic_coverage(self, index: TimetableIndex) -> List[Dict]:
         """Map topics to actual coverage with enhanced learning progression analysis"""
-        topics = timetable_data.get("selected_topics", [])
-        subtopics = timetable_data.get("selected_subtopics", [])
-        slots = timetable_data.get("slots", [])
-        
+        topics = index.topics
+        cross_references = self.topic_graph.cross_references([topic.get("name") for topic in topics])
         coverage_map = []
         for topic in topics:
-            topic_slots = [s for s in slots if s.get("topic_name") == topic.get("name")]
-            topic_subtopics = [st for st in subtopics if st.get("topic_id") == topic.get("id")]
+            allocated_lessons = len(index.by_topic.get(topic.get("name"), ()))
+            topic_subtopics = index.subtopics_by_topic.get(topic.get("id"), [])
             
             # Analyze learning progression within the topic
-            subtopic_progression = self._analyze_subtopic_progression(topic_subtopics, topic_slots)
+            subtopic_progression = self._analyze_subtopic_progression(topic.get("name"), topic_subtopics, index)
             
             coverage_map.append({
                 "topic_name": topic.get("name"),
-                "allocated_lessons": len(topic_slots),
+                "allocated_lessons": allocated_lessons,
                 "subtopics": [st.get("name") for st in topic_subtopics],
-                "estimated_weeks": max(1, len(topic_slots) // 3),
+                "estimated_weeks": max(1, allocated_lessons // 3),
                 "learning_progression": subtopic_progression,
                 "complexity_level": self._assess_topic_complexity(topic.get("name")),
                 "prerequisites": self._identify_prerequisites(topic.get("name")),
-                "cross_references": self._identify_cross_references(topic.get("name"), topics)
+                "cross_references": cross_references.get(topic.get("name"), [])
             })
         
         return coverage_map
     
-    def _analyze_subtopic_progression(self, subtopics: List[Dict], slots: List[Dict]) -> Dict:
+    def _analyze_subtopic_progression(self, topic_name: Optional[str], subtopics: List[Dict], index: TimetableIndex) -> Dict:
         """Analyze the learning progression within a topic's subtopics"""
         if not subtopics:
             return {"progression": "linear", "complexity_growth": "steady"}
         
-        # Count lessons per subtopic
+        # Lessons per subtopic, as taught under this topic
         subtopic_lessons = {}
         for subtopic in subtopics:
-            subtopic_slots = [s for s in slots if s.get("subtopic_name") == subtopic.get("name")]
-            subtopic_lessons[subtopic.get("name")] = len(subtopic_slots)
+            subtopic_lessons[subtopic.get("name")] = index.lesson_counts.get((topic_name, subtopic.get("name")), 0)
         
         # Analyze progression pattern
         lesson_counts = list(subtopic_lessons.values())
@@ -289,74 +433,16 @@ class GroqAIService:
     
     def _assess_topic_complexity(self, topic_name: str) -> str:
         """Assess the complexity level of a topic"""
-        topic_lower = topic_name.lower()
-        
-        # Foundation topics
-        if any(word in topic_lower for word in ["introduction", "basic", "fundamental", "overview"]):
-            return "foundation"
-        
-        # Intermediate topics
-        elif any(word in topic_lower for word in ["application", "analysis", "development", "practice"]):
-            return "intermediate"
-        
-        # Advanced topics
-        elif any(word in topic_lower for word in ["advanced", "complex", "synthesis", "evaluation", "research"]):
-            return "advanced"
-        
-        else:
-            return "intermediate"
+        return topic_graph.classify(topic_name or "").level
     
     def _identify_prerequisites(self, topic_name: str) -> List[str]:
         """Identify prerequisite topics for a given topic"""
-        topic_lower = topic_name.lower()
-        prerequisites = []
-        
-        # Mathematics prerequisites
-        if "algebra" in topic_lower:
-            prerequisites.extend(["numbers", "basic operations"])
-        elif "geometry" in topic_lower:
-            prerequisites.extend(["algebra", "basic shapes"])
-        elif "calculus" in topic_lower:
-            prerequisites.extend(["algebra", "geometry", "functions"])
-        
-        # Science prerequisites
-        elif "advanced" in topic_lower and any(sci in topic_lower for sci in ["biology", "chemistry", "physics"]):
-            prerequisites.extend(["basic concepts", "fundamentals"])
-        
-        # Language prerequisites
-        elif "writing" in topic_lower:
-            prerequisites.extend(["vocabulary", "grammar"])
-        elif "literature" in topic_lower:
-            prerequisites.extend(["reading", "vocabulary"])
-        
-        return prerequisites
+        return self.topic_graph.prerequisites(topic_name or "")
     
     def _identify_cross_references(self, topic_name: str, all_topics: List[Dict]) -> List[str]:
         """Identify topics that have cross-references with the given topic"""
-        topic_lower = topic_name.lower()
-        cross_references = []
-        
-        for topic in all_topics:
-            other_topic = topic.get("name", "").lower()
-            
-            # Mathematics cross-references
-            if "algebra" in topic_lower and "geometry" in other_topic:
-                cross_references.append(topic.get("name"))
-            elif "geometry" in topic_lower and "algebra" in other_topic:
-                cross_references.append(topic.get("name"))
-            
-            # Science cross-references
-            elif any(sci in topic_lower for sci in ["biology", "chemistry", "physics"]):
-                if any(sci in other_topic for sci in ["biology", "chemistry", "physics"]) and topic_lower != other_topic:
-                    cross_references.append(topic.get("name"))
-            
-            # Language cross-references
-            elif "grammar" in topic_lower and "writing" in other_topic:
-                cross_references.append(topic.get("name"))
-            elif "vocabulary" in topic_lower and any(skill in other_topic for skill in ["reading", "writing", "speaking"]):
-                cross_references.append(topic.get("name"))
-        
-        return list(set(cross_references))  # Remove duplicates
+        names = [topic.get("name") for topic in all_topics]
+        return self.topic_graph.cross_references([topic_name] + names).get(topic_name, [])
     
     def _get_subject_system_prompt(self, context: Dict) -> str:
         """Get subject-specific system prompt with enhanced hierarchical context"""
@@ -560,28 +646,19 @@ class GroqAIService:
             - Cross-curricular connections
             - Individual student support"""
     
-    def _build_enhanced_prompt(self, context: Dict[str, Any], config: Dict[str, Any]) -> str:
-        """Build comprehensive prompt using timetable data with enhanced pedagogical pacing"""
-        from services.kenya_curriculum import KenyaCurriculumService
-        
-        curriculum_service = KenyaCurriculumService()
-        references = curriculum_service.get_subject_references(
-            context["subject_name"], 
-            context["form_grade"]
-        )
+    def _build_enhanced_prompt(self, context: Dict[str, Any], config: Dict[str, Any],
+                               token_budget: Optional[int] = None) -> str:
+        """Build comprehensive prompt using timetable data with enhanced pedagogical pacing.
+        Sections are compacted or dropped (lowest value first) to stay within token_budget;
+        the budgeting report is kept on self.last_prompt_report."""
+        references = kenya_curriculum.get_references(context["subject_name"], context["form_grade"])
         
         # Format actual lesson distribution
         lesson_distribution = context.get("lesson_distribution", {})
         distribution_text = "\n".join([f"- {topic}: {count} lessons" for topic, count in lesson_distribution.items()])
         
-        # Format weekly breakdown with enhanced pedagogical insights
+        # Weekly breakdown as lesson ranges per topic; merged across weeks when space is short
         weekly_breakdown = context.get("weekly_breakdown", {})
-        weekly_text = ""
-        for week, lessons in weekly_breakdown.items():
-            weekly_text += f"\nWeek {week}:\n"
-            for lesson in lessons:
-                topic_week_info = f" (Topic Week {lesson.get('topic_week', 1)}/{lesson.get('total_topic_weeks', 1)})"
-                weekly_text += f"  Lesson {lesson['lesson_number']}: {lesson['topic']} - {lesson['subtopic']}{topic_week_info}\n"
         
         # Analyze learning progression
         topic_coverage = context.get("actual_topic_coverage", [])
@@ -590,8 +667,8 @@ class GroqAIService:
         # Pedagogical pacing recommendations
         pacing_recommendations = self._generate_pacing_recommendations(context)
         
-        prompt = f"""
-Create a comprehensive scheme of work with the following details:
+        total_periods = context.get("total_teaching_periods", 48)
+        header = f"""Create a comprehensive scheme of work with the following details:
 
 SCHOOL CONTEXT:
 - School: {context.get("school_name")}
@@ -602,31 +679,11 @@ SCHOOL CONTEXT:
 - School Level: {context.get("school_level", "Secondary")}
 
 ACTUAL TIMETABLE ALLOCATION:
-- Total Teaching Periods: {context.get("total_teaching_periods", 48)}
+- Total Teaching Periods: {total_periods}
 - Required Weeks: 12 (EXACTLY 12 weeks as requested)
-- Lessons per Week: {max(1, context.get("total_teaching_periods", 48) // 12)}
-
-LESSON DISTRIBUTION PER TOPIC:
-{distribution_text}
-
-WEEKLY LESSON BREAKDOWN:
-{weekly_text}
-
-LEARNING PROGRESSION ANALYSIS:
-{progression_analysis}
-
-PEDAGOGICAL PACING RECOMMENDATIONS:
-{pacing_recommendations}
-
-CURRICULUM STANDARDS:
-- Standard: KICD (Kenya Institute of Curriculum Development)
-- Approved Textbooks: {', '.join(references["textbooks"])}
-- Main Reference: {references["main_textbook"]}
-
-COMPETENCY AREAS:
-{chr(10).join(['- ' + comp for comp in references["competencies"]])}
-
-SPECIFIC REQUIREMENTS FOR {context.get("subject_name", "Biology")} {context.get("form_grade", "Form 2")} {context.get("term", "Term 1")}:
+- Lessons per Week: {max(1, total_periods // 12)}"""
+        
+        requirements = f"""SPECIFIC REQUIREMENTS FOR {context.get("subject_name", "Biology")} {context.get("form_grade", "Form 2")} {context.get("term", "Term 1")}:
 1. Follow exact KICD scheme format for Biology Form 2 Term 1
 2. Cover key topics: Cell Biology, Nutrition in Plants and Animals, Transport in Plants
 3. Each lesson must have 3-4 specific objectives starting with action verbs
@@ -641,20 +698,21 @@ SPECIFIC REQUIREMENTS FOR {context.get("subject_name", "Biology")} {context.get(
 12. Include cross-curricular connections with Chemistry and Geography
 
 STYLE: {config.get("style", "detailed")} 
-LANGUAGE LEVEL: {config.get("language_complexity", "intermediate")}
-
-OUTPUT FORMAT: Return valid JSON with this exact structure (MUST have exactly 12 weeks):
-{{
-  "scheme_header": {{
+LANGUAGE LEVEL: {config.get("language_complexity", "intermediate")}"""
+        
+        scheme_header = f"""  "scheme_header": {{
     "school_name": "{context.get('school_name')}",
     "subject": "{context.get('subject_name')}",
     "form_grade": "{context.get('form_grade')}",
     "term": "{context.get('term')}",
     "academic_year": "{context.get('academic_year', '2025')}",
     "total_weeks": 12,
-    "total_lessons": {context.get("total_teaching_periods", 48)},
+    "total_lessons": {total_periods},
     "learning_progression": "Progressive - Foundation to Advanced Applications"
-  }},
+  }},"""
+        output_format = f"""OUTPUT FORMAT: Return valid JSON with this exact structure (MUST have exactly 12 weeks):
+{{
+{scheme_header}
   "weeks": [
     {{
       "week_number": 1,
@@ -692,12 +750,48 @@ OUTPUT FORMAT: Return valid JSON with this exact structure (MUST have exactly 12
     }}
     // Continue for exactly 12 weeks covering the Biology Form 2 Term 1 curriculum
   ]
-}}
-"""
+}}"""
+        output_format_compact = f"""OUTPUT FORMAT: Return valid JSON with this exact structure (MUST have exactly 12 weeks):
+{{
+{scheme_header}
+  "weeks": [{{"week_number": 1, "theme": "...", "learning_focus": "...", "lessons": [{{
+    "lesson_number": 1, "topic_subtopic": "TOPIC - Subtopic",
+    "specific_objectives": ["To ...", "To ...", "To ..."],
+    "teaching_learning_activities": ["Q/A: ...", "Practical: ...", "Discussion: ..."],
+    "materials_resources": ["..."], "references": "Book Chapter Pg",
+    "remarks": "...", "assessment_opportunities": "...", "cross_curricular_links": "..."
+  }}]}}]
+}}"""
+        
+        sections = [
+            prompt_budget.PromptSection("context", [header], priority=100, required=True),
+            prompt_budget.PromptSection("distribution", [f"LESSON DISTRIBUTION PER TOPIC:\n{distribution_text}"], priority=80),
+            prompt_budget.PromptSection("weekly_breakdown", [
+                f"WEEKLY LESSON BREAKDOWN:\n{prompt_budget.weekly_runs_text(weekly_breakdown)}",
+                f"WEEKLY LESSON BREAKDOWN:\n{prompt_budget.topic_span_text(weekly_breakdown)}",
+            ] if weekly_breakdown else [], priority=90),
+            prompt_budget.PromptSection("progression", [f"LEARNING PROGRESSION ANALYSIS:\n{progression_analysis}"], priority=10),
+            prompt_budget.PromptSection("pacing", [f"PEDAGOGICAL PACING RECOMMENDATIONS:\n{pacing_recommendations}"], priority=20),
+            prompt_budget.PromptSection("standards", [f"""CURRICULUM STANDARDS:
+- Standard: KICD (Kenya Institute of Curriculum Development)
+- Approved Textbooks: {', '.join(references["textbooks"])}
+- Main Reference: {references["main_textbook"]}"""], priority=60),
+            prompt_budget.PromptSection("competencies", [
+                "COMPETENCY AREAS:\n" + "\n".join(['- ' + comp for comp in references["competencies"]])
+            ], priority=40),
+            prompt_budget.PromptSection("requirements", [requirements], priority=100, required=True),
+            prompt_budget.PromptSection("output_format", [output_format, output_format_compact], priority=30, required=True),
+        ]
+        
+        if token_budget is None:
+            token_budget = prompt_budget.prompt_budget(self.model)
+        prompt, report = prompt_budget.fit_sections(sections, token_budget)
+        self.last_prompt_report = report
         return prompt
     
-    def _parse_scheme_response(self, content: str, context: Dict) -> Dict[str, Any]:
+    def _parse_scheme_response(self, content: str, context: Dict, telemetry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Parse and validate AI response"""
+        telemetry = telemetry if telemetry is not None else {}
         try:
             # Extract JSON from response
             start_idx = content.find('{')
@@ -713,11 +807,12 @@ OUTPUT FORMAT: Return valid JSON with this exact structure (MUST have exactly 12
             if "weeks" not in parsed:
                 raise ValueError("Invalid response structure - missing weeks")
             
+            telemetry["parse_success"] = True
             return {
                 "scheme_content": parsed,
                 "metadata": {
-                    "generated_at": "2024-07-20T10:00:00Z",
-                    "ai_model": self.model,
+                    "generated_at": datetime.utcnow().isoformat() + "Z",
+                    "ai_model": telemetry.get("model") or self.model,
                     "total_weeks": len(parsed.get("weeks", [])),
                     "total_lessons": sum(len(week.get("lessons", [])) for week in parsed.get("weeks", [])),
                     "generation_source": "timetable_based"
@@ -726,217 +821,16 @@ OUTPUT FORMAT: Return valid JSON with this exact structure (MUST have exactly 12
             
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"JSON parsing error: {str(e)}")
+            telemetry["fallback_reason"] = f"parse_error: {str(e)[:200]}"
             return self._create_fallback_scheme(context)
         except Exception as e:
             logger.error(f"Response parsing error: {str(e)}")
+            telemetry["fallback_reason"] = f"parse_error: {str(e)[:200]}"
             return self._create_fallback_scheme(context)
     
     def _create_fallback_scheme(self, context: Dict) -> Dict[str, Any]:
-        """Create Biology Form 2 Term 1 scheme structure as fallback with 12 weeks"""
-        subject_name = context.get("subject_name", "Biology")
-        form_grade = context.get("form_grade", "Form 2")
-        term = context.get("term", "Term 1")
-        school_name = context.get("school_name", "School Name")
-        
-        # Create Biology-specific content for Form 2 Term 1 (12 weeks)
-        weeks = []
-        
-        # Biology Form 2 Term 1 curriculum topics with proper progression
-        biology_topics = [
-            {
-                "week": 1,
-                "theme": "Introduction to Cell Biology",
-                "topic": "Cell Structure",
-                "content": "Basic cell structure and organelles",
-                "objectives": [
-                    "To identify the basic structure of a cell",
-                    "To distinguish between plant and animal cells",
-                    "To explain the functions of cell organelles"
-                ]
-            },
-            {
-                "week": 2,
-                "theme": "Cell Organelles and Functions",
-                "topic": "Cell Structure",
-                "content": "Detailed study of cell organelles",
-                "objectives": [
-                    "To describe the structure and function of mitochondria",
-                    "To explain the role of nucleus in cell activities",
-                    "To identify chloroplasts in plant cells"
-                ]
-            },
-            {
-                "week": 3,
-                "theme": "Cell Division Processes",
-                "topic": "Cell Division",
-                "content": "Mitosis and meiosis",
-                "objectives": [
-                    "To explain the process of mitosis",
-                    "To distinguish between mitosis and meiosis",
-                    "To state the importance of cell division"
-                ]
-            },
-            {
-                "week": 4,
-                "theme": "Photosynthesis Introduction",
-                "topic": "Nutrition in Plants",
-                "content": "Light and dark reactions",
-                "objectives": [
-                    "To define photosynthesis",
-                    "To identify factors affecting photosynthesis",
-                    "To explain the importance of chlorophyll"
-                ]
-            },
-            {
-                "week": 5,
-                "theme": "Photosynthesis Process",
-                "topic": "Nutrition in Plants",
-                "content": "Detailed photosynthesis mechanism",
-                "objectives": [
-                    "To describe the light reaction of photosynthesis",
-                    "To explain the dark reaction of photosynthesis",
-                    "To investigate factors affecting photosynthesis rate"
-                ]
-            },
-            {
-                "week": 6,
-                "theme": "Plant Nutrition and Minerals",
-                "topic": "Nutrition in Plants",
-                "content": "Mineral nutrition in plants",
-                "objectives": [
-                    "To identify essential elements for plant growth",
-                    "To explain deficiency symptoms in plants",
-                    "To describe how plants obtain mineral salts"
-                ]
-            },
-            {
-                "week": 7,
-                "theme": "Animal Nutrition Basics",
-                "topic": "Nutrition in Animals",
-                "content": "Types of nutrition and feeding",
-                "objectives": [
-                    "To classify animals according to their feeding habits",
-                    "To describe different modes of feeding",
-                    "To explain the importance of balanced diet"
-                ]
-            },
-            {
-                "week": 8,
-                "theme": "Human Digestive System",
-                "topic": "Nutrition in Animals",
-                "content": "Digestion and absorption",
-                "objectives": [
-                    "To describe the structure of human digestive system",
-                    "To explain the process of digestion",
-                    "To identify digestive enzymes and their functions"
-                ]
-            },
-            {
-                "week": 9,
-                "theme": "Respiration in Living Organisms",
-                "topic": "Respiration",
-                "content": "Aerobic and anaerobic respiration",
-                "objectives": [
-                    "To define respiration",
-                    "To distinguish between aerobic and anaerobic respiration",
-                    "To explain the importance of respiration"
-                ]
-            },
-            {
-                "week": 10,
-                "theme": "Transport in Plants - Water",
-                "topic": "Transport in Plants",
-                "content": "Water transport mechanisms",
-                "objectives": [
-                    "To describe how water is absorbed by roots",
-                    "To explain the process of transpiration",
-                    "To investigate factors affecting transpiration rate"
-                ]
-            },
-            {
-                "week": 11,
-                "theme": "Transport in Plants - Nutrients",
-                "topic": "Transport in Plants",
-                "content": "Translocation of organic materials",
-                "objectives": [
-                    "To describe how manufactured food is transported in plants",
-                    "To explain the role of phloem in transport",
-                    "To investigate the pathway of food transport"
-                ]
-            },
-            {
-                "week": 12,
-                "theme": "Review and Assessment",
-                "topic": "Comprehensive Review",
-                "content": "Review of all covered topics",
-                "objectives": [
-                    "To review all topics covered in the term",
-                    "To solve practice questions on cell biology and nutrition",
-                    "To prepare for end of term examinations"
-                ]
-            }
-        ]
-        
-        for week_data in biology_topics:
-            weeks.append({
-                "week_number": week_data["week"],
-                "theme": week_data["theme"],
-                "learning_focus": f"Focus on {week_data['content']} with practical applications",
-                "lessons": [
-                    {
-                        "lesson_number": 1,
-                        "topic_subtopic": f"{week_data['topic']} - {week_data['content']}",
-                        "specific_objectives": week_data["objectives"],
-                        "teaching_learning_activities": [
-                            "Q/A session to assess prior knowledge on the topic",
-                            "Interactive discussion and explanation of key concepts",
-                            "Practical activity or demonstration related to the topic",
-                            "Group work to reinforce understanding",
-                            "Assessment and feedback session"
-                        ],
-                        "materials_resources": [
-                            "KLB Biology Form 2 textbook",
-                            "Microscopes and prepared slides (where applicable)",
-                            "Charts showing biological processes",
-                            "Local examples and specimens",
-                            "Assessment tools and worksheets"
-                        ],
-                        "references": f"KLB Biology Form 2 - Chapter on {week_data['topic']}",
-                        "remarks": f"Focus on practical understanding of {week_data['content']}. Use local examples where possible.",
-                        "assessment_opportunities": "CAT, Practical work, Class discussion",
-                        "cross_curricular_links": "Chemistry (chemical reactions), Geography (environmental science)"
-                    }
-                ]
-            })
-        
-        return {
-            "scheme_content": {
-                "scheme_header": {
-                    "school_name": school_name,
-                    "subject": subject_name,
-                    "form_grade": form_grade,
-                    "term": term,
-                    "academic_year": context.get("academic_year", "2025"),
-                    "total_weeks": 12,
-                    "total_lessons": 12,
-                    "learning_progression": "Progressive - Foundation to Advanced Applications"
-                },
-                "weeks": weeks
-            },
-            "metadata": {
-                "generated_at": "2025-07-23T16:05:26.332Z",
-                "ai_model": "llama3-8b-8192",
-                "total_weeks": 12,
-                "total_lessons": 12,
-                "generation_source": "biology_form2_term1_template",
-                "generation_config": {
-                    "model": "llama3-8b-8192",
-                    "style": "detailed",
-                    "curriculum_standard": "KICD",
-                    "language_complexity": "intermediate"
-                }
-            }
-        }
+        """Scheme built from the subject's curriculum (or the context's topics) when the LLM cannot answer"""
+        return fallback_templates.build_scheme(context, self.fallback_template)
     
     def _analyze_learning_progression(self, topic_coverage: List[Dict]) -> str:
         """Analyze the overall learning progression across topics"""
@@ -0,0 +1,185 @@
+"""
+Shared library of generated lesson content
+What the LLM writes for a subtopic does not depend on the teacher who asked for it, so it is kept
+in content_library per subtopic, form, style (STYLE_FIELDS of the generation config) and prompt
+version, one fragment per lesson of the subtopic:
+
+- scheme generation builds the scheme from the library when every subtopic it teaches has
+  fragments, and otherwise stores the lessons of the LLM's scheme for the next teacher;
+- lesson-plan generation sends the LLM only the groups whose plans are not in the library.
+
+Bumping a kind's PROMPT_VERSIONS entry stops its older entries from being served; those are
+evicted first once the library holds more than MAX_ENTRIES, then the least recently used.
+Entries older than their subtopic's last edit are regenerated. Rejected entries
+(QUALITY_REJECTED) are not served, and approved ones (QUALITY_APPROVED) are only completed with
+lessons they lack, never overwritten.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+import models
+from services import fallback_templates, kenya_curriculum, metrics, single_flight
+
+SCHEME = "scheme"
+LESSON_PLAN = "lesson_plan"
+# Bump with any change to the matching prompt in services.ai_service (_build_enhanced_prompt,
+# _build_lesson_plan_prompt) that changes what a lesson should contain
+PROMPT_VERSIONS = {SCHEME: 1, LESSON_PLAN: 1}
+
+QUALITY_REJECTED = 0
+QUALITY_GENERATED = 1
+QUALITY_APPROVED = 2
+
+# Generation config fields that change the content written for a lesson
+STYLE_FIELDS = ("style", "curriculum_standard", "language_complexity")
+# Fields of a generated scheme lesson kept per subtopic; titles and remarks follow the scheme
+SCHEME_FIELDS = ("specific_objectives", "teaching_learning_activities", "materials_resources",
+                 "assessment_opportunities", "references")
+
+MAX_ENTRIES = int(os.getenv("CONTENT_LIBRARY_MAX_ENTRIES", "50000"))
+# Share of MAX_ENTRIES left after an eviction, so the next ones are not on every store
+EVICT_TO = 0.9
+
+
+def style_of(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {field: (config or {}).get(field) for field in STYLE_FIELDS if (config or {}).get(field)}
+
+
+def _key(form_grade: Optional[str], config: Optional[Dict[str, Any]]):
+    return kenya_curriculum.normalize_key(form_grade or ""), single_flight.make_key("content-style", style_of(config))
+
+
+def lookup(db: Session, kind: str, subtopic_ids: List[int], form_grade: Optional[str],
+           config: Optional[Dict[str, Any]]) -> Dict[int, List[Optional[Dict[str, Any]]]]:
+    """Fragments of the subtopics that have a servable entry; those entries count a hit"""
+    form_key, style_key = _key(form_grade, config)
+    entries = crud.content_library.get_entries(db, kind, sorted(set(subtopic_ids)), form_key, style_key,
+                                               PROMPT_VERSIONS[kind])
+    found = {}
+    for subtopic_id in set(subtopic_ids):
+        entry, subtopic_updated_at = entries.get(subtopic_id, (None, None))
+        servable = (entry is not None and entry.quality != QUALITY_REJECTED and any(entry.fragments or [])
+                    and not _outdated(entry, subtopic_updated_at))
+        metrics.record_cache("content_library", servable)
+        if servable:
+            found[subtopic_id] = entry
+    if found:
+        crud.content_library.touch(db, [entry.id for entry in found.values()], datetime.utcnow())
+        db.commit()
+    return {subtopic_id: list(entry.fragments) for subtopic_id, entry in found.items()}
+
+
+def _outdated(entry: models.ContentFragment, subtopic_updated_at: Optional[datetime]) -> bool:
+    return subtopic_updated_at is not None and entry.updated_at is not None and entry.updated_at < subtopic_updated_at
+
+
+def store(db: Session, kind: str, generated: Dict[int, Dict[int, Dict[str, Any]]], form_grade: Optional[str],
+          config: Optional[Dict[str, Any]], model: Optional[str] = None) -> int:
+    """Add generated fragments ({subtopic_id: {lesson index: fragment}}) to the library and commit;
+    returns the entries changed"""
+    generated = {subtopic_id: lessons for subtopic_id, lessons in generated.items() if lessons}
+    if not generated:
+        return 0
+    form_key, style_key = _key(form_grade, config)
+    entries = crud.content_library.get_entries(db, kind, sorted(generated), form_key, style_key, PROMPT_VERSIONS[kind])
+    now = datetime.utcnow()
+    changed = 0
+    for subtopic_id, lessons in generated.items():
+        entry, subtopic_updated_at = entries.get(subtopic_id, (None, None))
+        if entry is None:
+            entry = models.ContentFragment(
+                kind=kind, subtopic_id=subtopic_id, form_key=form_key, style_key=style_key, style=style_of(config),
+                prompt_version=PROMPT_VERSIONS[kind], fragments=[], quality=QUALITY_GENERATED, version=0,
+                hits=0, created_at=now, last_used_at=now
+            )
+            db.add(entry)
+        elif entry.quality == QUALITY_REJECTED or _outdated(entry, subtopic_updated_at):
+            entry.fragments, entry.quality = [], QUALITY_GENERATED
+        fragments = list(entry.fragments or [])
+        fragments.extend([None] * (max(lessons) + 1 - len(fragments)))
+        for index, fragment in lessons.items():
+            if entry.quality != QUALITY_APPROVED or fragments[index] is None:
+                fragments[index] = fragment
+        if fragments != entry.fragments or entry.version == 0:
+            # A new list, so the JSON column is seen as changed
+            entry.fragments = fragments
+            entry.version = (entry.version or 0) + 1
+            entry.model = model or entry.model
+            entry.updated_at = now
+            changed += 1
+    db.flush()
+    evict(db)
+    db.commit()
+    return changed
+
+
+def evict(db: Session, max_entries: int = MAX_ENTRIES) -> int:
+    """Bring the library down to EVICT_TO of max_entries once it holds more (not committed)"""
+    count = crud.content_library.count(db)
+    if count <= max_entries:
+        return 0
+    return crud.content_library.evict(db, PROMPT_VERSIONS, count - int(max_entries * EVICT_TO))
+
+
+def set_quality(db: Session, entry: models.ContentFragment, quality: int) -> models.ContentFragment:
+    if quality not in (QUALITY_REJECTED, QUALITY_GENERATED, QUALITY_APPROVED):
+        raise ValueError(f"quality must be {QUALITY_REJECTED}, {QUALITY_GENERATED} or {QUALITY_APPROVED}")
+    entry.quality = quality
+    db.commit()
+    return entry
+
+
+def stats(db: Session) -> Dict[str, Any]:
+    groups = [
+        {"kind": kind, "prompt_version": version, "current": PROMPT_VERSIONS.get(kind) == version,
+         "quality": quality, "entries": entries, "hits": hits or 0}
+        for kind, version, quality, entries, hits in crud.content_library.get_stats(db)
+    ]
+    return {
+        "entries": sum(group["entries"] for group in groups),
+        "hits": sum(group["hits"] for group in groups),
+        "max_entries": MAX_ENTRIES,
+        "prompt_versions": PROMPT_VERSIONS,
+        "groups": groups,
+    }
+
+
+def scheme_from_library(db: Session, template: Optional[fallback_templates.SubjectTemplate],
+                        context: Dict[str, Any], config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The scheme fallback_templates.build_scheme would lay out, with the library's lessons, when
+    every subtopic it teaches has them; None otherwise"""
+    units = fallback_templates.lesson_units(template, context) if template is not None else []
+    if not units or any(isinstance(unit.subtopic_key, tuple) for unit in units):
+        return None
+    found = lookup(db, SCHEME, [unit.subtopic_key for unit in units], context.get("form_grade"), config)
+    fragments = {subtopic_id: [fragment for fragment in lessons if fragment] for subtopic_id, lessons in found.items()}
+    if len(fragments) < len(units):
+        return None
+    result = fallback_templates.build_scheme(context, template, fragments)
+    result["metadata"]["telemetry"] = {"model": None, "attempts": 0, "parse_success": True,
+                                       "fallback_reason": None, "content_library": len(fragments)}
+    return result
+
+
+def store_scheme(db: Session, template: Optional[fallback_templates.SubjectTemplate], context: Dict[str, Any],
+                 config: Optional[Dict[str, Any]], weeks: List[Dict[str, Any]], model: Optional[str] = None) -> int:
+    """Keep the lessons of an LLM-generated scheme under the subtopics their titles match"""
+    if template is None:
+        return 0
+    generated: Dict[int, Dict[int, Dict[str, Any]]] = {}
+    for week in weeks or []:
+        for lesson in (week.get("lessons") or []) if isinstance(week, dict) else []:
+            if not isinstance(lesson, dict):
+                continue
+            unit = fallback_templates.find_unit(template, lesson.get("topic_subtopic"))
+            fragment = {field: lesson[field] for field in SCHEME_FIELDS if lesson.get(field)}
+            if unit is None or isinstance(unit.subtopic_key, tuple) or not fragment:
+                continue
+            lessons = generated.setdefault(unit.subtopic_key, {})
+            lessons[len(lessons)] = fragment
+    return store(db, SCHEME, generated, context.get("form_grade"), config, model)
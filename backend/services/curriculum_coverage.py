@@ -0,0 +1,163 @@
+"""
+Curriculum coverage per school, form and term
+Whether the subtopics scheduled in timetable_slots cover the duration_lessons the curriculum
+requires. Each subtopic's scheduled lessons (one per slot of an active timetable) are kept in
+coverage_subtopics and each subject's totals in coverage_subjects:
+
+- timetable writes call apply() with the subtopic counts before and after, which adds the
+  difference to the affected subtopics and refreshes their subjects' totals;
+- a subject is rebuilt from its slots only when it has no rollup yet or its curriculum changed
+  (crud.subject.get_content_version), which the report checks for the whole scope at once.
+
+A school report is then a few indexed reads of the rollups, whatever the number of timetables.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+
+
+def slot_counts(slots: List[Any]) -> Counter:
+    """Lessons per subtopic_id of slot dicts (as saved by the timetable page) or TimetableSlot rows"""
+    counts: Counter = Counter()
+    for slot in slots:
+        subtopic_id = slot.get("subtopic_id") if isinstance(slot, dict) else slot.subtopic_id
+        if isinstance(subtopic_id, int):
+            counts[subtopic_id] += 1
+    return counts
+
+
+def totals(counts: List[tuple]) -> Dict[str, int]:
+    """coverage_subjects totals from a subject's (topic_id, required, scheduled) subtopic counts"""
+    topics: Dict[int, List[int]] = {}
+    result = dict(subtopics=len(counts), required_lessons=0, scheduled_lessons=0, covered_lessons=0,
+                  uncovered_subtopics=0, over_allocated_topics=0)
+    for topic_id, required, scheduled in counts:
+        required, scheduled = required or 0, scheduled or 0
+        result["required_lessons"] += required
+        result["scheduled_lessons"] += scheduled
+        result["covered_lessons"] += min(required, scheduled)
+        result["uncovered_subtopics"] += scheduled < required
+        topic = topics.setdefault(topic_id, [0, 0])
+        topic[0] += required
+        topic[1] += scheduled
+    result["over_allocated_topics"] = sum(scheduled > required for required, scheduled in topics.values())
+    return result
+
+
+def apply(db: Session, before: Optional[Counter], after: Counter) -> List[int]:
+    """Add a timetable write's change in slot_counts (before is None for a new timetable) to the
+    rollups; call before the commit. Subjects without a rollup are skipped: their first report
+    builds them from the slots."""
+    before = before or Counter()
+    deltas = {subtopic_id: after[subtopic_id] - before[subtopic_id] for subtopic_id in before.keys() | after.keys()}
+    deltas = {subtopic_id: delta for subtopic_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    subject_ids = crud.coverage.add_scheduled(db, deltas)
+    for subject_id in subject_ids:
+        crud.coverage.set_totals(db, subject_id, totals(crud.coverage.get_counts(db, subject_id)))
+    return subject_ids
+
+
+def build_subject(db: Session, subject_id: int, school_id: int, form_grade_id: int, term_id: int, version: str):
+    """Recount a subject's subtopics from the slots of every active timetable"""
+    required = crud.coverage.get_required(db, subject_id)
+    scheduled = crud.coverage.get_scheduled(db, [subtopic_id for subtopic_id, _, _ in required])
+    rows = [
+        (subtopic_id, topic_id, max(1, duration_lessons or 1), scheduled.get(subtopic_id, 0))
+        for subtopic_id, topic_id, duration_lessons in required
+    ]
+    crud.coverage.replace_subject(db, subject_id, school_id, form_grade_id, term_id, version, rows)
+    crud.coverage.set_totals(db, subject_id, totals([(topic_id, req, sched) for _, topic_id, req, sched in rows]))
+
+
+def refresh(db: Session, school_id: int, scope: List[tuple]) -> int:
+    """Build the subjects in scope whose rollup is missing or older than their curriculum"""
+    subject_ids = [row[0] for row in scope]
+    versions = crud.subject.get_content_versions(db, subject_ids)
+    rollups = crud.coverage.get_rollups(db, subject_ids)
+    rebuilt = 0
+    for subject_id, _, form_grade_id, _, term_id, _ in scope:
+        rollup = rollups.get(subject_id)
+        if rollup is None or rollup.content_version != versions.get(subject_id):
+            build_subject(db, subject_id, school_id, form_grade_id, term_id, versions.get(subject_id))
+            rebuilt += 1
+    if rebuilt:
+        db.commit()
+    return rebuilt
+
+
+def _percent(part: int, whole: int) -> float:
+    return round(100.0 * part / whole, 1) if whole else 100.0
+
+
+def school_report(db: Session, school_id: int, form_grade_id: Optional[int] = None,
+                  term_id: Optional[int] = None) -> Dict[str, Any]:
+    """Coverage of every active subject of the school (optionally of one form and/or term)"""
+    scope = crud.coverage.get_scope(db, school_id, form_grade_id, term_id)
+    rebuilt = refresh(db, school_id, scope)
+    rollups = crud.coverage.get_rollups(db, [row[0] for row in scope])
+
+    uncovered: Dict[int, List[Dict[str, Any]]] = {}
+    for subject_id, subtopic_id, title, topic_id, topic_title, required, scheduled in crud.coverage.get_uncovered(
+            db, school_id, form_grade_id, term_id):
+        uncovered.setdefault(subject_id, []).append({
+            "subtopic_id": subtopic_id,
+            "title": title,
+            "topic_id": topic_id,
+            "topic_title": topic_title,
+            "required_lessons": required,
+            "scheduled_lessons": scheduled,
+        })
+    over_allocated: Dict[int, List[Dict[str, Any]]] = {}
+    for subject_id, topic_id, title, required, scheduled in crud.coverage.get_over_allocated(
+            db, school_id, form_grade_id, term_id):
+        over_allocated.setdefault(subject_id, []).append({
+            "topic_id": topic_id,
+            "title": title,
+            "required_lessons": required,
+            "scheduled_lessons": scheduled,
+        })
+
+    subjects = []
+    for subject_id, subject_name, row_form_grade_id, form_grade_name, row_term_id, term_name in scope:
+        rollup = rollups[subject_id]
+        subjects.append({
+            "subject_id": subject_id,
+            "subject_name": subject_name,
+            "form_grade_id": row_form_grade_id,
+            "form_grade": form_grade_name,
+            "term_id": row_term_id,
+            "term": term_name,
+            "subtopics": rollup.subtopics,
+            "required_lessons": rollup.required_lessons,
+            "scheduled_lessons": rollup.scheduled_lessons,
+            "covered_lessons": rollup.covered_lessons,
+            "coverage_percent": _percent(rollup.covered_lessons, rollup.required_lessons),
+            "uncovered_subtopics": uncovered.get(subject_id, []),
+            "over_allocated_topics": over_allocated.get(subject_id, []),
+        })
+
+    required = sum(subject["required_lessons"] for subject in subjects)
+    covered = sum(subject["covered_lessons"] for subject in subjects)
+    return {
+        "school_id": school_id,
+        "form_grade_id": form_grade_id,
+        "term_id": term_id,
+        "totals": {
+            "subjects": len(subjects),
+            "required_lessons": required,
+            "scheduled_lessons": sum(subject["scheduled_lessons"] for subject in subjects),
+            "covered_lessons": covered,
+            "coverage_percent": _percent(covered, required),
+            "uncovered_subtopics": sum(rollups[row[0]].uncovered_subtopics for row in scope),
+            "over_allocated_topics": sum(rollups[row[0]].over_allocated_topics for row in scope),
+        },
+        "subjects": subjects,
+        "rebuilt_subjects": rebuilt,
+    }
+
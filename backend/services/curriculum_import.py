@@ -0,0 +1,404 @@
+"""
+Bulk curriculum import
+Loads school levels → forms/grades → terms → subjects → topics → subtopics from a nested
+JSON document or from flat NDJSON/CSV rows in a single transaction.
+
+The whole input is validated before anything is written. Rows are then inserted level by
+level in batches, with each child's parent id taken from the row inserted (or matched) one
+level up. Existing rows are matched by code (school levels, forms, terms, subjects) or by
+title (topics, subtopics) within their parent, which makes re-running an import idempotent
+when upsert is enabled.
+
+Nested document:
+
+    {"school_levels": [{"name": "Secondary", "code": "SEC", "forms_grades": [
+        {"name": "Form 2", "code": "F2", "terms": [
+            {"name": "Term 1", "code": "T1", "subjects": [
+                {"name": "Biology", "code": "BIO", "topics": [
+                    {"title": "Cell Biology", "subtopics": [{"title": "Cell Structure"}]}]}]}]}]}]}
+
+Top-level lists of any other level attach to existing parents by id, e.g.
+{"terms": [{"form_grade_id": 4, "name": "Term 3", "code": "T3"}]}. A node without a
+name/title only references an existing row, so new content can be added below it.
+
+Flat rows (one per NDJSON line or CSV record) carry a "type" and the "path" of ancestor
+keys from the school level down, separated by "/" (or the parent id column instead):
+
+    {"type": "subtopic", "path": "SEC/F2/T1/BIO/Cell Biology", "title": "Cell Division"}
+"""
+
+import csv
+import io
+import json
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+PATH_SEPARATOR = "/"
+
+
+class Level(NamedTuple):
+    name: str              # collection key in nested documents
+    type_name: str         # "type" value in flat rows
+    model: Any
+    schema: Any
+    parent_fk: str
+    key: str               # natural key within the parent used for upserts
+    children: Optional[str]
+
+
+LEVELS = [
+    Level("school_levels", "school_level", models.SchoolLevel, schemas.SchoolLevelBase, "school_id", "code", "forms_grades"),
+    Level("forms_grades", "form_grade", models.FormGrade, schemas.FormGradeBase, "school_level_id", "code", "terms"),
+    Level("terms", "term", models.Term, schemas.TermBase, "form_grade_id", "code", "subjects"),
+    Level("subjects", "subject", models.Subject, schemas.SubjectBase, "term_id", "code", "topics"),
+    Level("topics", "topic", models.Topic, schemas.TopicBase, "subject_id", "title", "subtopics"),
+    Level("subtopics", "subtopic", models.Subtopic, schemas.SubtopicBase, "topic_id", "title", None),
+]
+LEVEL_BY_TYPE = {level.type_name: index for index, level in enumerate(LEVELS)}
+# Alternative child collection names accepted in nested documents
+CHILD_ALIASES = {"forms_grades": "forms"}
+# Name/title fields; a node without one only references an existing row
+LABEL_FIELDS = ("name", "title")
+
+
+class ImportNode:
+    __slots__ = ("level", "data", "row", "parent", "parent_id", "children", "position", "id", "is_reference")
+
+    def __init__(self, level: int, data: Dict[str, Any], row: str, parent: Optional["ImportNode"] = None,
+                 parent_id: Optional[int] = None, position: int = 0, is_reference: Optional[bool] = None):
+        self.level = level
+        self.data = data
+        self.row = row
+        self.parent = parent
+        self.parent_id = parent_id
+        self.children: List["ImportNode"] = []
+        self.position = position
+        self.id: Optional[int] = None
+        # References point at an existing row and are never written
+        self.is_reference = not any(data.get(field) for field in LABEL_FIELDS) if is_reference is None else is_reference
+
+    @property
+    def spec(self) -> Level:
+        return LEVELS[self.level]
+
+    @property
+    def key(self) -> Optional[str]:
+        value = self.data.get(self.spec.key)
+        return str(value).strip() if value is not None else None
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = {level.name: 0 for level in LEVELS}
+        self.updated = {level.name: 0 for level in LEVELS}
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, node: Optional[ImportNode], message: str, row: Optional[str] = None):
+        entry = {"row": row or (node.row if node else None), "error": message}
+        if node is not None:
+            entry["type"] = node.spec.type_name
+            entry["key"] = node.key
+        self.errors.append(entry)
+
+    def to_dict(self, dry_run: bool = False) -> Dict[str, Any]:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "total_created": sum(self.created.values()),
+            "total_updated": sum(self.updated.values()),
+            "dry_run": dry_run,
+        }
+
+
+# ============= PARSING =============
+
+def parse_document(document: Dict[str, Any], school_id: int, result: ImportResult) -> List[ImportNode]:
+    """Turn a nested JSON document into import trees"""
+    roots = []
+    for index, level in enumerate(LEVELS):
+        items = document.get(level.name) or document.get(CHILD_ALIASES.get(level.name, "")) or []
+        if not isinstance(items, list):
+            result.error(None, f"'{level.name}' must be a list", row=level.name)
+            continue
+        for position, item in enumerate(items):
+            row = f"{level.name}[{position}]"
+            if not isinstance(item, dict):
+                result.error(None, "Expected an object", row=row)
+                continue
+            parent_id = item.get(level.parent_fk) or (school_id if index == 0 else None)
+            if not parent_id:
+                result.error(None, f"Top-level {level.type_name} needs '{level.parent_fk}'", row=row)
+                continue
+            roots.append(_build_node(index, item, row, None, parent_id, position, result))
+    return roots
+
+
+def _build_node(level_index: int, item: Dict[str, Any], row: str, parent: Optional[ImportNode],
+                parent_id: Optional[int], position: int, result: ImportResult) -> ImportNode:
+    level = LEVELS[level_index]
+    data = {k: v for k, v in item.items() if k not in (level.children, CHILD_ALIASES.get(level.children), level.parent_fk)}
+    node = ImportNode(level_index, data, row, parent, parent_id, position)
+    if level.children:
+        children = item.get(level.children) or item.get(CHILD_ALIASES.get(level.children, "")) or []
+        if not isinstance(children, list):
+            result.error(node, f"'{level.children}' must be a list")
+            children = []
+        for child_position, child in enumerate(children):
+            child_row = f"{row}.{level.children}[{child_position}]"
+            if not isinstance(child, dict):
+                result.error(None, "Expected an object", row=child_row)
+                continue
+            node.children.append(_build_node(level_index + 1, child, child_row, node, None, child_position, result))
+    return node
+
+
+def parse_rows(rows: Iterable[Tuple[str, Dict[str, Any]]], school_id: int, result: ImportResult) -> List[ImportNode]:
+    """Assemble flat (row label, row) pairs into import trees using each row's path"""
+    roots: List[ImportNode] = []
+    nodes: Dict[Tuple, ImportNode] = {}
+
+    def get_node(level_index: int, anchor: Tuple, segments: List[str], row: str) -> Optional[ImportNode]:
+        """Find or create the (reference) node for an ancestor path"""
+        lookup = anchor + tuple(segments)
+        if lookup in nodes:
+            return nodes[lookup]
+        level = LEVELS[level_index]
+        if len(segments) == 1:
+            parent, parent_id = None, anchor[-1]
+        else:
+            parent = get_node(level_index - 1, anchor, segments[:-1], row)
+            parent_id = None
+        node = ImportNode(level_index, {level.key: segments[-1]}, row, parent, parent_id, is_reference=True)
+        if parent is None:
+            roots.append(node)
+        else:
+            node.position = len(parent.children)
+            parent.children.append(node)
+        nodes[lookup] = node
+        return node
+
+    for row_label, raw in rows:
+        if "_error" in raw:
+            result.error(None, raw["_error"], row=row_label)
+            continue
+        level_index = LEVEL_BY_TYPE.get(str(raw.get("type", "")).strip())
+        if level_index is None:
+            result.error(None, f"Unknown type '{raw.get('type')}', expected one of {', '.join(LEVEL_BY_TYPE)}", row=row_label)
+            continue
+        level = LEVELS[level_index]
+        data = {k: v for k, v in raw.items() if k not in ("type", "path", level.parent_fk) and v not in (None, "")}
+        if not data.get(level.key):
+            result.error(None, f"Missing '{level.key}'", row=row_label)
+            continue
+
+        path = raw.get("path") or []
+        segments = [s.strip() for s in (path.split(PATH_SEPARATOR) if isinstance(path, str) else path) if str(s).strip()]
+        if raw.get(level.parent_fk):
+            # Attached to an existing parent by id; path is ignored
+            try:
+                anchor, segments, root_level = (level.parent_fk, int(raw[level.parent_fk])), [], level_index
+            except (TypeError, ValueError):
+                result.error(None, f"'{level.parent_fk}' must be an integer", row=row_label)
+                continue
+        else:
+            anchor, root_level = ("school_id", school_id), 0
+            if len(segments) != level_index:
+                result.error(None, f"A {level.type_name} needs a path of {level_index} ancestor key(s), got {len(segments)}", row=row_label)
+                continue
+
+        full_path = segments + [str(data[level.key]).strip()]
+        lookup = anchor + tuple(full_path)
+        existing = nodes.get(lookup)
+        if existing is not None and not existing.is_reference:
+            result.error(existing, f"Duplicate {level.type_name} '{data[level.key]}'", row=row_label)
+            continue
+        if existing is not None:
+            # Promote a placeholder created for an earlier child row
+            existing.data, existing.row, existing.is_reference = data, row_label, False
+            continue
+
+        parent = get_node(root_level + len(segments) - 1, anchor, segments, row_label) if segments else None
+        node = ImportNode(level_index, data, row_label, parent, None if parent else anchor[-1], is_reference=False)
+        if parent is None:
+            node.position = len([r for r in roots if r.level == level_index])
+            roots.append(node)
+        else:
+            node.position = len(parent.children)
+            parent.children.append(node)
+        nodes[lookup] = node
+    return roots
+
+
+def iter_ndjson_lines(lines: Iterable[str]) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            row = {"_error": f"Invalid JSON: {e.msg}"}
+        if not isinstance(row, dict):
+            row = {"_error": "Expected a JSON object"}
+        yield f"line {number}", row
+
+
+def iter_csv_rows(text: str) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    reader = csv.DictReader(io.StringIO(text))
+    for number, record in enumerate(reader, start=2):  # line 1 is the header
+        yield f"line {number}", {k.strip(): _parse_cell(k.strip(), v) for k, v in record.items() if k}
+
+
+def _parse_cell(column: str, value: Optional[str]) -> Any:
+    """CSV cells holding lists/objects are JSON; learning_objectives may also be "a|b|c" """
+    if value is None:
+        return None
+    value = value.strip()
+    if value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    if column == "learning_objectives" and value:
+        return [part.strip() for part in value.split("|") if part.strip()]
+    return value
+
+
+# ============= VALIDATION =============
+
+def _walk(roots: List[ImportNode]) -> Iterable[ImportNode]:
+    stack = list(reversed(roots))
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def validate(roots: List[ImportNode], result: ImportResult) -> Dict[int, Dict[str, Any]]:
+    """Validate every node; returns the cleaned column values of each data node by id(node)"""
+    cleaned: Dict[int, Dict[str, Any]] = {}
+    siblings: Dict[Tuple, ImportNode] = {}
+    for node in _walk(roots):
+        level = node.spec
+        if not node.key:
+            result.error(node, f"Missing '{level.key}'")
+            continue
+
+        sibling_key = (node.level, id(node.parent) if node.parent else ("id", node.parent_id), node.key.lower())
+        if sibling_key in siblings and siblings[sibling_key] is not node:
+            result.error(node, f"Duplicate {level.type_name} '{node.key}' under the same parent")
+            continue
+        siblings[sibling_key] = node
+
+        if node.is_reference:
+            continue
+        try:
+            values = level.schema.model_validate(node.data)
+        except ValidationError as e:
+            for err in e.errors():
+                field = ".".join(str(part) for part in err["loc"])
+                result.error(node, f"{field}: {err['msg']}")
+            continue
+        insert_values = values.model_dump()
+        if "display_order" not in node.data:
+            insert_values["display_order"] = node.position
+        cleaned[id(node)] = {
+            "insert": insert_values,
+            "update": values.model_dump(exclude_unset=True),
+        }
+    return cleaned
+
+
+# ============= IMPORT =============
+
+def import_structure(db: Session, roots: List[ImportNode], result: ImportResult,
+                     upsert: bool = True, dry_run: bool = False) -> ImportResult:
+    """Validate and write import trees in one transaction; nothing is written if any row fails"""
+    cleaned = validate(roots, result)
+    if result.errors:
+        return result
+
+    by_level: List[List[ImportNode]] = [[] for _ in LEVELS]
+    for node in _walk(roots):
+        by_level[node.level].append(node)
+
+    try:
+        for level_index, nodes in enumerate(by_level):
+            if nodes:
+                _import_level(db, LEVELS[level_index], nodes, cleaned, result, upsert)
+        if result.errors or dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
+def _import_level(db: Session, level: Level, nodes: List[ImportNode], cleaned: Dict[int, Dict[str, Any]],
+                  result: ImportResult, upsert: bool):
+    model = level.model
+    parent_col = getattr(model, level.parent_fk)
+    key_col = getattr(model, level.key)
+
+    pending = []
+    for node in nodes:
+        parent_id = node.parent.id if node.parent else node.parent_id
+        if parent_id is None:
+            continue  # parent failed; its error is already recorded
+        pending.append((node, int(parent_id)))
+
+    # One query per batch of parents finds every row that already exists
+    existing: Dict[Tuple[int, str], int] = {}
+    parent_ids = sorted({parent_id for _, parent_id in pending})
+    for start in range(0, len(parent_ids), BATCH_SIZE):
+        rows = db.query(model.id, parent_col, key_col).filter(
+            parent_col.in_(parent_ids[start:start + BATCH_SIZE])
+        ).all()
+        for row_id, parent_id, key in rows:
+            if key is not None:
+                existing.setdefault((parent_id, str(key).strip().lower()), row_id)
+
+    inserts: List[Tuple[ImportNode, Dict[str, Any]]] = []
+    updates: List[Dict[str, Any]] = []
+    for node, parent_id in pending:
+        match = existing.get((parent_id, node.key.lower()))
+        if node.is_reference:
+            if match is None:
+                result.error(node, f"{level.type_name} '{node.key}' not found under {level.parent_fk}={parent_id}")
+            node.id = match
+            continue
+        values = cleaned[id(node)]
+        if match is not None:
+            if not upsert:
+                result.error(node, f"{level.type_name} '{node.key}' already exists")
+                continue
+            node.id = match
+            if values["update"]:
+                updates.append({"id": match, **values["update"]})
+        else:
+            inserts.append((node, {**values["insert"], level.parent_fk: parent_id}))
+
+    for start in range(0, len(updates), BATCH_SIZE):
+        db.bulk_update_mappings(model, updates[start:start + BATCH_SIZE])
+    result.updated[level.name] += len(updates)
+
+    for start in range(0, len(inserts), BATCH_SIZE):
+        batch = inserts[start:start + BATCH_SIZE]
+        mappings = [values for _, values in batch]
+        # return_defaults fills in the new primary keys so children can reference them
+        db.bulk_insert_mappings(model, mappings, return_defaults=True)
+        for (node, _), values in zip(batch, mappings):
+            node.id = values["id"]
+    result.created[level.name] += len(inserts)
+    logger.info(f"Bulk import {level.name}: {len(inserts)} created, {len(updates)} updated")
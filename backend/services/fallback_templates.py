@@ -0,0 +1,287 @@
+"""
+Fallback scheme templates built from the curriculum
+When the LLM is unavailable or its answer cannot be parsed, schemes are assembled from the
+subject's own Topic/Subtopic rows: objectives, activities, resources and assessment criteria
+from the database, laid out over the term by the timetable slots (or by each subtopic's
+duration_lessons when there are no slots).
+
+A subject is compiled once into a SubjectTemplate with every lesson entry pre-built, and kept
+per worker until its content version (crud.subject.get_content_version) changes or the curriculum
+references are reloaded (their text is built into the lessons), so building a scheme is only a
+walk over prepared lessons. Without a subject in the database, a template is
+compiled from the topics and subtopics named in the request context.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+from services import kenya_curriculum, metrics
+
+logger = logging.getLogger(__name__)
+
+# Compiled subjects kept per worker (least recently used are evicted first)
+MAX_TEMPLATES = 512
+DEFAULT_WEEKS = 12
+DEFAULT_ACTIVITIES = [
+    "Q/A session to assess prior knowledge",
+    "Teacher explanation and class discussion",
+    "Group work and presentations",
+    "Written exercise",
+]
+DEFAULT_ASSESSMENT = "Oral questions, Class exercise, CAT"
+
+_lock = threading.Lock()
+_templates: "OrderedDict[int, Tuple[Tuple[str, float], SubjectTemplate]]" = OrderedDict()
+
+
+class LessonUnit(NamedTuple):
+    """One subtopic, ready to be emitted duration_lessons times"""
+    topic_key: Any
+    subtopic_key: Any
+    topic_title: str
+    subtopic_title: str
+    duration_lessons: int
+    lesson: Dict[str, Any]  # every lesson field except lesson_number and remarks
+
+
+class SubjectTemplate(NamedTuple):
+    subject_name: str
+    form_grade: str
+    source: str                           # "curriculum" (database rows) or "context"
+    units: List[LessonUnit]               # curriculum order
+    by_subtopic: Dict[Any, LessonUnit]
+    by_topic: Dict[Any, List[LessonUnit]]
+    by_title: Dict[str, LessonUnit]        # normalized "Topic - Subtopic" and subtopic titles
+
+
+def _as_list(value: Any) -> List[str]:
+    """JSON columns hold lists, dicts or plain text; flatten to a list of strings"""
+    if not value:
+        return []
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, str):
+        value = [line.strip(" -•\t") for line in value.splitlines()]
+    return [str(item).strip() for item in value if item and str(item).strip()]
+
+
+def _objectives(topic_objectives: List[str], subtopic_title: str, content: Optional[str]) -> List[str]:
+    objectives = [f"By the end of the lesson, the learner should be able to explain {subtopic_title}"]
+    if content:
+        objectives.append(f"Describe {content.strip().rstrip('.')}")
+    objectives.extend(topic_objectives[:2])
+    return objectives
+
+
+def _unit(subject_name: str, form_grade: str, topic_key: Any, topic_title: str, topic_objectives: List[str],
+          subtopic_key: Any, subtopic_title: str, content: Optional[str] = None, activities: Any = None,
+          resources: Any = None, assessment: Any = None, duration_lessons: Optional[int] = None) -> LessonUnit:
+    assessment_items = _as_list(assessment)
+    lesson = {
+        "topic_subtopic": f"{topic_title} - {subtopic_title}",
+        "specific_objectives": _objectives(topic_objectives, subtopic_title, content),
+        "teaching_learning_activities": _as_list(activities) or DEFAULT_ACTIVITIES,
+        "materials_resources": _as_list(resources) or [f"{subject_name} {form_grade} course book", "Chalkboard/whiteboard"],
+        "references": kenya_curriculum.reference_text(subject_name, form_grade, topic_title),
+        "assessment_opportunities": ", ".join(assessment_items) if assessment_items else DEFAULT_ASSESSMENT,
+    }
+    return LessonUnit(topic_key, subtopic_key, topic_title, subtopic_title, max(1, duration_lessons or 1), lesson)
+
+
+def _title_key(title: Any) -> str:
+    return " ".join(str(title or "").lower().split())
+
+
+def _index(subject_name: str, form_grade: str, source: str, units: List[LessonUnit]) -> SubjectTemplate:
+    by_topic: Dict[Any, List[LessonUnit]] = {}
+    by_title: Dict[str, LessonUnit] = {}
+    for unit in units:
+        by_topic.setdefault(unit.topic_key, []).append(unit)
+        by_title.setdefault(_title_key(unit.lesson["topic_subtopic"]), unit)
+        by_title.setdefault(_title_key(unit.subtopic_title), unit)
+    return SubjectTemplate(subject_name, form_grade, source, units,
+                           {unit.subtopic_key: unit for unit in units}, by_topic, by_title)
+
+
+def find_unit(template: SubjectTemplate, title: Any) -> Optional[LessonUnit]:
+    """Unit of a lesson titled "Topic - Subtopic" (as in generated schemes) or by its subtopic alone"""
+    title = str(title or "")
+    return template.by_title.get(_title_key(title)) or template.by_title.get(_title_key(title.rsplit(" - ", 1)[-1]))
+
+
+def compile_subject(subject) -> SubjectTemplate:
+    """Compile a Subject loaded with its active topics and subtopics (crud.subject.get_with_topics)"""
+    form_grade = subject.term.form_grade.name if getattr(subject, "term", None) and subject.term.form_grade else ""
+    units = []
+    for topic in subject.topics:
+        topic_objectives = _as_list(topic.learning_objectives)
+        for subtopic in topic.subtopics:
+            units.append(_unit(
+                subject.name, form_grade, topic.id, topic.title, topic_objectives,
+                subtopic.id, subtopic.title, subtopic.content, subtopic.activities,
+                subtopic.resources, subtopic.assessment_criteria, subtopic.duration_lessons
+            ))
+        if not topic.subtopics:
+            units.append(_unit(subject.name, form_grade, topic.id, topic.title, topic_objectives,
+                               ("topic", topic.id), topic.title, topic.description,
+                               duration_lessons=topic.duration_weeks))
+    return _index(subject.name, form_grade, "curriculum", units)
+
+
+def compile_from_context(context: Dict[str, Any]) -> SubjectTemplate:
+    """Template from the topics/subtopics named in the request when the subject is not in the database"""
+    subject_name = context.get("subject_name") or "Subject"
+    form_grade = context.get("form_grade") or ""
+    timetable_data = context.get("timetable_data") or {}
+    topics = [t for t in timetable_data.get("selected_topics") or [] if isinstance(t, dict)]
+    subtopics = [st for st in timetable_data.get("selected_subtopics") or [] if isinstance(st, dict)]
+
+    topic_titles = {t.get("id"): t.get("title") or t.get("name") or "Topic" for t in topics}
+    for slot in timetable_data.get("slots") or []:
+        if isinstance(slot, dict) and slot.get("topic_id") is not None:
+            topic_titles.setdefault(slot["topic_id"], slot.get("topic_name") or slot.get("topic") or "Topic")
+    units = []
+    covered = set()
+    for topic_id, topic_title in topic_titles.items():
+        for st in subtopics:
+            if st.get("topic_id") == topic_id:
+                title = st.get("title") or st.get("name") or topic_title
+                units.append(_unit(subject_name, form_grade, topic_id, topic_title, [], st.get("id", title), title,
+                                   duration_lessons=st.get("duration_lessons")))
+                covered.add(topic_id)
+        if topic_id not in covered:
+            units.append(_unit(subject_name, form_grade, topic_id, topic_title, [], ("topic", topic_id), topic_title))
+    return _index(subject_name, form_grade, "context", units)
+
+
+def get_template(db: Session, subject_id: int) -> Optional[SubjectTemplate]:
+    """Compiled template for a subject, recompiled only when its topic/subtopic tree changes or
+    kenya_curriculum reloads the references"""
+    content_version = crud.subject.get_content_version(db=db, subject_id=subject_id)
+    if content_version is None:
+        return None
+    version = (content_version, kenya_curriculum.get_store().mtime)
+    with _lock:
+        cached = _templates.get(subject_id)
+        if cached and cached[0] == version:
+            _templates.move_to_end(subject_id)
+            metrics.record_cache("fallback_template", True)
+            return cached[1]
+    metrics.record_cache("fallback_template", False)
+
+    subject = crud.subject.get_with_topics(db=db, subject_id=subject_id, include_inactive=False)
+    if subject is None:
+        return None
+    template = compile_subject(subject)
+    with _lock:
+        _templates[subject_id] = (version, template)
+        _templates.move_to_end(subject_id)
+        while len(_templates) > MAX_TEMPLATES:
+            _templates.popitem(last=False)
+    return template
+
+
+def _lesson_sequence(template: SubjectTemplate, timetable_data: Dict[str, Any]) -> List[Tuple[LessonUnit, int, int]]:
+    """(unit, lesson within the unit, lessons of the unit) for every lesson of the term"""
+    sequence: List[Tuple[LessonUnit, int, int]] = []
+    slots = [slot for slot in timetable_data.get("slots") or [] if isinstance(slot, dict)]
+    if slots:
+        # One lesson per slot, in curriculum order; slots without a known subtopic take their
+        # topic's subtopics in turn
+        units = []
+        topic_cursor: Dict[Any, int] = {}
+        for slot in slots:
+            unit = template.by_subtopic.get(slot.get("subtopic_id"))
+            if unit is None and template.by_topic.get(slot.get("topic_id")):
+                topic_units = template.by_topic[slot["topic_id"]]
+                position = topic_cursor.get(slot["topic_id"], 0)
+                unit = topic_units[position % len(topic_units)]
+                topic_cursor[slot["topic_id"]] = position + 1
+            if unit is not None:
+                units.append(unit)
+        order = {unit.subtopic_key: index for index, unit in enumerate(template.units)}
+        units.sort(key=lambda unit: order[unit.subtopic_key])
+        counts: Dict[Any, int] = {}
+        for unit in units:
+            counts[unit.subtopic_key] = counts.get(unit.subtopic_key, 0) + 1
+        seen: Dict[Any, int] = {}
+        for unit in units:
+            seen[unit.subtopic_key] = seen.get(unit.subtopic_key, 0) + 1
+            sequence.append((unit, seen[unit.subtopic_key], counts[unit.subtopic_key]))
+        if sequence:
+            return sequence
+
+    selected = {t.get("id") if isinstance(t, dict) else t for t in timetable_data.get("selected_topics") or []}
+    units = [unit for unit in template.units if unit.topic_key in selected] or template.units
+    for unit in units:
+        for part in range(1, unit.duration_lessons + 1):
+            sequence.append((unit, part, unit.duration_lessons))
+    return sequence
+
+
+def lesson_units(template: SubjectTemplate, context: Dict[str, Any]) -> List[LessonUnit]:
+    """Distinct units a scheme built from the template for this context would teach"""
+    return list({unit.subtopic_key: unit for unit, _, _ in _lesson_sequence(template, context.get("timetable_data") or {})}.values())
+
+
+def build_scheme(context: Dict[str, Any], template: Optional[SubjectTemplate] = None,
+                 fragments: Optional[Dict[Any, List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+    """Deterministic scheme of work in the same shape as a parsed LLM response. fragments maps
+    subtopic keys to generated lesson fields (services.content_library), one entry per lesson,
+    which replace the template's fields for those units."""
+    if template is None:
+        template = compile_from_context(context)
+    timetable_data = context.get("timetable_data") or {}
+    subject_name = context.get("subject_name") or template.subject_name
+    form_grade = context.get("form_grade") or template.form_grade
+    total_weeks = int(timetable_data.get("total_weeks") or context.get("total_weeks") or DEFAULT_WEEKS)
+
+    sequence = _lesson_sequence(template, timetable_data)
+    lessons_per_week = max(1, math.ceil(len(sequence) / total_weeks)) if sequence else 0
+    weeks = []
+    for week_index in range(total_weeks):
+        chunk = sequence[week_index * lessons_per_week:(week_index + 1) * lessons_per_week] if lessons_per_week else []
+        week_topics = list(dict.fromkeys(unit.topic_title for unit, _, _ in chunk))
+        week_subtopics = list(dict.fromkeys(unit.subtopic_title for unit, _, _ in chunk))
+        lessons = []
+        for number, (unit, part, parts) in enumerate(chunk, start=1):
+            remarks = f"Lesson {part} of {parts} on {unit.subtopic_title}." if parts > 1 else ""
+            generated = (fragments or {}).get(unit.subtopic_key)
+            fields = {**unit.lesson, **generated[(part - 1) % len(generated)]} if generated else unit.lesson
+            lessons.append({"lesson_number": number, **fields, "remarks": remarks})
+        weeks.append({
+            "week_number": week_index + 1,
+            "theme": " / ".join(week_topics) if week_topics else "Revision and Assessment",
+            "learning_focus": "; ".join(week_subtopics) if week_subtopics else "Review of the term's work and end of term assessment",
+            "lessons": lessons,
+        })
+
+    return {
+        "scheme_content": {
+            "scheme_header": {
+                "school_name": context.get("school_name", "School Name"),
+                "subject": subject_name,
+                "form_grade": form_grade,
+                "term": context.get("term", ""),
+                "academic_year": context.get("academic_year", str(datetime.utcnow().year)),
+                "total_weeks": total_weeks,
+                "total_lessons": len(sequence),
+                "learning_progression": "Follows the curriculum order of topics and subtopics"
+            },
+            "weeks": weeks
+        },
+        "metadata": {
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "ai_model": None,
+            "total_weeks": total_weeks,
+            "total_lessons": len(sequence),
+            "generation_source": "content_library" if fragments else f"{template.source}_template",
+        }
+    }
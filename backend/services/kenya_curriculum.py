@@ -1,103 +1,130 @@
-from typing import Dict, List
+"""
+Kenya curriculum references (approved textbooks, competencies, assessment guidelines)
+The data lives in data/curriculum_references.json (CURRICULUM_REFERENCES_FILE) and is loaded
+once per process into read-only mappings indexed by (subject, form). The file is checked for
+changes at most every RELOAD_INTERVAL seconds and reloaded in place; a file that fails to
+load is logged and the previous data is kept.
+
+get_references() feeds the generation prompt and reference_text() the PDF References column.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REFERENCES_FILE = os.getenv(
+    "CURRICULUM_REFERENCES_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "curriculum_references.json")
+)
+RELOAD_INTERVAL = 5.0
+
+
+@lru_cache(maxsize=1024)
+def normalize_key(value: str) -> str:
+    """'Form 2' → 'form_2', 'Christian Religious Education' → 'christian_religious_education'"""
+    return "_".join((value or "").lower().split())
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ReferenceStore(NamedTuple):
+    version: Any
+    mtime: float
+    references: Mapping[Tuple[str, str], Mapping[str, Any]]
+    default: Mapping[str, Any]
+    assessment_guidelines: Mapping[str, Any]
+
+
+def load_store(path: str = REFERENCES_FILE) -> ReferenceStore:
+    mtime = os.path.getmtime(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    references = {
+        (normalize_key(subject), normalize_key(form)): _freeze(entry)
+        for subject, forms in data.get("subjects", {}).items()
+        for form, entry in forms.items()
+    }
+    return ReferenceStore(
+        version=data.get("version"),
+        mtime=mtime,
+        references=MappingProxyType(references),
+        default=_freeze(data.get("default", {})),
+        assessment_guidelines=_freeze(data.get("assessment_guidelines", {})),
+    )
+
+
+_lock = threading.Lock()
+_store: Optional[ReferenceStore] = None
+_checked_at = 0.0
+
+
+def get_store() -> ReferenceStore:
+    """The current store, reloaded when the data file has changed"""
+    global _store, _checked_at
+    now = time.monotonic()
+    if _store is not None and now - _checked_at < RELOAD_INTERVAL:
+        return _store
+    with _lock:
+        if _store is not None and now - _checked_at < RELOAD_INTERVAL:
+            return _store
+        _checked_at = now
+        try:
+            if _store is None or os.path.getmtime(REFERENCES_FILE) != _store.mtime:
+                store = load_store(REFERENCES_FILE)
+                if _store is not None:
+                    logger.info(f"Reloaded curriculum references (version {store.version})")
+                _store = store
+                _default_references.cache_clear()
+        except (OSError, ValueError) as e:
+            if _store is None:
+                raise
+            logger.error(f"Keeping previous curriculum references, reload failed: {e}")
+    return _store
+
+
+@lru_cache(maxsize=256)
+def _default_references(subject: str) -> Mapping[str, Any]:
+    def fill(value: Any) -> Any:
+        if isinstance(value, str):
+            return value.replace("{subject}", subject)
+        if isinstance(value, tuple):
+            return tuple(fill(item) for item in value)
+        return value
+    return MappingProxyType({key: fill(value) for key, value in get_store().default.items()})
+
+
+def get_references(subject: str, form_grade: str) -> Mapping[str, Any]:
+    """main_textbook, textbooks and competencies for a subject and form (read-only)"""
+    entry = get_store().references.get((normalize_key(subject), normalize_key(form_grade)))
+    return entry if entry is not None else _default_references(subject)
+
+
+def reference_text(subject: str, form_grade: str, topic: Optional[str] = None) -> str:
+    """Short reference for a lesson, e.g. 'KLB Mathematics Form 1 - Algebra'"""
+    main_textbook = get_references(subject, form_grade).get("main_textbook") or f"{subject} {form_grade} course book"
+    return f"{main_textbook} - {topic}" if topic else main_textbook
+
 
 class KenyaCurriculumService:
     """Service for Kenya curriculum references and standards"""
-    
-    def __init__(self):
-        self.curriculum_data = self._load_curriculum_data()
-    
-    def get_subject_references(self, subject: str, form_grade: str) -> Dict[str, any]:
+
+    def get_subject_references(self, subject: str, form_grade: str) -> Mapping[str, Any]:
         """Get approved textbooks and references for a subject and form"""
-        subject_key = subject.lower().replace(" ", "_")
-        form_key = form_grade.lower().replace(" ", "_").replace("form_", "form_")
-        
-        return self.curriculum_data.get(subject_key, {}).get(form_key, self._get_default_references(subject))
-    
-    def _load_curriculum_data(self) -> Dict:
-        """Load comprehensive Kenya curriculum reference data"""
-        return {
-            # MATHEMATICS
-            "mathematics": {
-                "form_1": {
-                    "main_textbook": "KLB Mathematics Form 1",
-                    "textbooks": [
-                        "KLB Mathematics Form 1 Student's Book",
-                        "Oxford Mathematics for Secondary Schools Book 1",
-                        "Longhorn Mathematics Form 1",
-                        "KLB Mathematics Form 1 Teacher's Guide"
-                    ],
-                    "competencies": [
-                        "Number operations and algebraic thinking",
-                        "Geometry and spatial reasoning", 
-                        "Measurement and data analysis",
-                        "Mathematical reasoning and problem solving"
-                    ]
-                },
-                "form_2": {
-                    "main_textbook": "KLB Mathematics Form 2",
-                    "textbooks": [
-                        "KLB Mathematics Form 2 Student's Book",
-                        "Oxford Mathematics for Secondary Schools Book 2",
-                        "Longhorn Mathematics Form 2",
-                        "KLB Mathematics Form 2 Teacher's Guide"
-                    ],
-                    "competencies": [
-                        "Advanced algebraic expressions and equations",
-                        "Geometric constructions and transformations",
-                        "Statistics and probability concepts",
-                        "Mathematical modeling and applications"
-                    ]
-                }
-            },
-            # ... (rest of curriculum data omitted for brevity, but will be included in the actual file) ...
-        }
-    
-    def _get_default_references(self, subject: str) -> Dict[str, any]:
-        """Get default references for subjects not specifically defined"""
-        return {
-            "main_textbook": f"KLB {subject} Student's Book",
-            "textbooks": [
-                f"KLB {subject} Student's Book",
-                f"Oxford {subject} for Secondary Schools",
-                f"Longhorn {subject}",
-                f"Approved {subject} Teacher's Guide"
-            ],
-            "competencies": [
-                "Core subject knowledge and understanding",
-                "Critical thinking and problem-solving skills",
-                "Communication and collaboration abilities",
-                "Self-directed learning and adaptation"
-            ]
-        }
-    
-    def get_assessment_guidelines(self, subject: str, form_grade: str) -> Dict[str, any]:
+        return get_references(subject, form_grade)
+
+    def get_assessment_guidelines(self, subject: str, form_grade: str) -> Mapping[str, Any]:
         """Get KICD assessment guidelines for the subject"""
-        return {
-            "formative_assessment": [
-                "Continuous Assessment Tests (CATs)",
-                "Class participation and engagement",
-                "Practical work and assignments",
-                "Group projects and presentations",
-                "Peer assessment activities"
-            ],
-            "summative_assessment": [
-                "End of term examinations",
-                "Annual examinations",
-                "KCSE preparation (Form 4)",
-                "Practical examinations (where applicable)"
-            ],
-            "grading_scale": {
-                "A": "80-100% (Excellent)",
-                "A-": "75-79% (Very Good)", 
-                "B+": "70-74% (Good)",
-                "B": "65-69% (Good)",
-                "B-": "60-64% (Satisfactory)",
-                "C+": "55-59% (Satisfactory)",
-                "C": "50-54% (Average)",
-                "C-": "45-49% (Average)",
-                "D+": "40-44% (Below Average)",
-                "D": "35-39% (Below Average)",
-                "D-": "30-34% (Poor)",
-                "E": "Below 30% (Very Poor)"
-            }
-        } 
\ No newline at end of file
+        return get_store().assessment_guidelines
@@ -0,0 +1,252 @@
+"""
+Batch lesson-plan generation
+A scheme's generated_content is expanded into one job per lesson: each lesson is matched to its
+subtopic (its "Topic - Subtopic" title against the subject's compiled template) and to a period
+of the scheme's timetable (the lessons of a week take the timetable's periods in order, dated
+from the term's start_date).
+
+Jobs are grouped by subtopic, up to MAX_LESSONS_PER_REQUEST consecutive lessons per group, and
+each group is one LLM request. Groups whose plans are in the shared library
+(services.content_library, per subtopic, form and style) cost no call, whichever teacher's scheme
+generated them; the others run on LESSON_PLAN_CONCURRENCY threads and their plans are added to the
+library. Groups the LLM cannot answer get plans built from the scheme's own lesson entries.
+
+The plans replace the scheme's earlier ones in one bulk insert. Progress is written to the
+batch's lesson_plan_batches row as each group finishes, so any worker can report it.
+"""
+
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+import models
+from services import content_library, fallback_templates
+from services.timetable_analytics import day_index
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("LESSON_PLAN_CONCURRENCY", "6"))
+MAX_LESSONS_PER_REQUEST = 4
+LESSON_MINUTES = 40
+# A queued or running batch older than this is taken as abandoned (e.g. its worker restarted)
+STALE_BATCH_SECONDS = 900
+
+
+class LessonJob(NamedTuple):
+    number: int                      # lesson_number across the scheme
+    week: int
+    lesson: Dict[str, Any]           # the scheme's lesson entry
+    topic_id: Optional[int]
+    subtopic_id: Optional[int]
+    topic_title: str
+    subtopic_title: str
+    group: Tuple                     # subtopic (or title) and chunk
+    period: Optional[Tuple]          # (day_of_week, period_number, time_slot)
+
+
+def _normalize(text: Any) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def _weeks(generated_content: Any) -> List[Dict[str, Any]]:
+    weeks = generated_content.get("weeks") if isinstance(generated_content, dict) else generated_content
+    return [week for week in weeks or [] if isinstance(week, dict)]
+
+
+def count_lessons(generated_content: Any) -> int:
+    return sum(len(week.get("lessons") or []) for week in _weeks(generated_content))
+
+
+def expand_jobs(db: Session, scheme: models.SchemeOfWork) -> List[LessonJob]:
+    """One job per lesson of the scheme's generated_content, in teaching order"""
+    template = fallback_templates.get_template(db, scheme.subject_id) if scheme.subject_id else None
+    periods = sorted(
+        {(day_index(day), period): (day, period, time_slot)
+         for day, period, time_slot in crud.timetable.get_scheme_periods(db, scheme.id)
+         if day_index(day) is not None}.items()
+    )
+
+    jobs: List[LessonJob] = []
+    group_sizes: Dict[Any, int] = {}
+    for week_index, week in enumerate(_weeks(scheme.generated_content)):
+        week_number = week.get("week_number") or week_index + 1
+        for position, lesson in enumerate(lesson for lesson in week.get("lessons") or [] if isinstance(lesson, dict)):
+            title = lesson.get("topic_subtopic") or week.get("theme") or ""
+            unit = fallback_templates.find_unit(template, title) if template else None
+            if unit is not None and not isinstance(unit.subtopic_key, tuple):
+                unit_key, topic_id, subtopic_id = ("subtopic", unit.subtopic_key), unit.topic_key, unit.subtopic_key
+                topic_title, subtopic_title = unit.topic_title, unit.subtopic_title
+            else:
+                topic_title, _, subtopic_title = title.partition(" - ")
+                unit_key, topic_id, subtopic_id = ("title", _normalize(title)), getattr(unit, "topic_key", None), None
+                subtopic_title = subtopic_title or topic_title
+            size = group_sizes.get(unit_key, 0)
+            group_sizes[unit_key] = size + 1
+            jobs.append(LessonJob(
+                len(jobs) + 1, week_number, lesson, topic_id, subtopic_id, topic_title, subtopic_title,
+                (unit_key, size // MAX_LESSONS_PER_REQUEST),
+                periods[position][1] if position < len(periods) else None,
+            ))
+    return jobs
+
+
+def _library_plans(library: Dict[int, List[Optional[Dict[str, Any]]]], group: Tuple,
+                   group_jobs: List[LessonJob]) -> Optional[List[Dict[str, Any]]]:
+    """The group's plans from the library, if it has every one of them"""
+    start = group[1] * MAX_LESSONS_PER_REQUEST
+    plans = library.get(group_jobs[0].subtopic_id, [])[start:start + len(group_jobs)]
+    return plans if len(plans) == len(group_jobs) and all(plans) else None
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(",")]
+    return [str(item) for item in value or [] if item]
+
+
+def template_plan(job: LessonJob) -> Dict[str, Any]:
+    """A plan from the scheme's own lesson entry, used when the LLM cannot answer"""
+    lesson = job.lesson
+    return {
+        "objectives": _as_list(lesson.get("specific_objectives")),
+        "introduction": f"Review of prior knowledge and introduction to {job.subtopic_title}",
+        "development": _as_list(lesson.get("teaching_learning_activities")),
+        "conclusion": f"Summary of {job.subtopic_title} and a short written exercise",
+        "resources": _as_list(lesson.get("materials_resources")),
+        "assessment": _as_list(lesson.get("assessment_opportunities")) or ["Oral questions"],
+    }
+
+
+def _scheduled_date(term_start: Optional[datetime], week: int, period: Optional[Tuple]) -> Optional[datetime]:
+    if term_start is None or period is None or not isinstance(week, int):
+        return None
+    monday = term_start - timedelta(days=term_start.weekday())
+    return monday + timedelta(weeks=week - 1, days=day_index(period[0]))
+
+
+def _row(scheme: models.SchemeOfWork, job: LessonJob, plan: Dict[str, Any], source: str) -> Dict[str, Any]:
+    activities = [{"stage": "introduction", "description": plan.get("introduction") or ""}]
+    activities += [{"stage": "development", "description": step} for step in _as_list(plan.get("development"))]
+    activities.append({"stage": "conclusion", "description": plan.get("conclusion") or ""})
+    day, period_number, time_slot = job.period or (None, None, None)
+    return {
+        "user_id": scheme.user_id,
+        "scheme_id": scheme.id,
+        "topic_id": job.topic_id,
+        "subtopic_id": job.subtopic_id,
+        "lesson_number": job.number,
+        "duration_minutes": LESSON_MINUTES,
+        "objectives": _as_list(plan.get("objectives")),
+        "activities": activities,
+        "resources": _as_list(plan.get("resources")),
+        "assessment": {"methods": _as_list(plan.get("assessment"))},
+        "content": {
+            "title": job.lesson.get("topic_subtopic") or job.subtopic_title,
+            "week_number": job.week,
+            "day_of_week": day,
+            "period_number": period_number,
+            "time_slot": time_slot,
+            "references": job.lesson.get("references"),
+            "remarks": job.lesson.get("remarks"),
+            "source": source,
+        },
+        "scheduled_date": _scheduled_date(scheme.term.start_date if scheme.term else None, job.week, job.period),
+    }
+
+
+def start_batch(db: Session, scheme: models.SchemeOfWork, user_id: int) -> Tuple[models.LessonPlanBatch, bool]:
+    """The scheme's batch in progress, or a new queued one; (batch, created)"""
+    since = datetime.utcnow() - timedelta(seconds=STALE_BATCH_SECONDS)
+    active = crud.lesson_plan.get_active_batch(db, scheme.id, since)
+    if active is not None:
+        return active, False
+    return crud.lesson_plan.create_batch(db, scheme.id, user_id), True
+
+
+def run(db: Session, batch: models.LessonPlanBatch, scheme: models.SchemeOfWork, ai_service,
+        config: Optional[Dict[str, Any]] = None) -> models.LessonPlanBatch:
+    """Generate and store every lesson plan of the scheme, updating batch as groups finish"""
+    config = config or {}
+    try:
+        jobs = expand_jobs(db, scheme)
+        groups: "OrderedDict[Tuple, List[LessonJob]]" = OrderedDict()
+        for job in jobs:
+            groups.setdefault(job.group, []).append(job)
+        crud.lesson_plan.update_batch(db, batch, status="running", started_at=datetime.utcnow(),
+                                      total_lessons=len(jobs), subtopics=len(groups))
+
+        form_grade = scheme.form_grade.name if scheme.form_grade else ""
+        library = content_library.lookup(db, content_library.LESSON_PLAN,
+                                         [job.subtopic_id for job in jobs if job.subtopic_id is not None],
+                                         form_grade, config)
+        results: Dict[Tuple, Tuple[List[Dict[str, Any]], str]] = {}
+        generated: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        model = None
+        completed = cache_hits = llm_calls = fallbacks = 0
+        for group, group_jobs in groups.items():
+            plans = _library_plans(library, group, group_jobs)
+            if plans is not None:
+                results[group] = (plans, "library")
+                completed += len(group_jobs)
+                cache_hits += 1
+        if cache_hits:
+            crud.lesson_plan.update_batch(db, batch, completed_lessons=completed, cache_hits=cache_hits)
+
+        pending = [group for group in groups if group not in results]
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(CONCURRENCY, len(pending))),
+                                    thread_name_prefix="lesson-plans") as pool:
+                futures = {
+                    pool.submit(ai_service.generate_lesson_plans, {
+                        "subject_name": scheme.subject_name,
+                        "form_grade": form_grade,
+                        "topic_title": groups[group][0].topic_title,
+                        "subtopic_title": groups[group][0].subtopic_title,
+                        "lesson_minutes": LESSON_MINUTES,
+                    }, [job.lesson for job in groups[group]], config): group
+                    for group in pending
+                }
+                for future in as_completed(futures):
+                    group = futures[future]
+                    plans, telemetry = future.result()
+                    llm_calls += 1 if telemetry.get("attempts") else 0
+                    if plans is not None:
+                        results[group] = (plans, "llm")
+                        model = telemetry.get("model") or model
+                        subtopic_id = groups[group][0].subtopic_id
+                        if subtopic_id is not None:
+                            start = group[1] * MAX_LESSONS_PER_REQUEST
+                            generated.setdefault(subtopic_id, {}).update(
+                                (start + index, plan) for index, plan in enumerate(plans)
+                            )
+                    else:
+                        fallbacks += 1
+                        results[group] = ([template_plan(job) for job in groups[group]], "template")
+                    completed += len(groups[group])
+                    crud.lesson_plan.update_batch(db, batch, completed_lessons=completed, llm_calls=llm_calls,
+                                                  fallbacks=fallbacks)
+
+        try:
+            content_library.store(db, content_library.LESSON_PLAN, generated, form_grade, config, model)
+        except Exception as library_error:
+            # e.g. another batch stored the same subtopics first; the plans are saved either way
+            logger.warning(f"Could not add lesson plans of batch {batch.id} to the content library: {library_error}")
+            db.rollback()
+        rows = [
+            _row(scheme, job, results[group][0][index], results[group][1])
+            for group, group_jobs in groups.items() for index, job in enumerate(group_jobs)
+        ]
+        rows.sort(key=lambda row: row["lesson_number"])
+        crud.lesson_plan.replace_for_scheme(db, scheme.id, rows)
+        return crud.lesson_plan.update_batch(db, batch, status="completed", finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.error(f"Lesson plan batch {batch.id} failed: {e}")
+        db.rollback()
+        return crud.lesson_plan.update_batch(db, batch, status="failed", error=str(e)[:500],
+                                             finished_at=datetime.utcnow())
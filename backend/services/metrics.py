@@ -0,0 +1,197 @@
+"""
+Prometheus metrics for the EDUScheme API
+Collects per-route HTTP metrics, LLM and PDF timings, DB pool usage and cache hit counts.
+
+When PROMETHEUS_MULTIPROC_DIR is set (required under multiple gunicorn workers) every
+worker writes its samples to shared files in that directory and /metrics aggregates them.
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        CONTENT_TYPE_LATEST,
+        generate_latest,
+        multiprocess,
+        REGISTRY,
+    )
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    logger.warning("prometheus_client not installed, metrics collection disabled")
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Latency buckets tuned for API requests (seconds)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM completions and PDF renders are much slower than regular requests
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+if METRICS_AVAILABLE:
+    HTTP_REQUESTS = Counter(
+        "eduscheme_http_requests_total",
+        "Total HTTP requests by route template",
+        ["method", "route", "status"],
+    )
+    HTTP_LATENCY = Histogram(
+        "eduscheme_http_request_duration_seconds",
+        "HTTP request latency by route template",
+        ["method", "route"],
+        buckets=HTTP_BUCKETS,
+    )
+    HTTP_IN_FLIGHT = Gauge(
+        "eduscheme_http_requests_in_flight",
+        "HTTP requests currently being processed",
+        ["method"],
+        multiprocess_mode="livesum",
+    )
+    LLM_LATENCY = Histogram(
+        "eduscheme_llm_request_duration_seconds",
+        "LLM completion latency",
+        ["model", "outcome"],
+        buckets=SLOW_BUCKETS,
+    )
+    LLM_TOKENS = Counter(
+        "eduscheme_llm_tokens_total",
+        "LLM tokens consumed",
+        ["model", "kind"],
+    )
+    LLM_HEDGES = Counter(
+        "eduscheme_llm_hedged_requests_total",
+        "Hedged LLM requests by hedge route and result (launched/won)",
+        ["model", "result"],
+    )
+    PDF_RENDER = Histogram(
+        "eduscheme_pdf_render_duration_seconds",
+        "Scheme of work PDF render time",
+        ["outcome"],
+        buckets=SLOW_BUCKETS,
+    )
+    DB_POOL_CHECKED_OUT = Gauge(
+        "eduscheme_db_pool_connections_checked_out",
+        "Database connections currently checked out of the pool",
+        multiprocess_mode="livesum",
+    )
+    CACHE_REQUESTS = Counter(
+        "eduscheme_cache_requests_total",
+        "Cache lookups by cache name and result (hit/miss)",
+        ["cache", "result"],
+    )
+
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    """Record a finished HTTP request"""
+    if not METRICS_AVAILABLE:
+        return
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_LATENCY.labels(method, route).observe(duration)
+
+
+@contextmanager
+def track_in_flight(method: str):
+    """Count a request as in flight for the duration of the block"""
+    if not METRICS_AVAILABLE:
+        yield
+        return
+    gauge = HTTP_IN_FLIGHT.labels(method)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def observe_llm_call(model: str, duration: float, outcome: str = "success", usage=None):
+    """Record an LLM completion; usage is the provider usage object (prompt/completion tokens)"""
+    if not METRICS_AVAILABLE:
+        return
+    LLM_LATENCY.labels(model, outcome).observe(duration)
+    if usage is not None:
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        if prompt_tokens:
+            LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+
+
+def record_hedge(model: str, result: str):
+    """Count a hedge request being launched or winning the race"""
+    if not METRICS_AVAILABLE:
+        return
+    LLM_HEDGES.labels(model, result).inc()
+
+
+@contextmanager
+def time_pdf_render():
+    """Time a PDF render, labelling the outcome as success or error"""
+    if not METRICS_AVAILABLE:
+        yield
+        return
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        PDF_RENDER.labels(outcome).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    """Record a cache lookup so hit ratios can be derived per cache"""
+    if not METRICS_AVAILABLE:
+        return
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def instrument_engine(engine):
+    """Track pool checkouts on a SQLAlchemy engine"""
+    if not METRICS_AVAILABLE:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Render the current metrics in the Prometheus text format"""
+    if not METRICS_AVAILABLE:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+    if MULTIPROC_DIR:
+        # Aggregate the per-worker files instead of this worker's in-memory registry
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int):
+    """Clean up live gauges of an exited gunicorn worker"""
+    if METRICS_AVAILABLE and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def route_template(request) -> str:
+    """Return the matched route template (e.g. /api/schemes/{scheme_id}) to keep label cardinality bounded"""
+    route = request.scope.get("route")
+    path: Optional[str] = getattr(route, "path", None)
+    return path or "unmatched"
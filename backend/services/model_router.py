@@ -0,0 +1,319 @@
+"""
+Model routing and hedged requests for LLM completions
+Each generation is routed by its estimated output size and the latency SLO: the first route
+in GROQ_MODELS whose context window fits the output and whose predicted latency (p95 time to
+first token plus the output at the route's token rate) is within GENERATION_SLO_SECONDS is
+used; when none meets the SLO, the fastest route that fits is used instead.
+
+Completions are streamed. If the primary route has produced no token by its hedge deadline
+(the p95 of its recent times to first token), the same request is also sent to a hedge route:
+another model or, with GROQ_HEDGE_BASE_URL, another endpoint (the primary route itself when
+there is no alternative). Whichever streams first wins and the other stream is closed.
+
+Times to first token and token rates are tracked in memory per worker; until a route has
+MIN_SAMPLES observations the defaults below are used.
+"""
+
+import logging
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from services import metrics, prompt_budget
+
+logger = logging.getLogger(__name__)
+
+# Candidate models in order of preference (cheapest first)
+GROQ_MODELS = [m.strip() for m in os.getenv("GROQ_MODELS", "llama3-8b-8192,llama-3.1-8b-instant").split(",") if m.strip()]
+# Optional second endpoint serving the same models, used for hedge requests
+HEDGE_BASE_URL = os.getenv("GROQ_HEDGE_BASE_URL") or None
+HEDGING_ENABLED = os.getenv("GROQ_HEDGING", "1").lower() not in ("0", "false", "no")
+SLO_SECONDS = float(os.getenv("GENERATION_SLO_SECONDS", "30"))
+
+# Hedge deadline bounds and the time to first token assumed before enough samples exist
+HEDGE_MIN_SECONDS = 0.5
+HEDGE_MAX_SECONDS = 10.0
+DEFAULT_TTFT_SECONDS = 2.0
+MIN_SAMPLES = 20
+WINDOW_SIZE = 200
+
+# Typical generation speed per model; replaced by observed rates once available
+MODEL_TOKENS_PER_SECOND = {
+    "llama3-8b-8192": 750,
+    "llama3-70b-8192": 300,
+    "llama-3.1-8b-instant": 750,
+    "llama-3.3-70b-versatile": 275,
+    "mixtral-8x7b-32768": 500,
+    "gemma2-9b-it": 600,
+}
+DEFAULT_TOKENS_PER_SECOND = 400
+
+# Output size of a scheme: roughly this many tokens per lesson plus the header and week themes
+TOKENS_PER_LESSON = 110
+SCHEME_OVERHEAD_TOKENS = 400
+# Smallest prompt a route must leave room for besides the output
+MIN_PROMPT_TOKENS = 1500
+
+
+def estimate_output_tokens(lessons: int) -> int:
+    return SCHEME_OVERHEAD_TOKENS + max(1, lessons) * TOKENS_PER_LESSON
+
+
+class Route(NamedTuple):
+    model: str
+    base_url: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.model}@{self.base_url or 'default'}"
+
+
+class RoutePlan(NamedTuple):
+    primary: Route
+    hedge: Optional[Route]
+    output_tokens: int
+    predicted_seconds: float
+
+
+class StreamResult(NamedTuple):
+    route: Route
+    content: str
+    usage: Any
+    ttft: float             # seconds from the start of the call to the winner's first token
+    hedge_launched: bool
+    hedge_won: bool
+
+
+class LatencyTracker:
+    """Rolling time-to-first-token and token-rate samples per route"""
+
+    def __init__(self, window: int = WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._ttft: Dict[str, deque] = {}
+        self._rates: Dict[str, deque] = {}
+        self.window = window
+
+    def observe(self, route: Route, ttft: float, completion_tokens: int = 0, generation_seconds: float = 0.0):
+        with self._lock:
+            self._ttft.setdefault(route.key, deque(maxlen=self.window)).append(ttft)
+            if completion_tokens and generation_seconds > 0:
+                self._rates.setdefault(route.key, deque(maxlen=self.window)).append(
+                    completion_tokens / generation_seconds
+                )
+
+    def ttft_p95(self, route: Route) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._ttft.get(route.key, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+
+    def tokens_per_second(self, route: Route) -> float:
+        with self._lock:
+            samples = list(self._rates.get(route.key, ()))
+        if len(samples) >= MIN_SAMPLES:
+            return statistics.median(samples)
+        return MODEL_TOKENS_PER_SECOND.get(route.model, DEFAULT_TOKENS_PER_SECOND)
+
+    def hedge_deadline(self, route: Route) -> float:
+        p95 = self.ttft_p95(route)
+        return min(HEDGE_MAX_SECONDS, max(HEDGE_MIN_SECONDS, p95 if p95 is not None else DEFAULT_TTFT_SECONDS))
+
+    def predicted_seconds(self, route: Route, output_tokens: int) -> float:
+        p95 = self.ttft_p95(route)
+        ttft = p95 if p95 is not None else DEFAULT_TTFT_SECONDS
+        return ttft + output_tokens / self.tokens_per_second(route)
+
+
+def chunk_usage(chunk) -> Optional[Any]:
+    """Token usage carried by a streamed chunk, as an object with attributes, or None.
+
+    Groq reports it on the final chunk under x_groq, which the SDK (groq 0.4) leaves a plain
+    dict; OpenAI-compatible servers may put it on the chunk itself."""
+    usage = None
+    x_groq = getattr(chunk, "x_groq", None)
+    if isinstance(x_groq, dict):
+        usage = x_groq.get("usage")
+    elif x_groq is not None:
+        usage = getattr(x_groq, "usage", None)
+    usage = usage or getattr(chunk, "usage", None)
+    if isinstance(usage, dict):
+        usage = SimpleNamespace(**usage)
+    return usage
+
+
+class _Attempt:
+    def __init__(self, route: Route, role: str):
+        self.route = route
+        self.role = role
+        self.started = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.usage = None
+        self.parts: List[str] = []
+        self.stream = None
+        self.error: Optional[Exception] = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        stream = self.stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class ModelRouter:
+    def __init__(self, routes: List[Route], tracker: Optional[LatencyTracker] = None,
+                 slo_seconds: float = SLO_SECONDS, hedging: bool = HEDGING_ENABLED):
+        if not routes:
+            raise ValueError("At least one model route is required")
+        self.routes = routes
+        self.tracker = tracker or LatencyTracker()
+        self.slo_seconds = slo_seconds
+        self.hedging = hedging
+
+    def plan(self, output_tokens: int) -> RoutePlan:
+        """Pick the primary and hedge routes for a completion of about output_tokens"""
+        fitting = [
+            route for route in self.routes
+            if prompt_budget.context_tokens(route.model) - prompt_budget.SAFETY_MARGIN_TOKENS - output_tokens
+            >= MIN_PROMPT_TOKENS
+        ] or [max(self.routes, key=lambda route: prompt_budget.context_tokens(route.model))]
+
+        predicted = {route: self.tracker.predicted_seconds(route, output_tokens) for route in fitting}
+        within_slo = [route for route in fitting if predicted[route] <= self.slo_seconds]
+        primary = within_slo[0] if within_slo else min(fitting, key=predicted.get)
+
+        hedge = None
+        if self.hedging:
+            alternatives = [route for route in fitting if route != primary]
+            hedge = min(alternatives, key=predicted.get) if alternatives else primary
+        return RoutePlan(primary, hedge, output_tokens, predicted[primary])
+
+    def complete(self, plan: RoutePlan, client_for: Callable[[Route], Any], messages: List[Dict[str, str]],
+                 prompt_tokens: int, temperature: float = 0.7) -> StreamResult:
+        """Stream one completion on plan.primary, hedged on plan.hedge. Raises the primary's
+        error when every attempt fails, or the winner's error if it fails mid-stream."""
+        started = time.perf_counter()
+        events: queue.Queue = queue.Queue()
+
+        def start(route: Route, role: str) -> _Attempt:
+            attempt = _Attempt(route, role)
+            max_tokens = prompt_budget.completion_budget(route.model, prompt_tokens)
+            threading.Thread(
+                target=self._run, args=(attempt, client_for(route), messages, max_tokens, temperature, events),
+                name=f"llm-{role}", daemon=True,
+            ).start()
+            return attempt
+
+        attempts = [start(plan.primary, "primary")]
+        hedge_at = started + self.tracker.hedge_deadline(plan.primary) if plan.hedge else None
+        winner: Optional[_Attempt] = None
+
+        def launch_hedge():
+            attempts.append(start(plan.hedge, "hedge"))
+            metrics.record_hedge(plan.hedge.model, "launched")
+            logger.info(f"Hedging {plan.primary.key} with {plan.hedge.key}")
+
+        while True:
+            timeout = max(0.0, hedge_at - time.perf_counter()) if hedge_at is not None and winner is None else None
+            try:
+                kind, attempt, error = events.get(timeout=timeout)
+            except queue.Empty:
+                hedge_at = None
+                launch_hedge()
+                continue
+            if winner is not None and attempt is not winner:
+                continue
+
+            if kind == "error":
+                if attempt is winner:
+                    raise error
+                attempt.error = error
+                if hedge_at is not None:
+                    hedge_at = None
+                    launch_hedge()
+                elif all(a.error is not None for a in attempts):
+                    raise attempts[0].error
+                continue
+
+            if winner is None:
+                winner = attempt
+                for other in attempts:
+                    if other is not winner:
+                        other.cancel()
+            if kind == "done":
+                break
+
+        generation_seconds = time.perf_counter() - winner.started - (winner.ttft or 0.0)
+        completion_tokens = getattr(winner.usage, "completion_tokens", None) or 0
+        self.tracker.observe(winner.route, winner.ttft or 0.0, completion_tokens, generation_seconds)
+        hedge_won = winner.role == "hedge"
+        if hedge_won:
+            metrics.record_hedge(winner.route.model, "won")
+        first_token_at = winner.started + (winner.ttft or 0.0)
+        return StreamResult(winner.route, "".join(winner.parts), winner.usage,
+                            first_token_at - started, len(attempts) > 1, hedge_won)
+
+    @staticmethod
+    def _run(attempt: _Attempt, client, messages: List[Dict[str, str]], max_tokens: int,
+             temperature: float, events: queue.Queue):
+        try:
+            stream = client.chat.completions.create(
+                model=attempt.route.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            attempt.stream = stream
+            if attempt.cancelled:
+                stream.close()
+            for chunk in stream:
+                if attempt.cancelled:
+                    break
+                choices = getattr(chunk, "choices", None) or []
+                text = getattr(choices[0].delta, "content", None) if choices else None
+                if text:
+                    if attempt.ttft is None:
+                        attempt.ttft = time.perf_counter() - attempt.started
+                        events.put(("first", attempt, None))
+                    attempt.parts.append(text)
+                usage = chunk_usage(chunk)
+                if usage is not None:
+                    attempt.usage = usage
+        except Exception as e:
+            duration = time.perf_counter() - attempt.started
+            if attempt.cancelled:
+                metrics.observe_llm_call(attempt.route.model, duration, outcome="cancelled")
+            else:
+                metrics.observe_llm_call(attempt.route.model, duration, outcome="error")
+                events.put(("error", attempt, e))
+            return
+
+        duration = time.perf_counter() - attempt.started
+        if attempt.cancelled:
+            metrics.observe_llm_call(attempt.route.model, duration, outcome="cancelled")
+            return
+        metrics.observe_llm_call(attempt.route.model, duration, usage=attempt.usage)
+        if attempt.ttft is None:
+            attempt.ttft = duration
+        events.put(("done", attempt, None))
+
+
+def default_routes() -> List[Route]:
+    routes = [Route(model) for model in GROQ_MODELS]
+    if HEDGE_BASE_URL:
+        routes += [Route(model, HEDGE_BASE_URL) for model in GROQ_MODELS]
+    return routes
+
+
+# Shared by every GroqAIService in this worker so latency samples accumulate across requests
+router = ModelRouter(default_routes())
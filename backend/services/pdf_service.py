@@ -16,6 +16,8 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.pdfgen import canvas
 import logging
 
+from services import kenya_curriculum, metrics
+
 logger = logging.getLogger(__name__)
 
 class SchemeOfWorkPDFGenerator:
@@ -151,7 +153,7 @@ class SchemeOfWorkPDFGenerator:
             story.extend(self._create_header(scheme_data, context))
             
             # Add scheme content
-            story.extend(self._create_scheme_content(scheme_data))
+            story.extend(self._create_scheme_content(scheme_data, context))
             
             # Add footer information
             story.extend(self._create_footer())
@@ -221,10 +223,14 @@ class SchemeOfWorkPDFGenerator:
         
         return story
     
-    def _create_scheme_content(self, scheme_data: Dict) -> List:
+    def _create_scheme_content(self, scheme_data: Dict, context: Optional[Dict] = None) -> List:
         """Create the main scheme content with weeks and lessons"""
         story = []
         weeks = scheme_data.get('weeks', [])
+        context = context or {}
+        header = scheme_data.get('scheme_header', {})
+        subject = header.get('subject', context.get('subject_name', 'Subject'))
+        form_grade = header.get('form_grade', context.get('form_grade', 'Form'))
         
         for week_idx, week in enumerate(weeks):
             # Week header
@@ -284,8 +290,8 @@ class SchemeOfWorkPDFGenerator:
                     else:
                         materials_text = str(materials)
                     
-                    # References
-                    references = lesson.get('references', 'N/A')
+                    # References, defaulting to the approved textbook for the subject and form
+                    references = lesson.get('references') or kenya_curriculum.reference_text(subject, form_grade)
                     
                     lesson_data.append([
                         Paragraph(str(lesson_num), self.styles['TableCell']),
@@ -402,7 +408,8 @@ class PDFService:
     
     def generate_scheme_pdf(self, scheme_data: Dict[str, Any], context: Dict[str, Any]) -> bytes:
         """Generate a scheme of work PDF"""
-        return self.scheme_generator.generate_scheme_pdf(scheme_data, context)
+        with metrics.time_pdf_render():
+            return self.scheme_generator.generate_scheme_pdf(scheme_data, context)
     
     def create_pdf_response_headers(self, filename: str) -> Dict[str, str]:
         """Create appropriate headers for PDF response"""
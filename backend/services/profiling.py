@@ -0,0 +1,167 @@
+"""
+On-demand request profiling
+A request carrying a valid X-Profile-Signature header is sampled while it runs and the
+resulting collapsed stacks (flamegraph.pl / speedscope format) are written to a bounded
+on-disk ring buffer. Requests without the header only pay for a dictionary lookup.
+
+Signatures are HMAC-SHA256 over "<expires>:<METHOD>:<path>" keyed with PROFILING_SECRET,
+so a token only profiles the endpoint it was minted for and only until it expires:
+
+    python -m services.profiling GET /api/v1/admin/hierarchy/1
+"""
+
+import os
+import re
+import sys
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Signature"
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+PROFILE_DIR = os.getenv(
+    "PROFILING_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+)
+PROFILE_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "50"))
+PROFILE_INTERVAL = float(os.getenv("PROFILING_INTERVAL_MS", "5")) / 1000.0
+# Signed requests to the profile store itself are never sampled, so reading profiles does not evict them
+PROFILE_ROUTES = "/api/v1/admin/profiles"
+
+# Threads whose innermost frame is in one of these modules are parked, not doing work
+_IDLE_MODULES = {"threading.py", "queue.py", "selectors.py"}
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def is_enabled() -> bool:
+    return bool(PROFILING_SECRET)
+
+
+def sign(method: str, path: str, ttl_seconds: int = 300, secret: Optional[str] = None) -> str:
+    """Create a profiling signature for one endpoint"""
+    key = (secret or PROFILING_SECRET).encode()
+    expires = int(time.time()) + ttl_seconds
+    digest = hmac.new(key, f"{expires}:{method.upper()}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{digest}"
+
+
+def verify(signature: Optional[str], method: str, path: str) -> bool:
+    """Check a profiling signature against the request method and path"""
+    if not signature or not is_enabled():
+        return False
+    try:
+        expires_str, digest = signature.split(".", 1)
+        expires = int(expires_str)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    expected = hmac.new(
+        PROFILING_SECRET.encode(), f"{expires}:{method.upper()}:{path}".encode(), hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+class StackSampler:
+    """Samples the stacks of all busy threads of this worker on a background thread.
+
+    Sync endpoints run in the threadpool, not on the event loop thread, so a per-thread
+    profiler would miss them. Concurrent requests on the same worker show up as well.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._collapse(frame)
+                if stack:
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(frame) -> Optional[str]:
+        if os.path.basename(frame.f_code.co_filename) in _IDLE_MODULES:
+            return None
+        names: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names)
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def save_profile(sampler: StackSampler, method: str, path: str, duration: float) -> str:
+    """Write a profile into the ring buffer and evict the oldest entries beyond the limit"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_path = _SAFE_NAME.sub("_", path.strip("/")) or "root"
+    name = f"{int(time.time() * 1000)}_{method.upper()}_{safe_path}_{int(duration * 1000)}ms.collapsed"
+    with open(os.path.join(PROFILE_DIR, name), "w") as fh:
+        fh.write(sampler.collapsed())
+
+    profiles = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".collapsed"))
+    for stale in profiles[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, stale))
+        except OSError:
+            pass
+    logger.info(f"Saved request profile {name} ({sampler.samples} samples)")
+    return name
+
+
+def list_profiles() -> List[Dict]:
+    """List stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".collapsed"):
+            continue
+        full_path = os.path.join(PROFILE_DIR, name)
+        stat = os.stat(full_path)
+        profiles.append({
+            "name": name,
+            "size_bytes": stat.st_size,
+            "created_at": stat.st_mtime,
+        })
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Resolve a profile name to its file, refusing anything outside the profile directory"""
+    if os.path.basename(name) != name or not name.endswith(".collapsed"):
+        return None
+    full_path = os.path.join(PROFILE_DIR, name)
+    return full_path if os.path.isfile(full_path) else None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or not is_enabled():
+        print("Usage: PROFILING_SECRET=... python -m services.profiling METHOD PATH")
+        sys.exit(1)
+    print(f"{PROFILE_HEADER}: {sign(sys.argv[1], sys.argv[2])}")
@@ -0,0 +1,187 @@
+"""
+Token budgeting for LLM prompts
+Prompts are assembled from named sections. When the estimated size goes over the budget,
+sections are handled in ascending priority: each one is first swapped for its more compact
+variants and then, if it is not required, dropped, until the prompt fits. The completion
+keeps whatever room the model's context window has left.
+
+Token counts use tiktoken's cl100k_base encoding when it is installed, which is close to the
+Llama 3 tokenizer. Otherwise a conservative characters-per-token estimate is used.
+"""
+
+import logging
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Context window per model; unknown models get DEFAULT_CONTEXT_TOKENS
+MODEL_CONTEXT_TOKENS = {
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "mixtral-8x7b-32768": 32768,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Completion tokens the prompt must always leave free
+OUTPUT_RESERVE_TOKENS = 4000
+# Upper bound for max_tokens when the prompt leaves more room
+MAX_COMPLETION_TOKENS = 6000
+# Headroom for estimation error and chat-format overhead
+SAFETY_MARGIN_TOKENS = 256
+CHARS_PER_TOKEN = 3.5
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # not installed, or the BPE file could not be loaded
+            logger.info(f"tiktoken unavailable, estimating tokens from length: {e}")
+            _encoding_failed = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def context_tokens(model: str) -> int:
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def prompt_budget(model: str, system_tokens: int = 0, output_reserve: int = OUTPUT_RESERVE_TOKENS) -> int:
+    """Tokens available to the user prompt after the system prompt and the completion reserve"""
+    return max(0, context_tokens(model) - output_reserve - SAFETY_MARGIN_TOKENS - system_tokens)
+
+
+def completion_budget(model: str, prompt_tokens: int) -> int:
+    """max_tokens for a completion: everything the prompt left free, within MAX_COMPLETION_TOKENS"""
+    available = context_tokens(model) - prompt_tokens - SAFETY_MARGIN_TOKENS
+    return max(256, min(available, MAX_COMPLETION_TOKENS))
+
+
+class PromptSection(NamedTuple):
+    name: str
+    variants: List[str]     # most detailed first; later entries are more compact
+    priority: int = 50      # lower priorities are compacted and dropped first
+    required: bool = False  # required sections may be compacted but never dropped
+
+
+def fit_sections(sections: List[PromptSection], budget: int) -> Tuple[str, Dict[str, Any]]:
+    """Join sections (in their given order) into a prompt within budget tokens.
+    Returns the prompt and a report of token counts and what was compacted or dropped."""
+    sizes = {section.name: [estimate_tokens(text) for text in section.variants] for section in sections}
+    chosen: Dict[str, Optional[int]] = {section.name: 0 for section in sections if section.variants}
+
+    def total() -> int:
+        return sum(sizes[name][index] for name, index in chosen.items() if index is not None)
+
+    compacted: List[str] = []
+    dropped: List[str] = []
+    for section in sorted(sections, key=lambda s: s.priority):
+        if total() <= budget:
+            break
+        if section.name not in chosen:
+            continue
+        while chosen[section.name] < len(section.variants) - 1 and total() > budget:
+            chosen[section.name] += 1
+            if section.name not in compacted:
+                compacted.append(section.name)
+        if total() > budget and not section.required:
+            chosen[section.name] = None
+            dropped.append(section.name)
+            if section.name in compacted:
+                compacted.remove(section.name)
+
+    parts = [section.variants[chosen[section.name]] for section in sections
+             if chosen.get(section.name) is not None]
+    prompt = "\n\n".join(part.strip("\n") for part in parts if part)
+    tokens = estimate_tokens(prompt)
+    if tokens > budget:
+        logger.warning(f"Prompt needs {tokens} tokens even with only required sections (budget {budget})")
+    return prompt, {
+        "budget": budget,
+        "tokens": tokens,
+        "compacted": compacted,
+        "dropped": dropped,
+        "sections": {name: sizes[name][index] for name, index in chosen.items() if index is not None},
+    }
+
+
+# ============= LESSON LISTING COMPACTION =============
+
+def _dedupe(values) -> List[str]:
+    seen = set()
+    result = []
+    for value in values:
+        if value and value not in seen:
+            seen.add(value)
+            result.append(value)
+    return result
+
+
+def _topic_runs(lessons: List[Dict[str, Any]]) -> List[Tuple[str, int, int, List[str]]]:
+    """Consecutive lessons on one topic → (topic, first lesson, last lesson, distinct subtopics)"""
+    runs = []
+    for lesson in lessons:
+        topic = lesson.get("topic") or "Unknown Topic"
+        number = lesson.get("lesson_number", len(runs) + 1)
+        if runs and runs[-1][0] == topic:
+            runs[-1][2] = number
+            runs[-1][3].append(lesson.get("subtopic"))
+        else:
+            runs.append([topic, number, number, [lesson.get("subtopic")]])
+    return [(topic, first, last, _dedupe(subtopics)) for topic, first, last, subtopics in runs]
+
+
+def _subtopic_text(subtopics: List[str], limit: Optional[int] = None) -> str:
+    if not subtopics:
+        return ""
+    shown = subtopics if limit is None else subtopics[:limit]
+    more = f"; +{len(subtopics) - len(shown)} more" if len(shown) < len(subtopics) else ""
+    return f" ({'; '.join(shown)}{more})"
+
+
+def weekly_runs_text(weekly_breakdown: Dict[Any, List[Dict[str, Any]]]) -> str:
+    """One line per week with lesson ranges per topic and each subtopic named once"""
+    lines = []
+    for week in sorted(weekly_breakdown, key=lambda w: int(w)):
+        runs = _topic_runs(weekly_breakdown[week])
+        parts = [
+            f"L{first}{'-' + str(last) if last != first else ''} {topic}{_subtopic_text(subtopics)}"
+            for topic, first, last, subtopics in runs
+        ]
+        lines.append(f"Week {week}: " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+def topic_span_text(weekly_breakdown: Dict[Any, List[Dict[str, Any]]], subtopic_limit: int = 6) -> str:
+    """Consecutive weeks teaching the same topic merged into one line with a lesson count"""
+    spans: List[List[Any]] = []  # [first week, last week, topic, lessons, subtopics]
+    for week in sorted(weekly_breakdown, key=lambda w: int(w)):
+        for topic, first, last, subtopics in _topic_runs(weekly_breakdown[week]):
+            lessons = last - first + 1
+            if spans and spans[-1][2] == topic and int(week) - int(spans[-1][1]) <= 1:
+                spans[-1][1] = week
+                spans[-1][3] += lessons
+                spans[-1][4].extend(subtopics)
+            else:
+                spans.append([week, week, topic, lessons, list(subtopics)])
+    lines = []
+    for first, last, topic, lessons, subtopics in spans:
+        weeks = f"Weeks {first}-{last}" if first != last else f"Week {first}"
+        lines.append(f"{weeks}: {topic}, {lessons} lessons{_subtopic_text(_dedupe(subtopics), subtopic_limit)}")
+    return "\n".join(lines)
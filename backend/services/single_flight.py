@@ -0,0 +1,204 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one execution: the first caller (the leader) runs
+the work and everyone else waiting on that key receives its result.
+
+Within a worker, callers in other threads wait on the leader's Future. Across workers, the
+leader also takes a lease row in a small SQLite file (SINGLE_FLIGHT_DB). Leaders in other
+workers find the lease, poll until the result is written, and return that result. A lease
+that outlives SINGLE_FLIGHT_LEASE_SECONDS is treated as abandoned and can be taken over.
+Finished results stay readable for SINGLE_FLIGHT_RESULT_TTL seconds, so a retry that
+arrives just after completion also gets the shared result.
+
+Keys come from make_key(), which normalizes dictionaries (sorted keys, None values dropped,
+whitespace collapsed) so equivalent payloads map to the same key.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import closing
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_DB = os.getenv(
+    "SINGLE_FLIGHT_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "single_flight.db")
+)
+LEASE_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "180"))
+RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "10"))
+POLL_INTERVAL = 0.25
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Stable key for a namespace and any JSON-like parts"""
+    payload = json.dumps(_normalize(parts), sort_keys=True, separators=(",", ":"), default=str)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class SqliteLease:
+    """Cross-process leases and shared results, one row per in-flight or recently finished key"""
+
+    def __init__(self, path: str = SINGLE_FLIGHT_DB, lease_seconds: float = LEASE_SECONDS,
+                 result_ttl: float = RESULT_TTL):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS flights ("
+                " key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " result TEXT, completed_at REAL)"
+            )
+            self._ready = True
+        return conn
+
+    def acquire(self, key: str, owner: str) -> Tuple[str, Any]:
+        """("acquired", None) if owner now holds the lease, ("done", result) if a result is
+        available, ("busy", None) if another worker is running it"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM flights WHERE (completed_at IS NULL AND expires_at < ?)"
+                    " OR (completed_at IS NOT NULL AND completed_at < ?)",
+                    (now, now - self.result_ttl),
+                )
+                row = conn.execute("SELECT result, completed_at FROM flights WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO flights (key, owner, expires_at) VALUES (?, ?, ?)",
+                                 (key, owner, now + self.lease_seconds))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return "acquired", None
+        if row[1] is not None:
+            return "done", json.loads(row[0])
+        return "busy", None
+
+    def wait(self, key: str) -> Tuple[str, Any]:
+        """Poll until the lease holder finishes ("done", result) or the lease is gone ("gone", None)"""
+        with closing(self._connect()) as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT result, completed_at, expires_at FROM flights WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or (row[1] is None and row[2] < time.time()):
+                    return "gone", None
+                if row[1] is not None:
+                    return "done", json.loads(row[0])
+                time.sleep(POLL_INTERVAL)
+
+    def complete(self, key: str, owner: str, result: Any):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE flights SET result = ?, completed_at = ? WHERE key = ? AND owner = ?",
+                (json.dumps(result, default=str), time.time(), key, owner),
+            )
+
+    def release(self, key: str, owner: str):
+        """Drop an unfinished lease so waiting workers can take over"""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM flights WHERE key = ? AND owner = ? AND completed_at IS NULL", (key, owner))
+
+
+class SingleFlight:
+    def __init__(self, name: str, lease: Optional[SqliteLease] = None):
+        self.name = name
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once for all concurrent callers of key; returns (result, shared) where
+        shared is True when the result came from another caller's execution.
+        Blocking: call from a worker thread, not the event loop."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            metrics.record_cache(self.name, True)
+            return future.result(), True
+
+        try:
+            result, shared = self._lead(key, fn)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        metrics.record_cache(self.name, shared)
+        return result, shared
+
+    def _lead(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        if self.lease is None:
+            return fn(), False
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        try:
+            while True:
+                status, result = self.lease.acquire(key, owner)
+                if status == "acquired":
+                    break
+                if status == "done":
+                    return result, True
+                status, result = self.lease.wait(key)
+                if status == "done":
+                    return result, True
+                # The other worker gave up or its lease expired; try to take over
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight lease store unavailable, running uncoordinated: {e}")
+            return fn(), False
+
+        try:
+            result = fn()
+        except BaseException:
+            self._release(key, owner)
+            raise
+        try:
+            self.lease.complete(key, owner, result)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Could not share single-flight result: {e}")
+            self._release(key, owner)
+        return result, False
+
+    def _release(self, key: str, owner: str):
+        try:
+            self.lease.release(key, owner)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not release single-flight lease: {e}")
+
+
+# Shared by every /api/schemes/generate request in this worker
+scheme_generation = SingleFlight("scheme_generation", SqliteLease())
@@ -0,0 +1,332 @@
+"""
+Timetable analytics
+Daily distribution, workload, schedule pattern and clashes computed from TimetableSlot rows,
+for one timetable, for a teacher across all their timetables, or for a whole school.
+
+Slots are counted into a day × period matrix per timetable in one vectorized pass (NumPy when
+it is installed, plain loops otherwise), and teacher and school reports sum those matrices.
+Each timetable's counts are kept per worker until its version (updated_at and slot count, see
+crud.timetable.get_versions) changes, so a report over hundreds of timetables only loads the
+slots of the ones saved since the last request.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+from services import metrics
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # optional dependency
+    np = None
+    NUMPY_AVAILABLE = False
+
+DAYS = ("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+SINGLE_LESSON_MINUTES = 40
+DOUBLE_LESSON_MINUTES = 80
+# Per-timetable counts kept per worker (least recently used are evicted first)
+MAX_TIMETABLES = 4096
+
+Grid = Tuple[Tuple[int, ...], ...]
+
+
+class TimetableStats(NamedTuple):
+    grid: Grid                      # lessons per (day in DAYS, period - 1)
+    period_labels: Tuple[str, ...]  # time_slot of each period, as first seen
+    slots: int
+    single_lessons: int
+    double_lessons: int             # double lessons, not their two slots
+    double_slots: int
+    evening_lessons: int
+
+
+_lock = threading.Lock()
+_stats: "OrderedDict[str, Tuple[str, TimetableStats]]" = OrderedDict()
+
+
+def day_index(day: Optional[str]) -> Optional[int]:
+    """'MON', 'Monday' and 'monday' → 0; None for anything that is not a day"""
+    key = (day or "").strip()[:3].upper()
+    return DAYS.index(key) if key in DAYS else None
+
+
+def _round(value: float) -> int:
+    # Half up, like Math.round in the timetable page
+    return int(value + 0.5)
+
+
+# ============= COUNTING =============
+
+def count_slots(rows: Iterable[Sequence[Any]], keys: List[Any]) -> Dict[Any, TimetableStats]:
+    """Count (key, day_of_week, period_number, time_slot, is_double_lesson, double_position,
+    is_evening) rows into TimetableStats per key. Rows with an unknown key, day or period are skipped."""
+    position = {key: index for index, key in enumerate(keys)}
+    owners, days, periods, flags = [], [], [], []
+    labels: Dict[Tuple[int, int], str] = {}
+    for key, day, period, time_slot, is_double, double_position, is_evening in rows:
+        day = day_index(day)
+        if key not in position or day is None or not isinstance(period, int) or period < 1:
+            continue
+        owner = position[key]
+        owners.append(owner)
+        days.append(day)
+        periods.append(period - 1)
+        # double, top half, double saved without a position, evening
+        flags.append((bool(is_double), bool(is_double) and double_position == "top",
+                      bool(is_double) and double_position not in ("top", "bottom"), bool(is_evening)))
+        labels.setdefault((owner, period - 1), time_slot or f"P{period}")
+
+    n = len(keys)
+    width = max(periods) + 1 if periods else 1
+    if NUMPY_AVAILABLE:
+        owner_array = np.asarray(owners, dtype=np.intp)
+        flag_array = np.asarray(flags, dtype=bool).reshape(-1, 4)
+        grids = np.zeros((n, len(DAYS), width), dtype=np.int64)
+        np.add.at(grids, (owner_array, np.asarray(days, dtype=np.intp), np.asarray(periods, dtype=np.intp)), 1)
+        totals = np.zeros((n, 5), dtype=np.int64)
+        totals[:, 0] = np.bincount(owner_array, minlength=n)
+        for column in range(4):
+            totals[:, column + 1] = np.bincount(owner_array[flag_array[:, column]], minlength=n)
+        grid_lists, total_lists = grids.tolist(), totals.tolist()
+    else:
+        grid_lists = [[[0] * width for _ in DAYS] for _ in range(n)]
+        total_lists = [[0] * 5 for _ in range(n)]
+        for owner, day, period, flag in zip(owners, days, periods, flags):
+            grid_lists[owner][day][period] += 1
+            total = total_lists[owner]
+            total[0] += 1
+            for column, value in enumerate(flag):
+                total[column + 1] += value
+
+    stats = {}
+    for owner, (key, grid, (slots, double_slots, tops, unpositioned, evenings)) in enumerate(
+            zip(keys, grid_lists, total_lists)):
+        period_labels = tuple(labels.get((owner, period), f"P{period + 1}") for period in range(width))
+        # Slots saved without double_position count as halves of a double lesson
+        double_lessons = tops + (unpositioned + 1) // 2
+        stats[key] = TimetableStats(tuple(map(tuple, grid)), period_labels, slots,
+                                    slots - double_slots, double_lessons, double_slots, evenings)
+    return stats
+
+
+def sum_grids(grids: List[Grid], groups: List[int], n_groups: int) -> List[List[List[int]]]:
+    """Add up day × period grids (of any width) into n_groups grids, grids[i] going to groups[i]"""
+    width = max((len(grid[0]) for grid in grids if grid), default=1)
+    if NUMPY_AVAILABLE:
+        stacked = np.zeros((len(grids), len(DAYS), width), dtype=np.int64)
+        for index, grid in enumerate(grids):
+            stacked[index, :, :len(grid[0])] = grid
+        totals = np.zeros((n_groups, len(DAYS), width), dtype=np.int64)
+        np.add.at(totals, np.asarray(groups, dtype=np.intp), stacked)
+        return totals.tolist()
+    totals = [[[0] * width for _ in DAYS] for _ in range(n_groups)]
+    for grid, group in zip(grids, groups):
+        total = totals[group]
+        for day, row in enumerate(grid):
+            for period, lessons in enumerate(row):
+                total[day][period] += lessons
+    return totals
+
+
+def combine(stats: List[TimetableStats], grid: Optional[Sequence[Sequence[int]]] = None) -> TimetableStats:
+    """One TimetableStats for lessons taught together, e.g. by one teacher; lessons of different
+    timetables in the same cell show up as clashes. Pass grid when the sum is already known."""
+    if grid is None:
+        grid = sum_grids([s.grid for s in stats], [0] * len(stats), 1)[0]
+    period_labels = max((s.period_labels for s in stats), key=len, default=())
+    counts = [sum(values) for values in zip(*(s[2:] for s in stats))] or [0] * 5
+    return TimetableStats(tuple(map(tuple, grid)), period_labels, *counts)
+
+
+# ============= METRICS =============
+
+def detect_pattern(daily: Dict[str, int], double_slots: int, evening_lessons: int) -> Tuple[str, str]:
+    if not daily:
+        return "Empty Schedule", "No lessons scheduled yet"
+    counts = list(daily.values())
+    if double_slots and evening_lessons:
+        return "Mixed Timing", "Flexible schedule with double lessons and evening sessions"
+    if double_slots >= 4:
+        return "Double-Heavy", "Intensive approach with multiple double lessons"
+    if max(counts) - min(counts) <= 1 and len(daily) >= 3:
+        return "Balanced Distribution", "Even spread across multiple days"
+    if "MON" in daily and "TUE" in daily and "THU" not in daily and "FRI" not in daily:
+        return "Front-Loaded", "Heavy concentration early in the week"
+    if len(daily) == 5:
+        return "Daily Touchpoint", "Consistent daily engagement throughout the week"
+    if len(daily) <= 2:
+        return "Concentrated", "Intensive sessions on limited days"
+    return "Custom Pattern", "Unique schedule tailored to specific needs"
+
+
+def workload_level(slots: int, double_lessons: int, evening_lessons: int) -> Tuple[str, int]:
+    """(light | optimal | heavy | overloaded, percentage); doubles and evenings weigh more"""
+    load = slots + double_lessons * 0.5 + evening_lessons * 0.3
+    if load <= 5:
+        return "light", _round(load / 5 * 25)
+    if load <= 12:
+        return "optimal", _round(25 + (load - 5) / 7 * 50)
+    if load <= 18:
+        return "heavy", _round(75 + (load - 12) / 6 * 20)
+    return "overloaded", min(100, _round(95 + (load - 18) / 5 * 5))
+
+
+def summarize(stats: TimetableStats) -> Dict[str, Any]:
+    """The metrics the timetable page shows, with clashes and lessons per day and period"""
+    daily = {DAYS[day]: sum(row) for day, row in enumerate(stats.grid) if sum(row)}
+    sessions = stats.single_lessons + stats.double_lessons
+    minutes = stats.single_lessons * SINGLE_LESSON_MINUTES + stats.double_lessons * DOUBLE_LESSON_MINUTES
+    pattern, pattern_description = detect_pattern(daily, stats.double_slots, stats.evening_lessons)
+    level, percentage = workload_level(stats.slots, stats.double_lessons, stats.evening_lessons)
+    return {
+        "total_sessions": sessions,
+        "total_hours": round(minutes / 60, 1),
+        "single_lessons": stats.single_lessons,
+        "double_lessons": stats.double_lessons,
+        "evening_lessons": stats.evening_lessons,
+        "daily_distribution": daily,
+        "total_days": len(daily),
+        "average_sessions_per_day": round(sessions / len(daily), 2) if daily else 0,
+        "pattern_type": pattern,
+        "pattern_description": pattern_description,
+        "workload_level": level,
+        "workload_percentage": percentage,
+        "efficiency": _round(sessions / max(len(daily), 1) * 20),
+        "conflicts": [
+            {"day": DAYS[day], "period": period + 1, "time_slot": _label(stats, period), "lessons": lessons}
+            for day, row in enumerate(stats.grid) for period, lessons in enumerate(row) if lessons > 1
+        ],
+        "period_usage": {DAYS[day]: list(row) for day, row in enumerate(stats.grid) if day < 5 or any(row)},
+    }
+
+
+def _label(stats: TimetableStats, period: int) -> str:
+    return stats.period_labels[period] if period < len(stats.period_labels) else f"P{period + 1}"
+
+
+# ============= SCOPES =============
+
+def get_stats(db: Session, timetables: List[Dict[str, Any]]) -> Dict[str, TimetableStats]:
+    """Counts for crud.timetable.get_versions rows; only stale timetables have their slots loaded"""
+    result: Dict[str, TimetableStats] = {}
+    stale = []
+    with _lock:
+        for timetable in timetables:
+            cached = _stats.get(timetable["id"])
+            if cached and cached[0] == timetable["version"]:
+                _stats.move_to_end(timetable["id"])
+                result[timetable["id"]] = cached[1]
+            else:
+                stale.append(timetable)
+    for timetable in timetables:
+        metrics.record_cache("timetable_analytics", timetable["id"] in result)
+    if not stale:
+        return result
+
+    ids = [timetable["id"] for timetable in stale]
+    fresh = count_slots(crud.timetable.get_slot_rows(db, ids), ids)
+    with _lock:
+        for timetable in stale:
+            _stats[timetable["id"]] = (timetable["version"], fresh[timetable["id"]])
+            _stats.move_to_end(timetable["id"])
+        while len(_stats) > MAX_TIMETABLES:
+            _stats.popitem(last=False)
+    result.update(fresh)
+    return result
+
+
+def timetable_report(db: Session, timetable_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Analytics of one timetable, None when it does not exist (or is not the user's)"""
+    timetables = crud.timetable.get_versions(db, timetable_id=timetable_id, user_id=user_id)
+    if not timetables:
+        return None
+    timetable = timetables[0]
+    stats = get_stats(db, timetables)[timetable["id"]]
+    return {"timetable_id": timetable["id"], "name": timetable["name"], **summarize(stats)}
+
+
+def teacher_report(db: Session, user_id: int) -> Dict[str, Any]:
+    """Each of a teacher's timetables, and all of them together; clashes in the combined
+    summary include lessons of different timetables at the same time"""
+    timetables = crud.timetable.get_versions(db, user_id=user_id)
+    stats = get_stats(db, timetables)
+    items = []
+    for timetable in timetables:
+        summary = summarize(stats[timetable["id"]])
+        del summary["period_usage"]
+        items.append({"timetable_id": timetable["id"], "name": timetable["name"], **summary})
+    return {
+        "user_id": user_id,
+        "timetable_count": len(timetables),
+        "combined": summarize(combine([stats[timetable["id"]] for timetable in timetables])),
+        "timetables": items,
+    }
+
+
+def school_report(db: Session, school_id: int) -> Dict[str, Any]:
+    """Lessons per day and period across the school, and workload and clashes per teacher"""
+    timetables = crud.timetable.get_versions(db, school_id=school_id)
+    stats = get_stats(db, timetables)
+    teacher_ids = list(dict.fromkeys(timetable["user_id"] for timetable in timetables))
+    teacher_index = {user_id: index for index, user_id in enumerate(teacher_ids)}
+    members: List[List[TimetableStats]] = [[] for _ in teacher_ids]
+    patterns: Dict[str, int] = {}
+    timetables_with_conflicts = 0
+    for timetable in timetables:
+        timetable_stats = stats[timetable["id"]]
+        members[teacher_index[timetable["user_id"]]].append(timetable_stats)
+        daily = {DAYS[day]: sum(row) for day, row in enumerate(timetable_stats.grid) if sum(row)}
+        pattern = detect_pattern(daily, timetable_stats.double_slots, timetable_stats.evening_lessons)[0]
+        patterns[pattern] = patterns.get(pattern, 0) + 1
+        if any(lessons > 1 for row in timetable_stats.grid for lessons in row):
+            timetables_with_conflicts += 1
+
+    teacher_grids = sum_grids(
+        [stats[timetable["id"]].grid for timetable in timetables],
+        [teacher_index[timetable["user_id"]] for timetable in timetables], len(teacher_ids)
+    )
+    teachers = []
+    workload_levels: Dict[str, int] = {}
+    for user_id, grid, teacher_stats in zip(teacher_ids, teacher_grids, members):
+        combined = combine(teacher_stats, grid)
+        level, percentage = workload_level(combined.slots, combined.double_lessons, combined.evening_lessons)
+        workload_levels[level] = workload_levels.get(level, 0) + 1
+        teachers.append({
+            "user_id": user_id,
+            "timetable_count": len(teacher_stats),
+            "total_sessions": combined.single_lessons + combined.double_lessons,
+            "workload_level": level,
+            "workload_percentage": percentage,
+            "clashes": sum(1 for row in grid for lessons in row if lessons > 1),
+        })
+
+    school = summarize(combine(list(stats.values())))
+    return {
+        "school_id": school_id,
+        "timetable_count": len(timetables),
+        "teacher_count": len(teacher_ids),
+        "total_sessions": school["total_sessions"],
+        "total_hours": school["total_hours"],
+        "daily_distribution": school["daily_distribution"],
+        "period_usage": school["period_usage"],
+        "patterns": patterns,
+        "workload_levels": workload_levels,
+        "timetables_with_conflicts": timetables_with_conflicts,
+        "teachers_with_clashes": sum(1 for teacher in teachers if teacher["clashes"]),
+        "teachers": teachers,
+    }
+
+
+def draft_report(slots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Analytics of unsaved slots, in the shape the timetable page saves them"""
+    rows = [
+        (0, slot.get("day_of_week"), slot.get("period_number"), slot.get("time_slot"),
+         slot.get("is_double_lesson"), slot.get("double_position"), slot.get("is_evening"))
+        for slot in slots if isinstance(slot, dict)
+    ]
+    return summarize(count_slots(rows, [0])[0])
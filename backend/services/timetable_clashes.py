@@ -0,0 +1,122 @@
+"""
+Clashes between timetables
+A teacher cannot teach two lessons in the same period, and a class (Timetable.class_name) cannot
+attend two; only timetables of the same term (their scheme's) can clash. Every timetable write rewrites the timetable's rows in timetable_occupancy, one per
+day and period it uses, so checking a save loads only the teacher's and the class's other cells
+through their indexes and looks each slot up in a dict; no other timetable is scanned.
+
+Clashes inside one timetable are reported by services.timetable_analytics.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+import models
+from services.timetable_analytics import DAYS, day_index
+
+Cell = Tuple[str, int, Optional[str]]  # (day, period_number, time_slot)
+
+
+def class_key(class_name: Optional[str]) -> Optional[str]:
+    """'2 East' and ' 2  east ' → '2 east'; None when no class is given"""
+    key = " ".join((class_name or "").lower().split())
+    return key or None
+
+
+def school_id_for(scheme: Optional[models.SchemeOfWork]) -> Optional[int]:
+    return scheme.school_level.school_id if scheme is not None and scheme.school_level else None
+
+
+def term_id_for(scheme: Optional[models.SchemeOfWork]) -> Optional[int]:
+    return scheme.term_id if scheme is not None else None
+
+
+def slot_cells(slots: List[Any]) -> List[Cell]:
+    """Distinct cells of slot dicts (as saved by the timetable page) or TimetableSlot rows"""
+    cells: Dict[Tuple[str, int], Optional[str]] = {}
+    for slot in slots:
+        if isinstance(slot, dict):
+            day, period, time_slot = slot.get("day_of_week"), slot.get("period_number"), slot.get("time_slot")
+        else:
+            day, period, time_slot = slot.day_of_week, slot.period_number, slot.time_slot
+        index = day_index(day)
+        if index is not None and isinstance(period, int) and period >= 1:
+            cells.setdefault((DAYS[index], period), time_slot)
+    return [(day, period, time_slot) for (day, period), time_slot in cells.items()]
+
+
+def find_conflicts(db: Session, user_id: int, slots: List[Any], school_id: Optional[int] = None,
+                   class_name: Optional[str] = None, term_id: Optional[int] = None,
+                   timetable_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Slots that fall in a period already used by another timetable of the teacher or, when a
+    class is given, of the class, in the same term. timetable_id is the timetable being saved, if it exists."""
+    key = class_key(class_name)
+    taken: Dict[Tuple[str, int], List[Tuple]] = {}
+    for row in crud.timetable.get_occupancy(db, user_id=user_id, school_id=school_id, class_key=key,
+                                            term_id=term_id, exclude_timetable_id=timetable_id):
+        taken.setdefault((row[0], row[1]), []).append(row)
+
+    conflicts = []
+    for day, period, time_slot in slot_cells(slots):
+        for _, _, other_id, other_name, other_user_id, other_school_id, other_class in taken.get((day, period), ()):
+            kinds = ["teacher"] if other_user_id == user_id else []
+            if key and other_class == key and other_school_id == school_id:
+                kinds.append("class")
+            for kind in kinds:
+                conflicts.append({
+                    "kind": kind,
+                    "day": day,
+                    "period": period,
+                    "time_slot": time_slot,
+                    "timetable_id": other_id,
+                    "timetable_name": other_name,
+                })
+    return conflicts
+
+
+def record(db: Session, timetable: models.Timetable, cells: List[Cell], school_id: Optional[int],
+           term_id: Optional[int]):
+    """Index a timetable's slot_cells; call on every write that changes its slots or class, before the commit"""
+    crud.timetable.set_occupancy(db, timetable.id, timetable.user_id, school_id, class_key(timetable.class_name),
+                                 term_id, cells)
+
+
+def rebuild(db: Session) -> int:
+    """Re-index every timetable from its slots (for databases created before timetable_occupancy)"""
+    timetables = db.query(models.Timetable).all()
+    for timetable in timetables:
+        record(db, timetable, slot_cells(timetable.slots), school_id_for(timetable.scheme),
+               term_id_for(timetable.scheme))
+    db.commit()
+    return len(timetables)
+
+
+def _groups(rows: List[Tuple], kind: str) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for owner, term_id, day, period, time_slot, timetable_id, name in rows:
+        group = groups.setdefault((owner, term_id, day, period), {
+            "kind": kind,
+            "user_id" if kind == "teacher" else "class_name": owner,
+            "term_id": term_id,
+            "day": day,
+            "period": period,
+            "time_slot": time_slot,
+            "timetables": [],
+        })
+        group["timetables"].append({"id": timetable_id, "name": name})
+    return sorted(groups.values(), key=lambda group: (day_index(group["day"]), group["period"]))
+
+
+def school_report(db: Session, school_id: int) -> Dict[str, Any]:
+    """Every period in which a teacher or a class of the school has more than one timetable in a term"""
+    teacher_clashes = _groups(crud.timetable.get_clashes(db, school_id, by="user_id"), "teacher")
+    class_clashes = _groups(crud.timetable.get_clashes(db, school_id, by="class_key"), "class")
+    return {
+        "school_id": school_id,
+        "teacher_clashes": teacher_clashes,
+        "class_clashes": class_clashes,
+        "teachers_affected": len({clash["user_id"] for clash in teacher_clashes}),
+        "classes_affected": len({clash["class_name"] for clash in class_clashes}),
+    }
@@ -0,0 +1,388 @@
+"""
+Automatic timetable placement
+Lays a term's lessons (duration_lessons of each selected subtopic, topics in dependency order) onto
+the periods a teacher has available. The solver picks a weekly pattern of periods and fills it
+week by week in curriculum order, so the lesson sequence holds by construction. The pattern is
+found by local search under a time budget, scored on:
+
+- doubles: two adjacent periods of one day, wanted doubles_per_week times and given two
+  lessons of the same subtopic;
+- evenings: evening periods are only offered with allow_evening and are never used for
+  doubles or for the first lesson of a topic;
+- day spreading: lessons evenly over the days, at most max_lessons_per_day a day, and a
+  subtopic's single lessons of one week on different days;
+- periods taken by the teacher's or the class's other timetables are never offered.
+
+The result is the weekly timetable in the slots shape of POST /api/timetables, plus the term plan:
+every lesson with its period and week_number. A double in the plan is only marked as one in the
+weeks where both of its periods teach the same subtopic.
+"""
+
+import math
+import random
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+from services import fallback_templates, topic_graph
+from services.fallback_templates import LessonUnit, SubjectTemplate
+from services.timetable_analytics import DAYS, day_index
+
+WEEKDAYS = 5
+DEFAULT_PERIODS_PER_DAY = 8
+DEFAULT_TIME_BUDGET = 0.25  # seconds
+MAX_TIME_BUDGET = 2.0
+# Search stops early after this many moves without improvement
+PATIENCE = 3000
+
+# Penalties
+OVER_DAY_LIMIT = 100.0
+DAY_IMBALANCE = 10.0
+MISSING_DOUBLE = 20.0
+SPLIT_DOUBLE = 1.0
+EVENING_INTRODUCTION = 20.0
+SAME_DAY_REPEAT = 3.0
+LATE_PERIOD = 0.01
+
+
+class Period(NamedTuple):
+    day: int              # index in DAYS
+    number: int           # period_number
+    time_slot: str
+    is_evening: bool
+
+
+class Lesson(NamedTuple):
+    unit: LessonUnit
+    part: int             # 1-based lesson within the unit
+    parts: int
+    introduction: bool    # first lesson of its topic
+
+
+class Placement(NamedTuple):
+    slots: List[Dict[str, Any]]     # weekly timetable, as saved by POST /api/timetables
+    plan: List[Dict[str, Any]]      # every lesson of the term with its week_number
+    unplaced: List[Dict[str, Any]]
+    weeks: int
+    lessons_per_week: int
+    doubles_per_week: int
+    cost: float
+    iterations: int
+    elapsed_ms: int
+
+
+def parse_periods(available: Optional[List[Dict[str, Any]]], blocked: Set[Tuple[str, int]],
+                  allow_evening: bool) -> List[Period]:
+    """Distinct usable periods in chronological order. Without a list, periods 1 to
+    DEFAULT_PERIODS_PER_DAY of every weekday are offered."""
+    if not available:
+        available = [
+            {"day_of_week": day, "period_number": number}
+            for day in DAYS[:WEEKDAYS] for number in range(1, DEFAULT_PERIODS_PER_DAY + 1)
+        ]
+    periods: Dict[Tuple[int, int], Period] = {}
+    for entry in available:
+        if not isinstance(entry, dict):
+            continue
+        day, number = day_index(entry.get("day_of_week")), entry.get("period_number")
+        if day is None or not isinstance(number, int) or number < 1 or (DAYS[day], number) in blocked:
+            continue
+        if entry.get("is_evening") and not allow_evening:
+            continue
+        periods.setdefault((day, number), Period(day, number, entry.get("time_slot") or f"P{number}",
+                                                 bool(entry.get("is_evening"))))
+    return [periods[key] for key in sorted(periods)]
+
+
+def parse_count(value: Any, name: str) -> Optional[int]:
+    """A whole-number option sent as a number or a numeric string; None when not given"""
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a whole number")
+    if not number.is_integer() or number < 0:
+        raise ValueError(f"{name} must be a whole number")
+    return int(number)
+
+
+def selected_ids(items: Optional[List[Any]]) -> List[Any]:
+    """Ids from a selection sent as ids or as {"id": ...} objects"""
+    return [item.get("id") if isinstance(item, dict) else item for item in items or []]
+
+
+def lesson_sequence(template: SubjectTemplate, topic_ids: Sequence[Any], subtopic_ids: Sequence[Any],
+                    graph: Optional[topic_graph.TopicGraph] = None) -> List[Lesson]:
+    """Every lesson of the selected units, topics in dependency order and units in curriculum order.
+    With subtopics selected, only those (and selected topics without subtopics) are taught."""
+    topics, subtopics = set(topic_ids), set(subtopic_ids)
+    units = [
+        unit for unit in template.units
+        if (unit.subtopic_key in subtopics if subtopics else not topics or unit.topic_key in topics)
+        or (isinstance(unit.subtopic_key, tuple) and unit.topic_key in topics)
+    ]
+    by_topic: Dict[Any, List[LessonUnit]] = {}
+    for unit in units:
+        by_topic.setdefault(unit.topic_key, []).append(unit)
+    titles = {topic_key: topic_units[0].topic_title for topic_key, topic_units in by_topic.items()}
+    if graph is not None:
+        rank = {title: index for index, title in enumerate(graph.order(list(dict.fromkeys(titles.values()))))}
+        ordered = sorted(by_topic, key=lambda topic_key: rank.get(titles[topic_key], len(rank)))
+    else:
+        ordered = list(by_topic)
+
+    lessons = []
+    for topic_key in ordered:
+        first = True
+        for unit in by_topic[topic_key]:
+            for part in range(1, unit.duration_lessons + 1):
+                lessons.append(Lesson(unit, part, unit.duration_lessons, first))
+                first = False
+    return lessons
+
+
+class PlacementSolver:
+    """Local search over the weekly pattern: single periods plus (top, bottom) double pairs"""
+
+    def __init__(self, periods: List[Period], lessons: List[Lesson], lessons_per_week: int,
+                 doubles_per_week: int, max_lessons_per_day: int, seed: int = 0):
+        self.periods = periods
+        self.lessons = lessons
+        self.lessons_per_week = lessons_per_week
+        self.doubles_per_week = doubles_per_week
+        self.max_lessons_per_day = max_lessons_per_day
+        self.random = random.Random(seed)
+        self.days = sorted({period.day for period in periods})
+        position = {(period.day, period.number): index for index, period in enumerate(periods)}
+        # Adjacent daytime periods of one day that can hold a double lesson
+        self.pairs = [
+            (index, position[(period.day, period.number + 1)])
+            for index, period in enumerate(periods)
+            if not period.is_evening and (period.day, period.number + 1) in position
+            and not periods[position[(period.day, period.number + 1)]].is_evening
+        ]
+
+    # ---- pattern → lessons ----
+
+    def entries(self, singles: Sequence[int], doubles: Sequence[Tuple[int, int]]) -> List[Tuple[int, ...]]:
+        """Pattern positions in chronological order: (index,) or (top, bottom)"""
+        positions = [(index,) for index in singles] + list(doubles)
+        return sorted(positions, key=lambda entry: (self.periods[entry[0]].day, self.periods[entry[0]].number))
+
+    def fill(self, entries: List[Tuple[int, ...]]):
+        """(week, entry, lessons) in teaching order until the lessons run out"""
+        cursor, week = 0, 1
+        while entries and cursor < len(self.lessons):
+            for entry in entries:
+                if cursor >= len(self.lessons):
+                    return
+                taken = self.lessons[cursor:cursor + len(entry)]
+                cursor += len(taken)
+                yield week, entry, taken
+            week += 1
+
+    # ---- scoring ----
+
+    def cost(self, singles: Sequence[int], doubles: Sequence[Tuple[int, int]]) -> float:
+        # Spreading counts sessions (a double is one); the daily limit counts lessons
+        sessions = dict.fromkeys(self.days, 0)
+        lessons_per_day = dict.fromkeys(self.days, 0)
+        late = 0
+        for index in singles:
+            sessions[self.periods[index].day] += 1
+            lessons_per_day[self.periods[index].day] += 1
+            late += self.periods[index].number
+        for top, bottom in doubles:
+            sessions[self.periods[top].day] += 1
+            lessons_per_day[self.periods[top].day] += 2
+            late += self.periods[top].number + self.periods[bottom].number
+
+        mean = (len(singles) + len(doubles)) / max(len(self.days), 1)
+        total = LATE_PERIOD * late + MISSING_DOUBLE * abs(len(doubles) - self.doubles_per_week)
+        for day in self.days:
+            total += OVER_DAY_LIMIT * max(0, lessons_per_day[day] - self.max_lessons_per_day)
+            total += DAY_IMBALANCE * (sessions[day] - mean) ** 2
+
+        seen: Set[Tuple[int, int, Any]] = set()
+        for week, entry, lessons in self.fill(self.entries(singles, doubles)):
+            period = self.periods[entry[0]]
+            if len(entry) == 2:
+                if len(lessons) < 2 or lessons[0].unit is not lessons[1].unit:
+                    total += SPLIT_DOUBLE
+                continue
+            lesson = lessons[0]
+            if period.is_evening and lesson.introduction:
+                total += EVENING_INTRODUCTION
+            key = (week, period.day, lesson.unit.subtopic_key)
+            if key in seen:
+                total += SAME_DAY_REPEAT
+            seen.add(key)
+        return total
+
+    # ---- search ----
+
+    def initial(self) -> Tuple[List[int], List[Tuple[int, int]]]:
+        """Doubles on different days first, then singles on the least loaded day, earliest period first"""
+        used: Set[int] = set()
+        per_day = dict.fromkeys(self.days, 0)
+        doubles: List[Tuple[int, int]] = []
+        doubles_wanted = min(self.doubles_per_week, self.lessons_per_week // 2)
+        for top, bottom in sorted(self.pairs, key=lambda pair: self.periods[pair[0]].number):
+            if len(doubles) >= doubles_wanted:
+                break
+            day = self.periods[top].day
+            if top not in used and bottom not in used and per_day[day] == 0:
+                doubles.append((top, bottom))
+                used.update((top, bottom))
+                per_day[day] += 2
+        singles: List[int] = []
+        while len(singles) + 2 * len(doubles) < self.lessons_per_week:
+            free = [index for index in range(len(self.periods)) if index not in used]
+            if not free:
+                break
+            index = min(free, key=lambda i: (per_day[self.periods[i].day], self.periods[i].number, self.periods[i].day))
+            singles.append(index)
+            used.add(index)
+            per_day[self.periods[index].day] += 1
+        return singles, doubles
+
+    def neighbour(self, singles: List[int], doubles: List[Tuple[int, int]]):
+        used = set(singles)
+        for pair in doubles:
+            used.update(pair)
+        free = [index for index in range(len(self.periods)) if index not in used]
+        free_pairs = [pair for pair in self.pairs if pair[0] not in used and pair[1] not in used]
+        move = self.random.random()
+        singles, doubles = list(singles), list(doubles)
+        if move < 0.5 and singles and free:
+            # Move a single lesson
+            singles[self.random.randrange(len(singles))] = self.random.choice(free)
+        elif move < 0.7 and doubles and free_pairs:
+            # Move a double lesson
+            doubles[self.random.randrange(len(doubles))] = self.random.choice(free_pairs)
+        elif move < 0.85 and doubles and len(free) >= 2:
+            # Split a double into two singles elsewhere
+            doubles.pop(self.random.randrange(len(doubles)))
+            singles.extend(self.random.sample(free, 2))
+        elif len(singles) >= 2 and free_pairs:
+            # Merge two singles into a double
+            for index in sorted(self.random.sample(range(len(singles)), 2), reverse=True):
+                singles.pop(index)
+            doubles.append(self.random.choice(free_pairs))
+        else:
+            return None
+        return singles, doubles
+
+    def solve(self, time_budget: float = DEFAULT_TIME_BUDGET):
+        """Best (singles, doubles, cost, iterations) found within time_budget seconds"""
+        deadline = time.perf_counter() + time_budget
+        singles, doubles = self.initial()
+        current = best = self.cost(singles, doubles)
+        best_pattern = (singles, doubles)
+        iterations = stale = 0
+        temperature = 2.0
+        while time.perf_counter() < deadline and stale < PATIENCE:
+            iterations += 1
+            stale += 1
+            candidate = self.neighbour(singles, doubles)
+            if candidate is None:
+                continue
+            score = self.cost(*candidate)
+            if score <= current or self.random.random() < math.exp((current - score) / temperature):
+                singles, doubles = candidate
+                current = score
+                if score < best - 1e-9:
+                    best, best_pattern, stale = score, candidate, 0
+            temperature = max(0.05, temperature * 0.999)
+        return best_pattern[0], best_pattern[1], best, iterations
+
+
+def _lesson_fields(lesson: Lesson) -> Dict[str, Any]:
+    unit = lesson.unit
+    return {
+        "topic_id": unit.topic_key,
+        # Topics without subtopics are taught as one unit keyed ("topic", id)
+        "subtopic_id": None if isinstance(unit.subtopic_key, tuple) else unit.subtopic_key,
+        "lesson_title": unit.subtopic_title if lesson.parts == 1 else f"{unit.subtopic_title} ({lesson.part}/{lesson.parts})",
+    }
+
+
+def _slot(period: Period, lesson: Lesson, week: Optional[int], double_position: Optional[str]) -> Dict[str, Any]:
+    slot = {
+        "day_of_week": DAYS[period.day],
+        "time_slot": period.time_slot,
+        "period_number": period.number,
+        **_lesson_fields(lesson),
+        "is_double_lesson": double_position is not None,
+        "double_position": double_position,
+        "is_evening": period.is_evening,
+    }
+    if week is not None:
+        slot["week_number"] = week
+    return slot
+
+
+def _double_positions(entry: Tuple[int, ...], taken: List[Lesson]) -> Tuple[Optional[str], ...]:
+    """top/bottom for a pair of periods that teaches one unit; two different units are two singles"""
+    if len(entry) == 2 and len(taken) == 2 and taken[0].unit is taken[1].unit:
+        return ("top", "bottom")
+    return (None,) * len(entry)
+
+
+def place(periods: List[Period], lessons: List[Lesson], total_weeks: int, lessons_per_week: Optional[int] = None,
+          doubles_per_week: Optional[int] = None, max_lessons_per_day: Optional[int] = None,
+          time_budget: float = DEFAULT_TIME_BUDGET, seed: int = 0) -> Placement:
+    """Solve and lay the lessons out; lessons beyond total_weeks are returned as unplaced"""
+    started = time.perf_counter()
+    total_weeks = max(1, total_weeks)
+    if lessons_per_week is None:
+        lessons_per_week = math.ceil(len(lessons) / total_weeks)
+    lessons_per_week = max(0, min(lessons_per_week, len(periods)))
+    if doubles_per_week is None:
+        doubles_per_week = 1 if any(lesson.parts > 1 for lesson in lessons) and lessons_per_week >= 3 else 0
+    if max_lessons_per_day is None:
+        days = len({period.day for period in periods}) or 1
+        max_lessons_per_day = max(2, math.ceil(lessons_per_week / days))
+    if not lessons or not lessons_per_week:
+        return Placement([], [], [_lesson_fields(lesson) for lesson in lessons], 0, lessons_per_week, 0, 0.0, 0,
+                         int((time.perf_counter() - started) * 1000))
+
+    solver = PlacementSolver(periods, lessons, lessons_per_week, doubles_per_week, max_lessons_per_day, seed)
+    singles, doubles, cost, iterations = solver.solve(min(max(time_budget, 0.0), MAX_TIME_BUDGET))
+    entries = solver.entries(singles, doubles)
+    # The weekly timetable: each pattern period with its first week's lesson
+    slots = []
+    for entry, (_, _, taken) in zip(entries, solver.fill(entries)):
+        for index, lesson, double_position in zip(entry, taken, _double_positions(entry, taken)):
+            slots.append(_slot(periods[index], lesson, None, double_position))
+    plan, weeks, placed = [], 0, 0
+    for week, entry, taken in solver.fill(entries):
+        if week > total_weeks:
+            break
+        weeks = week
+        for index, lesson, double_position in zip(entry, taken, _double_positions(entry, taken)):
+            plan.append(_slot(periods[index], lesson, week, double_position))
+        placed += len(taken)
+    return Placement(slots, plan, [_lesson_fields(lesson) for lesson in lessons[placed:]], weeks, lessons_per_week,
+                     len(doubles), round(cost, 2), iterations, int((time.perf_counter() - started) * 1000))
+
+
+def solve_for_subject(db: Session, subject_id: int, topic_ids: Sequence[Any], subtopic_ids: Sequence[Any],
+                      periods: List[Period], total_weeks: Optional[int] = None, **options) -> Optional[Placement]:
+    """Placement of the subject's selected curriculum; None when the subject does not exist.
+    total_weeks defaults to the selected topics' duration_weeks, or a 12 week term."""
+    template = fallback_templates.get_template(db, subject_id)
+    if template is None:
+        return None
+    lessons = lesson_sequence(template, topic_ids, subtopic_ids, topic_graph.get_graph(db, subject_id))
+    if not total_weeks:
+        total_weeks = _topic_weeks(db, subject_id, {lesson.unit.topic_key for lesson in lessons})
+    return place(periods, lessons, total_weeks or fallback_templates.DEFAULT_WEEKS, **options)
+
+
+def _topic_weeks(db: Session, subject_id: int, topic_ids: Set[Any]) -> int:
+    topics = crud.topic.get_page(db, *crud.topic._subject_criteria(subject_id))
+    return sum(topic.duration_weeks or 0 for topic in topics if topic.id in topic_ids)
@@ -0,0 +1,333 @@
+"""
+Topic dependency graph for the AI context builder
+Topic titles are classified once with a keyword automaton (Aho-Corasick over every keyword
+used by the complexity, prerequisite and cross-reference rules), so each title is scanned a
+single time whatever the number of rules. A subject's graph joins two kinds of edges:
+
+- explicit prerequisites stored in topic_prerequisites (set by admins), and
+- keyword prerequisites, e.g. topics mentioning "algebra" come before "geometry" topics.
+
+Topics are ordered topologically; ties (and cycles, which are reported and broken) go to the
+lower complexity rank, then to the curriculum order. Graphs are cached per worker and rebuilt
+when the subject's content version changes, which includes prerequisite edits.
+"""
+
+import heapq
+import logging
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+import crud
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_GRAPHS = 512
+# Related topics listed per topic, earliest in the curriculum first
+MAX_CROSS_REFERENCES = 10
+
+# Rank used to order topics of equal standing; the first keyword found (in this order) decides
+COMPLEXITY_RANKS = {
+    # Mathematics progression
+    "numbers": 1,
+    "algebra": 2,
+    "geometry": 2,
+    "statistics": 3,
+    "calculus": 4,
+
+    # Science progression
+    "introduction": 1,
+    "basic_concepts": 1,
+    "fundamentals": 1,
+    "applications": 2,
+    "advanced_concepts": 3,
+    "research": 4,
+
+    # Language progression
+    "vocabulary": 1,
+    "grammar": 2,
+    "reading": 2,
+    "writing": 3,
+    "literature": 3,
+    "analysis": 3,
+
+    # Humanities progression
+    "overview": 1,
+    "basic_principles": 1,
+    "detailed_study": 2,
+    "evaluation": 4,
+    "synthesis": 4,
+}
+DEFAULT_RANK = 2
+
+# Complexity level: the first level with a matching keyword wins
+LEVEL_KEYWORDS = [
+    ("foundation", ("introduction", "basic", "fundamental", "overview")),
+    ("intermediate", ("application", "analysis", "development", "practice")),
+    ("advanced", ("advanced", "complex", "synthesis", "evaluation", "research")),
+]
+DEFAULT_LEVEL = "intermediate"
+
+SCIENCES = ("biology", "chemistry", "physics")
+
+# (keywords that must all appear, keywords of which one must appear, prerequisites);
+# the first matching rule wins
+PREREQUISITE_RULES = [
+    (("algebra",), (), ("numbers", "basic operations")),
+    (("geometry",), (), ("algebra", "basic shapes")),
+    (("calculus",), (), ("algebra", "geometry", "functions")),
+    (("advanced",), SCIENCES, ("basic concepts", "fundamentals")),
+    (("writing",), (), ("vocabulary", "grammar")),
+    (("literature",), (), ("reading", "vocabulary")),
+]
+
+# Topic keyword → keywords of the topics it cross-references. Science topics reference each
+# other and, like the original rules, skip the language links.
+CROSS_REFERENCE_RULES = [
+    ("algebra", ("geometry",)),
+    ("geometry", ("algebra",)),
+    ("grammar", ("writing",)),
+    ("vocabulary", ("reading", "writing", "speaking")),
+]
+LANGUAGE_LINKS = ("grammar", "vocabulary")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick matcher: every keyword occurring in a text, in one pass over it"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[FrozenSet[str]] = [frozenset()]
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(frozenset())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state] = self._out[state] | {keyword}
+
+        # Breadth-first, so every failure link points at an already finished, shallower state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] | self._out[self._fail[child]]
+
+    def find(self, text: str) -> FrozenSet[str]:
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._out[state]:
+                found.update(self._out[state])
+        return frozenset(found)
+
+
+def _vocabulary() -> List[str]:
+    words = set(COMPLEXITY_RANKS) | set(SCIENCES)
+    for _, keywords in LEVEL_KEYWORDS:
+        words.update(keywords)
+    for all_of, any_of, prerequisites in PREREQUISITE_RULES:
+        words.update(all_of)
+        words.update(any_of)
+        words.update(prerequisites)
+    for keyword, targets in CROSS_REFERENCE_RULES:
+        words.add(keyword)
+        words.update(targets)
+    return sorted(words)
+
+
+_automaton = KeywordAutomaton(_vocabulary())
+
+
+# A topic title, or a ("keyword", name) node standing for every topic that mentions name
+Node = Union[str, Tuple[str, str]]
+
+
+class TopicFeatures(NamedTuple):
+    keywords: FrozenSet[str]
+    rank: int
+    level: str
+    prerequisites: Tuple[str, ...]  # keyword-derived prerequisite names
+    science: bool
+
+
+@lru_cache(maxsize=4096)
+def classify(title: str) -> TopicFeatures:
+    keywords = _automaton.find(title or "")
+    rank = next((value for key, value in COMPLEXITY_RANKS.items() if key in keywords), DEFAULT_RANK)
+    level = next((name for name, words in LEVEL_KEYWORDS if keywords.intersection(words)), DEFAULT_LEVEL)
+    prerequisites: Tuple[str, ...] = ()
+    for all_of, any_of, names in PREREQUISITE_RULES:
+        if all(word in keywords for word in all_of) and (not any_of or keywords.intersection(any_of)):
+            prerequisites = names
+            break
+    return TopicFeatures(keywords, rank, level, prerequisites, bool(keywords.intersection(SCIENCES)))
+
+
+class TopicGraph:
+    """Topics of one subject (titles in curriculum order) with their prerequisite edges"""
+
+    def __init__(self, titles: Sequence[str], explicit: Optional[Dict[str, List[str]]] = None):
+        self.titles = list(dict.fromkeys(title for title in titles if title))
+        self.index = {title: i for i, title in enumerate(self.titles)}
+        self.features = {title: classify(title) for title in self.titles}
+        self.explicit = {
+            title: [p for p in dict.fromkeys(prereqs) if p in self.index and p != title]
+            for title, prereqs in (explicit or {}).items() if title in self.index
+        }
+        self.by_keyword: Dict[str, List[str]] = {}
+        for title in self.titles:
+            for keyword in self.features[title].keywords:
+                self.by_keyword.setdefault(keyword, []).append(title)
+        self.requires = self._edges()
+        self.position = {title: i for i, title in enumerate(self._topological_order())}
+
+    def _edges(self) -> Dict[Node, List[Node]]:
+        """node → nodes that must come before it. Keyword prerequisites go through one
+        ("keyword", name) node per name, so they cost one edge per topic rather than one per pair."""
+        requires: Dict[Node, List[Node]] = {}
+        for title in self.titles:
+            before: List[Node] = list(self.explicit.get(title, []))
+            features = self.features[title]
+            for name in features.prerequisites:
+                # A topic mentioning its own prerequisite (e.g. "Advanced fundamentals of biology")
+                # would wait for itself
+                if name in self.by_keyword and name not in features.keywords:
+                    node = ("keyword", name)
+                    requires.setdefault(node, list(self.by_keyword[name]))
+                    before.append(node)
+            requires[title] = list(dict.fromkeys(before))
+        return requires
+
+    def _sort_key(self, title: str) -> Tuple[int, int]:
+        return self.features[title].rank, self.index[title]
+
+    def _topological_order(self) -> List[str]:
+        pending = {node: len(before) for node, before in self.requires.items()}
+        unlocks: Dict[Node, List[Node]] = {}
+        for node, before in self.requires.items():
+            for other in before:
+                unlocks.setdefault(other, []).append(node)
+
+        heap = [(self._sort_key(title), title) for title in self.titles if pending[title] == 0]
+        heapq.heapify(heap)
+        order: List[str] = []
+        placed = set()
+
+        def release(node: Node):
+            stack = [node]
+            while stack:
+                for other in unlocks.get(stack.pop(), ()):
+                    pending[other] -= 1
+                    if pending[other] != 0:
+                        continue
+                    if isinstance(other, tuple):
+                        stack.append(other)  # keyword nodes complete as soon as their topics are placed
+                    elif other not in placed:
+                        heapq.heappush(heap, (self._sort_key(other), other))
+
+        while len(order) < len(self.titles):
+            if not heap:
+                # Cycle: release the easiest remaining topic and carry on
+                title = min((t for t in self.titles if t not in placed), key=self._sort_key)
+                logger.warning(f"Topic prerequisites form a cycle through '{title}'")
+                heapq.heappush(heap, (self._sort_key(title), title))
+            _, title = heapq.heappop(heap)
+            if title in placed:
+                continue
+            placed.add(title)
+            order.append(title)
+            release(title)
+        return order
+
+    def order(self, titles: Iterable[str]) -> List[str]:
+        """titles in dependency order; titles outside this graph are ordered among themselves"""
+        titles = list(titles)
+        if all(title in self.position for title in titles):
+            return sorted(titles, key=self.position.__getitem__)
+        return TopicGraph(titles, self.explicit).order(titles)
+
+    def prerequisites(self, title: str) -> List[str]:
+        """Explicit prerequisite topics first, then the keyword-derived prerequisite names"""
+        names = list(self.explicit.get(title, []))
+        names.extend(classify(title).prerequisites)
+        return list(dict.fromkeys(names))
+
+    def cross_references(self, titles: Sequence[str]) -> Dict[str, List[str]]:
+        """title → up to MAX_CROSS_REFERENCES related titles among the given ones, in the given order.
+        Each title looks at the head of a few keyword buckets, so the whole map is linear."""
+        titles = list(dict.fromkeys(title for title in titles if title))
+        position = {title: i for i, title in enumerate(titles)}
+        by_keyword: Dict[str, List[str]] = {}
+        sciences: List[str] = []
+        for title in titles:
+            features = classify(title)
+            for keyword in features.keywords:
+                by_keyword.setdefault(keyword, []).append(title)
+            if features.science:
+                sciences.append(title)
+
+        # One spare per bucket makes up for skipping the topic itself
+        head = MAX_CROSS_REFERENCES + 1
+        result = {}
+        for title in titles:
+            features = classify(title)
+            related = set()
+            for keyword, targets in CROSS_REFERENCE_RULES:
+                if keyword in features.keywords and not (features.science and keyword in LANGUAGE_LINKS):
+                    for target in targets:
+                        related.update(by_keyword.get(target, ())[:head])
+            if features.science:
+                related.update(other for other in sciences[:head] if other.lower() != title.lower())
+            related.discard(title)
+            result[title] = sorted(related, key=position.__getitem__)[:MAX_CROSS_REFERENCES]
+        return result
+
+
+_lock = threading.Lock()
+_graphs: "OrderedDict[int, Tuple[str, TopicGraph]]" = OrderedDict()
+
+
+def get_graph(db: Session, subject_id: int) -> Optional[TopicGraph]:
+    """The subject's active topics and prerequisites, rebuilt only when its content version changes"""
+    version = crud.subject.get_content_version(db=db, subject_id=subject_id)
+    if version is None:
+        return None
+    with _lock:
+        cached = _graphs.get(subject_id)
+        if cached and cached[0] == version:
+            _graphs.move_to_end(subject_id)
+            metrics.record_cache("topic_graph", True)
+            return cached[1]
+    metrics.record_cache("topic_graph", False)
+
+    topics = crud.topic.get_page(db, *crud.topic._subject_criteria(subject_id))
+    titles = {topic.id: topic.title for topic in topics}
+    explicit: Dict[str, List[str]] = {}
+    for topic_id, prerequisite_id in crud.topic_prerequisite.get_by_subject(db=db, subject_id=subject_id):
+        if topic_id in titles and prerequisite_id in titles:
+            explicit.setdefault(titles[topic_id], []).append(titles[prerequisite_id])
+    graph = TopicGraph([topic.title for topic in topics], explicit)
+
+    with _lock:
+        _graphs[subject_id] = (version, graph)
+        _graphs.move_to_end(subject_id)
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.popitem(last=False)
+    return graph
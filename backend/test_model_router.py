@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for token usage on streamed completions (services.model_router)
+Runs offline against a stub client: python test_model_router.py (or pytest)
+"""
+from types import SimpleNamespace
+
+from services import model_router
+
+
+def _chunk(content=None, x_groq=None):
+    delta = SimpleNamespace(content=content)
+    chunk = SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+    if x_groq is not None:
+        chunk.x_groq = x_groq
+    return chunk
+
+
+class StubStream:
+    """A groq 0.4 stream: text deltas, then usage as a plain dict under x_groq"""
+
+    def __init__(self, parts):
+        self.chunks = [_chunk(part) for part in parts] + [_chunk(x_groq={
+            "id": "req_1",
+            "usage": {"prompt_tokens": 120, "completion_tokens": 42, "total_tokens": 162},
+        })]
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+class StubClient:
+    def __init__(self, parts):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: StubStream(parts)))
+
+
+def test_chunk_usage_from_dict():
+    usage = model_router.chunk_usage(_chunk(x_groq={"usage": {"prompt_tokens": 5, "completion_tokens": 7}}))
+    assert usage.prompt_tokens == 5
+    assert usage.completion_tokens == 7
+    assert model_router.chunk_usage(_chunk("text", x_groq={"id": "req_1"})) is None
+    assert model_router.chunk_usage(_chunk("text")) is None
+
+
+def test_streamed_usage_reaches_result():
+    route = model_router.Route("llama3-8b-8192")
+    router = model_router.ModelRouter([route], hedging=False)
+    result = router.complete(router.plan(200), lambda r: StubClient(['{"weeks": ', '[]}']),
+                             [{"role": "user", "content": "scheme"}], prompt_tokens=120)
+    assert result.content == '{"weeks": []}'
+    assert result.usage.prompt_tokens == 120
+    assert result.usage.completion_tokens == 42
+    assert result.usage.total_tokens == 162
+
+
+if __name__ == "__main__":
+    test_chunk_usage_from_dict()
+    test_streamed_usage_reaches_result()
+    print("✅ Streamed usage tests passed")
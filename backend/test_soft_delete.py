@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for cascading soft delete and restore (crud.BaseCRUD)
+Runs offline against an in-memory SQLite database: python test_soft_delete.py (or pytest)
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    school = models.School(name="Test School", code="TS")
+    db.add(school)
+    db.flush()
+    level = models.SchoolLevel(name="Secondary", code="SS", school_id=school.id)
+    db.add(level)
+    db.flush()
+    form = models.FormGrade(name="Form 1", code="F1", school_level_id=level.id)
+    db.add(form)
+    db.flush()
+    term = models.Term(name="Term 1", code="T1", form_grade_id=form.id)
+    db.add(term)
+    db.flush()
+    subject = models.Subject(name="Mathematics", code="MATH", term_id=term.id)
+    db.add(subject)
+    db.flush()
+    topic = models.Topic(title="Numbers", subject_id=subject.id)
+    db.add(topic)
+    db.flush()
+    for position in range(3):
+        db.add(models.Subtopic(title=f"Subtopic {position}", topic_id=topic.id, display_order=position))
+    db.commit()
+    return db, subject, topic
+
+
+def _active_subtopics(db, topic):
+    db.expire_all()
+    return [subtopic.is_active for subtopic in db.query(models.Subtopic).filter_by(topic_id=topic.id).order_by(models.Subtopic.id)]
+
+
+def test_restore_after_edit():
+    db, _, topic = _session()
+    crud.topic.soft_delete(db=db, id=topic.id)
+    assert _active_subtopics(db, topic) == [False, False, False]
+    crud.topic.update(db=db, db_obj=crud.topic.get(db, topic.id), obj_in={"description": "Edited while deleted"})
+    crud.topic.restore(db=db, id=topic.id)
+    assert crud.topic.get(db, topic.id).is_active
+    assert _active_subtopics(db, topic) == [True, True, True]
+
+
+def test_restore_keeps_rows_switched_off_on_their_own():
+    db, subject, topic = _session()
+    first = db.query(models.Subtopic).filter_by(topic_id=topic.id).order_by(models.Subtopic.id).first()
+    crud.subtopic.soft_delete(db=db, id=first.id)
+    crud.subject.soft_delete(db=db, id=subject.id)
+    assert not crud.topic.get(db, topic.id).is_active
+    assert _active_subtopics(db, topic) == [False, False, False]
+    crud.subject.restore(db=db, id=subject.id)
+    assert crud.topic.get(db, topic.id).is_active
+    assert _active_subtopics(db, topic) == [False, True, True]
+
+
+def test_delete_reaches_active_rows_below_inactive_ones():
+    db, subject, topic = _session()
+    crud.topic.soft_delete(db=db, id=topic.id)
+    first = db.query(models.Subtopic).filter_by(topic_id=topic.id).order_by(models.Subtopic.id).first()
+    crud.subtopic.restore(db=db, id=first.id)
+    crud.subject.soft_delete(db=db, id=subject.id)
+    assert _active_subtopics(db, topic) == [False, False, False]
+    # Restoring the subject undoes only its own delete: the topic stays off, the subtopic
+    # switched back on by hand is on again
+    crud.subject.restore(db=db, id=subject.id)
+    assert not crud.topic.get(db, topic.id).is_active
+    assert _active_subtopics(db, topic) == [True, False, False]
+    crud.topic.restore(db=db, id=topic.id)
+    assert _active_subtopics(db, topic) == [True, True, True]
+
+
+if __name__ == "__main__":
+    test_restore_after_edit()
+    test_restore_keeps_rows_switched_off_on_their_own()
+    test_delete_reaches_active_rows_below_inactive_ones()
+    print("✅ Soft delete tests passed")
@@ -272,7 +272,8 @@ export default function SchemeGeneratorPage() {
         '/api/schemes/generate',
         {
           context: generationContext,
-          generation_config: generationConfig
+          generation_config: generationConfig,
+          scheme_id: Number(context.schemeId) || undefined
         },
         {
           user_google_id: userGoogleId
@@ -321,6 +322,7 @@ export default function SchemeGeneratorPage() {
               }
             },
             ai_model_used: generationConfig.model,
+            generation_metadata: response.data?.metadata,
             user_google_id: userGoogleId
           }
           
@@ -1,53 +1,92 @@
 "use client"
 
-import { useState, useCallback, useMemo } from 'react'
+import { useState, useCallback, useEffect, useMemo } from 'react'
+import apiClient from '@/lib/apiClient'
 import { LessonSlot, TimetableAnalytics, AITip } from '../types/timetable'
 
+const ANALYTICS_DEBOUNCE_MS = 300
+
+const EMPTY_ANALYTICS: Omit<TimetableAnalytics, 'lastUpdated'> = {
+  totalSessions: 0,
+  totalHours: 0,
+  singleLessons: 0,
+  doubleLessons: 0,
+  eveningLessons: 0,
+  dailyDistribution: {},
+  totalDays: 0,
+  averageSessionsPerDay: 0,
+  patternType: 'Empty Schedule',
+  patternDescription: 'No lessons scheduled yet',
+  workloadLevel: 'light',
+  workloadPercentage: 0,
+  efficiency: 0
+}
+
+// Distribution, workload, pattern and clashes are computed by the backend
+// (POST /api/timetables/analytics); only the tips are derived here
 export function useTimetableAnalytics(selectedSlots: LessonSlot[]) {
   const [lastAnalysisTime, setLastAnalysisTime] = useState<Date>(new Date())
-
-  // Calculate basic analytics
-  const analytics = useMemo((): TimetableAnalytics => {
-    const dailyDistribution = selectedSlots.reduce((acc, slot) => {
-      acc[slot.day] = (acc[slot.day] || 0) + 1
-      return acc
-    }, {} as Record<string, number>)
-
-    const singleLessons = selectedSlots.filter(slot => !slot.isDoubleLesson).length
-    const doubleLessons = selectedSlots.filter(slot => 
-      slot.isDoubleLesson && slot.doublePosition === 'top'
-    ).length
-    const eveningLessons = selectedSlots.filter(slot => slot.isEvening).length
-
-    // Calculate total hours (40 min per single, 80 min per double)
-    const totalMinutes = (singleLessons * 40) + (doubleLessons * 80)
-    const totalHours = Math.round((totalMinutes / 60) * 10) / 10
-
-    const totalSessions = singleLessons + doubleLessons
-    const totalDays = Object.keys(dailyDistribution).length
-    const averageSessionsPerDay = totalDays > 0 ? totalSessions / totalDays : 0
-
-    const patternResult = detectSchedulePattern(selectedSlots)
-    const workloadResult = calculateWorkloadLevel(selectedSlots)
-
-    return {
-      totalSessions,
-      totalHours,
-      singleLessons,
-      doubleLessons,
-      eveningLessons,
-      dailyDistribution,
-      totalDays,
-      averageSessionsPerDay,
-      patternType: patternResult.type,
-      patternDescription: patternResult.description,
-      workloadLevel: workloadResult.level,
-      workloadPercentage: workloadResult.percentage,
-      efficiency: Math.round((totalSessions / Math.max(totalDays, 1)) * 20),
-      lastUpdated: lastAnalysisTime
+  const [result, setResult] = useState<{ analytics: Omit<TimetableAnalytics, 'lastUpdated'>, conflicts: string[] }>({
+    analytics: EMPTY_ANALYTICS,
+    conflicts: []
+  })
+
+  useEffect(() => {
+    if (selectedSlots.length === 0) {
+      setResult({ analytics: EMPTY_ANALYTICS, conflicts: [] })
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      try {
+        const response = await apiClient.post('/api/timetables/analytics', {
+          slots: selectedSlots.map(slot => ({
+            day_of_week: slot.day,
+            time_slot: slot.timeSlot,
+            period_number: slot.period,
+            is_double_lesson: slot.isDoubleLesson || false,
+            double_position: slot.doublePosition,
+            is_evening: slot.isEvening || false
+          }))
+        })
+        const data = response?.data
+        if (cancelled || !data) return
+        setResult({
+          analytics: {
+            totalSessions: data.total_sessions,
+            totalHours: data.total_hours,
+            singleLessons: data.single_lessons,
+            doubleLessons: data.double_lessons,
+            eveningLessons: data.evening_lessons,
+            dailyDistribution: data.daily_distribution,
+            totalDays: data.total_days,
+            averageSessionsPerDay: data.average_sessions_per_day,
+            patternType: data.pattern_type,
+            patternDescription: data.pattern_description,
+            workloadLevel: data.workload_level,
+            workloadPercentage: data.workload_percentage,
+            efficiency: data.efficiency
+          },
+          conflicts: (data.conflicts || []).map((conflict: { day: string, time_slot: string }) =>
+            `${conflict.day}-${conflict.time_slot}`
+          )
+        })
+      } catch (error) {
+        // Keep showing the last analysis until the backend answers again
+        console.error('Timetable analytics failed:', error)
+      }
+    }, ANALYTICS_DEBOUNCE_MS)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
     }
   }, [selectedSlots, lastAnalysisTime])
 
+  const analytics = useMemo((): TimetableAnalytics => ({
+    ...result.analytics,
+    lastUpdated: lastAnalysisTime
+  }), [result, lastAnalysisTime])
+
   // Generate AI tips based on current schedule
   const aiTips = useMemo((): AITip[] => {
     return generateAITips(selectedSlots, analytics)
@@ -56,29 +95,8 @@ export function useTimetableAnalytics(selectedSlots: LessonSlot[]) {
   // Get workload level for quick reference
   const workloadLevel = analytics.workloadLevel
 
-  // Get conflict warnings
-  const conflictWarnings = useMemo((): string[] => {
-    const conflicts: string[] = []
-    const slotMap = new Map<string, LessonSlot[]>()
-
-    // Group slots by day-time
-    selectedSlots.forEach(slot => {
-      const key = `${slot.day}-${slot.timeSlot}`
-      if (!slotMap.has(key)) {
-        slotMap.set(key, [])
-      }
-      slotMap.get(key)!.push(slot)
-    })
-
-    // Check for conflicts
-    slotMap.forEach((slots, key) => {
-      if (slots.length > 1) {
-        conflicts.push(key)
-      }
-    })
-
-    return conflicts
-  }, [selectedSlots])
+  // Clashing cells as `${day}-${timeSlot}` keys
+  const conflictWarnings = result.conflicts
 
   // Update analytics (triggers recalculation)
   const updateAnalytics = useCallback(() => {
@@ -94,108 +112,6 @@ export function useTimetableAnalytics(selectedSlots: LessonSlot[]) {
   }
 }
 
-// Helper functions for pattern detection and workload calculation
-function detectSchedulePattern(slots: LessonSlot[]) {
-  if (slots.length === 0) {
-    return {
-      type: 'Empty Schedule',
-      description: 'No lessons scheduled yet'
-    }
-  }
-
-  const dailyDistribution = slots.reduce((acc, slot) => {
-    acc[slot.day] = (acc[slot.day] || 0) + 1
-    return acc
-  }, {} as Record<string, number>)
-
-  const days = Object.keys(dailyDistribution)
-  const counts = Object.values(dailyDistribution)
-  const hasDoubles = slots.some(slot => slot.isDoubleLesson)
-  const hasEvening = slots.some(slot => slot.isEvening)
-  const maxDaily = Math.max(...counts)
-  const minDaily = Math.min(...counts)
-  const variance = maxDaily - minDaily
-
-  // Pattern detection logic
-  if (hasDoubles && hasEvening) {
-    return {
-      type: 'Mixed Timing',
-      description: 'Flexible schedule with double lessons and evening sessions'
-    }
-  }
-
-  if (hasDoubles && slots.filter(s => s.isDoubleLesson).length >= 4) {
-    return {
-      type: 'Double-Heavy',
-      description: 'Intensive approach with multiple double lessons'
-    }
-  }
-
-  if (variance <= 1 && days.length >= 3) {
-    return {
-      type: 'Balanced Distribution',
-      description: 'Even spread across multiple days'
-    }
-  }
-
-  if (days.includes('MON') && days.includes('TUE') && !days.includes('THU') && !days.includes('FRI')) {
-    return {
-      type: 'Front-Loaded',
-      description: 'Heavy concentration early in the week'
-    }
-  }
-
-  if (days.length === 5) {
-    return {
-      type: 'Daily Touchpoint',
-      description: 'Consistent daily engagement throughout the week'
-    }
-  }
-
-  if (days.length <= 2) {
-    return {
-      type: 'Concentrated',
-      description: 'Intensive sessions on limited days'
-    }
-  }
-
-  return {
-    type: 'Custom Pattern',
-    description: 'Unique schedule tailored to specific needs'
-  }
-}
-
-function calculateWorkloadLevel(slots: LessonSlot[]) {
-  const totalSlots = slots.length
-  const doubleLessons = slots.filter(slot => slot.isDoubleLesson && slot.doublePosition === 'top').length
-  const eveningLessons = slots.filter(slot => slot.isEvening).length
-  
-  // Calculate weighted workload (doubles and evenings count more)
-  const weightedLoad = totalSlots + (doubleLessons * 0.5) + (eveningLessons * 0.3)
-  
-  let level: string
-  let percentage: number
-
-  if (weightedLoad === 0) {
-    level = 'light'
-    percentage = 0
-  } else if (weightedLoad <= 5) {
-    level = 'light'
-    percentage = Math.round((weightedLoad / 5) * 25)
-  } else if (weightedLoad <= 12) {
-    level = 'optimal'
-    percentage = Math.round(25 + ((weightedLoad - 5) / 7) * 50)
-  } else if (weightedLoad <= 18) {
-    level = 'heavy'
-    percentage = Math.round(75 + ((weightedLoad - 12) / 6) * 20)
-  } else {
-    level = 'overloaded'
-    percentage = Math.min(100, Math.round(95 + ((weightedLoad - 18) / 5) * 5))
-  }
-
-  return { level, percentage }
-}
-
 function generateAITips(slots: LessonSlot[], analytics: TimetableAnalytics): AITip[] {
   const tips: AITip[] = []
 
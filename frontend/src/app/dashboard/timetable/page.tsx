@@ -118,6 +118,7 @@ export default function TimetablePage() {
   const [currentSubject, setCurrentSubject] = useState<any>(null)
   const [availableTopics, setAvailableTopics] = useState<any[]>([])
   const [availableSubtopics, setAvailableSubtopics] = useState<any[]>([])
+  const [subjectSubtopics, setSubjectSubtopics] = useState<any[]>([])
   const [selectedTopicIds, setSelectedTopicIds] = useState<number[]>([])
   const [selectedSubtopicIds, setSelectedSubtopicIds] = useState<number[]>([])
   const [isDataLoading, setIsDataLoading] = useState(true)
@@ -184,53 +185,30 @@ export default function TimetablePage() {
         return
       }
       
-      console.log('📡 Making API call to:', `/api/v1/admin/topics/?subject_id=${subjectId}`)
+      console.log('📡 Making API call to:', `/api/v1/subjects/${subjectId}/content-tree`)
       
-      // Load topics for this specific subject ONLY
-      const topicsResponse = await apiClient.get('/api/v1/admin/topics/', {
-        subject_id: subjectId
-      })
+      // One round trip: active topics with their active subtopics nested, already ordered
+      const treeResponse = await apiClient.get(`/api/v1/subjects/${subjectId}/content-tree`)
       
-      console.log('📚 Raw topics response:', topicsResponse)
-      console.log('📚 Topics response success:', topicsResponse?.success)
-      console.log('📚 Topics response data:', topicsResponse?.data)
-      console.log('📚 Topics response length:', topicsResponse?.data?.length)
+      console.log('📚 Content tree response:', treeResponse)
       
-      if (topicsResponse.success && topicsResponse.data) {
-        console.log(`✅ Successfully loaded ${topicsResponse.data.length} topics`)
-        setAvailableTopics(topicsResponse.data)
+      if (treeResponse.success && treeResponse.data) {
+        const topics = treeResponse.data.topics || []
+        console.log(`✅ Successfully loaded ${topics.length} topics`)
+        setAvailableTopics(topics)
         
-        if (topicsResponse.data.length === 0) {
+        if (topics.length === 0) {
           console.warn('⚠️ No topics found for this subject')
           setError(`No topics found for this subject. The subject may not have curriculum content yet.`)
         }
         
-        // Load subtopics for all topics of this subject
-        console.log('🔄 Starting to load subtopics for topics:', topicsResponse.data.map(t => t.id))
-        const allSubtopics: any[] = []
-        
-        for (const topic of topicsResponse.data) {
-          try {
-            console.log(`📖 Loading subtopics for topic ${topic.id} (${topic.title})`)
-            
-            const subtopicsResponse = await apiClient.get('/api/v1/admin/subtopics/', {
-              topic_id: topic.id
-            })
-            
-            console.log(`📖 Subtopics response for topic ${topic.id}:`, subtopicsResponse)
-            
-            if (subtopicsResponse.success && subtopicsResponse.data) {
-              console.log(`✅ Found ${subtopicsResponse.data.length} subtopics for topic ${topic.id}`)
-              allSubtopics.push(...subtopicsResponse.data)
-            } else {
-              console.warn(`⚠️ No subtopics found for topic ${topic.id}`)
-            }
-          } catch (subErr) {
-            console.error(`❌ Error fetching subtopics for topic ${topic.id}:`, subErr)
-          }
-        }
+        // Flatten the nested subtopics; they come without topic_id, so add it back
+        const allSubtopics: any[] = topics.flatMap((topic: any) =>
+          (topic.subtopics || []).map((subtopic: any) => ({ ...subtopic, topic_id: topic.id }))
+        )
         
         console.log(`🎯 Total subtopics collected:`, allSubtopics.length)
+        setSubjectSubtopics(allSubtopics)
         setAvailableSubtopics(allSubtopics)
         
         if (allSubtopics.length === 0) {
@@ -238,10 +216,10 @@ export default function TimetablePage() {
           setError('No subtopics found for any topic in this subject.')
         }
         
-        console.log(`✅ Final results - Topics: ${topicsResponse.data.length}, Subtopics: ${allSubtopics.length}`)
+        console.log(`✅ Final results - Topics: ${topics.length}, Subtopics: ${allSubtopics.length}`)
         
       } else {
-        console.error('❌ Failed to load topics - Invalid response:', topicsResponse)
+        console.error('❌ Failed to load topics - Invalid response:', treeResponse)
         setError('Failed to load topics. Please check if curriculum content exists for this subject.')
       }
     } catch (error: any) {
@@ -606,6 +584,7 @@ export default function TimetablePage() {
       setSelectedSubtopicIds([])
       setAvailableTopics([])
       setAvailableSubtopics([])
+      setSubjectSubtopics([])
       updateSelectedTopics([])
       updateSelectedSubtopics([])
       clearAll()
@@ -840,7 +819,7 @@ export default function TimetablePage() {
       newSelectedTopicIds.includes(topic.id)
     )
     updateSelectedTopics(selectedTopicsData)
-  }, [selectedTopicIds, availableSubtopics, availableTopics, updateSelectedTopics])
+  }, [selectedTopicIds, availableSubtopics, availableTopics, subjectSubtopics, updateSelectedTopics])
 
   const handleSubtopicSelect = useCallback((subtopicId: number, checked: boolean) => {
     if (checked) {
@@ -882,7 +861,7 @@ export default function TimetablePage() {
       newSelectedTopicIds.includes(topic.id)
     )
     updateSelectedTopics(selectedTopicsData)
-  }, [selectedTopicIds, availableSubtopics, availableTopics, updateSelectedTopics])
+  }, [selectedTopicIds, availableSubtopics, availableTopics, subjectSubtopics, updateSelectedTopics])
 
   const handleBulkSubtopicSelect = useCallback((subtopicIds: number[], selected: boolean) => {
     if (selected) {
@@ -901,23 +880,10 @@ export default function TimetablePage() {
     updateSelectedSubtopics(selectedSubtopicsData)
   }, [selectedSubtopicIds, availableSubtopics, updateSelectedSubtopics])
 
-  // Load subtopics for selected topics
+  // Narrow subtopics to the selected topics (already loaded with the content tree)
   const loadSubtopicsForTopics = useCallback(async (topicIds: number[]) => {
-    try {
-      const allSubtopics: any[] = []
-      for (const topicId of topicIds) {
-        const subtopicsResponse = await apiClient.get('/api/v1/admin/subtopics/', {
-          topic_id: topicId
-        })
-        if (subtopicsResponse.success && subtopicsResponse.data) {
-          allSubtopics.push(...subtopicsResponse.data)
-        }
-      }
-      setAvailableSubtopics(allSubtopics)
-    } catch (error) {
-      console.error('Error loading subtopics:', error)
-    }
-  }, [])
+    setAvailableSubtopics(subjectSubtopics.filter(subtopic => topicIds.includes(subtopic.topic_id)))
+  }, [subjectSubtopics])
 
   // Handle slot click with proper validation
   const handleSlotClick = useCallback((slot: LessonSlot) => {
@@ -221,6 +221,10 @@ export const topicApi = {
     return apiClient.get(`/api/v1/admin/topics/${id}`)
   },
 
+  async getByIds(ids: number[]): Promise<any> {
+    return apiClient.get('/api/v1/admin/topics:batch', { ids: ids.join(',') })
+  },
+
   async getBySubject(subjectId: number): Promise<any> {
     return apiClient.get('/api/v1/admin/topics/', { subject_id: subjectId })
   }
@@ -235,6 +239,10 @@ export const subtopicApi = {
     return apiClient.get(`/api/v1/admin/subtopics/${id}`)
   },
 
+  async getByIds(ids: number[]): Promise<any> {
+    return apiClient.get('/api/v1/admin/subtopics:batch', { ids: ids.join(',') })
+  },
+
   async getByTopic(topicId: number): Promise<any> {
     return apiClient.get('/api/v1/admin/subtopics/', { topic_id: topicId })
   }